@@ -0,0 +1,237 @@
+# analysis_pipeline.py
+#
+# Background frame-analysis pipeline for /api/camera/upload.
+#
+# Uploads are handed to a small pool of worker threads instead of
+# running the LLM call inside the Flask request. Work is coalesced per
+# camera: each camera has at most one pending frame, and a newer upload
+# replaces it (the stale frame is dropped without being analyzed). A
+# camera is never analyzed by two workers at once, so results for one
+# camera are always applied in upload order.
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional
+
+from history_store import to_epoch
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+DROPPED = "dropped"    # superseded by a newer frame from the same camera
+REJECTED = "rejected"  # queue was full
+
+
+class AnalysisPipeline:
+    """
+    Bounded, per-camera-coalescing work queue with a worker pool.
+
+    - analyze_fn(camera_id, image_path) -> dict: e.g. a wrapper around
+      llm_processor.analyze_parking_image
+    - on_result(camera_id, result, timestamp_iso): called from the worker
+      after a successful analysis (e.g. app.update_spot_storage)
+    - max_pending: max number of cameras with a frame waiting
+    - max_jobs_kept: how many finished job records status() remembers
+    """
+
+    def __init__(
+        self,
+        analyze_fn: Callable[[str, str], Dict[str, Any]],
+        on_result: Callable[[str, Dict[str, Any], str], None],
+        workers: int = 2,
+        max_pending: int = 64,
+        max_jobs_kept: int = 1000,
+    ):
+        self.analyze_fn = analyze_fn
+        self.on_result = on_result
+        self.num_workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.max_jobs_kept = max_jobs_kept
+
+        self._cond = threading.Condition()
+        self._ready: deque[str] = deque()          # cameras with a dispatchable frame
+        self._pending: Dict[str, Dict[str, Any]] = {}  # camera_id -> newest waiting job
+        self._running: Dict[str, Dict[str, Any]] = {}  # camera_id -> job being analyzed
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "dropped_stale": 0,
+            "rejected_full": 0,
+        }
+
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self) -> None:
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.num_workers):
+                t = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"analysis-worker-{i}",
+                    daemon=True,
+                )
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for t in threads:
+            t.join(timeout)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until nothing is pending or running (handy for offline tests).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    # -----------------------------
+    # Producer side
+    # -----------------------------
+    def submit(self, camera_id: str, image_path: str, timestamp_iso: str) -> Dict[str, Any]:
+        """
+        Queue a frame for analysis and return a copy of its job record.
+
+        If the camera already has a frame waiting, that frame is marked
+        DROPPED and replaced. If too many cameras are waiting, the new
+        job is REJECTED.
+        """
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "camera_id": camera_id,
+            "file": image_path,
+            "timestamp": timestamp_iso,
+            "status": QUEUED,
+            "result": None,
+            "error": None,
+        }
+
+        with self._cond:
+            self._counters["submitted"] += 1
+
+            stale = self._pending.get(camera_id)
+            if stale is None and len(self._pending) >= self.max_pending:
+                job["status"] = REJECTED
+                self._counters["rejected_full"] += 1
+                self._remember(job)
+                return dict(job)
+
+            if stale is not None:
+                stale["status"] = DROPPED
+                self._counters["dropped_stale"] += 1
+            elif camera_id not in self._running:
+                # Camera already in _ready if it had a stale frame; cameras
+                # still running get re-queued when their current job ends.
+                self._ready.append(camera_id)
+
+            self._pending[camera_id] = job
+            self._remember(job)
+            self._cond.notify_all()
+            return dict(job)
+
+    def _remember(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["job_id"]] = job
+        while len(self._jobs) > self.max_jobs_kept:
+            self._jobs.popitem(last=False)
+
+    # -----------------------------
+    # Introspection
+    # -----------------------------
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def oldest_timestamp(self) -> Optional[float]:
+        """
+        Epoch of the oldest frame waiting or being analyzed (its history
+        rows are not written yet), or None when idle.
+        """
+        with self._cond:
+            stamps = [job["timestamp"] for job in self._pending.values()]
+            stamps += [job["timestamp"] for job in self._running.values()]
+        return min(to_epoch(ts) for ts in stamps) if stamps else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.num_workers,
+                "max_pending": self.max_pending,
+                "queue_depth": len(self._pending),
+                "running": len(self._running),
+                **self._counters,
+            }
+
+    # -----------------------------
+    # Worker side
+    # -----------------------------
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            while not self._ready and not self._stopping:
+                self._cond.wait()
+            if self._stopping:
+                return None
+
+            camera_id = self._ready.popleft()
+            job = self._pending.pop(camera_id)
+            job["status"] = RUNNING
+            self._running[camera_id] = job
+            return job
+
+    def _finish(self, job: Dict[str, Any]) -> None:
+        with self._cond:
+            camera_id = job["camera_id"]
+            self._running.pop(camera_id, None)
+            if camera_id in self._pending:
+                # A newer frame arrived while we were busy with this camera
+                self._ready.append(camera_id)
+            self._cond.notify_all()
+
+    def _worker_loop(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            try:
+                result = self.analyze_fn(job["camera_id"], job["file"])
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                self.on_result(job["camera_id"], result, job["timestamp"])
+            except Exception as e:
+                print(f"[analysis_pipeline] {job['camera_id']} job {job['job_id']} failed: {e}")
+                with self._cond:
+                    job["status"] = FAILED
+                    job["error"] = str(e)
+                    self._counters["failed"] += 1
+            else:
+                with self._cond:
+                    job["status"] = DONE
+                    job["result"] = result
+                    self._counters["completed"] += 1
+            finally:
+                self._finish(job)
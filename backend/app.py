@@ -1,36 +1,154 @@
-from flask import Flask, request, jsonify, send_file
-from llm_processor import analyze_parking_image
-from predictor import predict_empty_probability, expected_wait_minutes
+from flask import Flask, Response, g, request, jsonify, send_file
+from llm_processor import analyze_parking_image, num_spots_for, BatchingAnalyzer, PAYLOAD_STATS
+import llm_processor
+from predictor import predict_empty_probability, predict_empty_probabilities, expected_wait_minutes, active_model, model_for
+import predictor
+from model_lifecycle import ModelLifecycle
+from spatial_index import SpotIndex, haversine_pairs_m
+from spot_state import SpotStateStore
+from response_cache import ResponseCache, etag_matches
+from change_journal import ChangeJournal, api_changes
+from spot_stream import SpotStream, Region, HEARTBEAT_FRAME, resync_frame
+from analysis_pipeline import AnalysisPipeline, REJECTED
+from history_store import open_history_store, to_epoch
+from event_log import TransitionFilter
+from rollups import OccupancyRollups, RESOLUTIONS
+from scene_change import SceneChangeDetector
+from shared_state import open_shared_state
+from request_profiler import RequestProfiler, TOKEN_HEADER, ID_HEADER
+import metrics
+from metrics import STAGE_SECONDS, UPLOADS, UPLOAD_BYTES, ANALYSES, HISTORY_ROWS
+import local_classifier
 from datetime import datetime, timedelta
+import atexit
+import hmac
 import os
-import csv
 import math
+import threading
+import time
+import numpy as np
 
 app = Flask(__name__)
 
 # Global: remember last uploaded image path
 LAST_IMAGE_PATH = None
 
-# CSV file for historical spot records
+# CSV file for historical spot records (the original format; imported
+# into the history store the first time an empty store is opened)
 HISTORY_CSV = "history.csv"
 
-# In-memory "current snapshot" of the latest analysis per camera
-# {
-#   "cam-001": {
-#       "timestamp": "...ISO...",
-#       "spots": [
-#           {
-#               "spot_index": 0,
-#               "status": "empty",
-#               "lat": None,
-#               "lng": None,
-#           },
-#           ...
-#       ]
-#   },
-#   ...
-# }
-CURRENT_SPOTS = {}
+# Indexed history storage (see history_store.py): "sqlite" (default),
+# "columnar" or "csv". Rows are written in batched group commits.
+HISTORY_BACKEND = os.environ.get("HISTORY_BACKEND", "sqlite")
+HISTORY_STORE = open_history_store(
+    HISTORY_BACKEND,
+    os.environ.get("HISTORY_PATH"),
+    migrate_from_csv=HISTORY_CSV,
+    batch_size=int(os.environ.get("HISTORY_BATCH_SIZE", "500")),
+    flush_interval_s=float(os.environ.get("HISTORY_FLUSH_S", "1.0")),
+)
+
+# HISTORY_MODE=transitions only logs status changes plus a full keyframe
+# per camera every HISTORY_KEYFRAME_S seconds (see event_log.py; read it
+# back with event_log.EventLogReader). The default "full" logs every row.
+HISTORY_MODE = os.environ.get("HISTORY_MODE", "full")
+HISTORY_KEYFRAME_S = float(os.environ.get("HISTORY_KEYFRAME_S", "900"))
+HISTORY_FILTER = TransitionFilter(HISTORY_KEYFRAME_S) if HISTORY_MODE == "transitions" else None
+
+# Per-camera / per-spot occupancy rollups at 1m, 15m and 1h, updated by
+# update_spot_storage on every upload (see rollups.py).
+ROLLUPS = OccupancyRollups()
+# With every upload logged, _backfill_rollups() rebuilds the rows stamped
+# before this moment from the history store and live uploads add only
+# the later ones, so a row flushed while the backfill runs is not
+# counted twice
+ROLLUP_BACKFILL_END = datetime.utcnow()
+if HISTORY_MODE == "full":
+    ROLLUPS.live_since = to_epoch(ROLLUP_BACKFILL_END)
+
+# Background retraining of the forecast model from the history store,
+# with validation and a live swap (see model_lifecycle.py). Off by
+# default, so importing this module (tests, benchmarks, tools) does not
+# create models/ or start training: serve.py turns it on for worker 0,
+# and `MODEL_RETRAIN_ENABLED=1 python app.py` for the development server.
+# When off, the app only follows versions activated elsewhere (the CLI,
+# or the one serve.py worker that retrains).
+MODEL_RETRAIN_ENABLED = os.environ.get("MODEL_RETRAIN_ENABLED", "0") != "0"
+MODEL_LIFECYCLE = ModelLifecycle(
+    HISTORY_STORE,
+    interval_s=float(os.environ.get("MODEL_RETRAIN_INTERVAL_S", str(6 * 3600))),
+    min_new_rows=int(os.environ.get("MODEL_RETRAIN_MIN_ROWS", "2000")),
+    poll_s=float(os.environ.get("MODEL_RETRAIN_POLL_S", "300")),
+)
+
+# Cameras that share a per-lot forecast model, e.g.
+# CAMERA_LOTS="cam-001:lot-a,cam-002:lot-a" (see model_registry.py);
+# other cameras use their own model if they have one, else the global one.
+predictor.MODEL_REGISTRY.aliases.update(
+    pair.split(":", 1) for pair in os.environ.get("CAMERA_LOTS", "").split(",") if ":" in pair
+)
+
+# Background frame analysis (see analysis_pipeline.py)
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "2"))
+ANALYSIS_MAX_PENDING = int(os.environ.get("ANALYSIS_MAX_PENDING", "64"))
+# On shutdown, seconds to let queued and running analyses finish before
+# the history store is flushed and closed (see shutdown())
+ANALYSIS_DRAIN_S = float(os.environ.get("ANALYSIS_DRAIN_S", "30"))
+
+# Local CPU classifier tried before the LLM (see local_classifier.py).
+# Only used if occupancy_model.joblib exists (train_occupancy_model.py);
+# frames with any spot below LOCAL_MIN_CONFIDENCE still go to the LLM.
+LOCAL_CLASSIFIER_ENABLED = os.environ.get("LOCAL_CLASSIFIER_ENABLED", "1") != "0"
+LOCAL_CLASSIFIER = (
+    local_classifier.load_default(float(os.environ.get("LOCAL_MIN_CONFIDENCE", "0.9")), lazy=True)
+    if LOCAL_CLASSIFIER_ENABLED
+    else None
+)
+LOCAL_COUNTERS = {"frames": 0, "accepted": 0, "escalated": 0}
+# Analysis workers update LOCAL_COUNTERS concurrently
+_LOCAL_COUNTERS_LOCK = threading.Lock()
+
+
+def _count_local(name):
+    with _LOCAL_COUNTERS_LOCK:
+        LOCAL_COUNTERS[name] += 1
+
+
+def _local_counters():
+    with _LOCAL_COUNTERS_LOCK:
+        return dict(LOCAL_COUNTERS)
+
+
+# Pack frames from several cameras into one vision request when
+# LLM_BATCH_SIZE > 1 (see llm_processor.BatchingAnalyzer). Batches only
+# fill up if ANALYSIS_WORKERS >= LLM_BATCH_SIZE.
+LLM_BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", "1"))
+LLM_BATCH_FLUSH_S = float(os.environ.get("LLM_BATCH_FLUSH_S", "0.5"))
+LLM_BATCHER = (
+    BatchingAnalyzer(batch_size=LLM_BATCH_SIZE, flush_interval_s=LLM_BATCH_FLUSH_S)
+    if LLM_BATCH_SIZE > 1
+    else None
+)
+
+# Skip the LLM when no spot region changed since the last analyzed frame
+# (see scene_change.py). SCENE_CHANGE_ENABLED=0 turns it off. Each camera
+# is split into as many regions as the prompt gives it spots.
+SCENE_CHANGE_ENABLED = os.environ.get("SCENE_CHANGE_ENABLED", "1") != "0"
+SCENE_DETECTOR = SceneChangeDetector(
+    region_threshold=float(os.environ.get("SCENE_REGION_THRESHOLD", "8.0")),
+    max_reuse_s=float(os.environ.get("SCENE_MAX_REUSE_S", "300")),
+    spot_count=num_spots_for,
+)
+
+# In-memory "current snapshot" of the latest analysis per camera: one
+# row per spot (camera, spot_index, status, lat/lng, last update) in
+# NumPy columns, with each camera's spots in one contiguous block that
+# uploads overwrite in place (see spot_state.py).
+SPOT_STATE = SpotStateStore()
+
+# Recent spot status changes for delta sync (/api/spots/changes), at most
+# CHANGE_JOURNAL_SIZE entries (see change_journal.py)
+CHANGE_JOURNAL = ChangeJournal(int(os.environ.get("CHANGE_JOURNAL_SIZE", "100000")))
 
 # Hardcoded coordinates for each (camera_id, spot_index).
 # Dummy values for now; later you can calibrate these to real GPS coords.
@@ -44,6 +162,92 @@ SPOT_COORDS = {
     # Add more as you add more cameras/spots
 }
 
+# Grid index over the spots in SPOT_STATE, keyed by (camera_id, spot_index),
+# so location queries only touch nearby spots. Kept in sync by
+# update_spot_storage().
+SPOT_INDEX = SpotIndex()
+
+# Multi-process serving (serve.py): the workers share SPOT_STATE and
+# LAST_IMAGE_PATH through per-camera entry files and a small memory-mapped
+# index of recent writes (see shared_state.py). Each worker publishes its
+# own camera updates and applies the others' before handling a request
+# (and every SHARED_SYNC_S seconds in the background). Unset, e.g.
+# `python app.py`, keeps the state in this process only.
+SHARED_STATE_PATH = os.environ.get("SHARED_STATE_PATH", "")
+SHARED_STATE = open_shared_state(SHARED_STATE_PATH)
+SHARED_SYNC_S = float(os.environ.get("SHARED_SYNC_S", "0.25"))
+_SHARED_SYNC_LOCK = threading.Lock()
+_SHARED_SEEN_GEN = 0
+
+# Serialized /api/spots/current and /api/spots/forecast bodies, keyed by
+# SPOT_STATE.version, a RESPONSE_CACHE_BUCKET_S time bucket and the query
+# (lat/lng rounded to RESPONSE_CACHE_COORD_DECIMALS places, 4 ~ 11 m),
+# with ETag / If-None-Match and optional gzip (see response_cache.py).
+# RESPONSE_CACHE_SIZE should cover the distinct keys polled between two
+# state versions (one per ~11 m cell with a phone in it, per endpoint);
+# at ~6 KB per entry (body plus gzip) the default 2048 holds ~12 MB.
+# RESPONSE_CACHE_ENABLED=0 builds every response from scratch.
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "1") != "0"
+RESPONSE_CACHE_BUCKET_S = float(os.environ.get("RESPONSE_CACHE_BUCKET_S", "15"))
+RESPONSE_CACHE_COORD_DECIMALS = int(os.environ.get("RESPONSE_CACHE_COORD_DECIMALS", "4"))
+RESPONSE_CACHE_GZIP = os.environ.get("RESPONSE_CACHE_GZIP", "1") != "0"
+RESPONSE_CACHE = ResponseCache(
+    app.json.dumps,
+    max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", "2048")),
+    gzip_min_bytes=int(os.environ.get("RESPONSE_CACHE_GZIP_MIN_BYTES", "1024")),
+)
+
+# Push stream of spot changes (/api/spots/stream, server-sent events) per
+# region, each change serialized once per region (see spot_stream.py).
+# Past STREAM_MAX_SUBSCRIBERS streams new ones get a 503; a stream more
+# than STREAM_MAX_QUEUED frames (or STREAM_MAX_QUEUED_BYTES) behind is
+# ended with a resync event. Idle streams get a comment line every
+# STREAM_HEARTBEAT_S seconds, which is also when a client that went away
+# is noticed.
+STREAM_HEARTBEAT_S = float(os.environ.get("STREAM_HEARTBEAT_S", "15"))
+SPOT_STREAM = SpotStream(
+    app.json.dumps,
+    max_subscribers=int(os.environ.get("STREAM_MAX_SUBSCRIBERS", "5000")),
+    max_queued=int(os.environ.get("STREAM_MAX_QUEUED", "64")),
+    max_queued_bytes=int(os.environ.get("STREAM_MAX_QUEUED_BYTES", str(256 * 1024))),
+)
+
+# POST /api/spots/forecast/batch: at most FORECAST_BATCH_MAX_QUERIES
+# queries per request. Query-to-spot distances are computed as one
+# matrix, in chunks of about FORECAST_BATCH_CHUNK pairs to bound memory.
+FORECAST_BATCH_MAX_QUERIES = int(os.environ.get("FORECAST_BATCH_MAX_QUERIES", "200"))
+FORECAST_BATCH_CHUNK = 1 << 21
+
+# GET /api/spots/forecast/horizon: the outlook reaches at most
+# HORIZON_MAX_MINUTES ahead (the table wraps around the week), and each
+# point's expected wait is capped at HORIZON_MAX_WAIT_MINUTES like
+# expected_wait_minutes()
+HORIZON_MAX_MINUTES = int(os.environ.get("HORIZON_MAX_MINUTES", str(7 * 24 * 60)))
+HORIZON_MAX_WAIT_MINUTES = int(os.environ.get("HORIZON_MAX_WAIT_MINUTES", "60"))
+
+# Opt-in request profiling (see request_profiler.py): PROFILE_SAMPLE_RATE
+# of requests, plus any request whose X-Profile-Token header matches
+# PROFILE_TOKEN, run under cProfile; the newest PROFILE_KEEP runs stay in
+# PROFILE_DIR and are listed at /admin/profiles (token required). Sampled
+# runs under PROFILE_MIN_MS are discarded. With neither a rate nor a
+# token, no request hook is installed.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+REQUEST_PROFILER = RequestProfiler(
+    os.environ.get("PROFILE_DIR", "profiles"),
+    sample_rate=PROFILE_SAMPLE_RATE,
+    token=PROFILE_TOKEN,
+    keep=int(os.environ.get("PROFILE_KEEP", "200")),
+    min_duration_s=float(os.environ.get("PROFILE_MIN_MS", "0")) / 1000.0,
+)
+
+# Operator token for the /api/model endpoints that change the served
+# model (retrain, rollback, activate), sent in the X-Admin-Token header.
+# Without ADMIN_TOKEN they answer 403.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
 def haversine_distance_m(lat1, lng1, lat2, lng2):
     """
     Rough distance between two lat/lng points in meters.
@@ -64,6 +268,94 @@ def haversine_distance_m(lat1, lng1, lat2, lng2):
     return R * c
 
 
+def _nearby_spots(user_lat, user_lng, radius, k):
+    """
+    API spot dicts for the spots in SPOT_STATE, nearest first.
+
+    - radius: only spots within radius meters (via SPOT_INDEX cells)
+    - k: only the k nearest spots, without sorting every spot
+
+    Spots without coordinates (or every spot, if the user location is
+    unknown) have distanceMeters None and come last, like the old full sort.
+    """
+    if user_lat is None or user_lng is None:
+        slots = SPOT_STATE.select()
+        distances = [None] * len(slots)
+    else:
+        if k is not None:
+            rows = SPOT_INDEX.nearest(user_lat, user_lng, k, max_radius_m=radius)
+        else:
+            rows = SPOT_INDEX.within(user_lat, user_lng, radius)
+        rows += [(key, None) for key in SPOT_INDEX.unlocated()]
+
+        slots = SPOT_STATE.slots_for(key for key, _ in rows)
+        distances = [d for _, d in rows]
+        found = slots >= 0  # a key can briefly outlive its spot during an update
+        if not found.all():
+            distances = [d for d, ok in zip(distances, found.tolist()) if ok]
+            slots = slots[found]
+
+    if k is not None:
+        slots, distances = slots[:max(k, 0)], distances[:max(k, 0)]
+
+    cols = SPOT_STATE.columns(slots)
+    return [
+        {
+            "spotID": f"{camera_id}-spot-{spot_index}",
+            "lat": lat,
+            "lng": lng,
+            "status": status,
+            "sourceCameraID": camera_id,
+            "lastUpdated": timestamp,
+            "distanceMeters": distance_m,
+        }
+        for camera_id, spot_index, lat, lng, status, timestamp, distance_m in zip(
+            cols["camera_id"], cols["spot_index"], cols["lat"], cols["lng"],
+            cols["status"], cols["timestamp"], distances,
+        )
+    ]
+
+
+def _quantize_coord(x):
+    return None if x is None else round(x, RESPONSE_CACHE_COORD_DECIMALS)
+
+
+def _quantize_arrival(arrival_iso):
+    """
+    Arrival time floored to the minute (the forecast table's resolution),
+    so nearby arrival times share a cache entry.
+    """
+    if not arrival_iso:
+        return arrival_iso
+    try:
+        arrival_dt = datetime.fromisoformat(arrival_iso.replace("Z", ""))
+    except ValueError:
+        return arrival_iso  # answered like any invalid time
+    if arrival_dt.tzinfo is not None:
+        return arrival_iso
+    return arrival_dt.replace(second=0, microsecond=0).isoformat() + "Z"
+
+
+def _cached_json(key, build):
+    """
+    Serve build()'s payload through RESPONSE_CACHE: 304 when the client's
+    If-None-Match matches, else the cached body (gzipped if accepted).
+    """
+    entry = RESPONSE_CACHE.get(key, build)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if etag_matches(request.headers.get("If-None-Match"), entry.etag):
+        RESPONSE_CACHE.count("not_modified")
+        return Response(status=304, headers=headers)
+
+    if RESPONSE_CACHE_GZIP and RESPONSE_CACHE.should_gzip(entry, request.headers.get("Accept-Encoding")):
+        RESPONSE_CACHE.count("gzip")
+        headers["Content-Encoding"] = "gzip"
+        return Response(entry.gzipped(), status=200, mimetype="application/json", headers=headers)
+
+    return Response(entry.body, status=200, mimetype="application/json", headers=headers)
+
+
 # Health check / root
 @app.route("/")
 def root():
@@ -83,18 +375,37 @@ def api_spots_forecast():
       - computes arrival_dt from time and current time
       - uses predictor.py to estimate predictedAvailability and expectedWaitMinutes
       - returns spots (currently empty/occupied) with prediction info attached
+
+    Served from RESPONSE_CACHE while the spot state and global model are
+    unchanged (lat/lng rounded, time floored to the minute).
     """
 
     user_lat = request.args.get("lat", type=float)
     user_lng = request.args.get("lng", type=float)
     radius = request.args.get("radius", type=int)
+    k = request.args.get("k", type=int)
 
     # Desired arrival time from frontend
     arrival_iso = request.args.get("time")
 
-    now_utc = datetime.utcnow()
-    now_iso = now_utc.isoformat() + "Z"
+    if not RESPONSE_CACHE_ENABLED:
+        return jsonify(_forecast_payload(user_lat, user_lng, radius, k, arrival_iso)), 200
+
+    user_lat, user_lng = _quantize_coord(user_lat), _quantize_coord(user_lng)
+    arrival_iso = _quantize_arrival(arrival_iso)
+    key = (
+        "forecast", SPOT_STATE.version, predictor.model_version(),
+        int(time.time() // RESPONSE_CACHE_BUCKET_S),
+        user_lat, user_lng, radius, k, arrival_iso,
+    )
+    return _cached_json(key, lambda: _forecast_payload(user_lat, user_lng, radius, k, arrival_iso))
 
+
+def _arrival_eta(arrival_iso, now_utc):
+    """
+    (arrival_dt, eta_minutes) for a requested arrival time: past times
+    are clamped to now, and a missing or invalid one means ~5 minutes.
+    """
     arrival_dt = None
     eta_minutes = None
 
@@ -118,45 +429,28 @@ def api_spots_forecast():
         eta_minutes = 5.0
         arrival_dt = now_utc + timedelta(minutes=5.0)
 
-    # Before we have real LLM data, pretend cam-001 sees 6 spots.
-    # Some empty, some occupied.
-    spots = []
+    return arrival_dt, eta_minutes
 
-    if CURRENT_SPOTS:
-        for camera_id, snapshot in CURRENT_SPOTS.items():
-            camera_ts = snapshot.get("timestamp")
-            for rec in snapshot.get("spots", []):
-                spot_index = rec.get("spot_index")
-                status = rec.get("status")
-                lat = rec.get("lat")
-                lng = rec.get("lng")
 
-                distance_m = None
-                if (
-                    user_lat is not None and user_lng is not None and 
-                    lat is not None and lng is not None
-                ):
-                    distance_m = haversine_distance_m(user_lat, user_lng, lat, lng)
+def _forecast_payload(user_lat, user_lng, radius, k, arrival_iso):
+    """
+    Response body of /api/spots/forecast.
+    """
+    started = time.perf_counter()
+    now_utc = datetime.utcnow()
+    now_iso = now_utc.isoformat() + "Z"
 
-                if (radius is not None and distance_m is not None and distance_m > radius):
-                    continue
+    arrival_dt, eta_minutes = _arrival_eta(arrival_iso, now_utc)
 
-                predicted_avail = predict_empty_probability(arrival_dt)
+    # Before we have real LLM data, pretend cam-001 sees 6 spots.
+    # Some empty, some occupied.
+    spots = []
 
-                spot = {
-                    "spotID": f"{camera_id}-spot-{spot_index}",
-                    "lat": lat,
-                    "lng": lng,
-                    "status": status,
-                    "sourceCameraID": camera_id,
-                    "lastUpdated": camera_ts,
-                    "distanceMeters": distance_m,
-                    "predictedAvailability": predicted_avail,
-                }
-                spots.append(spot)
+    if SPOT_STATE:
+        # Already nearest first (see _nearby_spots)
+        with STAGE_SECONDS.time("forecast", "nearby_spots", ""):
+            spots = _nearby_spots(user_lat, user_lng, radius, k)
     else:
-        dummy_pred_avail = predict_empty_probability(arrival_dt)
-
         # Fallback: original dummy test spots when we have no LLM data yet
         for idx in range(6):
             lat, lng = SPOT_COORDS.get(("cam-001", idx), (None, None))
@@ -181,40 +475,85 @@ def api_spots_forecast():
                 "sourceCameraID": "cam-001",
                 "lastUpdated": now_iso,
                 "distanceMeters": distance_m,
-                "predictedAvailability": dummy_pred_avail,
             }
             spots.append(spot)
 
-    # Sort spots by distance if available (nearest first).
-    # Spots with distanceMeters == None go last.
-    spots.sort(
-        key=lambda s: s["distanceMeters"]
-        if s.get("distanceMeters") is not None
-        else float("inf")
-    )
+        # Sort spots by distance if available (nearest first).
+        # Spots with distanceMeters == None go last.
+        spots.sort(
+            key=lambda s: s["distanceMeters"]
+            if s.get("distanceMeters") is not None
+            else float("inf")
+        )
+        if k is not None:
+            spots = spots[:max(k, 0)]
+
+    with STAGE_SECONDS.time("forecast", "predict", ""):
+        response = _forecast_response(
+            now_iso, {"lat": user_lat, "lng": user_lng, "radius": radius, "k": k}, spots, arrival_dt,
+            model_of=model_for,
+            avail_of=lambda num_empty, num_total, model: predict_empty_probability(
+                num_empty, num_total, eta_minutes, active=model),
+            wait_of=lambda num_empty, num_total, model: expected_wait_minutes(num_empty, num_total, active=model),
+        )
+    STAGE_SECONDS.observe(time.perf_counter() - started, "forecast", "total", "")
+    return response
+
+
+def _forecast_response(now_iso, query, spots, arrival_dt, model_of, avail_of, wait_of):
+    """
+    Forecast body for spots (nearest first): predictions per source
+    camera attached to each spot, plus the summary.
 
+    - model_of(camera_id): the model serving a camera
+    - avail_of / wait_of(num_empty, num_total, model): as
+      predict_empty_probability / expected_wait_minutes at the arrival time
+    """
     total_spots = len(spots)
     empty_spots = sum(1 for s in spots if s.get("status") == "empty")
     
-    # Prediction summary: average predicted availability + expected wait
-    if spots:
-        avg_pred_avail = sum(
-            s.get("predictedAvailability", 0.0) for s in spots
-        ) / len(spots)
+    # Prediction per source camera: each camera is served by its own (or
+    # its lot's) model from the registry, falling back to the global one.
+    # The model only depends on arrival time, so one table lookup covers
+    # every spot of a camera, and both numbers come from the same model
+    # version even if a retrained one is swapped in.
+    by_camera = {}
+    for s in spots:
+        by_camera.setdefault(s.get("sourceCameraID"), []).append(s)
+
+    camera_predictions = {}
+    for camera_id, cam_spots in by_camera.items():
+        model = model_of(camera_id)
+        cam_empty = sum(1 for s in cam_spots if s.get("status") == "empty")
+        cam_avail = avail_of(cam_empty, len(cam_spots), model)
+        cam_wait = wait_of(cam_empty, len(cam_spots), model)
+
+        # Every spot in the camera's group shares the same wait.
+        for s in cam_spots:
+            s["predictedAvailability"] = cam_avail
+            s["estimatedWaitMinutes"] = cam_wait
+        camera_predictions[camera_id] = (cam_avail, cam_wait, model.version)
+
+    if camera_predictions:
+        avg_pred_avail = sum(s["predictedAvailability"] for s in spots) / total_spots
+        # The driver can go to whichever lot frees up first
+        wait_minutes = min(wait for _, wait, _ in camera_predictions.values())
     else:
-        avg_pred_avail = predict_empty_probability(arrival_dt)
-
-    wait_minutes = expected_wait_minutes(arrival_dt)
+        model = active_model()
+        avg_pred_avail = avail_of(empty_spots, total_spots, model)
+        wait_minutes = wait_of(empty_spots, total_spots, model)
+        camera_predictions[None] = (avg_pred_avail, wait_minutes, model.version)
 
-    # Attach group-level estimated wait time to each spot.
-    # For our demo, every spot in the camera's group shares the same wait.
-    for s in spots:
-        s["estimatedWaitMinutes"] = wait_minutes
+    model_versions = {cam: version for cam, (_, _, version) in camera_predictions.items() if cam is not None}
+    distinct_versions = sorted({version for _, _, version in camera_predictions.values()})
 
     prediction = {
         "arrivalTimestamp": arrival_dt.isoformat() + "Z",
         "avgPredictedAvailability": avg_pred_avail,
         "expectedWaitMinutes": wait_minutes,
+        # One version string when every camera shares a model, else "mixed"
+        "modelVersion": distinct_versions[0] if len(distinct_versions) == 1 else "mixed",
+        "modelVersions": model_versions,
     }
 
     summary = {
@@ -224,17 +563,279 @@ def api_spots_forecast():
 
     response = {
         "timestamp": now_iso,
-        "query": {
-            "lat": user_lat,
-            "lng": user_lng,
-            "radius": radius,
-        },
+        "query": query,
         "summary": summary,
         "prediction": prediction,
         "spots": spots,
     }
 
-    return jsonify(response), 200
+    return response
+
+
+@app.route("/api/spots/forecast/batch", methods=["POST"])
+def api_spots_forecast_batch():
+    """
+    Batch forecast, for many destinations and arrival times at once.
+
+    Frontend sends JSON:
+      {"queries": [{"lat", "lng", "radius", "k", "time"}, ...]}
+    every field optional, as in /api/spots/forecast; at most
+    FORECAST_BATCH_MAX_QUERIES queries.
+
+    Returns:
+      - results: one /api/spots/forecast body (without "timestamp") per
+        query, in order. Every query sees the same spot state and the
+        same model per camera.
+    """
+    body = request.get_json(silent=True)
+    queries = body.get("queries") if isinstance(body, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": 'expected a JSON body {"queries": [...]}'}), 400
+    if len(queries) > FORECAST_BATCH_MAX_QUERIES:
+        return jsonify({"error": f"at most {FORECAST_BATCH_MAX_QUERIES} queries per batch"}), 400
+
+    try:
+        parsed = [_batch_query(q) for q in queries]
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"invalid query: {e}"}), 400
+
+    now_utc = datetime.utcnow()
+    return jsonify({
+        "timestamp": now_utc.isoformat() + "Z",
+        "results": _forecast_batch(parsed, now_utc),
+    }), 200
+
+
+def _batch_query(query):
+    """
+    (lat, lng, radius, k, time) of one batch query, typed like the
+    /api/spots/forecast query params.
+    """
+    if not isinstance(query, dict):
+        raise TypeError("each query must be an object")
+
+    def number(name, cast):
+        value = query.get(name)
+        return None if value is None else cast(value)
+
+    arrival_iso = query.get("time")
+    if arrival_iso is not None and not isinstance(arrival_iso, str):
+        raise TypeError("time must be an ISO-8601 string")
+    return number("lat", float), number("lng", float), number("radius", int), number("k", int), arrival_iso
+
+
+def _forecast_batch(queries, now_utc):
+    """
+    Forecast bodies (without "timestamp") for (lat, lng, radius, k, time)
+    queries. The per-spot work is shared by all of them: one distance
+    matrix, one column fetch for every selected spot, and one
+    probability gather over all arrival times per model.
+    """
+    if not SPOT_STATE:
+        # Dummy fallback spots, as in _forecast_payload
+        results = [_forecast_payload(*q) for q in queries]
+        for body in results:
+            del body["timestamp"]
+        return results
+
+    started = time.perf_counter()
+    now_iso = now_utc.isoformat() + "Z"
+    arrivals = [_arrival_eta(q[4], now_utc) for q in queries]
+    with STAGE_SECONDS.time("forecast_batch", "nearby_spots", ""):
+        selections = _nearby_slots_batch([q[:4] for q in queries])
+
+    # Columns of every selected spot, fetched once
+    with STAGE_SECONDS.time("forecast_batch", "columns", ""):
+        selected = np.concatenate([slots for slots, _ in selections])
+        unique_slots, inverse = np.unique(selected, return_inverse=True)
+        cols = SPOT_STATE.columns(unique_slots)
+        rows = list(zip(
+            cols["camera_id"], cols["spot_index"], cols["lat"], cols["lng"],
+            cols["status"], cols["timestamp"],
+        ))
+
+    # One model per camera and one P(any empty) per model and query
+    models = {}
+    probs = {}
+    waits = {}
+
+    def model_of(camera_id):
+        if camera_id not in models:
+            models[camera_id] = model_for(camera_id)
+        return models[camera_id]
+
+    def probs_for(model):
+        if id(model) not in probs:
+            etas = [eta for _, eta in arrivals]
+            probs[id(model)] = (model, predict_empty_probabilities(etas, active=model))
+        return probs[id(model)][1]
+
+    def wait_of(num_empty, num_total, model):
+        # Only depends on whether a spot is empty now, not on the query
+        key = (id(model), num_empty > 0)
+        if key not in waits:
+            waits[key] = (model, expected_wait_minutes(num_empty, num_total, active=model))
+        return waits[key][1]
+
+    results = []
+    offset = 0
+    with STAGE_SECONDS.time("forecast_batch", "predict", ""):
+        for qi, ((user_lat, user_lng, radius, k, _), (slots, distances), (arrival_dt, _)) in enumerate(
+            zip(queries, selections, arrivals)
+        ):
+            spots = []
+            for j, distance_m in zip(inverse[offset:offset + len(slots)].tolist(), distances):
+                camera_id, spot_index, lat, lng, status, timestamp = rows[j]
+                spots.append({
+                    "spotID": f"{camera_id}-spot-{spot_index}",
+                    "lat": lat,
+                    "lng": lng,
+                    "status": status,
+                    "sourceCameraID": camera_id,
+                    "lastUpdated": timestamp,
+                    "distanceMeters": distance_m,
+                })
+            offset += len(slots)
+
+            body = _forecast_response(
+                now_iso, {"lat": user_lat, "lng": user_lng, "radius": radius, "k": k}, spots, arrival_dt,
+                model_of=model_of,
+                avail_of=lambda num_empty, num_total, model, qi=qi: float(probs_for(model)[qi]),
+                wait_of=wait_of,
+            )
+            del body["timestamp"]
+            results.append(body)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "forecast_batch", "total", "")
+    return results
+
+
+def _nearby_slots_batch(queries):
+    """
+    _nearby_spots()'s selection for many (lat, lng, radius, k) queries:
+    [(slots, distances)], nearest first, from a queries x spots distance
+    matrix instead of one index lookup per query. Spots without
+    coordinates come last, in camera order.
+    """
+    slots = SPOT_STATE.select()
+    lat, lng = SPOT_STATE.coords(slots)
+    has = ~(np.isnan(lat) | np.isnan(lng))
+    located, unlocated = slots[has], slots[~has]
+    lat, lng = lat[has], lng[has]
+
+    def limit(found, distances, k):
+        if k is None:
+            return found, distances
+        return found[:max(k, 0)], distances[:max(k, 0)]
+
+    out = [None] * len(queries)
+    geo = []
+    for i, (user_lat, user_lng, _, k) in enumerate(queries):
+        if user_lat is None or user_lng is None:
+            out[i] = limit(slots, [None] * len(slots), k)
+        else:
+            geo.append(i)
+
+    rows_per_chunk = max(1, FORECAST_BATCH_CHUNK // max(1, len(located)))
+    for start in range(0, len(geo), rows_per_chunk):
+        chunk = geo[start:start + rows_per_chunk]
+        query_lat = np.array([queries[i][0] for i in chunk], dtype=np.float64)
+        query_lng = np.array([queries[i][1] for i in chunk], dtype=np.float64)
+        dist = haversine_pairs_m(query_lat[:, None], query_lng[:, None], lat[None, :], lng[None, :])
+
+        for i, row in zip(chunk, dist):
+            _, _, radius, k = queries[i]
+            idx = np.flatnonzero(row <= radius) if radius is not None else np.arange(row.shape[0])
+            if k is not None and k < idx.shape[0]:
+                # k nearest without sorting every candidate
+                idx = idx[np.argpartition(row[idx], k - 1)[:k]] if k > 0 else idx[:0]
+            idx = idx[np.argsort(row[idx], kind="stable")]
+            out[i] = limit(
+                np.concatenate([located[idx], unlocated]),
+                row[idx].tolist() + [None] * unlocated.shape[0],
+                k,
+            )
+    return out
+
+
+@app.route("/api/spots/forecast/horizon", methods=["GET"])
+def api_spots_forecast_horizon():
+    """
+    Availability outlook over the coming hours, for trip planning.
+
+    Frontend sends:
+      - camera: camera id or lot id (default: the global model)
+      - horizon: minutes ahead (default 360, at most one week)
+      - step: minutes between points (default 15)
+      - confidence: target for expectedWaitMinutes (default 0.8)
+
+    Returns:
+      - points: {minutesAhead, arrivalTimestamp, predictedAvailability,
+        expectedWaitMinutes} from now to the horizon. The wait is the
+        model's for arriving at that time, not counting spots the cameras
+        see empty right now (see /api/spots/forecast for that).
+
+    One table gather per request (predictor.availability_horizon), served
+    from RESPONSE_CACHE per (model version, camera/lot, minute).
+    """
+    camera_id = request.args.get("camera") or None
+    horizon = request.args.get("horizon", default=360, type=int)
+    step = request.args.get("step", default=15, type=int)
+    confidence = request.args.get("confidence", default=0.8, type=float)
+
+    if not 0 <= horizon <= HORIZON_MAX_MINUTES:
+        return jsonify({"error": f"horizon must be 0..{HORIZON_MAX_MINUTES} minutes"}), 400
+    if step < 1:
+        return jsonify({"error": "step must be at least 1 minute"}), 400
+    if not 0.0 < confidence <= 1.0:
+        return jsonify({"error": "confidence must be in (0, 1]"}), 400
+
+    # Every camera of a lot shares the lot's model, and its cache entries
+    model = model_for(camera_id)
+    model_key = predictor.MODEL_REGISTRY.key_for(camera_id)
+    now_local = datetime.now().replace(second=0, microsecond=0)
+    now_utc = datetime.utcnow().replace(second=0, microsecond=0)
+
+    def build():
+        with STAGE_SECONDS.time("forecast_horizon", "total", camera_id):
+            return _horizon_payload(model_key, model, now_utc, now_local, horizon, step, confidence)
+
+    if not RESPONSE_CACHE_ENABLED:
+        return jsonify(build()), 200
+
+    key = ("horizon", model.version, model_key, now_local.isoformat(), horizon, step, confidence)
+    return _cached_json(key, build)
+
+
+def _horizon_payload(model_key, model, start_utc, start_local, horizon, step, confidence):
+    """
+    Response body of /api/spots/forecast/horizon. start_local is the
+    same minute as start_utc in the model's (local) time.
+    """
+    availability, waits = predictor.availability_horizon(
+        horizon, step, confidence, max_wait=HORIZON_MAX_WAIT_MINUTES, now=start_local, active=model,
+    )
+    points = [
+        {
+            "minutesAhead": i * step,
+            "arrivalTimestamp": (start_utc + timedelta(minutes=i * step)).isoformat() + "Z",
+            "predictedAvailability": p,
+            "expectedWaitMinutes": w,
+        }
+        for i, (p, w) in enumerate(zip(availability.tolist(), waits.tolist()))
+    ]
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "query": {
+            "lot": model_key,
+            "horizon": horizon,
+            "step": step,
+            "confidence": confidence,
+        },
+        "modelVersion": model.version,
+        "start": start_utc.isoformat() + "Z",
+        "points": points,
+    }
+
 
 @app.route("/api/spots/current", methods=["GET"])
 def api_spots_current():
@@ -244,51 +845,47 @@ def api_spots_current():
     Frontend can optionally send:
       - lat, lng: user location
       - radius: filter radius in meters
+      - k: only return the k nearest spots
 
     Returns:
       - only spots that are currently EMPTY (available),
         optionally sorted by distance from the user.
+
+    Served from RESPONSE_CACHE while the spot state is unchanged
+    (lat/lng rounded).
     """
     user_lat = request.args.get("lat", type=float)
     user_lng = request.args.get("lng", type=float)
     radius = request.args.get("radius", type=int)
+    k = request.args.get("k", type=int)
 
-    now_utc = datetime.utcnow()
-    now_iso = now_utc.isoformat() + "Z"
+    if not RESPONSE_CACHE_ENABLED:
+        return jsonify(_current_payload(user_lat, user_lng, radius, k)), 200
 
-    spots: list[dict] = []
+    user_lat, user_lng = _quantize_coord(user_lat), _quantize_coord(user_lng)
+    key = (
+        "current", SPOT_STATE.version, int(time.time() // RESPONSE_CACHE_BUCKET_S),
+        user_lat, user_lng, radius, k,
+    )
+    return _cached_json(key, lambda: _current_payload(user_lat, user_lng, radius, k))
 
-    if CURRENT_SPOTS:
-        # Use latest LLM snapshot from all cameras
-        for camera_id, snapshot in CURRENT_SPOTS.items():
-            camera_ts = snapshot.get("timestamp")
-            for rec in snapshot.get("spots", []):
-                spot_index = rec.get("spot_index")
-                status = rec.get("status")
 
-                lat = rec.get("lat")
-                lng = rec.get("lng")
+def _current_payload(user_lat, user_lng, radius, k):
+    """
+    Response body of /api/spots/current.
+    """
+    # Read before the spots: if an update lands in between, a later
+    # /api/spots/changes?since=version just repeats it
+    version = CHANGE_JOURNAL.version
 
-                distance_m = None
-                if (
-                    user_lat is not None and user_lng is not None and
-                    lat is not None and lng is not None
-                ):
-                    distance_m = haversine_distance_m(user_lat, user_lng, lat, lng)
+    now_utc = datetime.utcnow()
+    now_iso = now_utc.isoformat() + "Z"
 
-                if radius is not None and distance_m is not None and distance_m > radius:
-                    continue
+    spots: list[dict] = []
 
-                spot = {
-                    "spotID": f"{camera_id}-spot-{spot_index}",
-                    "lat": lat,
-                    "lng": lng,
-                    "status": status,
-                    "sourceCameraID": camera_id,
-                    "lastUpdated": camera_ts,
-                    "distanceMeters": distance_m,
-                }
-                spots.append(spot)
+    if SPOT_STATE:
+        # Use latest LLM snapshot from all cameras, nearest first
+        spots = _nearby_spots(user_lat, user_lng, radius, k)
     else:
         # Fallback: use dummy spots, but only keep currently empty ones
         dummy_spots = [
@@ -330,12 +927,14 @@ def api_spots_current():
             s["distanceMeters"] = distance_m
             spots.append(s)
 
-    # Sort available spots by distance if we know it
-    spots.sort(
-        key=lambda s: s["distanceMeters"]
-        if s.get("distanceMeters") is not None
-        else float("inf")
-    )
+        # Sort available spots by distance if we know it
+        spots.sort(
+            key=lambda s: s["distanceMeters"]
+            if s.get("distanceMeters") is not None
+            else float("inf")
+        )
+        if k is not None:
+            spots = spots[:max(k, 0)]
 
     response = {
         "timestamp": now_iso,
@@ -343,11 +942,246 @@ def api_spots_current():
             "lat": user_lat,
             "lng": user_lng,
             "radius": radius,
+            "k": k,
         },
+        # Pass as /api/spots/changes?since= to get only later changes
+        "version": version,
         "spots": spots,
     }
 
-    return jsonify(response), 200
+    return response
+
+
+@app.route("/api/spots/changes", methods=["GET"])
+def api_spots_changes():
+    """
+    Delta sync: spots whose status changed after a version.
+
+    Frontend sends:
+      - since: "version" from /api/spots/current (the full snapshot it
+        holds) or from its previous /api/spots/changes response
+
+    Returns:
+      - version: pass as since next time
+      - changes: spots (fields as in /api/spots/current, without
+        distanceMeters) to add or update
+      - removed: spotIDs the cameras no longer report
+      - resync: true when since is older than the change journal (or from
+        before a restart); reload /api/spots/current instead
+    """
+    since = request.args.get("since", type=int)
+    if since is None:
+        return jsonify({"error": "since=<version> is required"}), 400
+
+    result = CHANGE_JOURNAL.since(since)
+    if result is None:
+        return jsonify({
+            "since": since,
+            "version": CHANGE_JOURNAL.version,
+            "resync": True,
+            "changes": [],
+            "removed": [],
+        }), 200
+
+    version, entries = result
+    changes, removed = api_changes(entries)
+    return jsonify({
+        "since": since,
+        "version": version,
+        "resync": False,
+        "changes": changes,
+        "removed": removed,
+    }), 200
+
+
+@app.route("/api/spots/stream", methods=["GET"])
+def api_spots_stream():
+    """
+    Push stream (server-sent events) of spot changes, instead of polling.
+
+    Frontend sends one of:
+      - lat, lng, radius: spots within radius meters (plus spots without
+        coordinates, as in /api/spots/current)
+      - cameras: comma-separated camera ids
+      - nothing: every spot
+    and optionally since (a version, like /api/spots/changes; on
+    reconnect the browser's Last-Event-ID header does the same) to first
+    get the changes it missed.
+
+    Events:
+      - hello: {"version"} once subscribed
+      - spots (id: version): {"version", "changes", "removed"} as in
+        /api/spots/changes, only spots in the region
+      - resync: {"version", "reason"}: changes were missed, reload
+        /api/spots/current; unless reason is "since", the stream ends
+    Idle streams get a ": ping" comment every STREAM_HEARTBEAT_S seconds.
+    """
+    user_lat = request.args.get("lat", type=float)
+    user_lng = request.args.get("lng", type=float)
+    radius = request.args.get("radius", type=float)
+    cameras = [c for c in request.args.get("cameras", "").split(",") if c]
+    if (user_lat is None, user_lng is None, radius is None) not in ((True, True, True), (False, False, False)):
+        return jsonify({"error": "lat, lng and radius must be given together"}), 400
+
+    since = request.args.get("since", type=int)
+    if since is None and request.headers.get("Last-Event-ID", "").isdigit():
+        since = int(request.headers["Last-Event-ID"])
+
+    # Rounded like the response cache keys, so nearby phones share a region
+    region = Region(cameras, _quantize_coord(user_lat), _quantize_coord(user_lng), radius)
+    sub = SPOT_STREAM.subscribe(region)
+    if sub is None:
+        return jsonify({"error": "too many streams, poll /api/spots/changes instead"}), 503
+
+    # Subscribed first, so nothing falls between the catch-up and the
+    # live frames; live frames the catch-up already covers are skipped
+    version = CHANGE_JOURNAL.version
+    head = [f'retry: 3000\nevent: hello\ndata: {{"version": {version}}}\n\n'.encode("utf-8")]
+    skip_through = 0
+    if since is not None:
+        result = CHANGE_JOURNAL.since(since)
+        if result is None:
+            head.append(resync_frame(version, "since"))
+        else:
+            skip_through, entries = result
+            entries = [e for e in entries if region.matches(e[1], e[4], e[5])]
+            if entries:
+                head.append(SPOT_STREAM.encode(skip_through, entries))
+
+    def stream():
+        try:
+            yield b"".join(head)
+            while True:
+                frames = sub.take(STREAM_HEARTBEAT_S)
+                if frames is None:
+                    return
+                frames = [frame for v, frame in frames if v is None or v > skip_through]
+                yield b"".join(frames) if frames else HEARTBEAT_FRAME
+        finally:
+            SPOT_STREAM.unsubscribe(sub)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _parse_time_window(default_hours: float = 24.0):
+    """
+    start/end query params (ISO-8601, "Z" optional). Defaults to the
+    last default_hours hours. Returns (start_dt, end_dt) or raises ValueError.
+    """
+    end_iso = request.args.get("end")
+    start_iso = request.args.get("start")
+
+    end_dt = datetime.fromisoformat(end_iso.replace("Z", "")) if end_iso else datetime.utcnow()
+    if start_iso:
+        start_dt = datetime.fromisoformat(start_iso.replace("Z", ""))
+    else:
+        start_dt = end_dt - timedelta(hours=default_hours)
+
+    if start_dt >= end_dt:
+        raise ValueError("start must be before end")
+    return start_dt, end_dt
+
+
+@app.route("/api/history", methods=["GET"])
+def api_history():
+    """
+    Historical per-spot occupancy.
+
+    Query params:
+      - camera_id, spot_index: optional filters
+      - start, end: ISO-8601 window (default: last 24h)
+      - resolution: raw | 1m | 15m | 1h (default raw)
+      - limit: max raw rows (default 10000)
+
+    raw returns the stored history rows (served from the history store's
+    (camera_id, timestamp) index); the other resolutions return columnar
+    per-camera series with per-spot sample/occupied counts per bucket from
+    the incremental rollups.
+    """
+    camera_id = request.args.get("camera_id")
+    spot_index = request.args.get("spot_index", type=int)
+    resolution = request.args.get("resolution", "raw")
+    limit = request.args.get("limit", default=10000, type=int)
+
+    try:
+        start_dt, end_dt = _parse_time_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = {
+        "camera_id": camera_id,
+        "spot_index": spot_index,
+        "start": start_dt.isoformat() + "Z",
+        "end": end_dt.isoformat() + "Z",
+        "resolution": resolution,
+    }
+
+    if resolution == "raw":
+        # One row past the limit, only to tell whether there were more
+        limit = max(limit, 0)
+        rows = HISTORY_STORE.query(
+            camera_id=camera_id, start=start_dt, end=end_dt, spot_index=spot_index, limit=limit + 1,
+        )
+        return jsonify({
+            "query": query,
+            "truncated": len(rows) > limit,
+            "records": rows[:limit],
+        }), 200
+
+    if resolution not in RESOLUTIONS:
+        return jsonify({"error": f"resolution must be raw or one of {sorted(RESOLUTIONS)}"}), 400
+
+    cameras = ROLLUPS.query(
+        start_dt, end_dt, resolution,
+        camera_ids=[camera_id] if camera_id else None,
+        per_spot=True,
+        spot_index=spot_index,
+    )
+    return jsonify({"query": query, "cameras": cameras}), 200
+
+
+@app.route("/api/occupancy/rollup", methods=["GET"])
+def api_occupancy_rollup():
+    """
+    Per-camera occupancy over time from the incremental rollups.
+
+    Query params:
+      - camera_id: optional, comma-separated list (default: all cameras)
+      - start, end: ISO-8601 window (default: last 24h)
+      - resolution: 1m | 15m | 1h (default 15m)
+      - per_spot: 1 to include per-spot sample/occupied counts
+
+    Each camera's series is columnar: parallel lists indexed by bucket
+    ("start" is the bucket start in epoch seconds).
+    """
+    camera_param = request.args.get("camera_id")
+    camera_ids = [c for c in camera_param.split(",") if c] if camera_param else None
+    resolution = request.args.get("resolution", "15m")
+    per_spot = request.args.get("per_spot", "0") in ("1", "true")
+
+    if resolution not in RESOLUTIONS:
+        return jsonify({"error": f"resolution must be one of {sorted(RESOLUTIONS)}"}), 400
+
+    try:
+        start_dt, end_dt = _parse_time_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cameras = ROLLUPS.query(start_dt, end_dt, resolution, camera_ids=camera_ids, per_spot=per_spot)
+
+    return jsonify({
+        "query": {
+            "camera_id": camera_ids,
+            "start": start_dt.isoformat() + "Z",
+            "end": end_dt.isoformat() + "Z",
+            "resolution": resolution,
+        },
+        "cameras": cameras,
+    }), 200
 
 
 # -----------------------------
@@ -363,63 +1197,159 @@ def camera_upload():
     Content-Type: image/jpeg
     Body: <raw JPEG bytes>
     """
-    global LAST_IMAGE_PATH
-
+    started = time.perf_counter()
     camera_id = request.args.get("camera_id", "unknown")
 
-    img_bytes = request.data or b""
+    with STAGE_SECONDS.time("camera_upload", "read_body", camera_id):
+        img_bytes = request.data or b""
     size = len(img_bytes)
     print(f"[camera_upload] Received image from {camera_id}, size={size} bytes")
 
     now_iso = datetime.utcnow().isoformat() + "Z"
 
     if not img_bytes:
+        UPLOADS.inc(camera_id, "empty")
         return jsonify({"error": "no data"}), 400
+    UPLOAD_BYTES.inc(camera_id, amount=size)
 
     # Save image to disk
-    os.makedirs("captures", exist_ok=True)
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = os.path.join("captures", f"{camera_id}_{timestamp}.jpg")
+    with STAGE_SECONDS.time("camera_upload", "save_jpeg", camera_id):
+        os.makedirs("captures", exist_ok=True)
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        filename = os.path.join("captures", f"{camera_id}_{timestamp}.jpg")
 
-    with open(filename, "wb") as f:
-        f.write(img_bytes)
+        with open(filename, "wb") as f:
+            f.write(img_bytes)
 
     print(f"[camera_upload] Saved image to {filename}")
 
-    # Remember this as the "latest" image
-    LAST_IMAGE_PATH = filename
+    # Remember this as the "latest" image (in every worker)
+    def remember(version):
+        global LAST_IMAGE_PATH
+        LAST_IMAGE_PATH = filename
 
-    # --- Step: Call LLM to analyze the image ---
-    try:
-        llm_result = analyze_parking_image(filename)
-        print("[LLM Result]", llm_result)
-    except Exception as e:
-        llm_result = {"error": str(e)}
-        print("[LLM ERROR]", e)
+    with STAGE_SECONDS.time("camera_upload", "share_latest", camera_id):
+        _shared_update(remember, last_image_path=filename)
 
-    if "error" not in llm_result:
-        update_spot_storage(camera_id, llm_result, now_iso)
+    # --- Step: queue the LLM analysis; a worker updates storage when done ---
+    with STAGE_SECONDS.time("camera_upload", "submit", camera_id):
+        job = ANALYSIS_PIPELINE.submit(camera_id, filename, now_iso)
+    print(f"[camera_upload] Job {job['job_id']} for {camera_id}: {job['status']}")
 
-    empty_spots = llm_result.get("empty_spots")
+    http_status = 503 if job["status"] == REJECTED else 202
+    UPLOADS.inc(camera_id, "rejected" if job["status"] == REJECTED else "accepted")
+    STAGE_SECONDS.observe(time.perf_counter() - started, "camera_upload", "total", camera_id)
 
     return jsonify({
-        "status": "ok",
+        "status": job["status"],
         "camera_id": camera_id,
         "size_bytes": size,
         "file": filename,
         "timestamp": now_iso,
-        "empty_spots": empty_spots,
-        "llm" : llm_result,
+        "job_id": job["job_id"],
+        "pipeline": ANALYSIS_PIPELINE.stats(),
+    }), http_status
+
+
+@app.route("/api/camera/jobs/<job_id>", methods=["GET"])
+def camera_job_status(job_id):
+    """
+    Status of an upload's analysis job: queued, running, done (with the
+    LLM result), failed, dropped (superseded by a newer frame from the
+    same camera) or rejected (queue was full).
+    """
+    job = ANALYSIS_PIPELINE.status(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job_id"}), 404
+
+    return jsonify({
+        **job,
+        "empty_spots": (job.get("result") or {}).get("empty_spots"),
+    }), 200
+
+
+@app.route("/api/camera/pipeline", methods=["GET"])
+def camera_pipeline_stats():
+    """
+    Queue depth, worker count and drop/reject counters for the analysis
+    pipeline, plus scene-change skip, response-cache, change-journal,
+    push-stream and request-profiler counters.
+    """
+    return jsonify({
+        **ANALYSIS_PIPELINE.stats(),
+        "scene_change": SCENE_DETECTOR.stats(),
+        "llm_batching": LLM_BATCHER.stats() if LLM_BATCHER is not None else None,
+        "payload_bytes": PAYLOAD_STATS.snapshot(),
+        "local_classifier": _local_counters() if LOCAL_CLASSIFIER is not None else None,
+        "response_cache": RESPONSE_CACHE.stats() if RESPONSE_CACHE_ENABLED else None,
+        "change_journal": CHANGE_JOURNAL.stats(),
+        "spot_stream": SPOT_STREAM.stats(),
+        "request_profiler": REQUEST_PROFILER.stats() if REQUEST_PROFILER.enabled else None,
     }), 200
 
+
+def _analyze_frame(camera_id: str, image_path: str) -> dict:
+    """
+    Worker-side analysis of one saved frame. Looks up analyze_parking_image
+    at call time so tests can swap in a stub.
+
+    If none of the camera's spot regions changed since the last analyzed
+    frame, the previous result is reused and the LLM is not called.
+    Otherwise the local classifier is tried first, and the frame is only
+    escalated to the LLM when some spot is below its confidence bar.
+    """
+    started = time.perf_counter()
+    if SCENE_CHANGE_ENABLED:
+        with STAGE_SECONDS.time("analyze_frame", "scene_change", camera_id):
+            reused = SCENE_DETECTOR.reuse_result(camera_id, image_path)
+        if reused is not None:
+            print(f"[scene_change] {camera_id}: no change, reusing last result")
+            ANALYSES.inc(camera_id, "scene_reuse")
+            STAGE_SECONDS.observe(time.perf_counter() - started, "analyze_frame", "total", camera_id)
+            return reused
+
+    if LOCAL_CLASSIFIER is not None:
+        _count_local("frames")
+        try:
+            with STAGE_SECONDS.time("analyze_frame", "local_classifier", camera_id):
+                local_result = LOCAL_CLASSIFIER.classify(image_path, num_spots_for(camera_id))
+        except Exception as e:
+            print(f"[local_classifier] {camera_id} failed, escalating: {e}")
+            local_result = None
+
+        if local_result is not None and local_result["confident"]:
+            _count_local("accepted")
+            print(f"[local_classifier] {camera_id}", local_result)
+            if SCENE_CHANGE_ENABLED:
+                SCENE_DETECTOR.record(camera_id, image_path, local_result)
+            ANALYSES.inc(camera_id, "local")
+            STAGE_SECONDS.observe(time.perf_counter() - started, "analyze_frame", "total", camera_id)
+            return local_result
+        _count_local("escalated")
+
+    # (analyze_parking_image times its own stages; this includes batching waits)
+    with STAGE_SECONDS.time("analyze_frame", "llm", camera_id):
+        if LLM_BATCHER is not None:
+            llm_result = LLM_BATCHER.analyze(camera_id, image_path)
+        else:
+            llm_result = analyze_parking_image(image_path, num_spots_for(camera_id), camera_id=camera_id)
+    print(f"[LLM Result] {camera_id}", llm_result)
+
+    if SCENE_CHANGE_ENABLED and "error" not in llm_result:
+        SCENE_DETECTOR.record(camera_id, image_path, llm_result)
+    source = "llm_batch" if LLM_BATCHER is not None else "llm"
+    ANALYSES.inc(camera_id, "error" if "error" in llm_result else source)
+    STAGE_SECONDS.observe(time.perf_counter() - started, "analyze_frame", "total", camera_id)
+    return llm_result
+
 # Helper function to update storage
 def update_spot_storage(camera_id: str, llm_result: dict, timestamp_iso: str):
     """
-    Update the in-memory CURRENT_SPOTS and append to HISTORY_CSV.
+    Update the in-memory SPOT_STATE (shared with the other serve.py
+    workers, if any) and append to HISTORY_STORE.
     For now, lat/lng are left as None placeholders until we wire in real coordinates.
     """
-    global CURRENT_SPOTS
-
+    started = time.perf_counter()
     spots = llm_result.get("spots", []) or []
 
     # Build records with placeholder coordinates for now
@@ -440,24 +1370,479 @@ def update_spot_storage(camera_id: str, llm_result: dict, timestamp_iso: str):
         }
         records.append(record)
 
-    # Update in-memory snapshot for this camera
-    CURRENT_SPOTS[camera_id] = {
-        "timestamp": timestamp_iso,
-        "spots": records,
+    def store(version):
+        with STAGE_SECONDS.time("update_spot_storage", "apply_state", camera_id):
+            _apply_spot_records(camera_id, records, timestamp_iso, version)
+
+        # Append to history (buffered; written in group commits)
+        with STAGE_SECONDS.time("update_spot_storage", "history_append", camera_id):
+            logged = records
+            if HISTORY_FILTER is not None:
+                logged = HISTORY_FILTER.filter(camera_id, records)
+
+            if logged:
+                HISTORY_STORE.append(logged)
+                HISTORY_ROWS.inc(camera_id, amount=len(logged))
+
+    if not _shared_update(store, camera_id, records, timestamp_iso):
+        print(f"[update_spot_storage] Skipped {camera_id} at {timestamp_iso}: a newer update was already applied")
+    STAGE_SECONDS.observe(time.perf_counter() - started, "update_spot_storage", "total", camera_id)
+
+
+def _apply_spot_records(camera_id: str, records: list, timestamp_iso: str, version=None, journal_all=False):
+    """
+    Make SPOT_STATE, SPOT_INDEX, CHANGE_JOURNAL and ROLLUPS reflect one
+    camera update, and push the changed spots to SPOT_STREAM.
+
+    journal_all journals every spot of the camera, not just the ones whose
+    status differs from this worker's previous state (for a worker that
+    missed some of the camera's updates, where the diff could hide a
+    change and its reversal).
+    """
+    # Overwrite this camera's block in place
+    removed, changed = SPOT_STATE.update_camera(camera_id, timestamp_iso, records)
+
+    # Keep SPOT_INDEX in sync: drop spots this camera no longer reports,
+    # then (re)insert the new records at their SPOT_COORDS position
+    for spot_index in removed:
+        SPOT_INDEX.remove((camera_id, spot_index))
+    for r in records:
+        key = (camera_id, r["spot_index"])
+        SPOT_INDEX.upsert(key, r["lat"], r["lng"], key)
+
+    if journal_all:
+        changed = [r["spot_index"] for r in records]
+    by_index = {r["spot_index"]: r for r in records}
+    changes = [
+        *((i, by_index[i]["status"], by_index[i]["lat"], by_index[i]["lng"], timestamp_iso) for i in changed),
+        # Removed spots keep their position, so circle streams can match them
+        *((i, None, *SPOT_COORDS.get((camera_id, i), (None, None)), timestamp_iso) for i in removed),
+    ]
+    version = CHANGE_JOURNAL.record(version, camera_id, changes)
+    if changes:
+        SPOT_STREAM.publish(version, camera_id, changes)
+
+    # Rollups see every upload, even when the history log only keeps transitions
+    ROLLUPS.add(records)
+
+
+# -----------------------------
+# Shared state across serve.py workers
+# -----------------------------
+def _sync_shared_state():
+    """
+    Apply the camera updates (and latest image) other workers published
+    since this worker last synced. One header read when nothing changed.
+
+    Only the latest update per camera is shared, so if a camera reported
+    several times between two syncs, this worker's rollups miss the
+    earlier ones (the history store still has them).
+    """
+    global LAST_IMAGE_PATH, _SHARED_SEEN_GEN
+
+    if SHARED_STATE is None or SHARED_STATE.generation() == _SHARED_SEEN_GEN:
+        return
+
+    with _SHARED_SYNC_LOCK:
+        gen, entries, last_image_path = SHARED_STATE.changes_since(_SHARED_SEEN_GEN)
+        if entries is None:
+            return
+
+        # Oldest first, so CHANGE_JOURNAL versions stay in order
+        for entry in entries:
+            camera_id = entry["camera_id"]
+            if CHANGE_JOURNAL.camera_version(camera_id) == entry["version"]:
+                continue
+            records = entry["spots"]
+            missed = CHANGE_JOURNAL.camera_version(camera_id) != entry["prev_version"]
+            _apply_spot_records(camera_id, records, entry["timestamp"], entry["version"], journal_all=missed)
+            if HISTORY_FILTER is not None:
+                HISTORY_FILTER.observe(camera_id, records)
+
+        LAST_IMAGE_PATH = last_image_path
+        CHANGE_JOURNAL.observe(gen)
+        _SHARED_SEEN_GEN = gen
+
+
+def _is_stale(camera_id, timestamp_iso):
+    """
+    True if camera_id already holds an update newer than timestamp_iso.
+    Two frames of one camera can be analyzed by different workers (or
+    pipeline threads) and finish out of order; the older must not win.
+    """
+    current = SPOT_STATE.camera_timestamp(camera_id)
+    return current is not None and to_epoch(timestamp_iso) < to_epoch(current)
+
+
+def _shared_update(apply, camera_id=None, records=None, timestamp_iso=None, last_image_path=None):
+    """
+    Publish one update to the shared state, then run apply(version) to
+    make this worker reflect it: camera_id's new records, or (without
+    camera_id) last_image_path as the latest image. If publishing fails
+    nothing changed, here or in the other workers. Without SHARED_STATE
+    this just calls apply(None).
+
+    Returns False, without publishing or applying, for camera records
+    older than the ones the camera already has.
+    """
+    global _SHARED_SEEN_GEN
+
+    if SHARED_STATE is None:
+        with _SHARED_SYNC_LOCK:
+            if camera_id is not None and _is_stale(camera_id, timestamp_iso):
+                return False
+            apply(None)
+        return True
+
+    # Holding the lock serializes writers across workers: sync first so
+    # the staleness check, prev_version and the latest image see
+    # everyone else's latest
+    with SHARED_STATE.locked():
+        _sync_shared_state()
+        with _SHARED_SYNC_LOCK:
+            if camera_id is not None and _is_stale(camera_id, timestamp_iso):
+                return False
+            if camera_id is None:
+                gen = SHARED_STATE.publish(last_image_path)
+            else:
+                gen = SHARED_STATE.publish(LAST_IMAGE_PATH, camera_id, {
+                    "timestamp": timestamp_iso,
+                    "prev_version": CHANGE_JOURNAL.camera_version(camera_id),
+                    "spots": records,
+                })
+            apply(gen)
+            _SHARED_SEEN_GEN = gen
+            CHANGE_JOURNAL.observe(gen)
+    return True
+
+
+def _shared_sync_loop():
+    while True:
+        time.sleep(SHARED_SYNC_S)
+        try:
+            _sync_shared_state()
+        except Exception as e:
+            print(f"[shared_state] Sync failed: {e}")
+
+
+@app.before_request
+def _sync_before_request():
+    _sync_shared_state()
+
+
+ANALYSIS_PIPELINE = AnalysisPipeline(
+    _analyze_frame,
+    update_spot_storage,
+    workers=ANALYSIS_WORKERS,
+    max_pending=ANALYSIS_MAX_PENDING,
+)
+ANALYSIS_PIPELINE.start()
+# Feature materialization (see feature_pipeline.py) stops short of
+# frames still being analyzed, and ages camera state on the history
+# log's keyframe schedule
+MODEL_LIFECYCLE.pipeline.pending_since = ANALYSIS_PIPELINE.oldest_timestamp
+MODEL_LIFECYCLE.pipeline.keyframe_interval_s = HISTORY_KEYFRAME_S
+
+
+def _backfill_rollups():
+    """
+    Rebuild the in-memory rollups from stored history after a restart,
+    up to ROLLUP_BACKFILL_END (live uploads cover the rest). Only
+    possible when every upload was logged (HISTORY_MODE=full).
+    """
+    horizon = max(ROLLUPS.retention_s.values())
+    end = ROLLUP_BACKFILL_END
+    rows = HISTORY_STORE.query(start=end - timedelta(seconds=horizon), end=end)
+
+    by_camera = {}
+    for r in rows:
+        if r.get("spot_index") is None or r.get("status") not in ("empty", "occupied"):
+            continue
+        ts, spots, occ = by_camera.setdefault(r["camera_id"], ([], [], []))
+        ts.append(to_epoch(r["timestamp"]))
+        spots.append(r["spot_index"])
+        occ.append(r["status"] == "occupied")
+
+    for camera_id, (ts, spots, occ) in by_camera.items():
+        ROLLUPS.add_arrays(camera_id, ts, spots, occ)
+    print(f"[rollups] Backfilled {len(rows)} history rows")
+
+
+if HISTORY_MODE == "full":
+    threading.Thread(target=_backfill_rollups, name="rollup-backfill", daemon=True).start()
+
+if SHARED_STATE is not None:
+    threading.Thread(target=_shared_sync_loop, name="shared-state-sync", daemon=True).start()
+
+SPOT_STREAM.start()
+
+MODEL_LIFECYCLE.start(train=MODEL_RETRAIN_ENABLED)
+
+_SHUTDOWN_LOCK = threading.Lock()
+_SHUT_DOWN = False
+
+
+def shutdown(drain_s=None):
+    """
+    Let the analysis pipeline finish what is queued (up to drain_s,
+    default ANALYSIS_DRAIN_S), stop it, then flush and close
+    HISTORY_STORE so buffered rows are not lost. Runs once: at
+    interpreter exit, or earlier from a serve.py worker on SIGTERM.
+    """
+    global _SHUT_DOWN
+    with _SHUTDOWN_LOCK:
+        if _SHUT_DOWN:
+            return
+        _SHUT_DOWN = True
+    drain_s = ANALYSIS_DRAIN_S if drain_s is None else drain_s
+    if not ANALYSIS_PIPELINE.wait_idle(drain_s):
+        print(f"[shutdown] Analyses still pending after {drain_s:.0f}s: {ANALYSIS_PIPELINE.stats()}")
+    ANALYSIS_PIPELINE.stop(timeout=5.0)
+    HISTORY_STORE.close()
+
+
+atexit.register(shutdown)
+
+
+# -----------------------------
+# Warm-up / readiness
+# -----------------------------
+# The forecast model, local classifier and OpenAI client are all created
+# on first use, so importing app.py (and forking workers) stays cheap.
+# STARTUP_WARMUP controls when they are loaded:
+#   background (default) - in a thread right after import
+#   eager                - before import returns (e.g. a pre-fork master,
+#                          so workers inherit the loaded state)
+#   off                  - on the first request that needs them
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "background")
+
+# component -> {"state": pending|ready|failed|disabled, "seconds", "error"}
+WARMUP_STATE = {
+    "forecast_model": {"state": "pending"},
+    "local_classifier": {"state": "pending" if LOCAL_CLASSIFIER is not None else "disabled"},
+    "llm_client": {"state": "pending"},
+}
+
+# Readiness only waits for what the request path needs; frame analysis
+# runs in the background and reports its own failures.
+READY_REQUIRES = ("forecast_model",)
+
+
+def _warm(component, load):
+    started = datetime.utcnow()
+    t0 = time.perf_counter()
+    try:
+        load()
+    except Exception as e:
+        WARMUP_STATE[component] = {"state": "failed", "error": str(e)}
+        print(f"[warmup] {component} failed: {e}")
+        return
+    WARMUP_STATE[component] = {
+        "state": "ready",
+        "seconds": round(time.perf_counter() - t0, 4),
+        "started": started.isoformat() + "Z",
+    }
+
+
+def warm_up():
+    """
+    Load everything that is otherwise created lazily.
+    """
+    _warm("forecast_model", lambda: active_model())
+    if LOCAL_CLASSIFIER is not None:
+        _warm("local_classifier", lambda: LOCAL_CLASSIFIER.model)
+    _warm("llm_client", llm_processor.get_client)
+
+
+def _refresh_warmup_state():
+    # Components loaded on demand (STARTUP_WARMUP=off) count as ready too
+    if WARMUP_STATE["forecast_model"]["state"] == "pending" and predictor.is_loaded():
+        WARMUP_STATE["forecast_model"] = {"state": "ready"}
+    if WARMUP_STATE["llm_client"]["state"] == "pending" and llm_processor.client_ready():
+        WARMUP_STATE["llm_client"] = {"state": "ready"}
+    if (
+        WARMUP_STATE["local_classifier"]["state"] == "pending"
+        and LOCAL_CLASSIFIER is not None
+        and LOCAL_CLASSIFIER.is_loaded()
+    ):
+        WARMUP_STATE["local_classifier"] = {"state": "ready"}
+
+
+if STARTUP_WARMUP == "eager":
+    warm_up()
+elif STARTUP_WARMUP == "background":
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Readiness probe: 200 once the forecast model is loaded, 503 before.
+    Always includes each component's warm-up state.
+    """
+    _refresh_warmup_state()
+    is_ready = all(WARMUP_STATE[c]["state"] == "ready" for c in READY_REQUIRES)
+    body = {
+        "ready": is_ready,
+        "warmup": STARTUP_WARMUP,
+        "pid": os.getpid(),
+        "components": WARMUP_STATE,
+        "model_version": active_model().version if is_ready else None,
     }
+    return jsonify(body), 200 if is_ready else 503
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """
+    Per-stage timing histograms and counters (see metrics.py) in the
+    Prometheus text format, for the worker that answers. No samples with
+    METRICS_ENABLED=0.
+    """
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# -----------------------------
+# Request profiling (opt-in)
+# -----------------------------
+def _profile_before_request():
+    if request.path.startswith("/admin/"):
+        return
+    run = REQUEST_PROFILER.start(request.method, request.full_path.rstrip("?"), request.headers.get(TOKEN_HEADER))
+    if run is not None:
+        g.profile_run = run
 
-    # Append to CSV history
-    if not records:
-        return  # nothing to log
 
-    file_exists = os.path.exists(HISTORY_CSV)
-    fieldnames = ["timestamp", "camera_id", "spot_index", "status", "lat", "lng"]
+def _profile_after_request(response):
+    run = g.pop("profile_run", None)
+    if run is not None:
+        profile_id = REQUEST_PROFILER.finish(run, response.status_code)
+        if profile_id is not None:
+            response.headers[ID_HEADER] = profile_id
+    return response
 
-    with open(HISTORY_CSV, mode="a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerows(records)
+
+def _profile_teardown(exc):
+    # Only still set if the request failed before after_request ran
+    run = g.pop("profile_run", None)
+    if run is not None:
+        REQUEST_PROFILER.finish(run, 500)
+
+
+if REQUEST_PROFILER.enabled:
+    app.before_request(_profile_before_request)
+    app.after_request(_profile_after_request)
+    app.teardown_request(_profile_teardown)
+
+
+@app.route("/admin/profiles", methods=["GET"])
+def admin_profiles():
+    """
+    Profiled requests, newest first (id, path, status, duration, trigger
+    and the files to download), plus the profiler's counters, for this
+    and every other worker sharing PROFILE_DIR. Needs the X-Profile-Token
+    header.
+    """
+    if not REQUEST_PROFILER.authorized(request.headers.get(TOKEN_HEADER)):
+        return jsonify({"error": f"set PROFILE_TOKEN and send it as {TOKEN_HEADER}"}), 403
+    return jsonify({
+        "profiles": REQUEST_PROFILER.list(),
+        "profiler": REQUEST_PROFILER.stats(),
+    }), 200
+
+
+@app.route("/admin/profiles/<filename>", methods=["GET"])
+def admin_profile_file(filename):
+    """
+    One file of a profiled request: <id>.prof (pstats, for
+    `python -m pstats` or snakeviz), <id>.txt (top functions by
+    cumulative time) or <id>.json. Needs the X-Profile-Token header.
+    """
+    if not REQUEST_PROFILER.authorized(request.headers.get(TOKEN_HEADER)):
+        return jsonify({"error": f"set PROFILE_TOKEN and send it as {TOKEN_HEADER}"}), 403
+    path = REQUEST_PROFILER.path_for(filename)
+    if path is None:
+        return jsonify({"error": f"unknown profile file {filename!r}"}), 404
+
+    if filename.endswith(".prof"):
+        return send_file(path.resolve(), mimetype="application/octet-stream", as_attachment=True,
+                         download_name=filename)
+    mimetype = "application/json" if filename.endswith(".json") else "text/plain"
+    return send_file(path.resolve(), mimetype=mimetype)
+
+
+# -----------------------------
+# Forecast model versions
+# -----------------------------
+@app.route("/api/model", methods=["GET"])
+def model_status():
+    """
+    Active forecast model version, retraining counters, all stored
+    versions (with their holdout scores) and per-camera registry stats.
+    """
+    return jsonify({
+        **MODEL_LIFECYCLE.status(),
+        "retrain_enabled": MODEL_RETRAIN_ENABLED,
+        "store": MODEL_LIFECYCLE.model_store.describe(),
+        "registry": predictor.MODEL_REGISTRY.stats(),
+    }), 200
+
+
+def _admin_authorized():
+    sent = request.headers.get(ADMIN_TOKEN_HEADER)
+    if not ADMIN_TOKEN or not sent:
+        return False
+    return hmac.compare_digest(sent.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+
+def _admin_forbidden():
+    return jsonify({"error": f"set ADMIN_TOKEN and send it as {ADMIN_TOKEN_HEADER}"}), 403
+
+
+@app.route("/api/model/retrain", methods=["POST"])
+def model_retrain():
+    """
+    Queue one forced retrain cycle on the background lifecycle thread and
+    return at once (202); GET /api/model shows when it is done
+    (last_result). Needs the X-Admin-Token header.
+    """
+    if not _admin_authorized():
+        return _admin_forbidden()
+    queued = MODEL_LIFECYCLE.request_retrain()
+    return jsonify({
+        "status": "queued" if queued else "already_queued",
+        "active_version": active_model().version,
+    }), 202
+
+
+@app.route("/api/model/rollback", methods=["POST"])
+def model_rollback():
+    """
+    Switch back to the previously active model version. Needs the
+    X-Admin-Token header.
+    """
+    if not _admin_authorized():
+        return _admin_forbidden()
+    try:
+        version = MODEL_LIFECYCLE.rollback()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"active_version": version}), 200
+
+
+@app.route("/api/model/activate", methods=["POST"])
+def model_activate():
+    """
+    Activate a specific stored version: /api/model/activate?version=v0003
+    Needs the X-Admin-Token header.
+    """
+    if not _admin_authorized():
+        return _admin_forbidden()
+    version = request.args.get("version", "")
+    if version not in MODEL_LIFECYCLE.model_store.versions():
+        return jsonify({"error": f"unknown model version {version!r}"}), 404
+    MODEL_LIFECYCLE.activate(version)
+    return jsonify({"active_version": version}), 200
 
 
 # -----------------------------
@@ -501,5 +1886,6 @@ def camera_view():
 # -----------------------------
 if __name__ == "__main__":
     # Run on all interfaces so iPhone & ESP32 on same Wi-Fi can reach it.
+    # Development server; use serve.py for several worker processes.
     app.run(host="0.0.0.0", port=8080, debug=True)
 
@@ -0,0 +1,4 @@
+# Offline benchmarks for the backend.
+#
+# Run from the backend/ directory so the flat module imports resolve, e.g.
+#   python -m benchmarks.bench_forecast_table
@@ -0,0 +1,80 @@
+# benchmarks/bench_analysis_pipeline.py
+#
+# Offline load test for AnalysisPipeline with a stubbed analyzer that
+# sleeps like an OpenAI round-trip. Simulates many cameras uploading
+# faster than the LLM can keep up and reports how long submit() holds
+# the "request", plus queue depth and drop counts.
+#
+#   cd backend && python -m benchmarks.bench_analysis_pipeline
+
+import random
+import threading
+import time
+
+from analysis_pipeline import AnalysisPipeline, DONE, DROPPED
+
+CAMERAS = 50
+UPLOADS_PER_CAMERA = 20
+UPLOAD_INTERVAL_S = 0.05
+LLM_LATENCY_S = 0.2
+WORKERS = 8
+
+
+def main():
+    applied = {}
+    lock = threading.Lock()
+
+    def stub_analyze(camera_id, image_path):
+        time.sleep(LLM_LATENCY_S * random.uniform(0.5, 1.5))
+        return {"spots": [], "total_spots": 6, "empty_spots": 0, "file": image_path}
+
+    def record(camera_id, result, timestamp_iso):
+        with lock:
+            # Results for a camera must arrive in upload order
+            prev = applied.get(camera_id)
+            if prev is not None and prev > timestamp_iso:
+                raise AssertionError(f"{camera_id}: out-of-order result")
+            applied[camera_id] = timestamp_iso
+
+    pipeline = AnalysisPipeline(stub_analyze, record, workers=WORKERS, max_pending=CAMERAS)
+    pipeline.start()
+
+    submit_times = []
+    jobs = []
+    max_depth = 0
+
+    start = time.perf_counter()
+    for n in range(UPLOADS_PER_CAMERA):
+        for c in range(CAMERAS):
+            camera_id = f"cam-{c:03d}"
+            t0 = time.perf_counter()
+            job = pipeline.submit(camera_id, f"captures/{camera_id}_{n:04d}.jpg", f"{n:06d}")
+            submit_times.append(time.perf_counter() - t0)
+            jobs.append(job["job_id"])
+        max_depth = max(max_depth, pipeline.stats()["queue_depth"])
+        time.sleep(UPLOAD_INTERVAL_S)
+
+    pipeline.wait_idle()
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+
+    statuses = [pipeline.status(j)["status"] for j in jobs]
+    stats = pipeline.stats()
+    submit_times.sort()
+
+    print(f"{CAMERAS} cameras x {UPLOADS_PER_CAMERA} uploads, {WORKERS} workers, "
+          f"~{LLM_LATENCY_S * 1e3:.0f} ms stub LLM latency")
+    print(f"  submit() p50 {submit_times[len(submit_times) // 2] * 1e6:.1f} us   "
+          f"max {submit_times[-1] * 1e6:.1f} us")
+    print(f"  analyzed {statuses.count(DONE)}, dropped as stale {statuses.count(DROPPED)}, "
+          f"max queue depth {max_depth}, wall {elapsed:.2f} s")
+    print(f"  inline equivalent would block uploads for ~{len(jobs) * LLM_LATENCY_S:.0f} s total")
+    print(f"  stats: {stats}")
+
+    # Every camera's newest frame must have been analyzed
+    if sorted(applied.values()) != [f"{UPLOADS_PER_CAMERA - 1:06d}"] * CAMERAS:
+        raise SystemExit("latest frame was not analyzed for every camera")
+
+
+if __name__ == "__main__":
+    main()
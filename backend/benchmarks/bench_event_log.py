@@ -0,0 +1,65 @@
+# benchmarks/bench_event_log.py
+#
+# Replays a full history.csv through event_log.TransitionFilter, reports
+# how much smaller the transition-only log is, and times EventLogReader
+# rebuilding the per-spot state at every upload (tests/test_event_log.py
+# checks that it matches the full log).
+#
+#   cd backend && python -m benchmarks.bench_event_log [history.csv] [--keyframe-s 900]
+#       [--lookback-s 60]
+
+import argparse
+import os
+import tempfile
+import time
+from itertools import groupby
+from pathlib import Path
+
+from event_log import EventLogReader, TransitionFilter
+from history_store import CsvHistoryStore, to_epoch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transition-only history log size and reconstruction time")
+    parser.add_argument("history_csv", nargs="?", default="history.csv")
+    parser.add_argument("--keyframe-s", type=float, default=900.0)
+    parser.add_argument("--lookback-s", type=float, default=None,
+                        help="reader's first seek window (default two keyframe intervals)")
+    args = parser.parse_args()
+
+    full_rows = CsvHistoryStore(args.history_csv, flush_interval_s=0).query()
+    full_rows.sort(key=lambda r: to_epoch(r["timestamp"]))
+    uploads = [
+        list(group)
+        for _, group in groupby(full_rows, key=lambda r: (r["timestamp"], r["camera_id"]))
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        events_path = Path(tmp) / "history_events.csv"
+        events = CsvHistoryStore(events_path, flush_interval_s=0)
+        transition_filter = TransitionFilter(args.keyframe_s)
+        for records in uploads:
+            events.append(transition_filter.filter(records[0]["camera_id"], records))
+        events.flush()
+
+        full_bytes = os.path.getsize(args.history_csv)
+        event_bytes = os.path.getsize(events_path)
+        stats = transition_filter.stats()
+        print(f"{len(uploads)} uploads, keyframe every {args.keyframe_s:.0f} s")
+        print(f"  rows:  {stats['rows_in']:>8,} -> {stats['rows_out']:>8,} "
+              f"({stats['reduction']:.1%} fewer, {stats['keyframes']} keyframes)")
+        print(f"  bytes: {full_bytes:>8,} -> {event_bytes:>8,} "
+              f"({1 - event_bytes / full_bytes:.1%} smaller)")
+
+        # Reconstruction: state as of every upload
+        reader = EventLogReader(events, args.keyframe_s, args.lookback_s)
+        probes = [to_epoch(records[0]["timestamp"]) for records in uploads]
+        start = time.perf_counter()
+        for t in probes:
+            reader.state_at(t)
+        elapsed = time.perf_counter() - start
+        print(f"  reconstruction: {elapsed / len(probes) * 1e3:.2f} ms per state_at() "
+              f"({len(probes)} probes)")
+
+if __name__ == "__main__":
+    main()
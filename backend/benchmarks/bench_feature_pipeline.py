@@ -0,0 +1,136 @@
+# benchmarks/bench_feature_pipeline.py
+#
+# Times feature_pipeline's incremental, watermarked runs against a full
+# recompute (over a full and a transition-only history log), and loading
+# the materialized npz against parsing the same rows from CSV.
+# tests/test_feature_pipeline.py checks that the rows match.
+#
+#   cd backend && python -m benchmarks.bench_feature_pipeline [--days 14] [--steps 20]
+
+import argparse
+import csv
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from event_log import TransitionFilter
+from feature_pipeline import FEATURE_COLUMNS, LABEL_COLUMN, FeaturePipeline, load_features, recompute
+from history_store import open_history_store, to_epoch, to_iso
+
+CAMERAS = 20
+SPOTS = 6
+CADENCE_S = 30
+
+
+def _uploads(days, rng):
+    """Yield one upload (list of history records) per camera per tick, in time order."""
+    t0 = to_epoch(datetime(2025, 11, 3))
+    status = rng.random((CAMERAS, SPOTS)) < 0.5
+    for tick in range(days * 86400 // CADENCE_S):
+        # Each spot flips with small probability, so runs are long
+        status ^= rng.random((CAMERAS, SPOTS)) < 0.02
+        for camera in range(CAMERAS):
+            ts = to_iso(t0 + tick * CADENCE_S + camera * 0.01)
+            yield [
+                {
+                    "timestamp": ts,
+                    "camera_id": f"cam-{camera:03d}",
+                    "spot_index": s,
+                    "status": "occupied" if status[camera, s] else "empty",
+                    "lat": 40.8,
+                    "lng": -73.96,
+                }
+                for s in range(SPOTS)
+            ]
+
+
+def _time(label, store, workdir, first, last, steps):
+    out_dir = workdir / f"features-{label}"
+    pipeline = FeaturePipeline(store, out_dir)
+
+    t0 = time.perf_counter()
+    for until in np.linspace(first, last, steps + 1)[1:]:
+        summary = pipeline.run_once(until=float(until))
+    incremental_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    full = recompute(store, end=last)
+    full_s = time.perf_counter() - t0
+
+    print(
+        f"{label:>12}: {len(full[LABEL_COLUMN]):,} rows "
+        f"({steps} runs {incremental_s:.2f} s total, last run {summary['seconds'] * 1e3:.1f} ms; "
+        f"full recompute {full_s:.2f} s)"
+    )
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature pipeline run and load times")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--steps", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = Path(tempfile.mkdtemp(prefix="features-bench-"))
+    try:
+        full_store = open_history_store("sqlite", str(workdir / "full.db"), flush_interval_s=0)
+        events_store = open_history_store("sqlite", str(workdir / "events.db"), flush_interval_s=0)
+        transitions = TransitionFilter()
+
+        first = last = None
+        for records in _uploads(args.days, rng):
+            full_store.append(records)
+            events_store.append(transitions.filter(records[0]["camera_id"], records))
+            ts = to_epoch(records[0]["timestamp"])
+            first = ts if first is None else first
+            last = ts
+        full_store.flush()
+        events_store.flush()
+        print(f"History: {args.days} days, {CAMERAS} cameras, transition log {transitions.stats()['reduction']:.0%} smaller")
+
+        out_dir = _time("full log", full_store, workdir, first, last + 1, args.steps)
+        _time("transitions", events_store, workdir, first, last + 1, args.steps)
+
+        # Loading: npz shards vs the same rows as CSV
+        FeaturePipeline(None, out_dir).compact()
+        t0 = time.perf_counter()
+        data = load_features(out_dir)
+        npz_s = time.perf_counter() - t0
+
+        csv_path = workdir / "training.csv"
+        columns = FEATURE_COLUMNS + [LABEL_COLUMN]
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*(data[c].tolist() for c in columns)))
+
+        t0 = time.perf_counter()
+        try:
+            import pandas as pd
+
+            pd.read_csv(csv_path)
+            reader = "pandas.read_csv"
+        except ImportError:
+            with open(csv_path, newline="") as f:
+                list(csv.DictReader(f))
+            reader = "csv.DictReader"
+        csv_s = time.perf_counter() - t0
+
+        print(
+            f"Load {len(data[LABEL_COLUMN]):,} rows: npz {npz_s * 1e3:.1f} ms, "
+            f"{reader} {csv_s * 1e3:.1f} ms ({csv_s / max(npz_s, 1e-9):.1f}x)"
+        )
+
+        full_store.close()
+        events_store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# benchmarks/bench_forecast_batch.py
+#
+# POST /api/spots/forecast/batch vs one GET /api/spots/forecast per
+# query, through Flask's test client: queries per second for N separate
+# GETs and for batches of --batch-size, over random destinations
+# (radius or k nearest) and arrival times. First checks that every batch
+# result matches the GET answer for the same query (same spots,
+# distances and predictions; unlocated spots may come in another order).
+#
+#   cd backend && python -m benchmarks.bench_forecast_batch [--cameras 500]
+#       [--queries 2000] [--batch-size 50]
+
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+os.environ.setdefault("MODEL_RETRAIN_ENABLED", "0")
+os.environ.setdefault("STARTUP_WARMUP", "eager")
+os.environ.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+os.environ.setdefault("HISTORY_PATH", os.path.join(tempfile.mkdtemp(prefix="batch-bench-"), "history.db"))
+
+import app as backend  # noqa: E402
+
+CENTER = (40.8098, -73.9600)
+
+
+def _seed(cameras, rng):
+    ts = datetime.utcnow().isoformat() + "Z"
+    for c in range(cameras):
+        camera_id = f"cam-{c:04d}"
+        lat0 = CENTER[0] + rng.uniform(-0.02, 0.02)
+        lng0 = CENTER[1] + rng.uniform(-0.02, 0.02)
+        records = [
+            {
+                "timestamp": ts, "camera_id": camera_id, "spot_index": i,
+                "status": rng.choice(["empty", "occupied"]),
+                # A few cameras are not calibrated yet
+                "lat": None if c % 25 == 0 else lat0 + i * 1e-5,
+                "lng": None if c % 25 == 0 else lng0,
+            }
+            for i in range(8)
+        ]
+        backend._apply_spot_records(camera_id, records, ts)
+
+
+def _queries(n, rng):
+    """Random destinations; arrival times on the half minute, away from slot edges."""
+    base = datetime.utcnow().replace(second=30, microsecond=0)
+    out = []
+    for _ in range(n):
+        query = {
+            "lat": round(CENTER[0] + rng.uniform(-0.02, 0.02), 6),
+            "lng": round(CENTER[1] + rng.uniform(-0.02, 0.02), 6),
+            "time": (base + timedelta(minutes=rng.randint(2, 600))).isoformat() + "Z",
+        }
+        if rng.random() < 0.5:
+            query["radius"] = rng.choice([200, 500, 1000])
+        if rng.random() < 0.7:
+            query["k"] = rng.choice([5, 20, 50])
+        out.append(query)
+    return out
+
+
+def _get(client, query):
+    resp = client.get("/api/spots/forecast?" + urlencode(query))
+    return json.loads(resp.data)
+
+
+def _post(client, queries):
+    resp = client.post("/api/spots/forecast/batch", json={"queries": queries})
+    if resp.status_code != 200:
+        raise SystemExit(f"batch failed: {resp.status_code} {resp.data[:200]!r}")
+    return json.loads(resp.data)["results"]
+
+
+def _normalized(body):
+    spots = {
+        s["spotID"]: (s["status"], s["distanceMeters"], s["predictedAvailability"], s["estimatedWaitMinutes"])
+        for s in body["spots"]
+    }
+    prediction = dict(body["prediction"])
+    prediction.pop("arrivalTimestamp")
+    return body["query"], body["summary"], prediction, spots
+
+
+def _close(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    if isinstance(a, (tuple, list)) and isinstance(b, (tuple, list)):
+        return len(a) == len(b) and all(_close(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_close(a[key], b[key]) for key in a)
+    return a == b
+
+
+def _check_parity(client, queries):
+    backend.RESPONSE_CACHE_ENABLED = False
+    try:
+        for query, got in zip(queries, _post(client, queries)):
+            want = _get(client, query)
+            if not _close(_normalized(got), _normalized(want)):
+                raise SystemExit(f"{query}: batch result differs from GET /api/spots/forecast")
+            located = [s["spotID"] for s in got["spots"] if s["distanceMeters"] is not None]
+            if located != [s["spotID"] for s in want["spots"] if s["distanceMeters"] is not None][:len(located)]:
+                raise SystemExit(f"{query}: batch spots are not nearest first")
+    finally:
+        backend.RESPONSE_CACHE_ENABLED = True
+    print(f"parity with GET /api/spots/forecast on {len(queries)} queries: OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch forecast vs separate forecast GETs")
+    parser.add_argument("--cameras", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    _seed(args.cameras, rng)
+    client = backend.app.test_client()
+    _check_parity(client, _queries(min(args.batch_size, backend.FORECAST_BATCH_MAX_QUERIES), rng))
+
+    queries = _queries(args.queries, rng)
+    print(f"{len(backend.SPOT_STATE):,} spots on {args.cameras} cameras, {len(queries):,} queries")
+
+    t0 = time.perf_counter()
+    for query in queries:
+        _get(client, query)
+    t_get = time.perf_counter() - t0
+
+    size = min(args.batch_size, backend.FORECAST_BATCH_MAX_QUERIES)
+    t0 = time.perf_counter()
+    for start in range(0, len(queries), size):
+        _post(client, queries[start:start + size])
+    t_batch = time.perf_counter() - t0
+
+    print(f"{'separate GETs':<22} {len(queries) / t_get:9.0f} queries/s")
+    print(f"{f'batches of {size}':<22} {len(queries) / t_batch:9.0f} queries/s   ({t_get / t_batch:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_forecast_horizon.py
+#
+# The availability horizon (/api/spots/forecast/horizon):
+#   - predictor.availability_horizon (one table gather, vectorized
+#     waits) vs asking predict_empty_probability / expected_wait_minutes
+#     once per point, checking both give the same curve and waits
+#   - the endpoint through Flask's test client: first request of a
+#     minute vs repeats served from the response cache
+#
+#   cd backend && python -m benchmarks.bench_forecast_horizon
+#       [--horizon 720] [--step 15] [--requests 2000]
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MODEL_RETRAIN_ENABLED", "0")
+os.environ.setdefault("STARTUP_WARMUP", "eager")
+os.environ.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+os.environ.setdefault("HISTORY_PATH", os.path.join(tempfile.mkdtemp(prefix="horizon-bench-"), "history.db"))
+
+import app as backend  # noqa: E402
+import predictor  # noqa: E402
+from forecast_engine import first_crossing, week_slot  # noqa: E402
+
+
+def _per_point(now, horizon, step, confidence, max_wait):
+    """One scalar lookup and one wait curve per point, as a client looping over /api/spots/forecast would."""
+    table = predictor.active_model().table
+    availability, waits = [], []
+    for minutes in range(0, horizon + 1, step):
+        slot = week_slot(now + timedelta(minutes=minutes))
+        availability.append(float(table.probs[slot]))
+        curve = table.curve(slot, max_wait)
+        waits.append(first_crossing(curve, confidence, default=float(max_wait)))
+    return availability, waits
+
+
+def _timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Availability horizon: batched vs per point, cached vs cold")
+    parser.add_argument("--horizon", type=int, default=720)
+    parser.add_argument("--step", type=int, default=15)
+    parser.add_argument("--confidence", type=float, default=0.8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    now = datetime.now().replace(second=0, microsecond=0)
+    max_wait = backend.HORIZON_MAX_WAIT_MINUTES
+
+    # Every confidence level and a week-wrapping horizon must agree too
+    for confidence in (0.5, args.confidence, 0.95, 1.0):
+        for horizon, step in ((args.horizon, args.step), (7 * 24 * 60, 60), (90, 1)):
+            availability, waits = predictor.availability_horizon(
+                horizon, step, confidence, max_wait=max_wait, now=now,
+            )
+            want_availability, want_waits = _per_point(now, horizon, step, confidence, max_wait)
+            if availability.tolist() != want_availability or waits.tolist() != want_waits:
+                raise SystemExit(f"horizon={horizon} step={step} confidence={confidence}: batched result differs")
+    print("batched horizon matches per-point predictions: OK")
+
+    points = args.horizon // args.step + 1
+    t_loop, _ = _timed(lambda: _per_point(now, args.horizon, args.step, args.confidence, max_wait), args.repeat)
+    t_batch, _ = _timed(
+        lambda: predictor.availability_horizon(args.horizon, args.step, args.confidence, max_wait=max_wait, now=now),
+        args.repeat,
+    )
+    print(f"{args.horizon} min horizon, {points} points")
+    print(f"  per point:  {t_loop * 1e3:8.3f} ms")
+    print(f"  batched:    {t_batch * 1e3:8.3f} ms   ({t_loop / t_batch:5.1f}x)")
+
+    client = backend.app.test_client()
+    url = f"/api/spots/forecast/horizon?horizon={args.horizon}&step={args.step}&confidence={args.confidence}"
+
+    backend.RESPONSE_CACHE_ENABLED = False
+    t0 = time.perf_counter()
+    for _ in range(args.requests):
+        fresh = client.get(url)
+    t_cold = (time.perf_counter() - t0) / args.requests
+
+    backend.RESPONSE_CACHE_ENABLED = True
+    backend.RESPONSE_CACHE.clear()
+    t0 = time.perf_counter()
+    for _ in range(args.requests):
+        cached = client.get(url)
+    t_cached = (time.perf_counter() - t0) / args.requests
+
+    body, fresh_body = json.loads(cached.data), json.loads(fresh.data)
+    if len(body["points"]) != points:
+        raise SystemExit(f"expected {points} points, got {len(body['points'])}")
+    # (unless the minute turned between the two runs)
+    if body["start"] == fresh_body["start"] and body["points"] != fresh_body["points"]:
+        raise SystemExit("cached horizon differs from a fresh build")
+    print(f"  endpoint, built every time: {t_cold * 1e6:8.1f} us/request")
+    print(f"  endpoint, cached:           {t_cached * 1e6:8.1f} us/request   ({t_cold / t_cached:5.1f}x)")
+    print(f"cache stats: {backend.RESPONSE_CACHE.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_forecast_table.py
+#
+# Times the precomputed time-of-week table in predictor.py against the
+# old per-call RandomForest path (tests/test_forecast_table.py checks
+# that both agree).
+#
+#   cd backend && python -m benchmarks.bench_forecast_table
+
+import random
+import time
+from datetime import datetime
+
+import predictor
+
+
+def _sklearn_probability(eta_minutes: float, now: datetime) -> float:
+    """The pre-table implementation: one predict_proba per call."""
+    X = predictor._arrival_features(eta_minutes, now)
+    proba_any_empty = predictor.active_model().model.predict_proba(X)[0][1]
+    return float(max(0.0, min(1.0, proba_any_empty)))
+
+
+def _table_probability(eta_minutes: float, now: datetime) -> float:
+    return float(predictor.active_model().table.probs[predictor._arrival_slot(eta_minutes, now)])
+
+
+def _sklearn_forecast(now: datetime) -> float:
+    """One forecast request before the table: 1 probability + wait loop (no empty spots)."""
+    _sklearn_probability(5.0, now)
+    for w in range(0, 61):
+        if _sklearn_probability(w, now) >= 0.8:
+            return float(w)
+    return 60.0
+
+
+def _table_forecast(now: datetime) -> float:
+    _table_probability(5.0, now)
+    for w in range(0, 61):
+        if _table_probability(w, now) >= 0.8:
+            return float(w)
+    return 60.0
+
+
+def _time_per_call(fn, args_list) -> float:
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list)
+
+
+def main():
+    rng = random.Random(1)
+    now = datetime.now()
+    etas = [(rng.uniform(0, 240), now) for _ in range(200)]
+    nows = [(datetime(2025, 12, 1 + rng.randrange(7), rng.randrange(24), rng.randrange(60)),)
+            for _ in range(20)]
+
+    t_sk = _time_per_call(_sklearn_probability, etas)
+    t_tb = _time_per_call(_table_probability, etas * 50)
+    print(f"predict_empty_probability: sklearn {t_sk * 1e3:8.3f} ms   table {t_tb * 1e6:8.3f} us"
+          f"   ({t_sk / t_tb:,.0f}x)")
+
+    t_sk = _time_per_call(_sklearn_forecast, nows)
+    t_tb = _time_per_call(_table_forecast, nows * 50)
+    print(f"forecast request (prob + wait): sklearn {t_sk * 1e3:8.3f} ms   table {t_tb * 1e6:8.3f} us"
+          f"   ({t_sk / t_tb:,.0f}x)")
+
+    start = time.perf_counter()
+    predictor.reload_model()
+    print(f"model load + table build: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
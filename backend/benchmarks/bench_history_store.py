@@ -0,0 +1,101 @@
+# benchmarks/bench_history_store.py
+#
+# Write throughput and range-query latency for the history_store
+# backends, on synthetic history (default 10M rows: 200 cameras x 6 spots
+# at a 5 s cadence). The CSV backend is only queried at small sizes,
+# since every query has to parse the whole file.
+#
+#   cd backend && python -m benchmarks.bench_history_store [--rows 10000000]
+#       [--backends sqlite,columnar,csv] [--dir /tmp/history-bench]
+
+import argparse
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from history_store import open_history_store, to_epoch, to_iso
+
+CAMERAS = 200
+SPOTS = 6
+CADENCE_S = 5
+CSV_QUERY_MAX_ROWS = 1_000_000
+
+
+def _frames(total_rows, start):
+    """Yield lists of records, one upload (6 rows) per camera per tick."""
+    t0 = to_epoch(start)
+    frames = total_rows // SPOTS
+    for n in range(frames):
+        camera = n % CAMERAS
+        tick = n // CAMERAS
+        ts = to_iso(t0 + tick * CADENCE_S + camera * 0.01)
+        cam_id = f"cam-{camera:03d}"
+        yield [
+            {
+                "timestamp": ts,
+                "camera_id": cam_id,
+                "spot_index": s,
+                "status": "empty" if (tick + s + camera) % 3 == 0 else "occupied",
+                "lat": 40.8 + camera * 1e-4,
+                "lng": -73.96 - s * 1e-5,
+            }
+            for s in range(SPOTS)
+        ]
+
+
+def run_backend(backend, rows, workdir, start):
+    path = workdir / {"sqlite": "history.db", "columnar": "columnar", "csv": "history.csv"}[backend]
+    store = open_history_store(backend, str(path), batch_size=6000, flush_interval_s=0)
+
+    t0 = time.perf_counter()
+    for records in _frames(rows, start):
+        store.append(records)
+    store.flush()
+    write_s = time.perf_counter() - t0
+    print(f"{backend:>8}: wrote {rows:,} rows in {write_s:.1f} s ({rows / write_s:,.0f} rows/s)")
+
+    if backend == "csv" and rows > CSV_QUERY_MAX_ROWS:
+        print(f"{'':>8}  (range queries skipped: full-file scan at {rows:,} rows)")
+        store.close()
+        return
+
+    ticks = rows // SPOTS // CAMERAS
+    span_s = ticks * CADENCE_S
+    queries = {
+        "1 camera, 1 hour": ("cam-007", 0.5, 3600),
+        "1 camera, 1 day": ("cam-042", 0.25, 86400),
+        "all cameras, 5 min": (None, 0.75, 300),
+    }
+    for name, (camera_id, frac, width_s) in queries.items():
+        q_start = start + timedelta(seconds=span_s * frac)
+        q_end = q_start + timedelta(seconds=width_s)
+        t0 = time.perf_counter()
+        result = store.query(camera_id=camera_id, start=q_start, end=q_end)
+        ms = (time.perf_counter() - t0) * 1e3
+        print(f"{'':>8}  {name:<20} {len(result):>9,} rows in {ms:9.2f} ms")
+
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History store benchmark")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--backends", default="sqlite,columnar,csv")
+    parser.add_argument("--dir", default=None)
+    args = parser.parse_args()
+
+    workdir = Path(args.dir or tempfile.mkdtemp(prefix="history-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    start = datetime(2025, 11, 1)
+    try:
+        for backend in args.backends.split(","):
+            run_backend(backend, args.rows, workdir, start)
+    finally:
+        if args.dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
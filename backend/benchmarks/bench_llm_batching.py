@@ -0,0 +1,153 @@
+# benchmarks/bench_llm_batching.py
+#
+# Offline comparison of one-image-per-request analysis vs multi-camera
+# batches, against a local stub of the Chat Completions API. The stub
+# charges a fixed per-request overhead plus a per-image cost, and can be
+# told to return malformed batch answers to exercise the fallback path.
+#
+# Also checks that a missing frame or a failing per-image fallback only
+# fails that frame's entry of a batch.
+#
+#   cd backend && python -m benchmarks.bench_llm_batching
+
+import json
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import llm_processor
+from llm_processor import BatchingAnalyzer, analyze_parking_image, analyze_parking_images_batch
+
+REQUEST_OVERHEAD_S = 0.40
+PER_IMAGE_S = 0.05
+CAMERAS = 24
+
+
+class StubClient:
+    """Mimics client.chat.completions.create closely enough for llm_processor."""
+
+    def __init__(self, malformed_every: int = 0, overhead_s: float = REQUEST_OVERHEAD_S, fail_single=()):
+        self.requests = 0
+        self.malformed_every = malformed_every
+        self.overhead_s = overhead_s
+        # Single-image requests for these spot counts raise, like an API error
+        self.fail_single = set(fail_single)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        with self._lock:
+            self.requests += 1
+            n = self.requests
+        content = messages[1]["content"]
+        images = sum(1 for part in content if part["type"] == "image_url")
+        time.sleep(self.overhead_s + PER_IMAGE_S * images)
+
+        labels = [
+            re.match(r"IMAGE (\d+) \(camera_id=(.*), spots=(\d+)\)", part["text"])
+            for part in content if part["type"] == "text"
+        ]
+        labels = [m for m in labels if m]
+
+        if labels:
+            if self.malformed_every and n % self.malformed_every == 0:
+                body = '{"cameras": [{"image_index": 0, "spots": "???"}'  # truncated JSON
+            else:
+                body = json.dumps({"cameras": [
+                    {
+                        "image_index": int(m.group(1)),
+                        "camera_id": m.group(2),
+                        "spots": [
+                            {"spot_index": i, "status": "empty" if i % 2 else "occupied"}
+                            for i in range(int(m.group(3)))
+                        ],
+                    }
+                    for m in labels
+                ]})
+        else:
+            # The spot count the single-image prompt asks for
+            text = next(part["text"] for part in content if part["type"] == "text")
+            num_spots = int(re.search(r'"total_spots\" to (\d+)', text).group(1))
+            if num_spots in self.fail_single:
+                raise RuntimeError("stub API error")
+            body = json.dumps({"spots": [
+                {"spot_index": i, "status": "empty" if i % 2 else "occupied"} for i in range(num_spots)
+            ]})
+
+        message = SimpleNamespace(content=body)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _run_concurrently(fn, frames):
+    results = [None] * len(frames)
+
+    def worker(i, frame):
+        results[i] = fn(frame)
+
+    threads = [threading.Thread(target=worker, args=(i, f)) for i, f in enumerate(frames)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, results
+
+
+def main():
+    # The stub frames below are not real JPEGs; send them untouched
+    llm_processor.PREPROCESS_ENABLED = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = []
+        for c in range(CAMERAS):
+            path = Path(tmp) / f"cam-{c:03d}.jpg"
+            path.write_bytes(b"\xff\xd8" + bytes(20_000) + b"\xff\xd9")
+            frames.append({"camera_id": f"cam-{c:03d}", "image_path": str(path),
+                           "num_spots": 4 + c % 5})
+
+        single = StubClient()
+        t_single, want = _run_concurrently(
+            lambda f: analyze_parking_image(f["image_path"], f["num_spots"], single), frames)
+        print(f"single:           {single.requests:3d} requests, {t_single:.2f} s wall")
+
+        for batch_size, malformed_every in ((4, 0), (8, 0), (8, 2)):
+            stub = StubClient(malformed_every)
+            batcher = BatchingAnalyzer(batch_size=batch_size, flush_interval_s=0.2,
+                                       max_inflight=CAMERAS, llm_client=stub)
+            t_batch, got = _run_concurrently(
+                lambda f: batcher.analyze(f["camera_id"], f["image_path"], f["num_spots"]), frames)
+
+            for w, g in zip(want, got):
+                if w["spots"] != g["spots"]:
+                    raise SystemExit("batched result differs from single-image result")
+
+            label = f"batch={batch_size}" + (f", malformed 1/{malformed_every}" if malformed_every else "")
+            print(f"{label:<17} {stub.requests:3d} requests, {t_batch:.2f} s wall, "
+                  f"stats {batcher.stats()}")
+
+        _check_partial_failures(frames, want)
+
+
+def _check_partial_failures(frames, want):
+    """One frame missing, one whose fallback call fails: only those two fail."""
+    subset = [dict(f) for f in frames[:5]]
+    subset[1]["image_path"] = subset[1]["image_path"] + ".missing"
+    # Malformed batch answer, so every frame falls back to single calls,
+    # and the single call for frame 3's spot count fails
+    stub = StubClient(malformed_every=1, overhead_s=0.0, fail_single=[subset[3]["num_spots"]])
+    got = analyze_parking_images_batch(subset, stub)
+
+    failed = [i for i, r in enumerate(got) if "error" in r]
+    if failed != [1, 3]:
+        raise SystemExit(f"expected only frames 1 and 3 to fail, got {failed}: {got}")
+    for i in (0, 2, 4):
+        if got[i]["spots"] != want[i]["spots"] or not got[i].get("batch_fallback"):
+            raise SystemExit(f"frame {i} lost its result when other frames failed")
+    print("missing frame and failed fallback only fail their own entries: OK")
+
+
+if __name__ == "__main__":
+    main()
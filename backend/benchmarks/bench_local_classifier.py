@@ -0,0 +1,72 @@
+# benchmarks/bench_local_classifier.py
+#
+# Offline accuracy and latency of the local occupancy classifier, using
+# captures/ frames labelled with the LLM answers from history.csv.
+# Trains on the first 80% of frames (by time), evaluates on the rest,
+# and shows how often each confidence bar would still escalate to the LLM.
+#
+#   cd backend && python -m benchmarks.bench_local_classifier [captures_dir] [history_csv]
+
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from llm_processor import num_spots_for
+from local_classifier import LocalOccupancyClassifier, build_dataset, labelled_frames
+
+THRESHOLDS = (0.6, 0.7, 0.8, 0.9, 0.95)
+
+
+def main():
+    captures_dir = sys.argv[1] if len(sys.argv) > 1 else "captures"
+    history_csv = sys.argv[2] if len(sys.argv) > 2 else "history.csv"
+
+    frames = labelled_frames(captures_dir, history_csv)
+    if len(frames) < 10:
+        raise SystemExit(f"Need at least 10 labelled frames, found {len(frames)}")
+
+    cutoff = int(len(frames) * 0.8)
+    train_frames, test_frames = frames[:cutoff], frames[cutoff:]
+
+    X, y, _ = build_dataset(train_frames, num_spots_for=num_spots_for)
+    clf = RandomForestClassifier(
+        n_estimators=100, max_depth=8, min_samples_leaf=3,
+        class_weight="balanced", random_state=42, n_jobs=-1,
+    )
+    clf.fit(X, y)
+    classifier = LocalOccupancyClassifier(clf)
+
+    results = []
+    start = time.perf_counter()
+    for path, camera_id, labels in test_frames:
+        results.append((classifier.classify(str(path), num_spots_for(camera_id)), labels))
+    per_frame_ms = (time.perf_counter() - start) / len(test_frames) * 1e3
+
+    spot_correct = [
+        (s["status"] == "occupied") == bool(labels[s["spot_index"]])
+        for result, labels in results
+        for s in result["spots"] if s["spot_index"] in labels
+    ]
+    print(f"train frames {len(train_frames)}, test frames {len(test_frames)}")
+    print(f"per-spot accuracy (all frames): {np.mean(spot_correct):.1%}")
+    print(f"latency: {per_frame_ms:.2f} ms per frame (features + predict)")
+
+    for threshold in THRESHOLDS:
+        accepted = [
+            (result, labels) for result, labels in results
+            if min(result["spot_confidence"]) >= threshold
+        ]
+        frame_ok = [
+            all((s["status"] == "occupied") == bool(labels.get(s["spot_index"], 0))
+                for s in result["spots"])
+            for result, labels in accepted
+        ]
+        acc = f"{np.mean(frame_ok):.1%}" if frame_ok else "n/a"
+        print(f"  min confidence {threshold:.2f}: {len(accepted) / len(results):5.1%} frames handled locally, "
+              f"whole-frame accuracy {acc}, LLM calls avoided {len(accepted)}/{len(results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# benchmarks/bench_metrics.py
+#
+# The /metrics instrumentation (metrics.py):
+#   - cost of one observation (resolved series, label lookup, timer
+#     block) and of rendering --cameras cameras' worth of series
+#   - uploads through Flask's test client, analyzed by the real
+#     analyze_parking_image with a fake OpenAI client, then a check that
+#     /metrics parses and its per-camera stage counts add up (every
+#     upload timed, one OpenAI call and one storage update per analysis)
+#   - /api/spots/forecast with the instrumentation on vs off
+#
+#   cd backend && python -m benchmarks.bench_metrics [--cameras 50]
+#       [--frames 4] [--requests 3000]
+
+import argparse
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("MODEL_RETRAIN_ENABLED", "0")
+os.environ.setdefault("STARTUP_WARMUP", "eager")
+os.environ.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+os.environ.setdefault("SCENE_CHANGE_ENABLED", "0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+os.environ.setdefault("HISTORY_PATH", os.path.join(tempfile.mkdtemp(prefix="metrics-bench-"), "history.db"))
+
+from PIL import Image  # noqa: E402
+
+import app as backend  # noqa: E402
+import llm_processor  # noqa: E402
+import metrics  # noqa: E402
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+class FakeOpenAI:
+    """chat.completions.create() answering like the model, after latency_s."""
+
+    def __init__(self, latency_s, seed):
+        self.latency_s = latency_s
+        self.rng = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        time.sleep(self.latency_s)
+        spots = [{"spot_index": i, "status": self.rng.choice(["empty", "occupied"])} for i in range(6)]
+        content = json.dumps({"total_spots": 6, "spots": spots})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def parse_exposition(text):
+    """
+    {(name, labels): value} from Prometheus text, checking that every
+    histogram's buckets are cumulative and end in its _count.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        m = SAMPLE.match(line)
+        if m is None:
+            raise SystemExit(f"unparseable /metrics line: {line!r}")
+        labels = tuple(LABEL.findall(m.group(2) or ""))
+        samples[(m.group(1), labels)] = float(m.group(3))
+
+    buckets = {}
+    for (name, labels), value in samples.items():
+        if name.endswith("_bucket"):
+            le = dict(labels)["le"]
+            rest = tuple(kv for kv in labels if kv[0] != "le")
+            buckets.setdefault((name[:-len("_bucket")], rest), []).append(
+                (float("inf") if le == "+Inf" else float(le), value)
+            )
+    for (name, labels), points in buckets.items():
+        counts = [n for _, n in sorted(points)]
+        if counts != sorted(counts) or counts[-1] != samples.get((name + "_count", labels)):
+            raise SystemExit(f"{name}{dict(labels)}: buckets are not cumulative up to _count")
+    return samples
+
+
+def stage_count(samples, operation, stage, camera_id):
+    for (name, labels), value in samples.items():
+        if name == "parking_stage_seconds_count":
+            got = dict(labels)
+            if (got["operation"], got["stage"], got["camera_id"]) == (operation, stage, camera_id):
+                return value
+    return 0.0
+
+
+def _per_call(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def _micro(cameras):
+    registry = metrics.MetricsRegistry()
+    hist = registry.histogram("bench_seconds", "bench", ("operation", "stage", "camera_id"))
+    series = hist.labels("camera_upload", "save_jpeg", "cam-000")
+
+    def timed_block():
+        with hist.time("camera_upload", "save_jpeg", "cam-000"):
+            pass
+
+    n = 200000
+    print("per observation:")
+    for enabled in (True, False):
+        registry.enabled = enabled
+        state = "on " if enabled else "off"
+        print(f"  [{state}] resolved series  {_per_call(lambda: series.observe(0.003), n) * 1e9:7.0f} ns")
+        print(f"  [{state}] label lookup     "
+              f"{_per_call(lambda: hist.observe(0.003, 'camera_upload', 'save_jpeg', 'cam-000'), n) * 1e9:7.0f} ns")
+        print(f"  [{state}] timer block      {_per_call(timed_block, n) * 1e9:7.0f} ns")
+    registry.enabled = True
+
+    stages = ("read_body", "save_jpeg", "share_latest", "submit", "total")
+    for c in range(cameras):
+        for stage in stages:
+            hist.observe(0.001, "camera_upload", stage, f"cam-{c:03d}")
+    t0 = time.perf_counter()
+    text = registry.render()
+    print(f"render: {cameras * len(stages):,} series, {len(text) / 1024:.0f} KiB in "
+          f"{(time.perf_counter() - t0) * 1e3:.1f} ms")
+    parse_exposition(text)
+
+
+def _jpeg(rng):
+    img = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _wait_idle(timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = backend.ANALYSIS_PIPELINE.stats()
+        if stats["queue_depth"] == 0 and stats["running"] == 0:
+            return stats
+        time.sleep(0.02)
+    raise SystemExit("analysis pipeline did not drain")
+
+
+def _end_to_end(client, cameras, frames, llm_latency_s):
+    fake = FakeOpenAI(llm_latency_s, seed=0)
+    backend.analyze_parking_image = lambda image_path, num_spots=6, llm_client=None, camera_id=None: (
+        llm_processor.analyze_parking_image(image_path, num_spots, fake, camera_id)
+    )
+    rng = random.Random(0)
+    accepted = {}
+    for _ in range(frames):
+        for c in range(cameras):
+            camera_id = f"cam-{c:03d}"
+            resp = client.post(f"/api/camera/upload?camera_id={camera_id}", data=_jpeg(rng),
+                               content_type="image/jpeg")
+            if resp.status_code == 202:
+                accepted[camera_id] = accepted.get(camera_id, 0) + 1
+    stats = _wait_idle()
+
+    resp = client.get("/metrics")
+    if resp.status_code != 200 or not resp.content_type.startswith("text/plain"):
+        raise SystemExit(f"/metrics: {resp.status_code} {resp.content_type}")
+    samples = parse_exposition(resp.get_data(as_text=True))
+
+    analyzed = 0
+    for camera_id, n in accepted.items():
+        if stage_count(samples, "camera_upload", "total", camera_id) != n:
+            raise SystemExit(f"{camera_id}: {n} accepted uploads, not all timed")
+        runs = stage_count(samples, "analyze_frame", "total", camera_id)
+        calls = stage_count(samples, "analyze_parking_image", "openai_call", camera_id)
+        stored = stage_count(samples, "update_spot_storage", "total", camera_id)
+        if not 1 <= runs <= n or calls != runs or stored != runs:
+            raise SystemExit(f"{camera_id}: {runs:.0f} analyses, {calls:.0f} OpenAI calls, {stored:.0f} updates")
+        analyzed += runs
+    if analyzed != stats["completed"]:
+        raise SystemExit(f"{analyzed:.0f} analyses in /metrics, pipeline completed {stats['completed']}")
+    print(f"/metrics after {sum(accepted.values())} uploads from {len(accepted)} cameras "
+          f"({analyzed:.0f} analyzed): {len(samples):,} samples, per-camera counts add up: OK")
+
+    print("mean seconds per stage, all cameras:")
+    totals = {}
+    for (name, labels), value in samples.items():
+        if name in ("parking_stage_seconds_sum", "parking_stage_seconds_count"):
+            got = dict(labels)
+            entry = totals.setdefault((got["operation"], got["stage"]), [0.0, 0.0])
+            entry[name.endswith("_count")] += value
+    for (operation, stage), (total, count) in sorted(totals.items()):
+        if count:
+            print(f"  {operation:<24} {stage:<18} {total / count * 1e3:9.3f} ms  x{count:.0f}")
+
+
+def _forecast_overhead(client, requests):
+    backend.RESPONSE_CACHE_ENABLED = False
+    url = "/api/spots/forecast?lat=40.8098&lng=-73.96&radius=1000&k=20"
+    try:
+        times = {}
+        for _ in range(2):
+            for enabled in (False, True):
+                metrics.REGISTRY.enabled = enabled
+                t = _per_call(lambda: client.get(url), requests)
+                times[enabled] = min(times.get(enabled, float("inf")), t)
+    finally:
+        metrics.REGISTRY.enabled = True
+        backend.RESPONSE_CACHE_ENABLED = True
+    print(f"/api/spots/forecast, built every time: off {times[False] * 1e6:7.1f} us/request, "
+          f"on {times[True] * 1e6:7.1f} us/request ({(times[True] / times[False] - 1) * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage metrics: overhead and /metrics consistency")
+    parser.add_argument("--cameras", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=4, help="uploads per camera")
+    parser.add_argument("--llm-latency-ms", type=float, default=5.0)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    if not metrics.REGISTRY.enabled:
+        raise SystemExit("run without METRICS_ENABLED=0")
+
+    _micro(args.cameras)
+
+    # captures/ goes to a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="metrics-bench-cwd-"))
+    client = backend.app.test_client()
+    _end_to_end(client, args.cameras, args.frames, args.llm_latency_ms / 1000.0)
+    _forecast_overhead(client, args.requests)
+
+
+if __name__ == "__main__":
+    main()
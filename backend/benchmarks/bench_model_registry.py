@@ -0,0 +1,99 @@
+# benchmarks/bench_model_registry.py
+#
+# Cache hit rate, lookup latency and memory of model_registry.ModelRegistry
+# with hundreds of per-lot models, under a skewed (Zipf) request mix
+# where a few lots get most of the traffic. A fraction of the cameras
+# has no model of its own and falls back to the global one.
+#
+# Every lot gets a committed version with a table.npy (what serving
+# loads), so no forest is unpickled here.
+#
+#   cd backend && python -m benchmarks.bench_model_registry [--lots 500]
+#       [--lookups 200000] [--capacities 16,64,256]
+
+import argparse
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import predictor
+from forecast_engine import MINUTES_PER_WEEK, ProbabilityTable
+from model_registry import ModelRegistry
+from model_store import ModelStore
+
+
+def _make_lots(root, lots, rng):
+    for i in range(lots):
+        store = ModelStore(root / f"lot-{i:04d}")
+        version = store.new_version()
+        ProbabilityTable(rng.random(MINUTES_PER_WEEK)).save(store.table_path(version))
+        store.commit(version, {"origin": "bench"})
+        store.activate(version)
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _run(root, lots, unmodelled, lookups, capacity, zipf_a, rng):
+    global_model = predictor.ActiveModel("global", None, ProbabilityTable(np.full(MINUTES_PER_WEEK, 0.5)))
+    registry = ModelRegistry(
+        load_version=lambda store, version: predictor.load_version(version, store),
+        global_model=lambda: global_model,
+        root=root,
+        capacity=capacity,
+        refresh_s=3600.0,
+    )
+
+    # Camera ids: lot-0000.. have models, cam-x-0000.. do not
+    ids = [f"lot-{i:04d}" for i in range(lots)] + [f"cam-x-{i:04d}" for i in range(unmodelled)]
+    ranks = rng.zipf(zipf_a, size=lookups) - 1
+    picks = rng.permutation(len(ids))[np.minimum(ranks, len(ids) - 1)]
+
+    latencies = np.empty(lookups)
+    slot = predictor._arrival_slot(10.0)
+    for n, idx in enumerate(picks.tolist()):
+        t0 = time.perf_counter()
+        model = registry.get(ids[idx])
+        float(model.table.probs[slot])
+        latencies[n] = time.perf_counter() - t0
+
+    stats = registry.stats()
+    mapped_kb = stats["resident_models"] * MINUTES_PER_WEEK * 8 / 1024
+    print(
+        f"capacity {capacity:>4}: hit rate {stats['hit_rate']:6.1%}  loads {stats['loads']:>6}  "
+        f"evictions {stats['evictions']:>6}  resident {stats['resident']:>4} "
+        f"({stats['resident_models']} models, {mapped_kb / 1024:.1f} MB mapped)  "
+        f"median {np.median(latencies) * 1e6:6.1f} us  p99 {np.percentile(latencies, 99) * 1e6:7.1f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-camera model registry benchmark")
+    parser.add_argument("--lots", type=int, default=500)
+    parser.add_argument("--unmodelled", type=int, default=100, help="cameras without their own model")
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--capacities", default="16,64,256")
+    parser.add_argument("--zipf", type=float, default=1.3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    root = Path(tempfile.mkdtemp(prefix="model-registry-"))
+    try:
+        _make_lots(root, args.lots, rng)
+        print(f"{args.lots} lots with models, {args.unmodelled} cameras on the global model, "
+              f"{args.lookups:,} Zipf({args.zipf}) lookups")
+        rss_before = _rss_mb()
+        for capacity in (int(c) for c in args.capacities.split(",")):
+            _run(root, args.lots, args.unmodelled, args.lookups, capacity, args.zipf, rng)
+        print(f"peak RSS {_rss_mb():.1f} MB (was {rss_before:.1f} MB before the runs)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_model_swap.py
+#
+# Hot model swap under load: request threads run the forecast path
+# (probability + expected wait, pinned to one active_model() snapshot)
+# while the main thread keeps swapping between two model versions.
+# Checks every request saw one consistent version and reports request
+# latency with and without swaps. Also exercises model_store's
+# activate / rollback / prune on a scratch directory.
+#
+#   cd backend && python -m benchmarks.bench_model_swap [--threads 8] [--seconds 5]
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import predictor
+from forecast_engine import MINUTES_PER_WEEK, ProbabilityTable
+from model_store import ModelStore
+
+
+def _constant_model(version, p):
+    """An ActiveModel whose table answers p everywhere (no sklearn needed)."""
+    return predictor.ActiveModel(version, None, ProbabilityTable(np.full(MINUTES_PER_WEEK, p)))
+
+
+def _request(latencies, errors, expected):
+    t0 = time.perf_counter()
+    model = predictor.active_model()
+    prob = predictor.predict_empty_probability(0, 6, 10.0, active=model)
+    wait = predictor.expected_wait_minutes(0, 6, active=model)
+    latencies.append(time.perf_counter() - t0)
+    if (prob, wait) != expected[model.version]:
+        errors.append((model.version, prob, wait))
+
+
+def _run(threads, seconds, swap):
+    # v-low never reaches 0.8, so wait = max_wait; v-high answers 0 minutes
+    low, high = _constant_model("v-low", 0.2), _constant_model("v-high", 0.9)
+    expected = {"v-low": (0.2, 60.0), "v-high": (0.9, 0.0)}
+    predictor.set_active(low)
+
+    stop = threading.Event()
+    latencies, errors = [], []
+
+    def worker():
+        while not stop.is_set():
+            _request(latencies, errors, expected)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+
+    swaps = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if swap:
+            predictor.set_active(high if swaps % 2 == 0 else low)
+            swaps += 1
+        time.sleep(0.001)
+    stop.set()
+    for t in pool:
+        t.join()
+
+    if errors:
+        raise SystemExit(f"{len(errors)} requests mixed model versions, e.g. {errors[0]}")
+
+    lat_us = sorted(x * 1e6 for x in latencies)
+    p99 = lat_us[int(len(lat_us) * 0.99)]
+    label = f"{swaps} swaps" if swap else "no swaps"
+    print(f"{label:>12}: {len(lat_us):,} requests, median {statistics.median(lat_us):.1f} us, p99 {p99:.1f} us")
+
+
+def _check_store():
+    root = Path(tempfile.mkdtemp(prefix="model-store-"))
+    try:
+        store = ModelStore(root, keep_versions=3)
+        versions = []
+        for i in range(5):
+            v = store.new_version()
+            store.model_path(v).write_bytes(b"model %d" % i)
+            store.commit(v, {"origin": "bench"})
+            store.activate(v)
+            versions.append(v)
+
+        assert store.active_version() == versions[-1]
+        assert store.rollback() == versions[-2]
+        assert store.rollback() == versions[-3]
+        try:
+            store.rollback()
+        except ValueError:
+            pass
+        else:
+            raise SystemExit("rollback past the kept history should fail")
+        assert store.versions() == versions[-3:], store.versions()
+
+        # An uncommitted (crashed) training run is never listed
+        store.new_version()
+        assert store.versions() == versions[-3:]
+        print(f"model store: activate/rollback/prune OK ({', '.join(store.versions())} kept)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot model swap check")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    original = predictor.active_model()
+    try:
+        _run(args.threads, args.seconds, swap=False)
+        _run(args.threads, args.seconds, swap=True)
+    finally:
+        predictor.set_active(original)
+
+    _check_store()
+
+
+if __name__ == "__main__":
+    main()
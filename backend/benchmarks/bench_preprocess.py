@@ -0,0 +1,65 @@
+# benchmarks/bench_preprocess.py
+#
+# Before/after payload size for the crop + downscale + re-encode stage in
+# image_preprocess.py, over the saved captures/ images.
+#
+# "patches" is a rough vision-token proxy: the number of 32x32 tiles
+# covering the image that is sent.
+#
+#   cd backend && python -m benchmarks.bench_preprocess [captures_dir]
+
+import base64
+import math
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from image_preprocess import PreprocessConfig, preprocess_jpeg
+
+CONFIGS = {
+    "default (crop 60%, 512px, q75)": PreprocessConfig(),
+    "crop only": PreprocessConfig(max_size=None, jpeg_quality=90),
+    "crop, 384px, q60": PreprocessConfig(max_size=(384, 384), jpeg_quality=60),
+}
+
+
+def _patches(size):
+    w, h = size
+    return math.ceil(w / 32) * math.ceil(h / 32)
+
+
+def main():
+    captures_dir = Path(sys.argv[1] if len(sys.argv) > 1 else "captures")
+    paths = sorted(captures_dir.glob("*.jpg"))
+    if not paths:
+        raise SystemExit(f"No captures found in {captures_dir}")
+
+    raws = [p.read_bytes() for p in paths]
+    sizes = []
+    for raw, path in zip(raws, paths):
+        with Image.open(path) as img:
+            sizes.append(img.size)
+
+    orig_bytes = sum(len(r) for r in raws) / len(raws)
+    orig_b64 = sum(len(base64.b64encode(r)) for r in raws) / len(raws)
+    orig_patches = sum(_patches(s) for s in sizes) / len(sizes)
+    print(f"{len(raws)} frames from {captures_dir}")
+    print(f"  original: {orig_bytes / 1024:7.1f} KiB/frame  "
+          f"({orig_b64 / 1024:7.1f} KiB base64)  ~{orig_patches:.0f} patches")
+
+    for name, config in CONFIGS.items():
+        start = time.perf_counter()
+        out = [preprocess_jpeg(raw, config) for raw in raws]
+        per_frame_ms = (time.perf_counter() - start) / len(raws) * 1e3
+
+        sent = sum(len(b) for b, _ in out) / len(out)
+        patches = sum(_patches(size) for _, size in out) / len(out)
+        print(f"  {name:<32} {sent / 1024:7.1f} KiB/frame ({sent / orig_bytes:5.1%})  "
+              f"~{patches:.0f} patches ({patches / orig_patches:5.1%})  "
+              f"{per_frame_ms:.2f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
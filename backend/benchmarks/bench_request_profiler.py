@@ -0,0 +1,158 @@
+# benchmarks/bench_request_profiler.py
+#
+# Opt-in request profiling (request_profiler.py), through Flask's test
+# client on /api/spots/forecast (response cache off, --cameras cameras
+# of spots):
+#   - a request sent with X-Profile-Token is profiled: the response names
+#     the run (X-Profile-Id), /admin/profiles lists it (only with the
+#     token), and its .prof loads in pstats and shows the predictor calls
+#   - rotation keeps only PROFILE_KEEP runs
+#   - per-request cost with profiling off (no hooks, as app.py does
+#     without a rate or token), with the hooks installed but the request
+#     not picked, and with every request profiled
+#
+#   cd backend && python -m benchmarks.bench_request_profiler
+#       [--cameras 200] [--requests 2000]
+
+import argparse
+import json
+import os
+import pstats
+import random
+import tempfile
+import time
+from datetime import datetime
+
+PROFILE_DIR = os.path.join(tempfile.mkdtemp(prefix="profiler-bench-"), "profiles")
+
+os.environ.setdefault("MODEL_RETRAIN_ENABLED", "0")
+os.environ.setdefault("STARTUP_WARMUP", "eager")
+os.environ.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+os.environ.setdefault("HISTORY_PATH", os.path.join(os.path.dirname(PROFILE_DIR), "history.db"))
+os.environ["PROFILE_TOKEN"] = "bench-token"
+os.environ["PROFILE_DIR"] = PROFILE_DIR
+os.environ["PROFILE_KEEP"] = "20"
+
+import app as backend  # noqa: E402
+from request_profiler import ID_HEADER, TOKEN_HEADER  # noqa: E402
+
+CENTER = (40.8098, -73.9600)
+URL = "/api/spots/forecast?lat=40.8098&lng=-73.96&radius=2000"
+HOOKS = (
+    (backend.app.before_request_funcs, backend._profile_before_request),
+    (backend.app.after_request_funcs, backend._profile_after_request),
+    (backend.app.teardown_request_funcs, backend._profile_teardown),
+)
+
+
+def _seed(cameras, rng):
+    ts = datetime.utcnow().isoformat() + "Z"
+    for c in range(cameras):
+        camera_id = f"cam-{c:04d}"
+        lat0 = CENTER[0] + rng.uniform(-0.01, 0.01)
+        lng0 = CENTER[1] + rng.uniform(-0.01, 0.01)
+        records = [
+            {
+                "timestamp": ts, "camera_id": camera_id, "spot_index": i,
+                # Mostly full, so expected_wait_minutes has to search
+                "status": "empty" if rng.random() < 0.1 else "occupied",
+                "lat": lat0 + i * 1e-5, "lng": lng0,
+            }
+            for i in range(6)
+        ]
+        backend._apply_spot_records(camera_id, records, ts)
+
+
+def _set_hooks(installed):
+    for funcs, hook in HOOKS:
+        hooks = funcs.setdefault(None, [])
+        if installed and hook not in hooks:
+            hooks.append(hook)
+        elif not installed and hook in hooks:
+            hooks.remove(hook)
+
+
+def _check_requested(client):
+    resp = client.get(URL, headers={TOKEN_HEADER: "bench-token"})
+    profile_id = resp.headers.get(ID_HEADER)
+    if resp.status_code != 200 or not profile_id:
+        raise SystemExit(f"token request not profiled: {resp.status_code} {dict(resp.headers)}")
+    if client.get(URL).headers.get(ID_HEADER):
+        raise SystemExit("request without the token was profiled")
+
+    if client.get("/admin/profiles").status_code != 403:
+        raise SystemExit("/admin/profiles answered without the token")
+    if client.get("/admin/profiles", headers={TOKEN_HEADER: "wrong"}).status_code != 403:
+        raise SystemExit("/admin/profiles answered with a wrong token")
+    listing = json.loads(client.get("/admin/profiles", headers={TOKEN_HEADER: "bench-token"}).data)
+    newest = listing["profiles"][0]
+    if newest["id"] != profile_id or newest["status"] != 200 or newest["trigger"] != "requested":
+        raise SystemExit(f"/admin/profiles does not list {profile_id} first: {newest}")
+
+    resp = client.get(f"/admin/profiles/{profile_id}.prof", headers={TOKEN_HEADER: "bench-token"})
+    if resp.status_code != 200:
+        raise SystemExit(f"download failed: {resp.status_code}")
+    path = os.path.join(tempfile.mkdtemp(prefix="profiler-bench-dl-"), f"{profile_id}.prof")
+    with open(path, "wb") as f:
+        f.write(resp.data)
+    functions = {name for _, _, name in pstats.Stats(path).stats}
+    if "expected_wait_minutes" not in functions:
+        raise SystemExit("the forecast's profile does not show expected_wait_minutes")
+    for bad in ("../app.py", f"{profile_id}.py", "nope.prof"):
+        if client.get(f"/admin/profiles/{bad}", headers={TOKEN_HEADER: "bench-token"}).status_code != 404:
+            raise SystemExit(f"/admin/profiles/{bad} was served")
+
+    summary = client.get(f"/admin/profiles/{profile_id}.txt", headers={TOKEN_HEADER: "bench-token"})
+    print(f"requested profile {profile_id}: listed, downloaded, {len(functions)} functions: OK")
+    print("  " + "\n  ".join(summary.get_data(as_text=True).splitlines()[:14]))
+
+
+def _timed(client, requests, headers=None):
+    t0 = time.perf_counter()
+    for _ in range(requests):
+        client.get(URL, headers=headers)
+    return (time.perf_counter() - t0) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request profiling: admin listing, rotation and overhead")
+    parser.add_argument("--cameras", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    _seed(args.cameras, random.Random(0))
+    backend.RESPONSE_CACHE_ENABLED = False
+    client = backend.app.test_client()
+
+    _check_requested(client)
+
+    profiler = backend.REQUEST_PROFILER
+    profiler.sample_rate = 1.0
+    for _ in range(2 * profiler.keep):
+        client.get(URL)
+    kept = len(profiler.list())
+    files = len(os.listdir(PROFILE_DIR))
+    if kept != profiler.keep or files != 3 * profiler.keep:
+        raise SystemExit(f"rotation kept {kept} runs ({files} files), expected {profiler.keep}")
+    print(f"rotation keeps the newest {kept} runs: OK")
+
+    n = args.requests
+    profiler.sample_rate = 0.0
+    _set_hooks(False)
+    t_off = min(_timed(client, n) for _ in range(2))
+    _set_hooks(True)
+    t_idle = min(_timed(client, n) for _ in range(2))
+    profiler.sample_rate = 1.0
+    t_all = _timed(client, max(1, n // 10))
+    profiler.sample_rate = 0.0
+
+    print(f"/api/spots/forecast over {len(backend.SPOT_STATE):,} spots:")
+    print(f"  profiling off (no hooks):       {t_off * 1e6:8.1f} us/request")
+    print(f"  hooks installed, not picked:    {t_idle * 1e6:8.1f} us/request   ({(t_idle / t_off - 1) * 100:+.1f}%)")
+    print(f"  every request profiled:         {t_all * 1e6:8.1f} us/request   ({t_all / t_off:5.1f}x)")
+    print(f"profiler stats: {profiler.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# benchmarks/bench_response_cache.py
+#
+# Polling throughput of /api/spots/current and /api/spots/forecast
+# through Flask's test client, with a few hundred phones polling from
+# nearby positions:
+#   no cache     - RESPONSE_CACHE_ENABLED off, every poll rebuilt
+#   cache        - cached body (200 every time)
+#   cache + gzip - cached body, gzip-compressed once per entry
+#   cache + 304  - the phone sends If-None-Match with its last ETag
+# A camera upload (a new SPOT_STATE version) lands every --update-every
+# polls, so the cache also pays for rebuilds. Checks cached bodies match
+# freshly built ones.
+#
+#   cd backend && python -m benchmarks.bench_response_cache [--cameras 200]
+#       [--polls 5000] [--phones 300]
+
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("MODEL_RETRAIN_ENABLED", "0")
+os.environ.setdefault("STARTUP_WARMUP", "eager")
+os.environ.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+os.environ.setdefault("HISTORY_PATH", os.path.join(tempfile.mkdtemp(prefix="cache-bench-"), "history.db"))
+
+import app as backend  # noqa: E402
+
+CENTER = (40.8098, -73.9600)
+
+
+def _seed(cameras, rng):
+    ts = datetime.utcnow().isoformat() + "Z"
+    for c in range(cameras):
+        camera_id = f"cam-{c:04d}"
+        lat0 = CENTER[0] + rng.uniform(-0.01, 0.01)
+        lng0 = CENTER[1] + rng.uniform(-0.01, 0.01)
+        records = [
+            {
+                "timestamp": ts, "camera_id": camera_id, "spot_index": i,
+                "status": rng.choice(["empty", "occupied"]),
+                "lat": lat0 + i * 1e-5, "lng": lng0,
+            }
+            for i in range(6)
+        ]
+        backend._apply_spot_records(camera_id, records, ts)
+
+
+def _upload(cameras, rng):
+    camera_id = f"cam-{rng.randrange(cameras):04d}"
+    ts = datetime.utcnow().isoformat() + "Z"
+    records = backend.SPOT_STATE.camera_records(camera_id)
+    for r in records:
+        r["timestamp"] = ts
+        r["status"] = rng.choice(["empty", "occupied"])
+    backend._apply_spot_records(camera_id, records, ts)
+
+
+def _urls(phones, rng, decimals=6):
+    urls = []
+    for _ in range(phones):
+        lat = CENTER[0] + rng.uniform(-0.005, 0.005)
+        lng = CENTER[1] + rng.uniform(-0.005, 0.005)
+        path = rng.choice(["/api/spots/current", "/api/spots/forecast"])
+        urls.append(f"{path}?lat={lat:.{decimals}f}&lng={lng:.{decimals}f}&k=20")
+    return urls
+
+
+def _run(client, urls, polls, cameras, update_every, conditional=False, gzip_ok=False):
+    rng = random.Random(1)
+    etags = {}
+    statuses = {}
+    sent = 0
+    t0 = time.perf_counter()
+    for n in range(polls):
+        if update_every and n % update_every == update_every - 1:
+            _upload(cameras, rng)
+        phone = rng.randrange(len(urls))
+        headers = {}
+        if gzip_ok:
+            headers["Accept-Encoding"] = "gzip"
+        if conditional and phone in etags:
+            headers["If-None-Match"] = etags[phone]
+        resp = client.get(urls[phone], headers=headers)
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        sent += len(resp.data)
+        if resp.headers.get("ETag"):
+            etags[phone] = resp.headers["ETag"]
+    elapsed = time.perf_counter() - t0
+    return polls / elapsed, sent / polls, statuses
+
+
+def _check_parity(client, urls):
+    """
+    Cached bodies (plain and gzipped) equal a fresh build, minus the
+    time-dependent fields. urls use already-rounded coordinates.
+    """
+    def strip(body):
+        body = json.loads(body)
+        body.pop("timestamp", None)
+        body.get("prediction", {}).pop("arrivalTimestamp", None)
+        return body
+
+    for url in urls[:20]:
+        backend.RESPONSE_CACHE_ENABLED = True
+        cached = client.get(url).data
+        zipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+        if zipped.headers.get("Content-Encoding") == "gzip":
+            if gzip.decompress(zipped.data) != cached:
+                raise SystemExit(f"{url}: gzipped body differs")
+        backend.RESPONSE_CACHE_ENABLED = False
+        fresh = client.get(url).data
+        if strip(cached) != strip(fresh):
+            raise SystemExit(f"{url}: cached body differs from a fresh build")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polling throughput with and without the response cache")
+    parser.add_argument("--cameras", type=int, default=200)
+    parser.add_argument("--phones", type=int, default=300)
+    parser.add_argument("--polls", type=int, default=5000)
+    parser.add_argument("--update-every", type=int, default=500, help="polls between camera uploads (0: none)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    _seed(args.cameras, rng)
+    urls = _urls(args.phones, rng)
+    client = backend.app.test_client()
+
+    _check_parity(client, _urls(20, rng, decimals=backend.RESPONSE_CACHE_COORD_DECIMALS))
+
+    print(f"{args.cameras} cameras x 6 spots, {args.phones} phones, {args.polls:,} polls, "
+          f"an upload every {args.update_every} polls")
+    print(f"{'case':<14} {'polls/s':>9} {'bytes/poll':>11} {'hit rate':>9}  statuses")
+    cases = [
+        ("no cache", False, {}),
+        ("cache", True, {}),
+        ("cache + gzip", True, {"gzip_ok": True}),
+        ("cache + 304", True, {"conditional": True, "gzip_ok": True}),
+    ]
+    for label, enabled, kwargs in cases:
+        backend.RESPONSE_CACHE_ENABLED = enabled
+        backend.RESPONSE_CACHE.clear()
+        before = backend.RESPONSE_CACHE.stats()
+        rate, size, statuses = _run(client, urls, args.polls, args.cameras, args.update_every, **kwargs)
+        after = backend.RESPONSE_CACHE.stats()
+        hits, misses = (after[c] - before[c] for c in ("hits", "misses"))
+        hit_rate = f"{hits / (hits + misses):.0%}" if enabled and hits + misses else "-"
+        print(f"{label:<14} {rate:9.0f} {size:11.0f} {hit_rate:>9}  {dict(sorted(statuses.items()))}")
+
+    print(f"cache stats: {backend.RESPONSE_CACHE.stats()}")
+
+
+if __name__ == "__main__":
+    main()
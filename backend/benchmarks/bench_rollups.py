@@ -0,0 +1,129 @@
+# benchmarks/bench_rollups.py
+#
+# Loads a month of synthetic 1-minute uploads for many cameras into
+# rollups.OccupancyRollups, then times the queries behind
+# /api/occupancy/rollup and /api/history. Also checks that the
+# vectorized backfill path (add_arrays) and the per-upload path (add)
+# produce identical buckets.
+#
+#   cd backend && python -m benchmarks.bench_rollups [--cameras 300] [--days 30]
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from history_store import to_iso
+from rollups import OccupancyRollups
+
+NUM_SPOTS = 6
+START = datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _camera_data(rng, days, cadence_s):
+    """(ts, spot_index, occupied) for one camera, one row per spot per upload."""
+    uploads = START + np.arange(0, days * 86400, cadence_s, dtype=np.float64)
+    ts = np.repeat(uploads, NUM_SPOTS)
+    spots = np.tile(np.arange(NUM_SPOTS), len(uploads))
+    # Busier in the middle of the day
+    hour = (ts % 86400) / 3600.0
+    p_occ = 0.3 + 0.5 * np.exp(-((hour - 13.0) / 4.0) ** 2)
+    occupied = rng.random(ts.size) < p_occ
+    return ts, spots, occupied
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0, out
+
+
+def _check_parity(rng):
+    ts, spots, occupied = _camera_data(rng, days=1, cadence_s=60)
+    bulk = OccupancyRollups()
+    bulk.add_arrays("cam-x", ts, spots, occupied)
+
+    incremental = OccupancyRollups()
+    for i in range(0, ts.size, NUM_SPOTS):
+        incremental.add([
+            {
+                "timestamp": to_iso(ts[j]),
+                "camera_id": "cam-x",
+                "spot_index": int(spots[j]),
+                "status": "occupied" if occupied[j] else "empty",
+            }
+            for j in range(i, i + NUM_SPOTS)
+        ])
+
+    for res in ("1m", "15m", "1h"):
+        a = bulk.query(START, START + 86400, res, per_spot=True)
+        b = incremental.query(START, START + 86400, res, per_spot=True)
+        if a != b:
+            raise SystemExit(f"Mismatch between add() and add_arrays() at {res}")
+    return ts.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Occupancy rollup query benchmark")
+    parser.add_argument("--cameras", type=int, default=300)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--cadence-s", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    rows = _check_parity(rng)
+    print(f"add() and add_arrays() agree on {rows} rows at every resolution")
+
+    rollups = OccupancyRollups()
+    t0 = time.perf_counter()
+    total_rows = 0
+    for c in range(args.cameras):
+        ts, spots, occupied = _camera_data(rng, args.days, args.cadence_s)
+        rollups.add_arrays(f"cam-{c:03d}", ts, spots, occupied)
+        total_rows += ts.size
+    load_s = time.perf_counter() - t0
+    print(f"Loaded {total_rows:,} rows for {args.cameras} cameras over {args.days} days in {load_s:.1f}s")
+
+    nbytes = sum(
+        s.buckets.nbytes + s.samples.nbytes + s.occupied.nbytes
+        for cams in rollups._series.values()
+        for s in cams.values()
+    )
+    print(f"Rollup memory: {nbytes / 1e6:.1f} MB (1m kept for the last 7 days)")
+
+    # Per-upload cost of the live path
+    live_ts = START + args.days * 86400
+    record_batch = [
+        {"timestamp": to_iso(live_ts), "camera_id": "cam-000", "spot_index": i, "status": "empty"}
+        for i in range(NUM_SPOTS)
+    ]
+    add_ms, _ = _time(lambda: rollups.add(record_batch), args.repeat * 20)
+    print(f"add() one upload ({NUM_SPOTS} spots): {add_ms * 1000:.1f} us")
+
+    end = START + args.days * 86400
+    cases = [
+        ("1 camera, month, 15m", dict(start=START, end=end, resolution="15m", camera_ids=["cam-000"])),
+        ("1 camera, month, 1h, per spot", dict(start=START, end=end, resolution="1h",
+                                              camera_ids=["cam-000"], per_spot=True)),
+        ("1 camera, last day, 1m", dict(start=end - 86400, end=end, resolution="1m", camera_ids=["cam-000"])),
+        ("all cameras, month, 1h", dict(start=START, end=end, resolution="1h")),
+        ("all cameras, month, 15m", dict(start=START, end=end, resolution="15m")),
+        ("all cameras, last day, 15m", dict(start=end - 86400, end=end, resolution="15m")),
+    ]
+
+    print()
+    print(f"{'query':36s} {'buckets':>10s} {'ms':>9s}")
+    for label, kwargs in cases:
+        ms, out = _time(lambda: rollups.query(**kwargs), args.repeat)
+        buckets = sum(len(series["start"]) for series in out.values())
+        print(f"{label:36s} {buckets:10,d} {ms:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# benchmarks/bench_serve_workers.py
+#
+# Load test of serve.py: throughput of GET /api/spots/current and
+# /api/spots/forecast with 1, 2 and 4 worker processes, driven by
+# several client processes (one new connection per request, so the
+# kernel spreads them over the workers).
+#
+# The spot state is seeded straight into the shared state (no camera
+# uploads or LLM calls). Before each run it checks that every worker
+# serves the seeded state, and after the run that an update written to
+# the shared state shows up in every worker. First, without a server,
+# it publishes --large-spots spots and checks that a reader that fell
+# behind the change ring and one that did not both catch up.
+#
+#   cd backend && python -m benchmarks.bench_serve_workers [--workers 1,2,4]
+#       [--clients 8] [--seconds 5] [--cameras 20] [--large-spots 100000]
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from multiprocessing import Pool
+from pathlib import Path
+
+from shared_state import SharedCameraState
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PATHS = [
+    "/api/spots/current?lat=40.8095&lng=-73.9600&k=20",
+    "/api/spots/forecast?lat=40.8095&lng=-73.9600&k=20",
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(base, path, timeout=10.0):
+    with urllib.request.urlopen(base + path, timeout=timeout) as resp:
+        return resp.status, json.loads(resp.read())
+
+
+def _publish(state, cameras, versions, flip=False):
+    """
+    Publish every camera's spots as app._shared_update does; versions
+    maps camera_id to its last published version and is updated.
+    """
+    now_iso = datetime.utcnow().isoformat() + "Z"
+    for c in range(cameras):
+        camera_id = f"cam-{c:03d}"
+        spots = []
+        for i in range(6):
+            occupied = ((c + i) % 3 == 0) != flip
+            spots.append({
+                "timestamp": now_iso,
+                "camera_id": camera_id,
+                "spot_index": i,
+                "status": "occupied" if occupied else "empty",
+                "lat": 40.8090 + c * 1e-4,
+                "lng": -73.9600 + i * 1e-4,
+            })
+        with state.locked():
+            versions[camera_id] = state.publish(None, camera_id, {
+                "timestamp": now_iso, "prev_version": versions.get(camera_id), "spots": spots,
+            })
+
+
+def _fingerprint(body):
+    """Spot ids and statuses of a /api/spots/current response."""
+    return sorted((s["spotID"], s["status"]) for s in body["spots"])
+
+
+def _check_consistent(base, workers, expected, label, attempts=None):
+    """
+    Hit /ready until every worker answered, checking all of them serve
+    `expected` from /api/spots/current.
+    """
+    attempts = attempts or 50 * workers
+    seen = {}
+    for _ in range(attempts):
+        _, ready = _get(base, "/ready")
+        _, body = _get(base, PATHS[0])
+        fp = _fingerprint(body)
+        if fp != expected:
+            raise SystemExit(f"{label}: worker {ready['pid']} served a different snapshot")
+        seen[ready["pid"]] = True
+        if len(seen) >= workers:
+            break
+    # /ready and the spots request may land on different workers; each
+    # response was still checked against `expected`
+    return len(seen)
+
+
+def _client(args):
+    base, seconds, seed = args
+    n = errors = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        path = PATHS[(n + seed) % len(PATHS)]
+        try:
+            status, _ = _get(base, path)
+            if status != 200:
+                errors += 1
+        except (urllib.error.URLError, OSError):
+            errors += 1
+        n += 1
+    return n, errors
+
+
+def _wait_ready(base, proc, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"serve.py exited with {proc.returncode}")
+        try:
+            if _get(base, "/ready", timeout=2.0)[0] == 200:
+                return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.2)
+    raise SystemExit("serve.py did not become ready")
+
+
+def _run(workers, clients, seconds, cameras):
+    tmp = Path(tempfile.mkdtemp(prefix="serve-bench-"))
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    state_path = str(tmp / "snapshot")
+
+    env = dict(os.environ)
+    env.update({
+        "HISTORY_PATH": str(tmp / "history.db"),
+        "MODEL_RETRAIN_ENABLED": "0",
+        "LOCAL_CLASSIFIER_ENABLED": "0",
+        "STARTUP_WARMUP": "eager",
+        "ANALYSIS_WORKERS": "1",
+    })
+    env.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(port), "--state-path", state_path],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(base, proc)
+
+        state = SharedCameraState(state_path)
+        versions = {}
+        _publish(state, cameras, versions)
+        expected = _fingerprint(_get(base, PATHS[0])[1])
+        if not expected:
+            raise SystemExit("seeded spots are not served")
+        seen = _check_consistent(base, workers, expected, "seeded state")
+
+        with Pool(clients) as pool:
+            t0 = time.perf_counter()
+            results = pool.map(_client, [(base, seconds, i) for i in range(clients)])
+            elapsed = time.perf_counter() - t0
+
+        # An update after the load must reach every worker
+        _publish(state, cameras, versions, flip=True)
+        flipped = _fingerprint(_get(base, PATHS[0])[1])
+        if flipped == expected:
+            raise SystemExit("snapshot update was not picked up")
+        _check_consistent(base, workers, flipped, "updated state")
+        state.close()
+
+        requests = sum(n for n, _ in results)
+        errors = sum(e for _, e in results)
+        return requests / elapsed, errors, seen
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _check_large_state(spots):
+    """
+    Publish `spots` spots (6 per camera) and read them back as a worker
+    that never synced and as one that did, timing both.
+    """
+    tmp = Path(tempfile.mkdtemp(prefix="serve-bench-state-"))
+    try:
+        state = SharedCameraState(tmp / "snapshot")
+        reader = SharedCameraState(tmp / "snapshot")
+        cameras = max(1, spots // 6)
+        versions = {}
+        t0 = time.perf_counter()
+        _publish(state, cameras, versions)
+        per_write = (time.perf_counter() - t0) / cameras
+
+        t0 = time.perf_counter()
+        gen, entries, _ = reader.changes_since(0)
+        full_s = time.perf_counter() - t0
+        if sorted(e["camera_id"] for e in entries) != sorted(versions):
+            raise SystemExit(f"a new reader saw {len(entries)} of {cameras} cameras")
+        del entries  # freeing them would land in the timing below
+
+        with state.locked():
+            state.publish(None, "cam-000", {"timestamp": None, "prev_version": versions["cam-000"], "spots": []})
+        t0 = time.perf_counter()
+        _, entries, _ = reader.changes_since(gen)
+        step_s = time.perf_counter() - t0
+        if [e["camera_id"] for e in entries] != ["cam-000"]:
+            raise SystemExit(f"a synced reader saw {[e['camera_id'] for e in entries]}, expected cam-000")
+        print(f"shared state with {cameras * 6:,} spots: {per_write * 1e3:.2f} ms per camera write, "
+              f"catch-up {full_s * 1e3:.0f} ms from scratch, {step_s * 1e3:.2f} ms for one update: OK")
+        state.close()
+        reader.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve.py throughput vs worker count")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--cameras", type=int, default=20)
+    parser.add_argument("--large-spots", type=int, default=100000)
+    args = parser.parse_args()
+
+    _check_large_state(args.large_spots)
+
+    print(f"{args.clients} client processes, {args.seconds:.0f}s per run, "
+          f"{args.cameras} cameras x 6 spots, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'errors':>7} {'workers seen':>13}")
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        rate, errors, seen = _run(workers, args.clients, args.seconds, args.cameras)
+        baseline = baseline or rate
+        print(f"{workers:>7} {rate:9.1f} {rate / baseline:7.2f}x {errors:>7} {seen:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_spatial_index.py
+#
+# Radius and k-nearest spot queries over 10k-100k synthetic spots:
+# the old scalar-haversine-and-sort scan vs SpotIndex.
+#
+#   cd backend && python -m benchmarks.bench_spatial_index
+
+import math
+import random
+import time
+
+from spatial_index import SpotIndex
+
+CENTER = (40.8098, -73.9600)  # Morningside campus
+SPREAD_DEG = 0.05             # ~5 km box around it
+RADIUS_M = 300
+K = 20
+QUERIES = 50
+
+
+def _scalar_haversine(lat1, lng1, lat2, lng2):
+    """Copy of app.haversine_distance_m (the per-spot path being replaced)."""
+    R = 6371000.0
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2.0) ** 2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _scan(spots, lat, lng, radius=None, k=None):
+    rows = []
+    for key, slat, slng in spots:
+        d = _scalar_haversine(lat, lng, slat, slng)
+        if radius is not None and d > radius:
+            continue
+        rows.append((key, d))
+    rows.sort(key=lambda r: r[1])
+    return rows[:k] if k is not None else rows
+
+
+def _timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def run(n: int) -> None:
+    rng = random.Random(n)
+    spots = [
+        (("cam-%05d" % (i // 6), i % 6),
+         CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+         CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG))
+        for i in range(n)
+    ]
+
+    start = time.perf_counter()
+    index = SpotIndex()
+    for key, lat, lng in spots:
+        index.upsert(key, lat, lng, key)
+    build = time.perf_counter() - start
+
+    queries = [
+        (CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+         CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG))
+        for _ in range(QUERIES)
+    ]
+
+    t_scan_r, want_r = _timed(lambda q: _scan(spots, *q, radius=RADIUS_M), queries)
+    t_idx_r, got_r = _timed(lambda q: index.within(*q, RADIUS_M), queries)
+    t_scan_k, want_k = _timed(lambda q: _scan(spots, *q, k=K), queries)
+    t_idx_k, got_k = _timed(lambda q: index.nearest(*q, K), queries)
+
+    for want, got in zip(want_r + want_k, got_r + got_k):
+        if [key for key, _ in want] != [key for key, _ in got]:
+            raise SystemExit(f"n={n}: index results differ from full scan")
+
+    print(f"n={n:>7,}  build {build * 1e3:7.1f} ms")
+    print(f"    radius {RADIUS_M} m : scan {t_scan_r * 1e3:8.2f} ms   index {t_idx_r * 1e3:7.3f} ms"
+          f"   ({t_scan_r / t_idx_r:,.0f}x, avg {sum(map(len, got_r)) / QUERIES:.0f} hits)")
+    print(f"    k={K} nearest : scan {t_scan_k * 1e3:8.2f} ms   index {t_idx_k * 1e3:7.3f} ms"
+          f"   ({t_scan_k / t_idx_k:,.0f}x)")
+
+
+def main():
+    for n in (10_000, 30_000, 100_000):
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_spot_changes.py
+#
+# Delta sync (/api/spots/changes) against full snapshots, through Flask's
+# test client and the real update_spot_storage path: simulated phones
+# start from /api/spots/current, then poll /api/spots/changes?since=
+# <version> while cameras upload (statuses flip, spots appear and
+# disappear). Reports bytes and server time per poll, delta vs full
+# list; tests/test_spot_changes.py checks that the deltas add up to the
+# full snapshot.
+#
+#   cd backend && python -m benchmarks.bench_spot_changes [--cameras 300]
+#       [--steps 3000] [--phones 20]
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MODEL_RETRAIN_ENABLED", "0")
+os.environ.setdefault("STARTUP_WARMUP", "off")
+os.environ.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+os.environ.setdefault("HISTORY_MODE", "transitions")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+os.environ.setdefault("HISTORY_PATH", os.path.join(tempfile.mkdtemp(prefix="changes-bench-"), "history.db"))
+
+import app as backend  # noqa: E402
+
+SPOTS_PER_CAMERA = 8
+
+
+class Clock:
+    def __init__(self):
+        self.t = datetime(2025, 1, 6, 8, 0)
+
+    def tick(self):
+        self.t += timedelta(seconds=1)
+        return self.t.isoformat() + "Z"
+
+
+def _upload(camera_id, rng, clock, statuses):
+    """One analysis result for camera_id: a few flips, sometimes a spot comes or goes."""
+    spots = statuses.setdefault(camera_id, {i: "empty" for i in range(SPOTS_PER_CAMERA)})
+    for i in list(spots):
+        if rng.random() < 0.15:
+            spots[i] = "occupied" if spots[i] == "empty" else "empty"
+    if rng.random() < 0.05 and len(spots) > 1:
+        del spots[rng.choice(list(spots))]
+    elif rng.random() < 0.05:
+        spots[max(spots) + 1] = "empty"
+    result = {"spots": [{"spot_index": i, "status": st} for i, st in sorted(spots.items())]}
+    backend.update_spot_storage(camera_id, result, clock.tick())
+
+
+def _full(client):
+    resp = client.get("/api/spots/current")
+    body = json.loads(resp.data)
+    state = {s["spotID"]: s["status"] for s in body["spots"]}
+    return body["version"], state, len(resp.data)
+
+
+class Phone:
+    def __init__(self, client):
+        self.client = client
+        self.version, self.state, _ = _full(client)
+        self.resyncs = 0
+
+    def poll(self):
+        resp = self.client.get(f"/api/spots/changes?since={self.version}")
+        body = json.loads(resp.data)
+        size = len(resp.data)
+        if body["resync"]:
+            self.resyncs += 1
+            self.version, self.state, full_size = _full(self.client)
+            return size + full_size
+        for spot in body["changes"]:
+            self.state[spot["spotID"]] = spot["status"]
+        for spot_id in body["removed"]:
+            self.state.pop(spot_id, None)
+        self.version = body["version"]
+        return size
+
+
+def _run(client, cameras, steps, phones, rng):
+    clock, statuses = Clock(), {}
+    for c in range(cameras):
+        _upload(f"cam-{c:04d}", rng, clock, statuses)
+
+    fleet = [Phone(client) for _ in range(phones)]
+    delta_bytes = delta_s = polls = 0
+    for _ in range(steps):
+        for _ in range(rng.randint(0, 3)):
+            _upload(f"cam-{rng.randrange(cameras):04d}", rng, clock, statuses)
+        phone = rng.choice(fleet)
+        t0 = time.perf_counter()
+        delta_bytes += phone.poll()
+        delta_s += time.perf_counter() - t0
+        polls += 1
+
+    # Same polls as full downloads, for comparison
+    t0 = time.perf_counter()
+    full_bytes = sum(_full(client)[2] for _ in range(200))
+    full_s = time.perf_counter() - t0
+
+    resyncs = sum(phone.resyncs for phone in fleet)
+    print(f"{cameras} cameras, {steps} steps, {phones} phones, {resyncs} resyncs")
+    print(f"  delta poll: {delta_bytes / polls:9.0f} bytes  {delta_s / polls * 1e3:7.3f} ms")
+    print(f"  full poll:  {full_bytes / 200:9.0f} bytes  {full_s / 200 * 1e3:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta sync vs full snapshots")
+    parser.add_argument("--cameras", type=int, default=300)
+    parser.add_argument("--steps", type=int, default=3000)
+    parser.add_argument("--phones", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    client = backend.app.test_client()
+    _run(client, args.cameras, args.steps, args.phones, rng)
+    print(f"journal: {backend.CHANGE_JOURNAL.stats()}")
+
+
+if __name__ == "__main__":
+    main()
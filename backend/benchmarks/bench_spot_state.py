@@ -0,0 +1,204 @@
+# benchmarks/bench_spot_state.py
+#
+# Memory and latency of the current-spot state at 100k spots: the old
+# nested dicts (CURRENT_SPOTS[camera_id]["spots"] = [record dicts]) vs
+# spot_state.SpotStateStore. Measures building the state, one camera
+# update, counting empty spots (total and per camera), listing the empty
+# spots as API dicts and listing every spot, and checks both
+# representations return the same answers.
+#
+#   cd backend && python -m benchmarks.bench_spot_state [--spots 100000]
+#       [--per-camera 10]
+
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from spot_state import SpotStateStore
+
+CENTER = (40.8098, -73.9600)
+SPREAD_DEG = 0.05
+
+
+def _make_uploads(spots, per_camera, rng):
+    """[(camera_id, timestamp_iso, records)] like update_spot_storage builds."""
+    t0 = datetime(2025, 1, 6, 8, 0)
+    uploads = []
+    for c in range(spots // per_camera):
+        camera_id = f"cam-{c:05d}"
+        ts = (t0 + timedelta(seconds=c)).isoformat() + "Z"
+        lat0 = CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        lng0 = CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        records = [
+            {
+                "timestamp": ts,
+                "camera_id": camera_id,
+                "spot_index": i,
+                "status": "empty" if rng.random() < 0.3 else "occupied",
+                # A few spots are not calibrated yet
+                "lat": None if i == per_camera - 1 and c % 7 == 0 else lat0 + i * 1e-5,
+                "lng": None if i == per_camera - 1 and c % 7 == 0 else lng0,
+            }
+            for i in range(per_camera)
+        ]
+        uploads.append((camera_id, ts, records))
+    return uploads
+
+
+# -----------------------------
+# Old representation
+# -----------------------------
+def _dict_build(uploads):
+    current = {}
+    for camera_id, ts, records in uploads:
+        current[camera_id] = {"timestamp": ts, "spots": [dict(r) for r in records]}
+    return current
+
+
+def _dict_count_empty(current):
+    return sum(1 for snap in current.values() for r in snap["spots"] if r["status"] == "empty")
+
+
+def _dict_counts_by_camera(current):
+    return {
+        camera_id: sum(1 for r in snap["spots"] if r["status"] == "empty")
+        for camera_id, snap in current.items()
+    }
+
+
+def _dict_list(current, status=None):
+    return [
+        {
+            "spotID": f"{r['camera_id']}-spot-{r['spot_index']}",
+            "lat": r["lat"],
+            "lng": r["lng"],
+            "status": r["status"],
+            "sourceCameraID": r["camera_id"],
+            "lastUpdated": r["timestamp"],
+            "distanceMeters": None,
+        }
+        for snap in current.values()
+        for r in snap["spots"]
+        if status is None or r["status"] == status
+    ]
+
+
+# -----------------------------
+# SpotStateStore
+# -----------------------------
+def _store_build(uploads):
+    store = SpotStateStore()
+    for camera_id, ts, records in uploads:
+        store.update_camera(camera_id, ts, records)
+    return store
+
+
+def _store_list(store, status=None):
+    # As app._nearby_spots builds them, straight from the columns
+    cols = store.columns(store.select(status=status))
+    return [
+        {
+            "spotID": f"{camera_id}-spot-{spot_index}",
+            "lat": lat,
+            "lng": lng,
+            "status": st,
+            "sourceCameraID": camera_id,
+            "lastUpdated": timestamp,
+            "distanceMeters": None,
+        }
+        for camera_id, spot_index, lat, lng, st, timestamp in zip(
+            cols["camera_id"], cols["spot_index"], cols["lat"], cols["lng"], cols["status"], cols["timestamp"],
+        )
+    ]
+
+
+def _measure(build, uploads):
+    # Timed without tracemalloc, which slows every (small) allocation
+    t0 = time.perf_counter()
+    build(uploads)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    state = build(uploads)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return state, elapsed, size
+
+
+def _timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Current spot state: dicts vs columnar store")
+    parser.add_argument("--spots", type=int, default=100_000)
+    parser.add_argument("--per-camera", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    uploads = _make_uploads(args.spots, args.per_camera, rng)
+
+    current, t_dict_build, mem_dict = _measure(_dict_build, uploads)
+    store, t_store_build, mem_store = _measure(_store_build, uploads)
+
+    print(f"{len(store):,} spots on {len(uploads):,} cameras")
+    print(f"{'':<28} {'dicts':>12} {'store':>12}")
+    print(f"{'memory (MB)':<28} {mem_dict / 2**20:12.1f} {mem_store / 2**20:12.1f}"
+          f"   (store arrays {store.memory_bytes() / 2**20:.1f} MB)")
+    print(f"{'build (ms)':<28} {t_dict_build * 1e3:12.1f} {t_store_build * 1e3:12.1f}")
+
+    # One camera reports again: half its spots flip
+    camera_id, _, records = uploads[len(uploads) // 2]
+    ts = datetime(2025, 1, 6, 9, 0).isoformat() + "Z"
+    flipped = [
+        {**r, "timestamp": ts, "status": ("occupied" if r["status"] == "empty" else "empty") if i % 2 else r["status"]}
+        for i, r in enumerate(records)
+    ]
+
+    # Alternating reports, timed in a loop: one update is a few microseconds
+    updates = 1000
+
+    def dict_update():
+        for _ in range(updates):
+            current[camera_id] = {"timestamp": ts, "spots": [dict(r) for r in records]}
+            current[camera_id] = {"timestamp": ts, "spots": [dict(r) for r in flipped]}
+
+    def store_update():
+        for _ in range(updates):
+            store.update_camera(camera_id, ts, records)
+            store.update_camera(camera_id, ts, flipped)
+
+    cases = [
+        ("update one camera", dict_update, store_update, 2 * updates),
+        ("count empty", lambda: _dict_count_empty(current), lambda: store.count("empty"), 1),
+        ("count empty per camera", lambda: _dict_counts_by_camera(current), lambda: store.counts_by_camera("empty"), 1),
+        ("list empty spots", lambda: _dict_list(current, "empty"), lambda: _store_list(store, "empty"), 1),
+        ("list all spots", lambda: _dict_list(current), lambda: _store_list(store), 1),
+    ]
+    for label, dict_fn, store_fn, calls in cases:
+        t_dict, want = _timed(dict_fn, args.repeat)
+        t_store, got = _timed(store_fn, args.repeat)
+        if want != got:
+            raise SystemExit(f"{label}: store result differs from the dict representation")
+        t_dict, t_store = t_dict / calls, t_store / calls
+        print(f"{label + ' (ms)':<28} {t_dict * 1e3:12.3f} {t_store * 1e3:12.3f}   ({t_dict / t_store:5.1f}x)")
+
+    # Growing a camera moves it to a new block; compaction keeps order
+    bigger = flipped + [dict(flipped[0], spot_index=args.per_camera + i) for i in range(3)]
+    store.update_camera(camera_id, ts, bigger)
+    current[camera_id] = {"timestamp": ts, "spots": [dict(r) for r in bigger]}
+    if _store_list(store) != _dict_list(current):
+        raise SystemExit("store order or contents differ after a camera grew")
+    print("parity OK (including a camera that outgrew its block)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+# benchmarks/bench_spot_stream.py
+#
+# Load test of /api/spots/stream: app.py served by werkzeug in this
+# process (threaded, one thread per stream), with --subscribers SSE
+# clients on raw sockets read by a single selector thread. Most phones
+# subscribe to a circle around one of --regions points (so many share a
+# region), some to a few cameras and a few to every spot; then cameras
+# upload through update_spot_storage. Checks that
+#   - each subscriber's state, built only from its stream, equals the
+#     current spots in its region
+#   - idle streams get heartbeats
+#   - a stream that stops draining (a stuck client) is dropped once its
+#     queue is full, and never holds more than the queue limit
+# and reports fan-out latency (upload to frame received) and frames
+# serialized vs delivered per change event.
+#
+#   cd backend && python -m benchmarks.bench_spot_stream [--subscribers 2000]
+#       [--uploads 300] [--rate 50] [--regions 40] [--cameras 100]
+
+import argparse
+import json
+import os
+import random
+import selectors
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MODEL_RETRAIN_ENABLED", "0")
+os.environ.setdefault("STARTUP_WARMUP", "off")
+os.environ.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+os.environ.setdefault("HISTORY_MODE", "transitions")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+os.environ.setdefault("HISTORY_PATH", os.path.join(tempfile.mkdtemp(prefix="stream-bench-"), "history.db"))
+os.environ.setdefault("STREAM_HEARTBEAT_S", "1")
+os.environ.setdefault("STREAM_MAX_SUBSCRIBERS", "100000")
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import app as backend  # noqa: E402
+from spot_stream import Region  # noqa: E402
+
+CENTER = (40.8098, -73.9600)
+SPOTS_PER_CAMERA = 8
+RADIUS_M = 400
+
+
+class Clock:
+    def __init__(self):
+        self.t = datetime(2025, 1, 6, 8, 0)
+
+    def tick(self):
+        self.t += timedelta(seconds=1)
+        return self.t.isoformat() + "Z"
+
+
+def _place_cameras(cameras, rng):
+    """SPOT_COORDS for every camera; every tenth camera is not calibrated."""
+    for c in range(cameras):
+        if c % 10 == 0:
+            continue
+        lat0 = CENTER[0] + rng.uniform(-0.01, 0.01)
+        lng0 = CENTER[1] + rng.uniform(-0.01, 0.01)
+        for i in range(SPOTS_PER_CAMERA * 2):
+            backend.SPOT_COORDS[(f"cam-{c:04d}", i)] = (lat0 + i * 1e-5, lng0)
+
+
+def _upload(camera_id, rng, clock, statuses):
+    """One analysis result for camera_id: a few flips, sometimes a spot comes or goes."""
+    spots = statuses.setdefault(camera_id, {i: "empty" for i in range(SPOTS_PER_CAMERA)})
+    for i in list(spots):
+        if rng.random() < 0.15:
+            spots[i] = "occupied" if spots[i] == "empty" else "empty"
+    if rng.random() < 0.05 and len(spots) > 1:
+        del spots[rng.choice(list(spots))]
+    elif rng.random() < 0.05 and max(spots) + 1 < SPOTS_PER_CAMERA * 2:
+        spots[max(spots) + 1] = "empty"
+    result = {"spots": [{"spot_index": i, "status": st} for i, st in sorted(spots.items())]}
+    backend.update_spot_storage(camera_id, result, clock.tick())
+
+
+# -----------------------------
+# SSE clients
+# -----------------------------
+class Client:
+    """One subscriber: its region, and the state rebuilt from its frames."""
+
+    def __init__(self, sock, region):
+        self.sock = sock
+        self.region = region
+        self.raw = b""
+        self.headers_done = False
+        self.chunked = False
+        self.body = b""
+        self.hello = False
+        self.closed = False
+        self.state = {}
+        self.pings = 0
+        self.resyncs = 0
+        self.received = []  # (version, monotonic time)
+
+    def feed(self, data, now):
+        self.raw += data
+        if not self.headers_done:
+            head, sep, rest = self.raw.partition(b"\r\n\r\n")
+            if not sep:
+                return
+            status_line = head.split(b"\r\n", 1)[0]
+            if b" 200 " not in status_line:
+                raise SystemExit(f"stream refused: {status_line.decode()}")
+            self.chunked = b"transfer-encoding: chunked" in head.lower()
+            self.headers_done, self.raw = True, rest
+
+        if self.chunked:
+            while True:
+                size_line, sep, rest = self.raw.partition(b"\r\n")
+                if not sep:
+                    break
+                size = int(size_line.split(b";")[0], 16)
+                if len(rest) < size + 2:
+                    break
+                self.body += rest[:size]
+                self.raw = rest[size + 2:]
+        else:
+            self.body, self.raw = self.body + self.raw, b""
+
+        while b"\n\n" in self.body:
+            frame, self.body = self.body.split(b"\n\n", 1)
+            self._frame(frame.decode("utf-8"), now)
+
+    def _frame(self, frame, now):
+        if frame.startswith(":"):
+            self.pings += 1
+            return
+        fields = dict(line.split(": ", 1) for line in frame.split("\n") if ": " in line)
+        event = fields.get("event")
+        if event == "hello":
+            self.hello = True
+        elif event == "resync":
+            self.resyncs += 1
+        elif event == "spots":
+            body = json.loads(fields["data"])
+            for spot in body["changes"]:
+                self.state[spot["spotID"]] = spot["status"]
+            for spot_id in body["removed"]:
+                self.state.pop(spot_id, None)
+            self.received.append((body["version"], now))
+
+
+def _reader(selector, stop):
+    while not stop.is_set():
+        for key, _ in selector.select(timeout=0.1):
+            client = key.data
+            try:
+                data = client.sock.recv(65536)
+            except BlockingIOError:
+                continue
+            if not data:
+                client.closed = True
+                selector.unregister(client.sock)
+                continue
+            client.feed(data, time.perf_counter())
+
+
+def _subscribe(port, path):
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n".encode())
+    sock.setblocking(False)
+    return sock
+
+
+def _make_clients(n, regions, cameras, rng):
+    """[(path, Region)]: circles around region points, camera sets, everything."""
+    out = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.85:
+            lat, lng = rng.choice(regions)
+            out.append((f"/api/spots/stream?lat={lat}&lng={lng}&radius={RADIUS_M}",
+                        Region(None, lat, lng, float(RADIUS_M))))
+        elif kind < 0.98:
+            chosen = sorted(f"cam-{c:04d}" for c in rng.sample(range(cameras), 3))
+            out.append((f"/api/spots/stream?cameras={','.join(chosen)}", Region(chosen)))
+        else:
+            out.append(("/api/spots/stream", Region()))
+    return out
+
+
+def _truth(region):
+    cols = backend.SPOT_STATE.columns(backend.SPOT_STATE.select())
+    return {
+        f"{camera_id}-spot-{spot_index}": status
+        for camera_id, spot_index, lat, lng, status in zip(
+            cols["camera_id"], cols["spot_index"], cols["lat"], cols["lng"], cols["status"],
+        )
+        if region.matches(camera_id, lat, lng)
+    }
+
+
+def _wait_quiet(clients, quiet_s=0.5, timeout_s=60.0):
+    """Until the dispatcher is idle and no client received anything for quiet_s."""
+    deadline = time.monotonic() + timeout_s
+    last = None
+    while time.monotonic() < deadline:
+        seen = sum(len(c.received) for c in clients)
+        if backend.SPOT_STREAM.stats()["pending_events"] == 0 and seen == last:
+            return
+        last = seen
+        time.sleep(quiet_s)
+    raise SystemExit("streams did not settle")
+
+
+def _check_stuck_consumer():
+    """
+    A subscriber whose stream thread stops draining it (as when the
+    client stops reading and the socket fills up) is cut off at its limit.
+    """
+    stream = backend.SPOT_STREAM
+    sub = stream.subscribe(Region())
+    rng, clock, statuses = random.Random(2), Clock(), {}
+    clock.t += timedelta(days=1)
+    for _ in range(stream.max_queued * 4):
+        _upload(f"cam-{rng.randrange(50):04d}", rng, clock, statuses)
+        frames, size = sub.queued()
+        if frames > stream.max_queued or size > stream.max_queued_bytes:
+            raise SystemExit(f"stuck subscriber holds {frames} frames / {size} bytes")
+    deadline = time.monotonic() + 10
+    while not sub.closed and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if not sub.closed or sub.queued()[0] != 1:
+        raise SystemExit("a stuck subscriber was not dropped with a resync frame")
+    print(f"stuck subscriber dropped after {stream.max_queued} queued frames: OK")
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE push stream load test")
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--uploads", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=50.0, help="camera uploads per second")
+    parser.add_argument("--regions", type=int, default=40, help="distinct circle centers")
+    parser.add_argument("--cameras", type=int, default=100)
+    args = parser.parse_args()
+
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, min(hard, 4 * args.subscribers + 256)), hard))
+    except (ImportError, ValueError):
+        pass
+
+    rng = random.Random(0)
+    _place_cameras(args.cameras, rng)
+    regions = [
+        (round(CENTER[0] + rng.uniform(-0.008, 0.008), 4), round(CENTER[1] + rng.uniform(-0.008, 0.008), 4))
+        for _ in range(args.regions)
+    ]
+
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+
+    selector, stop = selectors.DefaultSelector(), threading.Event()
+    reader = threading.Thread(target=_reader, args=(selector, stop), name="bench-reader", daemon=True)
+    reader.start()
+
+    # Connect in batches (the listen backlog is small), each batch fully
+    # subscribed before the next
+    clients = []
+    t0 = time.perf_counter()
+    specs = _make_clients(args.subscribers, regions, args.cameras, rng)
+    for start in range(0, len(specs), 100):
+        batch = []
+        for path, region in specs[start:start + 100]:
+            client = Client(_subscribe(server.server_port, path), region)
+            selector.register(client.sock, selectors.EVENT_READ, client)
+            batch.append(client)
+        deadline = time.monotonic() + 30
+        while not all(c.hello for c in batch):
+            if time.monotonic() > deadline:
+                raise SystemExit("subscribers did not get their hello event")
+            time.sleep(0.01)
+        clients += batch
+    print(f"{len(clients)} subscribers connected in {time.perf_counter() - t0:.1f} s, "
+          f"{backend.SPOT_STREAM.stats()['regions']} distinct regions")
+
+    # Uploads: every camera once, then random ones at --rate
+    clock, statuses = Clock(), {}
+    sent_at = {}
+    order = [f"cam-{c:04d}" for c in range(args.cameras)]
+    order += [f"cam-{rng.randrange(args.cameras):04d}" for _ in range(args.uploads)]
+    t0 = time.perf_counter()
+    for n, camera_id in enumerate(order):
+        t_upload = time.perf_counter()
+        before = backend.CHANGE_JOURNAL.version
+        _upload(camera_id, rng, clock, statuses)
+        if backend.CHANGE_JOURNAL.version != before:
+            sent_at[backend.CHANGE_JOURNAL.version] = t_upload
+        time.sleep(max(0.0, t0 + (n + 1) / args.rate - time.perf_counter()))
+    _wait_quiet(clients)
+
+    for client in clients:
+        if client.closed or client.resyncs:
+            raise SystemExit("a subscriber was dropped during the load test")
+        if client.state != _truth(client.region):
+            raise SystemExit(f"{client.region.key}: streamed state differs from the current spots")
+    print(f"{len(order)} uploads at {args.rate:.0f}/s: every subscriber's streamed state matches its region")
+
+    latencies = [t - sent_at[v] for c in clients for v, t in c.received if v in sent_at]
+    stats = backend.SPOT_STREAM.stats()
+    print(f"  fan-out latency: p50 {_percentile(latencies, 50) * 1e3:7.1f} ms  "
+          f"p99 {_percentile(latencies, 99) * 1e3:7.1f} ms  max {max(latencies) * 1e3:7.1f} ms")
+    print(f"  per change event: {stats['frames_encoded'] / stats['events']:6.1f} frames serialized, "
+          f"{stats['delivered'] / stats['events']:8.1f} delivered")
+
+    pings = [c.pings for c in clients]
+    time.sleep(backend.STREAM_HEARTBEAT_S * 2.5)
+    missed = sum(1 for c, before in zip(clients, pings) if c.pings == before)
+    if missed:
+        raise SystemExit(f"{missed} idle subscribers got no heartbeat")
+    print(f"heartbeats every {backend.STREAM_HEARTBEAT_S:g} s on idle streams: OK")
+
+    _check_stuck_consumer()
+
+    # The reader must be out of select()/recv() before its sockets close
+    stop.set()
+    reader.join()
+    for client in clients:
+        client.sock.close()
+    selector.close()
+    server.shutdown()
+    print(f"stream stats: {backend.SPOT_STREAM.stats()}")
+
+
+if __name__ == "__main__":
+    main()
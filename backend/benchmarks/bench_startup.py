@@ -0,0 +1,158 @@
+# benchmarks/bench_startup.py
+#
+# Startup cost of the backend, each case in a fresh interpreter:
+#   before - what importing app.py used to pay up front: import openai and
+#            build the client, unpickle the RandomForest and score the
+#            time-of-week table
+#   lazy   - import app with STARTUP_WARMUP=off, then the first forecast
+#   eager  - import app with STARTUP_WARMUP=eager (everything loaded)
+# and per-worker memory for N workers forked from an eager master
+# (RSS and PSS; PSS splits shared pages, such as the memory-mapped
+# table.npy, between the processes that map them).
+#
+#   cd backend && python -m benchmarks.bench_startup [--workers 4]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def _mem_kb():
+    """(rss_kb, pss_kb) of this process, from /proc (Linux)."""
+    rss = pss = None
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        import resource
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss, pss
+
+
+# -----------------------------
+# Child side (one case per interpreter)
+# -----------------------------
+def _child_before():
+    t0 = time.perf_counter()
+    import joblib
+    from openai import OpenAI
+
+    from forecast_engine import ProbabilityTable
+
+    OpenAI()
+    model = joblib.load(BACKEND_DIR / "parking_forecast_model.joblib")
+    ProbabilityTable.from_model(model)
+    import_s = time.perf_counter() - t0
+    return {"import_s": import_s, "rss_kb": _mem_kb()[0]}
+
+
+def _child_app(warmup):
+    os.environ["STARTUP_WARMUP"] = warmup
+    t0 = time.perf_counter()
+    import app  # noqa: F401
+    import_s = time.perf_counter() - t0
+    rss_import = _mem_kb()[0]
+
+    import predictor
+
+    t0 = time.perf_counter()
+    predictor.predict_empty_probability(0, 6, 10.0)
+    first_s = time.perf_counter() - t0
+    return {"import_s": import_s, "rss_kb": rss_import, "first_forecast_s": first_s, "rss_after_kb": _mem_kb()[0]}
+
+
+def _child_fork(workers):
+    os.environ["STARTUP_WARMUP"] = "eager"
+    import app  # noqa: F401
+    import predictor
+
+    results = []
+    for _ in range(workers):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            # Touch the whole table the way requests would
+            predictor.availability_curve(7 * 24 * 60)
+            time.sleep(0.5)  # let siblings map it too before measuring
+            rss, pss = _mem_kb()
+            os.write(w, json.dumps({"rss_kb": rss, "pss_kb": pss}).encode())
+            os._exit(0)
+        os.close(w)
+        results.append((pid, r))
+
+    out = []
+    for pid, r in results:
+        with os.fdopen(r) as f:
+            out.append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+    return {"workers": out, "master_rss_kb": _mem_kb()[0]}
+
+
+def _run_child(args):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-bench-not-used")
+    env["MODEL_RETRAIN_ENABLED"] = "0"
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", *args],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"child {args} failed:\n{proc.stderr[-2000:]}")
+    # app.py and its background threads print too; pick out our line
+    line = next(l for l in reversed(proc.stdout.splitlines()) if l.startswith(RESULT_PREFIX))
+    return json.loads(line[len(RESULT_PREFIX):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend startup time and memory")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode = args.child[0]
+        if mode == "before":
+            result = _child_before()
+        elif mode == "fork":
+            result = _child_fork(int(args.child[1]))
+        else:
+            result = _child_app(mode)
+        print(RESULT_PREFIX + json.dumps(result), flush=True)
+        return
+
+    # Make sure the table cache exists so "lazy"/"eager" measure steady state
+    _run_child(["eager"])
+
+    before = _run_child(["before"])
+    lazy = _run_child(["off"])
+    eager = _run_child(["eager"])
+
+    print(f"{'case':<32} {'import s':>9} {'RSS MB':>8}")
+    print(f"{'before (openai + forest + table)':<32} {before['import_s']:9.3f} {before['rss_kb'] / 1024:8.1f}")
+    print(f"{'lazy: import app':<32} {lazy['import_s']:9.3f} {lazy['rss_kb'] / 1024:8.1f}")
+    print(f"{'lazy: + first forecast':<32} {lazy['first_forecast_s']:9.3f} {lazy['rss_after_kb'] / 1024:8.1f}")
+    print(f"{'eager: import app':<32} {eager['import_s']:9.3f} {eager['rss_kb'] / 1024:8.1f}")
+
+    fork = _run_child(["fork", str(args.workers)])
+    print()
+    print(f"{args.workers} forked workers (master RSS {fork['master_rss_kb'] / 1024:.1f} MB):")
+    for i, w in enumerate(fork["workers"]):
+        pss = f"{w['pss_kb'] / 1024:.1f}" if w["pss_kb"] is not None else "n/a"
+        print(f"  worker {i}: RSS {w['rss_kb'] / 1024:6.1f} MB   PSS {pss:>6} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_wait_curve.py
+#
+# Compares the old minute-by-minute expected_wait_minutes loop
+# (one RandomForest call per minute) against the batched
+# availability curve, at max_wait=60 and max_wait=1440.
+#
+#   cd backend && python -m benchmarks.bench_wait_curve
+
+import time
+from datetime import datetime
+
+import predictor
+from forecast_engine import first_crossing
+
+TARGETS = (0.5, 0.8, 0.9, 0.95)
+
+
+def _loop_wait(now: datetime, target_confidence: float, max_wait: int) -> float:
+    """The original implementation: scan w = 0..max_wait with the model."""
+    for w in range(0, max_wait + 1):
+        X = predictor._arrival_features(w, now)
+        p = float(max(0.0, min(1.0, predictor.active_model().model.predict_proba(X)[0][1])))
+        if p >= target_confidence:
+            return float(w)
+    return float(max_wait)
+
+
+def _curve_wait(now: datetime, target_confidence, max_wait: int):
+    curve = predictor.availability_curve(max_wait, now=now)
+    return first_crossing(curve, target_confidence, default=float(max_wait))
+
+
+def main():
+    # Mornings, midday and late evening on a few weekdays, so some
+    # queries cross quickly and others scan most of the horizon.
+    nows = [datetime(2025, 12, d, h, 0) for d in (1, 3, 7) for h in (8, 13, 22)]
+
+    for max_wait in (60, 1440):
+        # Parity: every (now, target) answered identically.
+        for now in nows:
+            curve_answers = _curve_wait(now, list(TARGETS), max_wait)
+            for target, got in zip(TARGETS, curve_answers):
+                want = _loop_wait(now, target, max_wait)
+                if want != got:
+                    raise SystemExit(
+                        f"mismatch at {now} target={target} max_wait={max_wait}: "
+                        f"loop={want} curve={got}"
+                    )
+
+        loop_nows = nows[:3] if max_wait > 60 else nows
+        start = time.perf_counter()
+        for now in loop_nows:
+            for target in TARGETS:
+                _loop_wait(now, target, max_wait)
+        t_loop = (time.perf_counter() - start) / (len(loop_nows) * len(TARGETS))
+
+        reps = 200
+        start = time.perf_counter()
+        for _ in range(reps):
+            for now in nows:
+                _curve_wait(now, list(TARGETS), max_wait)
+        t_curve = (time.perf_counter() - start) / (reps * len(nows))
+
+        print(
+            f"max_wait={max_wait:5d}: loop {t_loop * 1e3:10.2f} ms per target   "
+            f"curve {t_curve * 1e6:8.1f} us for all {len(TARGETS)} targets"
+        )
+
+
+if __name__ == "__main__":
+    main()
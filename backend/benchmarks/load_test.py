@@ -0,0 +1,359 @@
+# benchmarks/load_test.py
+#
+# End-to-end load test of the Flask app, offline: the app runs in a
+# subprocess (werkzeug, threaded, like `python app.py`) with
+# analyze_parking_image replaced by a stub that sleeps like an OpenAI
+# round-trip and returns random spot statuses. Meanwhile, in this
+# process:
+#   - N simulated ESP32 cameras POST JPEGs to /api/camera/upload, each at
+#     --camera-rate uploads per second
+#   - M simulated phones poll /api/spots/current and /api/spots/forecast
+#     from their own location, --phone-interval seconds apart
+# For each endpoint it reports throughput, errors and p50/p95/p99/max
+# latency (after --warmup seconds), plus the server's pipeline counters,
+# and writes everything as JSON (--out) so runs can be compared
+# (--compare an earlier file).
+#
+#   cd backend && python -m benchmarks.load_test [--cameras 20]
+#       [--camera-rate 0.5] [--phones 50] [--seconds 30]
+#       [--out load_test.json] [--compare previous.json]
+
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+CENTER = (40.8098, -73.9600)
+ENDPOINTS = ("upload", "current", "forecast")
+
+
+# -----------------------------
+# Server side (--serve, in the subprocess)
+# -----------------------------
+def _stub_analyzer(latency_s, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def analyze_parking_image(image_path, num_spots=6, llm_client=None, camera_id=None):
+        with lock:
+            delay = latency_s * rng.uniform(0.5, 1.5)
+            statuses = [rng.choice(["empty", "occupied"]) for _ in range(num_spots)]
+        time.sleep(delay)
+        spots = [{"spot_index": i, "status": status} for i, status in enumerate(statuses)]
+        return {
+            "total_spots": num_spots,
+            "empty_spots": statuses.count("empty"),
+            "spots": spots,
+            "file": image_path,
+        }
+
+    return analyze_parking_image
+
+
+def _serve(args):
+    from werkzeug.serving import make_server
+
+    import app as backend
+
+    backend.analyze_parking_image = _stub_analyzer(args.llm_latency_ms / 1000.0, args.seed)
+    # Place the cameras' spots around CENTER so location queries find them
+    rng = random.Random(args.seed)
+    for c in range(args.cameras):
+        lat0 = CENTER[0] + rng.uniform(-0.005, 0.005)
+        lng0 = CENTER[1] + rng.uniform(-0.005, 0.005)
+        for i in range(backend.num_spots_for(f"cam-{c:03d}")):
+            backend.SPOT_COORDS[(f"cam-{c:03d}", i)] = (lat0 + i * 1e-5, lng0)
+
+    server = make_server("127.0.0.1", args.port, backend.app, threaded=True)
+    server.serve_forever()
+
+
+# -----------------------------
+# Clients (this process)
+# -----------------------------
+class Recorder:
+    """Per-endpoint (start time, latency, ok) samples from every client thread; ok is a 2xx/3xx."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {name: [] for name in ENDPOINTS}
+        self.status_codes = {name: {} for name in ENDPOINTS}
+
+    def add(self, endpoint, started, latency, status):
+        with self._lock:
+            self.samples[endpoint].append((started, latency, status is not None and status < 400))
+            key = str(status) if status is not None else "error"
+            codes = self.status_codes[endpoint]
+            codes[key] = codes.get(key, 0) + 1
+
+
+def _request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    resp.read()
+    return resp.status
+
+
+def _client_loop(port, stop, recorder, endpoint_for, interval_s, first_delay_s, rng):
+    """One client: a keep-alive connection, reopened after errors."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    next_at = time.perf_counter() + first_delay_s
+    while not stop.is_set():
+        delay = next_at - time.perf_counter()
+        if delay > 0 and stop.wait(delay):
+            break
+        endpoint, method, path, body, headers = endpoint_for()
+        started = time.perf_counter()
+        try:
+            status = _request(conn, method, path, body, headers)
+        except (OSError, http.client.HTTPException):
+            status = None
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        recorder.add(endpoint, started, time.perf_counter() - started, status)
+        if endpoint == "upload":
+            # Cameras keep their schedule (open loop) however slow the server is
+            next_at = max(next_at + interval_s, time.perf_counter())
+        else:
+            # Phones wait a think time after each answer
+            next_at = time.perf_counter() + interval_s * rng.uniform(0.5, 1.5)
+    conn.close()
+
+
+def _jpeg_frames(count, rng):
+    """A few distinct small JPEGs (random blocks on gray), like a 320x240 ESP32 frame."""
+    from PIL import Image, ImageDraw
+
+    frames = []
+    for _ in range(count):
+        img = Image.new("RGB", (320, 240), (128, 128, 128))
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x, y = rng.randrange(300), rng.randrange(220)
+            draw.rectangle([x, y, x + 40, y + 30], fill=tuple(rng.randrange(256) for _ in range(3)))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=80)
+        frames.append(buf.getvalue())
+    return frames
+
+
+def _camera(c, frames, rng):
+    camera_id = f"cam-{c:03d}"
+
+    def next_request():
+        return ("upload", "POST", f"/api/camera/upload?camera_id={camera_id}", rng.choice(frames),
+                {"Content-Type": "image/jpeg"})
+
+    return next_request
+
+
+def _phone(rng):
+    lat = CENTER[0] + rng.uniform(-0.005, 0.005)
+    lng = CENTER[1] + rng.uniform(-0.005, 0.005)
+
+    def next_request():
+        if rng.random() < 0.5:
+            return "current", "GET", f"/api/spots/current?lat={lat:.6f}&lng={lng:.6f}&k=20", None, None
+        return "forecast", "GET", f"/api/spots/forecast?lat={lat:.6f}&lng={lng:.6f}&k=20", None, None
+
+    return next_request
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get_json(port, path, timeout=5.0):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def _wait_ready(port, proc, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"app server exited with {proc.returncode}")
+        try:
+            if _get_json(port, "/ready", timeout=2.0)[0] == 200:
+                return
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        time.sleep(0.2)
+    raise SystemExit("app server did not become ready")
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values)))]
+
+
+def _summarize(recorder, measure_from, measure_s):
+    out = {}
+    for endpoint in ENDPOINTS:
+        samples = [(lat, ok) for started, lat, ok in recorder.samples[endpoint] if started >= measure_from]
+        latencies = sorted(lat * 1e3 for lat, ok in samples if ok)
+        out[endpoint] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, ok in samples if not ok),
+            "throughput_rps": len(samples) / measure_s if measure_s > 0 else None,
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+            "max_ms": latencies[-1] if latencies else None,
+            "status_codes": recorder.status_codes[endpoint],
+        }
+    return out
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _print_table(endpoints, baseline=None):
+    print(f"{'endpoint':<10} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, row in endpoints.items():
+        cells = [row["throughput_rps"], row["p50_ms"], row["p95_ms"], row["p99_ms"], row["max_ms"]]
+        text = [f"{v:8.1f}" if v is not None else f"{'-':>8}" for v in cells]
+        print(f"{endpoint:<10} {text[0]} {row['errors']:7d} {' '.join(text[1:])}")
+        if baseline and endpoint in baseline:
+            old = baseline[endpoint]
+            deltas = []
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                if row[key] and old.get(key):
+                    deltas.append(f"{key} {100.0 * (row[key] - old[key]) / old[key]:+.1f}%")
+            print(f"{'':<10} vs baseline: {', '.join(deltas) or 'n/a'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test with a stubbed LLM")
+    parser.add_argument("--cameras", type=int, default=20)
+    parser.add_argument("--camera-rate", type=float, default=0.5, help="uploads per second per camera")
+    parser.add_argument("--phones", type=int, default=50)
+    parser.add_argument("--phone-interval", type=float, default=0.2, help="seconds between a phone's polls")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="mean stub analysis time")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds left out of the results")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="load_test.json", help="JSON results file")
+    parser.add_argument("--compare", default=None, help="earlier --out file to compare against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args)
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["endpoints"]
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    port = _free_port()
+    env = dict(os.environ)
+    env.setdefault("MODEL_RETRAIN_ENABLED", "0")
+    env.setdefault("STARTUP_WARMUP", "eager")
+    env.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+    env.setdefault("OPENAI_API_KEY", "sk-load-test-not-used")
+    env.setdefault("HISTORY_PATH", os.path.join(workdir, "history.db"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")]))
+
+    # Uploads are saved to captures/ under the working directory
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.load_test", "--serve", "--port", str(port),
+             "--cameras", str(args.cameras), "--llm-latency-ms", str(args.llm_latency_ms),
+             "--seed", str(args.seed)],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        _wait_ready(port, proc)
+
+        rng = random.Random(args.seed)
+        frames = _jpeg_frames(8, rng)
+        recorder = Recorder()
+        stop = threading.Event()
+        threads = []
+        camera_interval = 1.0 / args.camera_rate if args.camera_rate > 0 else None
+        for c in range(args.cameras if camera_interval else 0):
+            client_rng = random.Random(rng.random())
+            threads.append(threading.Thread(
+                target=_client_loop,
+                args=(port, stop, recorder, _camera(c, frames, client_rng), camera_interval,
+                      client_rng.uniform(0, camera_interval), client_rng),
+                daemon=True,
+            ))
+        for _ in range(args.phones):
+            client_rng = random.Random(rng.random())
+            threads.append(threading.Thread(
+                target=_client_loop,
+                args=(port, stop, recorder, _phone(client_rng), args.phone_interval,
+                      client_rng.uniform(0, args.phone_interval), client_rng),
+                daemon=True,
+            ))
+
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(args.warmup + args.seconds)
+        stop.set()
+        for t in threads:
+            t.join(35)
+
+        endpoints = _summarize(recorder, started + args.warmup, args.seconds)
+        _, pipeline = _get_json(port, "/api/camera/pipeline")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+    results = {
+        "started": datetime.utcnow().isoformat() + "Z",
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("serve", "port", "out", "compare")},
+        "endpoints": endpoints,
+        "server": pipeline,
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{args.cameras} cameras at {args.camera_rate:g}/s, {args.phones} phones every "
+          f"~{args.phone_interval:g} s, stub LLM ~{args.llm_latency_ms:.0f} ms, {args.seconds:g} s measured")
+    _print_table(endpoints, baseline)
+    print(f"analysis: completed {pipeline.get('completed')}, dropped as stale {pipeline.get('dropped_stale')}, "
+          f"rejected {pipeline.get('rejected_full')}")
+    print(f"results written to {args.out} (server log: {log_path})")
+
+
+if __name__ == "__main__":
+    main()
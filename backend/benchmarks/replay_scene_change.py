@@ -0,0 +1,92 @@
+# benchmarks/replay_scene_change.py
+#
+# Offline replay of saved captures through SceneChangeDetector.
+# Reports how many LLM calls would have been avoided per camera.
+# No API calls are made; every frame that would go to the LLM is just
+# counted and recorded with a placeholder result.
+#
+#   cd backend && python -m benchmarks.replay_scene_change [captures_dir]
+#       [--threshold 8.0] [--max-reuse-s 300]
+
+import argparse
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from llm_processor import num_spots_for
+from scene_change import SceneChangeDetector
+
+
+def _parse_capture_name(path: Path):
+    """
+    captures/<camera_id>_<YYYYmmdd_HHMMSS>.jpg, as written by camera_upload.
+    """
+    camera_id, date_part, time_part = path.stem.rsplit("_", 2)
+    ts = datetime.strptime(f"{date_part}_{time_part}", "%Y%m%d_%H%M%S")
+    return camera_id, ts.timestamp()
+
+
+def load_captures(captures_dir):
+    """
+    (ts, camera_id, path) of every capture in captures_dir, oldest first.
+    """
+    frames = []
+    for path in Path(captures_dir).glob("*.jpg"):
+        try:
+            camera_id, ts = _parse_capture_name(path)
+        except ValueError:
+            continue
+        frames.append((ts, camera_id, path))
+    frames.sort()
+    return frames
+
+
+def replay(frames, detector):
+    """
+    Feed frames through detector; per camera, how many frames it saw and
+    how many would have gone to the LLM.
+    """
+    per_camera = defaultdict(lambda: {"frames": 0, "llm_calls": 0})
+    for ts, camera_id, path in frames:
+        per_camera[camera_id]["frames"] += 1
+        if detector.reuse_result(camera_id, str(path), now=ts) is None:
+            per_camera[camera_id]["llm_calls"] += 1
+            detector.record(camera_id, str(path), {"spots": []}, now=ts)
+    return dict(per_camera)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captures through SceneChangeDetector")
+    parser.add_argument("captures_dir", nargs="?", default="captures")
+    parser.add_argument("--threshold", type=float, default=8.0)
+    parser.add_argument("--max-reuse-s", type=float, default=300.0)
+    args = parser.parse_args()
+
+    frames = load_captures(args.captures_dir)
+    if not frames:
+        raise SystemExit(f"No captures found in {args.captures_dir}")
+
+    detector = SceneChangeDetector(
+        region_threshold=args.threshold,
+        max_reuse_s=args.max_reuse_s,
+        spot_count=num_spots_for,
+    )
+
+    start = time.perf_counter()
+    per_camera = replay(frames, detector)
+    elapsed = time.perf_counter() - start
+
+    for camera_id, c in sorted(per_camera.items()):
+        avoided = c["frames"] - c["llm_calls"]
+        print(f"{camera_id}: {c['frames']} frames, {c['llm_calls']} LLM calls, "
+              f"{avoided} avoided ({avoided / c['frames']:.0%})")
+
+    stats = detector.stats()
+    print(f"total: {stats['frames']} frames, {stats['skipped']} LLM calls avoided "
+          f"(skip rate {stats['skip_rate']:.0%}, {stats['forced_refresh']} forced refreshes)")
+    print(f"detector cost: {elapsed / len(frames) * 1e3:.2f} ms per frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# change_journal.py
+#
+# Bounded in-memory journal of spot status changes, for delta sync:
+# a client holding the state at version v asks for the changes after v
+# (/api/spots/changes?since=v) instead of re-downloading every spot.
+#
+# Each entry is the spot's absolute state after the change (or a removal),
+# stamped with the version of the update that caused it, so replaying a
+# superset of the changes is harmless. since() keeps only the latest entry
+# per spot. Once the journal is full the oldest entries are dropped and
+# `floor` rises; clients behind the floor (or ahead of `version`, e.g.
+# after a restart) must resync from a full snapshot.
+#
+# Versions only have to increase. app.py uses its own counter in a single
+# process and the shared snapshot generation under serve.py, so every
+# worker answers with the same versions.
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_MAX_CHANGES = 100_000
+
+# (version, camera_id, spot_index, status, lat, lng, timestamp); status is
+# None for a spot the camera no longer reports
+Change = Tuple[int, str, Any, Any, Any, Any, Optional[str]]
+
+
+class ChangeJournal:
+    def __init__(self, max_changes: int = DEFAULT_MAX_CHANGES):
+        self.max_changes = max(1, int(max_changes))
+        self._lock = threading.Lock()
+        self._entries: "deque[Change]" = deque()
+        self.version = 0
+        self.floor = 0
+        # camera_id -> version of its last recorded update
+        self._camera_versions: Dict[str, int] = {}
+        self._counters = {"recorded": 0, "dropped": 0, "queries": 0, "resyncs": 0}
+
+    def camera_version(self, camera_id: str) -> Optional[int]:
+        return self._camera_versions.get(camera_id)
+
+    def record(
+        self,
+        version: Optional[int],
+        camera_id: str,
+        changes: Iterable[Tuple[Any, Any, Any, Any, Optional[str]]],
+    ) -> int:
+        """
+        Record camera_id's changed spots, as (spot_index, status, lat, lng,
+        timestamp), at `version` (None: the next version). Returns it.
+        """
+        with self._lock:
+            if version is None:
+                version = self.version + 1
+            for spot_index, status, lat, lng, timestamp in changes:
+                self._entries.append((version, camera_id, spot_index, status, lat, lng, timestamp))
+                self._counters["recorded"] += 1
+            while len(self._entries) > self.max_changes:
+                dropped = self._entries.popleft()
+                self.floor = max(self.floor, dropped[0])
+                self._counters["dropped"] += 1
+            self._camera_versions[camera_id] = max(version, self._camera_versions.get(camera_id, 0))
+            self.version = max(self.version, version)
+            return version
+
+    def observe(self, version: int) -> None:
+        """The state is now at `version` (e.g. a write that changed no spot)."""
+        with self._lock:
+            self.version = max(self.version, version)
+
+    def since(self, version: int) -> Optional[Tuple[int, List[Change]]]:
+        """
+        (latest version, changes after `version`, latest per spot, oldest
+        first), or None if the client must resync.
+        """
+        with self._lock:
+            self._counters["queries"] += 1
+            if version < self.floor or version > self.version:
+                self._counters["resyncs"] += 1
+                return None
+
+            latest: Dict[Tuple[str, Any], Change] = {}
+            # Newest first, stopping at the first entry the client has seen
+            for entry in reversed(self._entries):
+                if entry[0] <= version:
+                    break
+                latest.setdefault((entry[1], entry[2]), entry)
+            return self.version, sorted(latest.values(), key=lambda e: e[0])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "max_changes": self.max_changes,
+                "version": self.version,
+                "floor": self.floor,
+            }
+
+
+def api_changes(entries: Iterable[Change]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    (changes, removed) for the API: spot dicts (fields as in
+    /api/spots/current, without distanceMeters) and removed spotIDs.
+    """
+    changes, removed = [], []
+    for _, camera_id, spot_index, status, lat, lng, timestamp in entries:
+        spot_id = f"{camera_id}-spot-{spot_index}"
+        if status is None:
+            removed.append(spot_id)
+            continue
+        changes.append({
+            "spotID": spot_id,
+            "lat": lat,
+            "lng": lng,
+            "status": status,
+            "sourceCameraID": camera_id,
+            "lastUpdated": timestamp,
+        })
+    return changes, removed
@@ -0,0 +1,251 @@
+# event_log.py
+#
+# Transition-only (run-length) history logging.
+#
+# At a 5 s camera cadence almost every history row repeats the previous
+# one. In "transitions" mode update_spot_storage only persists:
+#   - a keyframe (every spot of the camera) on a camera's first upload,
+#     when its spots change, and then at least every keyframe_interval_s,
+#     and
+#   - in between, only the spots whose status or coordinates changed.
+#
+# Rows keep the normal history schema, so they go into the same
+# HistoryStore. A keyframe starts with a marker row (spot_index None,
+# status "keyframe") that tells readers to drop the camera's earlier
+# spots. EventLogReader rebuilds the full per-spot state at any time
+# (seeking back to each camera's last keyframe, however long ago) or over
+# a range, for consumers that expect full snapshots.
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from history_store import KEYFRAME, TimeLike, to_epoch, to_iso
+
+DEFAULT_KEYFRAME_INTERVAL_S = 900.0
+
+
+def keyframe_marker(camera_id: str, timestamp: str) -> Dict[str, Any]:
+    """The row written ahead of a keyframe's spot rows."""
+    return {
+        "timestamp": timestamp,
+        "camera_id": camera_id,
+        "spot_index": None,
+        "status": KEYFRAME,
+        "lat": None,
+        "lng": None,
+    }
+
+
+def row_order(row: Dict[str, Any]) -> Tuple[float, bool]:
+    """Sort key for history rows: by time, a keyframe's marker first."""
+    return to_epoch(row["timestamp"]), row["status"] != KEYFRAME
+
+
+class TransitionFilter:
+    """
+    Per-camera memory of the last persisted state; decides which of an
+    upload's records need to be written.
+    """
+
+    def __init__(self, keyframe_interval_s: float = DEFAULT_KEYFRAME_INTERVAL_S):
+        self.keyframe_interval_s = float(keyframe_interval_s)
+        self._lock = threading.Lock()
+        # camera_id -> {spot_index: (status, lat, lng)}
+        self._state: Dict[str, Dict[Any, Tuple[Any, Any, Any]]] = {}
+        self._last_keyframe: Dict[str, float] = {}
+        self._counters = {"uploads": 0, "rows_in": 0, "rows_out": 0, "keyframes": 0}
+
+    def filter(self, camera_id: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Records (all from one upload of camera_id) that should be persisted.
+        """
+        if not records:
+            return []
+
+        ts = to_epoch(records[0]["timestamp"])
+        new_state = {r["spot_index"]: (r["status"], r["lat"], r["lng"]) for r in records}
+
+        with self._lock:
+            self._counters["uploads"] += 1
+            self._counters["rows_in"] += len(records)
+
+            old_state = self._state.get(camera_id)
+            last_kf = self._last_keyframe.get(camera_id)
+            keyframe = (
+                old_state is None
+                or last_kf is None
+                or ts - last_kf >= self.keyframe_interval_s
+                or ts < last_kf  # clock went backwards: start over
+                or set(old_state) != set(new_state)  # spots added/removed
+            )
+
+            if keyframe:
+                out = [keyframe_marker(camera_id, records[0]["timestamp"])] + list(records)
+                self._last_keyframe[camera_id] = ts
+                self._counters["keyframes"] += 1
+            else:
+                out = [r for r in records if old_state.get(r["spot_index"]) != new_state[r["spot_index"]]]
+
+            self._state[camera_id] = new_state
+            self._counters["rows_out"] += len(out)
+            return out
+
+    def observe(self, camera_id: str, records: List[Dict[str, Any]]) -> None:
+        """
+        Take note of records another process persisted (serve.py workers
+        share one history), so the next filter() diffs against them. The
+        keyframe clock is left alone: at worst this writes a keyframe early.
+        """
+        if not records:
+            return
+        with self._lock:
+            self._state[camera_id] = {r["spot_index"]: (r["status"], r["lat"], r["lng"]) for r in records}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows_in = self._counters["rows_in"]
+            return {
+                **self._counters,
+                "keyframe_interval_s": self.keyframe_interval_s,
+                "reduction": 1.0 - self._counters["rows_out"] / rows_in if rows_in else 0.0,
+            }
+
+
+class EventLogReader:
+    """
+    Rebuilds full per-spot state from transition rows in a HistoryStore
+    (query(camera_id, start, end) and cameras()).
+
+    state_at() seeks back from `when` to each camera's last keyframe
+    marker, querying lookback_s first and doubling the window until it
+    finds one, so a camera that has been silent for days keeps its state.
+    The default first window is two keyframe intervals.
+    """
+
+    def __init__(
+        self,
+        store,
+        keyframe_interval_s: float = DEFAULT_KEYFRAME_INTERVAL_S,
+        lookback_s: Optional[float] = None,
+    ):
+        self.store = store
+        self.lookback_s = 2.0 * keyframe_interval_s if lookback_s is None else lookback_s
+
+    @staticmethod
+    def _apply(state: Dict[str, Dict[Any, Dict[str, Any]]], row: Dict[str, Any]) -> None:
+        if row["status"] == KEYFRAME:
+            # The spot rows that follow are the camera's whole state
+            state[row["camera_id"]] = {}
+            return
+        state.setdefault(row["camera_id"], {})[row["spot_index"]] = {
+            "status": row["status"],
+            "lat": row["lat"],
+            "lng": row["lng"],
+            "timestamp": row["timestamp"],
+        }
+
+    def _since_keyframe(self, camera_id: str, end: float) -> List[Dict[str, Any]]:
+        """
+        camera_id's rows before `end`, oldest first, starting at its last
+        keyframe marker (or at its first row if it has none).
+        """
+        rows: List[Dict[str, Any]] = []
+        hi = end
+        span = self.lookback_s
+        while True:
+            chunk = self.store.query(camera_id=camera_id, start=hi - span, end=hi)
+            exhausted = not chunk
+            if exhausted:
+                # A gap in its uploads: take everything older in one go
+                chunk = self.store.query(camera_id=camera_id, end=hi)
+            chunk.sort(key=row_order)
+            rows = chunk + rows
+            for i in range(len(chunk) - 1, -1, -1):
+                if chunk[i]["status"] == KEYFRAME:
+                    return rows[i:]
+            if exhausted:
+                return rows
+            hi -= span
+            span *= 2
+
+    def state_at(
+        self,
+        when: TimeLike,
+        camera_id: Optional[str] = None,
+    ) -> Dict[str, Dict[Any, Dict[str, Any]]]:
+        """
+        {camera_id: {spot_index: {"status", "lat", "lng", "timestamp"}}} as
+        of `when` (inclusive). "timestamp" is when that spot last changed.
+        """
+        end = to_epoch(when) + 1e-6
+        cameras = [camera_id] if camera_id is not None else self.store.cameras()
+
+        state: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        for cam in cameras:
+            for row in self._since_keyframe(cam, end):
+                self._apply(state, row)
+        return state
+
+    def transitions(
+        self,
+        start: TimeLike,
+        end: TimeLike,
+        camera_id: Optional[str] = None,
+    ) -> Iterator[Tuple[float, Dict[str, Dict[Any, Dict[str, Any]]]]]:
+        """
+        Yield (epoch, state) for the state at `start` and then after every
+        logged row timestamp in (start, end). `state` is updated in place;
+        copy it if you keep it.
+        """
+        t0, t1 = to_epoch(start), to_epoch(end)
+        state = self.state_at(t0, camera_id)
+        yield t0, state
+
+        rows = self.store.query(camera_id=camera_id, start=t0 + 1e-6, end=t1)
+        rows.sort(key=row_order)
+
+        i = 0
+        while i < len(rows):
+            ts = to_epoch(rows[i]["timestamp"])
+            while i < len(rows) and to_epoch(rows[i]["timestamp"]) == ts:
+                self._apply(state, rows[i])
+                i += 1
+            yield ts, state
+
+    def sample(
+        self,
+        start: TimeLike,
+        end: TimeLike,
+        step_s: float,
+        camera_id: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Full history-style rows (one per spot) at start, start + step_s, ...
+        up to end, e.g. to build training rows at a fixed cadence.
+        """
+        t0, t1 = to_epoch(start), to_epoch(end)
+        state = self.state_at(t0, camera_id)
+
+        rows = self.store.query(camera_id=camera_id, start=t0 + 1e-6, end=t1)
+        rows.sort(key=row_order)
+
+        i = 0
+        t = t0
+        while t < t1:
+            while i < len(rows) and to_epoch(rows[i]["timestamp"]) <= t:
+                self._apply(state, rows[i])
+                i += 1
+            ts_iso = to_iso(t)
+            for cam, spots in sorted(state.items()):
+                for spot_index, rec in sorted(spots.items(), key=lambda kv: (kv[0] is None, kv[0] or 0)):
+                    yield {
+                        "timestamp": ts_iso,
+                        "camera_id": cam,
+                        "spot_index": spot_index,
+                        "status": rec["status"],
+                        "lat": rec["lat"],
+                        "lng": rec["lng"],
+                    }
+            t += step_s
@@ -0,0 +1,386 @@
+# feature_pipeline.py
+#
+# Incrementally turns the spot history the backend writes into training
+# rows for train_model.py, in the same schema as training.csv:
+#   day_of_week, minute_of_day, current_occupied, current_empty,
+#   label_any_empty
+# plus timestamp (epoch seconds) and camera_id for time-based splits.
+#
+# One row per camera every step_s (on a grid of multiples of step_s),
+# from that camera's spot state carried forward between uploads. An
+# upload in a full log, or a keyframe in a transition-only log (see
+# event_log.py), replaces the camera's state; transition rows in between
+# update single spots. A camera whose last keyframe is older than
+# max_state_age_s (keep it above the keyframe interval) stops producing
+# rows until its next upload; full-log uploads count as keyframes on
+# TransitionFilter's schedule. Both logs therefore give the same rows.
+#
+# Each run queries history in [watermark, end) and writes the new rows as
+# one compressed .npz shard under features/. end is now - settle_s, but
+# never past the oldest row that is not visible yet (still in the history
+# store's write buffer, or a frame still being analyzed), so rows that
+# arrive late are not skipped. The watermark, carried state and list of
+# committed shards live in features/checkpoint.json, written last, so a
+# crash mid-run just redoes that window. load_features() concatenates the
+# committed shards.
+#
+#   python feature_pipeline.py            # materialize new history once
+#   python feature_pipeline.py --compact  # also merge shards into one
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from event_log import DEFAULT_KEYFRAME_INTERVAL_S, row_order
+from history_store import KEYFRAME, to_epoch
+
+FEATURES_DIR = Path(__file__).with_name("features")
+
+FEATURE_COLUMNS = ["day_of_week", "minute_of_day", "current_occupied", "current_empty"]
+LABEL_COLUMN = "label_any_empty"
+
+_INT_COLUMNS = FEATURE_COLUMNS + [LABEL_COLUMN]
+
+DEFAULT_STEP_S = 60.0
+DEFAULT_SETTLE_S = 60.0
+DEFAULT_MAX_STATE_AGE_S = 1800.0  # two transition-log keyframe intervals
+
+# Bumped when the rows change meaning; an older checkpoint is discarded
+# and the history materialized again
+CHECKPOINT_VERSION = 2
+
+
+def time_features(epoch: float) -> Tuple[int, int]:
+    """
+    (day_of_week, minute_of_day) for an epoch timestamp, in local time to
+    match predictor._arrival_features (which uses datetime.now()).
+    """
+    dt = datetime.fromtimestamp(epoch)
+    return dt.weekday(), dt.hour * 60 + dt.minute
+
+
+def _empty_columns() -> Dict[str, list]:
+    return {name: [] for name in _INT_COLUMNS + ["timestamp", "camera_id"]}
+
+
+def _to_arrays(cols: Dict[str, list]) -> Dict[str, np.ndarray]:
+    out = {name: np.asarray(cols[name], dtype=np.int16) for name in _INT_COLUMNS}
+    out["timestamp"] = np.asarray(cols["timestamp"], dtype=np.float64)
+    out["camera_id"] = np.asarray(cols["camera_id"], dtype=str)
+    return out
+
+
+def _apply_upload(
+    camera: Dict[str, Any],
+    rows: List[Dict[str, Any]],
+    ts: float,
+    keyframe_interval_s: float,
+) -> None:
+    """One camera's history rows sharing timestamp ts."""
+    spots = {str(r["spot_index"]): r["status"] for r in rows if r["status"] != KEYFRAME}
+    if any(r["status"] == KEYFRAME for r in rows):
+        camera["deltas"] = True
+        camera["snapshot"] = ts
+    elif camera["deltas"]:
+        # Transitions between keyframes
+        camera["spots"].update(spots)
+        return
+    elif (
+        # A full log: age the state on TransitionFilter's keyframe
+        # schedule, so a camera that goes silent stops at the same tick
+        # in both logs
+        ts - camera["snapshot"] >= keyframe_interval_s
+        or ts < camera["snapshot"]
+        or set(spots) != set(camera["spots"])
+    ):
+        camera["snapshot"] = ts
+    camera["spots"] = spots
+
+
+def rows_from_history(
+    rows: Iterable[Dict[str, Any]],
+    state: Dict[str, Dict[str, Any]],
+    end: float,
+    start: Optional[float] = None,
+    step_s: float = DEFAULT_STEP_S,
+    max_state_age_s: float = DEFAULT_MAX_STATE_AGE_S,
+    keyframe_interval_s: float = DEFAULT_KEYFRAME_INTERVAL_S,
+) -> Dict[str, np.ndarray]:
+    """
+    Training rows at every multiple of step_s in [start, end), from the
+    history rows with start <= timestamp < end.
+
+    `state` is {camera_id: {"spots": {spot_index: status}, "snapshot":
+    epoch of the last keyframe, "deltas": True once a keyframe marker was
+    seen}} from the previous window and is updated in place (spot keys are
+    strings so it round-trips through JSON).
+    """
+    by_camera: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        if row.get("status") != KEYFRAME and (
+            row.get("spot_index") is None or row.get("status") not in ("empty", "occupied")
+        ):
+            continue
+        by_camera.setdefault(row["camera_id"], []).append(row)
+
+    cols = _empty_columns()
+    for camera_id in sorted(set(state) | set(by_camera)):
+        cam_rows = sorted(by_camera.get(camera_id, []), key=row_order)
+        times = [to_epoch(r["timestamp"]) for r in cam_rows]
+        camera = state.get(camera_id)
+        i = 0
+
+        def apply_until(limit: float) -> None:
+            # The camera's uploads with timestamp <= limit, one at a time
+            nonlocal camera, i
+            while i < len(cam_rows) and times[i] <= limit:
+                j = i
+                while j < len(cam_rows) and times[j] == times[i]:
+                    j += 1
+                if camera is None:
+                    camera = {"spots": {}, "snapshot": times[i], "deltas": False}
+                _apply_upload(camera, cam_rows[i:j], times[i], keyframe_interval_s)
+                i = j
+
+        k = math.ceil((times[0] if camera is None else start) / step_s)
+        while k * step_s < end:
+            tick = k * step_s
+            apply_until(tick)
+            if camera is not None and camera["spots"] and tick - camera["snapshot"] <= max_state_age_s:
+                empty = sum(1 for status in camera["spots"].values() if status == "empty")
+                day_of_week, minute_of_day = time_features(tick)
+                cols["day_of_week"].append(day_of_week)
+                cols["minute_of_day"].append(minute_of_day)
+                cols["current_occupied"].append(len(camera["spots"]) - empty)
+                cols["current_empty"].append(empty)
+                cols[LABEL_COLUMN].append(int(empty > 0))
+                cols["timestamp"].append(tick)
+                cols["camera_id"].append(camera_id)
+                k += 1
+            elif i < len(cam_rows):
+                # Nothing to report until its next upload
+                k = max(k + 1, math.ceil(times[i] / step_s))
+            else:
+                break
+
+        # Uploads after the window's last tick
+        apply_until(math.inf)
+        if camera is None or end - camera["snapshot"] > max_state_age_s:
+            # Stale: its next upload (a keyframe, in a transition log) starts over
+            state.pop(camera_id, None)
+        else:
+            state[camera_id] = camera
+
+    return _to_arrays(cols)
+
+
+def concat(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    if not parts:
+        return _to_arrays(_empty_columns())
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+class FeaturePipeline:
+    """
+    Watermarked history -> npz materializer over a history_store.HistoryStore.
+    """
+
+    def __init__(
+        self,
+        store,
+        out_dir: Path | str = FEATURES_DIR,
+        settle_s: float = DEFAULT_SETTLE_S,
+        max_state_age_s: float = DEFAULT_MAX_STATE_AGE_S,
+        step_s: float = DEFAULT_STEP_S,
+        keyframe_interval_s: float = DEFAULT_KEYFRAME_INTERVAL_S,
+        pending_since: Optional[Callable[[], Optional[float]]] = None,
+    ):
+        """
+        - settle_s: history younger than this is left for the next run
+          (covers other processes' write buffers)
+        - step_s: cadence of the training rows
+        - keyframe_interval_s: the transition log's (HISTORY_KEYFRAME_S)
+        - pending_since: epoch of the oldest frame still being analyzed in
+          this process (e.g. AnalysisPipeline.oldest_timestamp), or None
+        """
+        self.store = store
+        self.out_dir = Path(out_dir)
+        self.settle_s = float(settle_s)
+        self.max_state_age_s = float(max_state_age_s)
+        self.step_s = float(step_s)
+        self.keyframe_interval_s = float(keyframe_interval_s)
+        self.pending_since = pending_since
+        self.checkpoint_path = self.out_dir / "checkpoint.json"
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path) as f:
+                ckpt = json.load(f)
+            if ckpt.get("version") == CHECKPOINT_VERSION:
+                return ckpt
+        return {
+            "version": CHECKPOINT_VERSION, "watermark": None, "state": {}, "shards": [], "next_shard": 0, "rows": 0,
+        }
+
+    def _visible_until(self) -> Optional[float]:
+        """
+        Epoch of the oldest history row not yet visible to queries, if any:
+        buffered in the store, or for a frame still being analyzed.
+        """
+        pending = [self.store.flushed_until()]
+        if self.pending_since is not None:
+            pending.append(self.pending_since())
+        pending = [t for t in pending if t is not None]
+        return min(pending) if pending else None
+
+    def _save_checkpoint(self, ckpt: Dict[str, Any]) -> None:
+        tmp = self.checkpoint_path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(ckpt, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _write_shard(self, name: str, arrays: Dict[str, np.ndarray]) -> None:
+        tmp = self.out_dir / (name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, self.out_dir / name)
+
+    def run_once(self, until: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Materialize history in [watermark, until). `until` defaults to
+        now - settle_s; either way the run stops at the oldest row that is
+        not visible yet, so it is picked up next time instead of skipped.
+        Returns a summary dict.
+        """
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        ckpt = self.load_checkpoint()
+
+        start = ckpt["watermark"]
+        end = time.time() - self.settle_s if until is None else to_epoch(until)
+        pending = self._visible_until()
+        if pending is not None:
+            end = min(end, pending)
+        if start is not None and end <= start:
+            return {"new_rows": 0, "watermark": start, "total_rows": ckpt["rows"]}
+
+        t0 = time.perf_counter()
+        history = self.store.query(start=start, end=end)
+        arrays = rows_from_history(
+            history, ckpt["state"], end, start, self.step_s, self.max_state_age_s, self.keyframe_interval_s,
+        )
+        new_rows = len(arrays[LABEL_COLUMN])
+
+        if new_rows:
+            name = f"part-{ckpt['next_shard']:06d}.npz"
+            self._write_shard(name, arrays)
+            ckpt["shards"].append(name)
+            ckpt["next_shard"] += 1
+            ckpt["rows"] += new_rows
+
+        ckpt["watermark"] = end
+        self._save_checkpoint(ckpt)
+
+        return {
+            "history_rows": len(history),
+            "new_rows": new_rows,
+            "watermark": end,
+            "total_rows": ckpt["rows"],
+            "shards": len(ckpt["shards"]),
+            "seconds": time.perf_counter() - t0,
+        }
+
+    def compact(self) -> int:
+        """
+        Merge all committed shards into one. Returns the row count.
+        """
+        ckpt = self.load_checkpoint()
+        if len(ckpt["shards"]) <= 1:
+            return ckpt["rows"]
+
+        merged = load_features(self.out_dir)
+        name = f"part-{ckpt['next_shard']:06d}.npz"
+        self._write_shard(name, merged)
+
+        old = ckpt["shards"]
+        ckpt["shards"] = [name]
+        ckpt["next_shard"] += 1
+        self._save_checkpoint(ckpt)
+        for shard in old:
+            (self.out_dir / shard).unlink(missing_ok=True)
+        return ckpt["rows"]
+
+
+def load_features(out_dir: Path | str = FEATURES_DIR) -> Dict[str, np.ndarray]:
+    """
+    All committed training rows as column arrays (empty if none yet).
+    """
+    out_dir = Path(out_dir)
+    checkpoint = out_dir / "checkpoint.json"
+    if not checkpoint.exists():
+        return concat([])
+    with open(checkpoint) as f:
+        shards = json.load(f)["shards"]
+
+    parts = []
+    for shard in shards:
+        with np.load(out_dir / shard) as data:
+            parts.append({name: data[name] for name in data.files})
+    return concat(parts)
+
+
+def recompute(
+    store,
+    max_state_age_s: float = DEFAULT_MAX_STATE_AGE_S,
+    end=None,
+    step_s: float = DEFAULT_STEP_S,
+    keyframe_interval_s: float = DEFAULT_KEYFRAME_INTERVAL_S,
+) -> Dict[str, np.ndarray]:
+    """
+    All training rows before end (default now) from scratch (reference
+    for the incremental path).
+    """
+    end = time.time() if end is None else to_epoch(end)
+    return rows_from_history(store.query(end=end), {}, end, None, step_s, max_state_age_s, keyframe_interval_s)
+
+
+def main():
+    import argparse
+
+    from history_store import open_history_store
+
+    parser = argparse.ArgumentParser(description="Materialize training rows from the spot history")
+    parser.add_argument("--backend", default=os.environ.get("HISTORY_BACKEND", "sqlite"))
+    parser.add_argument("--path", default=os.environ.get("HISTORY_PATH"))
+    parser.add_argument("--out", default=str(FEATURES_DIR))
+    parser.add_argument("--settle-s", type=float, default=DEFAULT_SETTLE_S)
+    parser.add_argument("--compact", action="store_true")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).resolve().parent
+    store = open_history_store(
+        args.backend,
+        args.path,
+        migrate_from_csv=str(base_dir / "history.csv"),
+        flush_interval_s=0,
+    )
+    try:
+        summary = FeaturePipeline(store, args.out, settle_s=args.settle_s).run_once()
+    finally:
+        store.close()
+    print(f"[features] {summary}")
+
+    if args.compact:
+        rows = FeaturePipeline(None, args.out).compact()
+        print(f"[features] Compacted to one shard ({rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# forecast_engine.py
+#
+# Precomputed time-of-week lookup table for the forecast model.
+#
+# The RandomForest in parking_forecast_model.joblib only looks at
+# (day_of_week, minute_of_day), so there are just 7 * 1440 distinct
+# inputs it can ever see. We score the whole grid in one batched
+# predict_proba call when the model is loaded, and every later query
+# is a single array lookup instead of a 200-tree evaluation.
+
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+DAYS_PER_WEEK = 7
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = DAYS_PER_WEEK * MINUTES_PER_DAY
+
+
+def week_slot(when: datetime) -> int:
+    """
+    Map a datetime to its minute-of-week slot (0..10079).
+
+    Slot = day_of_week * 1440 + minute_of_day, matching the
+    (day_of_week, minute_of_day) features used in train_model.py.
+    """
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+class ProbabilityTable:
+    """
+    P(any spot empty) for every minute of the week.
+
+    Stored as a flat read-only float64 array of length 10080 (~80 KB),
+    indexed by week_slot().
+    """
+
+    def __init__(self, probs: np.ndarray):
+        # asarray keeps a float64 memmap from load() as a view (no copy)
+        probs = np.asarray(probs, dtype=np.float64).reshape(-1)
+        if probs.shape[0] != MINUTES_PER_WEEK:
+            raise ValueError(
+                f"expected {MINUTES_PER_WEEK} probabilities, got {probs.shape[0]}"
+            )
+        probs.setflags(write=False)
+        self._probs = probs
+
+    @classmethod
+    def from_model(cls, model) -> "ProbabilityTable":
+        """
+        Evaluate a fitted classifier on the full time-of-week grid.
+
+        Column 1 of predict_proba is class 1 = "any empty", same as
+        the scalar path in predictor.py.
+        """
+        day_of_week = np.repeat(np.arange(DAYS_PER_WEEK), MINUTES_PER_DAY)
+        minute_of_day = np.tile(np.arange(MINUTES_PER_DAY), DAYS_PER_WEEK)
+        X = np.column_stack([day_of_week, minute_of_day])
+
+        proba_any_empty = model.predict_proba(X)[:, 1]
+        return cls(np.clip(proba_any_empty, 0.0, 1.0))
+
+    def save(self, path: Path | str) -> None:
+        """
+        Write the table as a plain .npy file (atomically), for load().
+        """
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(self._probs))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path | str, mmap: bool = True) -> "ProbabilityTable":
+        """
+        Table written by save(). With mmap the array is a read-only view of
+        the file, so every process serving the same version shares one
+        copy through the page cache.
+        """
+        return cls(np.load(path, mmap_mode="r" if mmap else None))
+
+    @property
+    def probs(self) -> np.ndarray:
+        """Read-only view of the underlying minute-of-week array."""
+        return self._probs
+
+    def lookup(self, day_of_week: int, minute_of_day: int) -> float:
+        return float(self._probs[day_of_week * MINUTES_PER_DAY + minute_of_day])
+
+    def at(self, when: datetime) -> float:
+        return float(self._probs[week_slot(when)])
+
+    def curve(self, start_slot: int, horizon_minutes: int, step: int = 1) -> np.ndarray:
+        """
+        Probabilities for start_slot, start_slot + step, ... up to
+        start_slot + horizon_minutes, in one gather.
+
+        Slots wrap around the end of the week, so any horizon works
+        (e.g. 24h = 1440 minutes) without touching the model.
+        """
+        if step <= 0:
+            raise ValueError("step must be positive")
+        offsets = np.arange(0, int(horizon_minutes) + 1, int(step))
+        return self._probs.take(start_slot + offsets, mode="wrap")
+
+
+def first_crossing(
+    curve: np.ndarray,
+    target_confidence,
+    step: int = 1,
+    default: float | None = None,
+):
+    """
+    First minute offset at which curve >= target_confidence.
+
+    target_confidence may be a scalar or a sequence of levels; all of
+    them are answered from the same curve. Levels that are never
+    reached get `default`.
+    """
+    targets = np.atleast_1d(np.asarray(target_confidence, dtype=np.float64))
+    hits = curve[np.newaxis, :] >= targets[:, np.newaxis]
+
+    first_idx = hits.argmax(axis=1)
+    reached = hits[np.arange(targets.shape[0]), first_idx]
+
+    minutes = [
+        float(idx * step) if ok else default
+        for idx, ok in zip(first_idx.tolist(), reached.tolist())
+    ]
+
+    if np.ndim(target_confidence) == 0:
+        return minutes[0]
+    return minutes
+
+
+def crossing_waits(
+    curve: np.ndarray,
+    target_confidence: float,
+    max_wait: int,
+    default: float | None = None,
+) -> np.ndarray:
+    """
+    For every start offset t of a minute-resolution curve, the wait
+    first_crossing(curve[t:t + max_wait + 1], target_confidence) would
+    give, for all offsets at once (one reverse running minimum over the
+    hits instead of a scan per offset).
+
+    The curve must reach max_wait minutes past the last start wanted;
+    returns len(curve) - max_wait waits. Waits over max_wait get `default`.
+    """
+    max_wait = int(max_wait)
+    n = curve.shape[0]
+    offsets = np.arange(n)
+    # Index of the next minute at or after each offset that reaches the target
+    hit_at = np.where(curve >= target_confidence, offsets, n)
+    next_hit = np.minimum.accumulate(hit_at[::-1])[::-1]
+
+    starts = max(0, n - max_wait)
+    waits = (next_hit[:starts] - offsets[:starts]).astype(np.float64)
+    waits[waits > max_wait] = np.nan if default is None else default
+    return waits
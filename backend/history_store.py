@@ -0,0 +1,578 @@
+# history_store.py
+#
+# Storage engine for per-spot history records (what update_spot_storage
+# used to append straight to history.csv).
+#
+# Backends:
+#   - "sqlite":   one SQLite file in WAL mode, indexed on (camera_id, ts)
+#   - "columnar": one directory per camera per day, one raw binary file
+#                 per column, appended in place and read with np.fromfile
+#   - "csv":      the original append-only history.csv (no index)
+#
+# All backends buffer appends and write them in group commits, either
+# when `batch_size` rows are waiting or every `flush_interval_s` seconds.
+#
+# Records are the same dicts update_spot_storage builds:
+#   {"timestamp": ISO-8601 "...Z", "camera_id", "spot_index", "status", "lat", "lng"}
+#
+# CLI:
+#   python history_store.py import history.csv [--backend sqlite --path history.db]
+#   python history_store.py export out.csv   [--backend sqlite --path history.db]
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import heapq
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+FIELDNAMES = ["timestamp", "camera_id", "spot_index", "status", "lat", "lng"]
+
+# "keyframe" marks the marker row event_log.TransitionFilter writes (with
+# spot_index None) ahead of each full keyframe in transitions mode
+KEYFRAME = "keyframe"
+STATUS_CODES = {"empty": 0, "occupied": 1, KEYFRAME: 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+UNKNOWN_STATUS = 255
+
+TimeLike = Union[None, float, str, datetime]
+
+
+def to_epoch(value: TimeLike) -> Optional[float]:
+    """
+    Epoch seconds from an ISO string ("...Z" or naive, treated as UTC),
+    a datetime, or a number.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", ""))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def to_iso(epoch: float) -> str:
+    """Inverse of to_epoch(), in the "...Z" format the backend writes."""
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+def _float_or_none(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+class HistoryStore:
+    """
+    Base class: buffering + group commit. Subclasses implement
+    _write_batch(), query() and close-time cleanup.
+    """
+
+    def __init__(self, batch_size: int = 1000, flush_interval_s: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+
+        self._flusher = None
+        if flush_interval_s is not None and flush_interval_s > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name=f"{type(self).__name__}-flusher", daemon=True,
+            )
+            self._flusher.start()
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def append(self, records: Iterable[Dict[str, Any]]) -> None:
+        with self._cond:
+            self._buffer.extend(records)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write everything buffered so far in one batch."""
+        with self._write_lock:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+            if batch:
+                self._write_batch(batch)
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait(self.flush_interval_s)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flushed_until(self) -> Optional[float]:
+        """
+        Epoch of the oldest row appended but not yet visible to query()
+        (still buffered or being written); None if there is none.
+        """
+        with self._write_lock:
+            with self._cond:
+                if not self._buffer:
+                    return None
+                return min(to_epoch(r["timestamp"]) for r in self._buffer)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def query(
+        self,
+        camera_id: Optional[str] = None,
+        start: TimeLike = None,
+        end: TimeLike = None,
+        spot_index: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Records with start <= timestamp < end, ordered by (camera_id, timestamp),
+        at most `limit` of them. Only rows already flushed are visible.
+        """
+        raise NotImplementedError
+
+    def is_empty(self) -> bool:
+        raise NotImplementedError
+
+    def cameras(self) -> List[str]:
+        """Every camera_id with flushed rows."""
+        return sorted({r["camera_id"] for r in self.query()})
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.query())
+
+    def import_csv(self, csv_path: Union[str, Path], chunk_rows: int = 100_000) -> int:
+        """
+        Bulk-load an existing history.csv. Returns the number of rows imported.
+        """
+        n = 0
+        chunk: List[Dict[str, Any]] = []
+        with open(csv_path, newline="") as f:
+            for row in csv.DictReader(f):
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    with self._write_lock:
+                        self._write_batch(chunk)
+                    n += len(chunk)
+                    chunk = []
+        if chunk:
+            with self._write_lock:
+                self._write_batch(chunk)
+            n += len(chunk)
+        return n
+
+    def export_csv(self, csv_path: Union[str, Path]) -> int:
+        n = 0
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            for row in self.iter_all():
+                writer.writerow({k: row.get(k) for k in FIELDNAMES})
+                n += 1
+        return n
+
+
+# -----------------------------
+# SQLite (WAL)
+# -----------------------------
+class SQLiteHistoryStore(HistoryStore):
+    def __init__(self, path: Union[str, Path] = "history.db", **kwargs):
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn_lock = threading.Lock()
+        with self._conn_lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spot_history (
+                    ts REAL NOT NULL,
+                    camera_id TEXT NOT NULL,
+                    spot_index INTEGER,
+                    status TEXT,
+                    lat REAL,
+                    lng REAL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_history_camera_ts ON spot_history (camera_id, ts)"
+            )
+            self._conn.commit()
+        super().__init__(**kwargs)
+
+    def is_empty(self) -> bool:
+        with self._conn_lock:
+            return self._conn.execute("SELECT 1 FROM spot_history LIMIT 1").fetchone() is None
+
+    def _write_batch(self, batch):
+        rows = [
+            (
+                to_epoch(r["timestamp"]),
+                r["camera_id"],
+                None if r.get("spot_index") in (None, "") else int(r["spot_index"]),
+                r.get("status"),
+                _float_or_none(r.get("lat")),
+                _float_or_none(r.get("lng")),
+            )
+            for r in batch
+        ]
+        with self._conn_lock:
+            with self._conn:  # one transaction per group commit
+                self._conn.executemany(
+                    "INSERT INTO spot_history (ts, camera_id, spot_index, status, lat, lng) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def query(self, camera_id=None, start=None, end=None, spot_index=None, limit=None):
+        sql = "SELECT ts, camera_id, spot_index, status, lat, lng FROM spot_history WHERE 1=1"
+        params: List[Any] = []
+        if camera_id is not None:
+            sql += " AND camera_id = ?"
+            params.append(camera_id)
+        if start is not None:
+            sql += " AND ts >= ?"
+            params.append(to_epoch(start))
+        if end is not None:
+            sql += " AND ts < ?"
+            params.append(to_epoch(end))
+        if spot_index is not None:
+            sql += " AND spot_index = ?"
+            params.append(spot_index)
+        sql += " ORDER BY camera_id, ts, spot_index"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(max(0, int(limit)))
+
+        with self._conn_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                "timestamp": to_iso(ts),
+                "camera_id": cam,
+                "spot_index": idx,
+                "status": status,
+                "lat": lat,
+                "lng": lng,
+            }
+            for ts, cam, idx, status, lat, lng in rows
+        ]
+
+    def cameras(self):
+        with self._conn_lock:
+            rows = self._conn.execute("SELECT DISTINCT camera_id FROM spot_history ORDER BY camera_id").fetchall()
+        return [cam for (cam,) in rows]
+
+    def close(self):
+        super().close()
+        with self._conn_lock:
+            self._conn.close()
+
+
+# -----------------------------
+# Partitioned columnar
+# -----------------------------
+_COLUMNS = {
+    "ts": np.float64,
+    "spot": np.int32,
+    "status": np.uint8,
+    "lat": np.float64,
+    "lng": np.float64,
+}
+
+
+# Camera ids come from clients: ids like this name their directory as
+# is, anything else (e.g. "../x") gets a hashed name starting with "_",
+# with the id itself in its CAMERA_ID_FILE
+_SAFE_DIR = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+CAMERA_ID_FILE = "camera_id"
+
+
+class ColumnarHistoryStore(HistoryStore):
+    """
+    root/<camera dir>/<YYYY-MM-DD>/<column>.bin, one raw array per column.
+    Range queries only open the partitions for the requested cameras/days.
+    Missing lat/lng are stored as NaN, missing spot_index as -1.
+    """
+
+    def __init__(self, root: Union[str, Path] = "history_columnar", **kwargs):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        super().__init__(**kwargs)
+
+    def _camera_dir(self, camera_id: str) -> Path:
+        if _SAFE_DIR.match(camera_id):
+            return self.root / camera_id
+        return self.root / ("_" + hashlib.sha1(camera_id.encode("utf-8")).hexdigest())
+
+    def _partition(self, camera_id: str, day: date) -> Path:
+        return self._camera_dir(camera_id) / day.isoformat()
+
+    def _write_batch(self, batch):
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for r in batch:
+            ts = to_epoch(r["timestamp"])
+            day = datetime.fromtimestamp(ts, tz=timezone.utc).date()
+            groups.setdefault((r["camera_id"], day), []).append((ts, r))
+
+        for (camera_id, day), rows in groups.items():
+            part = self._partition(camera_id, day)
+            part.mkdir(parents=True, exist_ok=True)
+            id_file = part.parent / CAMERA_ID_FILE
+            if part.parent.name.startswith("_") and not id_file.exists():
+                id_file.write_text(camera_id, encoding="utf-8")
+            cols = {
+                "ts": [ts for ts, _ in rows],
+                "spot": [-1 if r.get("spot_index") in (None, "") else int(r["spot_index"]) for _, r in rows],
+                "status": [STATUS_CODES.get(r.get("status"), UNKNOWN_STATUS) for _, r in rows],
+                "lat": [np.nan if _float_or_none(r.get("lat")) is None else float(r["lat"]) for _, r in rows],
+                "lng": [np.nan if _float_or_none(r.get("lng")) is None else float(r["lng"]) for _, r in rows],
+            }
+            for name, dtype in _COLUMNS.items():
+                with open(part / f"{name}.bin", "ab") as f:
+                    np.asarray(cols[name], dtype=dtype).tofile(f)
+
+    def read_partition(self, camera_id: str, day: date) -> Optional[Dict[str, np.ndarray]]:
+        part = self._partition(camera_id, day)
+        if not (part / "ts.bin").exists():
+            return None
+        cols = {name: np.fromfile(part / f"{name}.bin", dtype=dtype) for name, dtype in _COLUMNS.items()}
+        # A crash mid-append could leave columns of different lengths
+        n = min(len(c) for c in cols.values())
+        return {name: c[:n] for name, c in cols.items()}
+
+    def cameras(self) -> List[str]:
+        out = []
+        for p in self.root.iterdir():
+            if not p.is_dir():
+                continue
+            if not p.name.startswith("_"):
+                out.append(p.name)
+            elif (p / CAMERA_ID_FILE).exists():
+                out.append((p / CAMERA_ID_FILE).read_text(encoding="utf-8"))
+        return sorted(out)
+
+    def _days(self, camera_id: str, start: Optional[float], end: Optional[float]) -> List[date]:
+        cam_dir = self._camera_dir(camera_id)
+        if not cam_dir.is_dir():
+            return []
+        days = sorted(date.fromisoformat(p.name) for p in cam_dir.iterdir() if p.is_dir())
+        if start is not None:
+            first = datetime.fromtimestamp(start, tz=timezone.utc).date()
+            days = [d for d in days if d >= first]
+        if end is not None:
+            last = datetime.fromtimestamp(end, tz=timezone.utc).date()
+            days = [d for d in days if d <= last]
+        return days
+
+    def _camera_arrays(self, cam, start_s, end_s, spot_index) -> Optional[Dict[str, np.ndarray]]:
+        """One camera's columns in [start_s, end_s), sorted by (ts, spot)."""
+        parts = [self.read_partition(cam, d) for d in self._days(cam, start_s, end_s)]
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return None
+        cols = {name: np.concatenate([p[name] for p in parts]) for name in _COLUMNS}
+
+        mask = np.ones(len(cols["ts"]), dtype=bool)
+        if start_s is not None:
+            mask &= cols["ts"] >= start_s
+        if end_s is not None:
+            mask &= cols["ts"] < end_s
+        if spot_index is not None:
+            mask &= cols["spot"] == spot_index
+        cols = {name: c[mask] for name, c in cols.items()}
+
+        order = np.lexsort((cols["spot"], cols["ts"]))
+        return {name: c[order] for name, c in cols.items()}
+
+    def query_arrays(self, camera_id=None, start=None, end=None, spot_index=None):
+        """
+        Like query(), but returns {camera_id: {column: ndarray}} without
+        building per-row dicts.
+        """
+        start_s, end_s = to_epoch(start), to_epoch(end)
+        cameras = [camera_id] if camera_id is not None else self.cameras()
+
+        out = {}
+        for cam in cameras:
+            cols = self._camera_arrays(cam, start_s, end_s, spot_index)
+            if cols is not None:
+                out[cam] = cols
+        return out
+
+    def query(self, camera_id=None, start=None, end=None, spot_index=None, limit=None):
+        start_s, end_s = to_epoch(start), to_epoch(end)
+        cameras = [camera_id] if camera_id is not None else self.cameras()
+
+        rows = []
+        for cam in cameras:
+            left = None if limit is None else max(0, int(limit)) - len(rows)
+            if left is not None and left <= 0:
+                break  # the remaining cameras' partitions are never read
+            cols = self._camera_arrays(cam, start_s, end_s, spot_index)
+            if cols is None:
+                continue
+            if left is not None:
+                cols = {name: c[:left] for name, c in cols.items()}
+            for ts, spot, status, lat, lng in zip(
+                cols["ts"].tolist(), cols["spot"].tolist(), cols["status"].tolist(),
+                cols["lat"].tolist(), cols["lng"].tolist(),
+            ):
+                rows.append({
+                    "timestamp": to_iso(ts),
+                    "camera_id": cam,
+                    "spot_index": None if spot < 0 else spot,
+                    "status": STATUS_NAMES.get(status),
+                    "lat": None if lat != lat else lat,  # NaN -> None
+                    "lng": None if lng != lng else lng,
+                })
+        return rows
+
+    def is_empty(self) -> bool:
+        return not self.cameras()
+
+
+# -----------------------------
+# CSV (original behavior)
+# -----------------------------
+class CsvHistoryStore(HistoryStore):
+    def __init__(self, path: Union[str, Path] = "history.csv", **kwargs):
+        self.path = str(path)
+        super().__init__(**kwargs)
+
+    def _write_batch(self, batch):
+        file_exists = os.path.exists(self.path)
+        with open(self.path, mode="a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            if not file_exists:
+                writer.writeheader()
+            writer.writerows({k: r.get(k) for k in FIELDNAMES} for r in batch)
+
+    def query(self, camera_id=None, start=None, end=None, spot_index=None, limit=None):
+        if not os.path.exists(self.path):
+            return []
+        start_s, end_s = to_epoch(start), to_epoch(end)
+
+        def matching(f):
+            for row in csv.DictReader(f):
+                if camera_id is not None and row["camera_id"] != camera_id:
+                    continue
+                ts = to_epoch(row["timestamp"])
+                if (start_s is not None and ts < start_s) or (end_s is not None and ts >= end_s):
+                    continue
+                if spot_index is not None and str(row["spot_index"]) != str(spot_index):
+                    continue
+                yield ts, {
+                    "timestamp": row["timestamp"],
+                    "camera_id": row["camera_id"],
+                    "spot_index": None if row["spot_index"] in (None, "") else int(row["spot_index"]),
+                    "status": row["status"] or None,
+                    "lat": _float_or_none(row["lat"]),
+                    "lng": _float_or_none(row["lng"]),
+                }
+
+        def key(item):
+            return item[1]["camera_id"], item[0]
+
+        with open(self.path, newline="") as f:
+            # The file is in append order, so every row must be read; with
+            # a limit only the first `limit` in query order are held
+            if limit is None:
+                rows = sorted(matching(f), key=key)
+            else:
+                rows = heapq.nsmallest(max(0, int(limit)), matching(f), key=key)
+        return [r for _, r in rows]
+
+    def import_csv(self, csv_path, chunk_rows: int = 100_000) -> int:
+        if os.path.abspath(csv_path) == os.path.abspath(self.path):
+            return 0
+        return super().import_csv(csv_path, chunk_rows)
+
+    def is_empty(self) -> bool:
+        return not os.path.exists(self.path)
+
+
+BACKENDS = {
+    "sqlite": SQLiteHistoryStore,
+    "columnar": ColumnarHistoryStore,
+    "csv": CsvHistoryStore,
+}
+
+DEFAULT_PATHS = {
+    "sqlite": "history.db",
+    "columnar": "history_columnar",
+    "csv": "history.csv",
+}
+
+
+def open_history_store(
+    backend: str = "sqlite",
+    path: Optional[str] = None,
+    migrate_from_csv: Optional[str] = None,
+    **kwargs,
+) -> HistoryStore:
+    """
+    Open a backend by name. If migrate_from_csv points at an existing
+    history.csv and the store is still empty, its rows are imported first.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown history backend {backend!r}; choose from {sorted(BACKENDS)}")
+
+    store = BACKENDS[backend](path or DEFAULT_PATHS[backend], **kwargs)
+
+    if migrate_from_csv and os.path.exists(migrate_from_csv) and store.is_empty():
+        n = store.import_csv(migrate_from_csv)
+        print(f"[history_store] Imported {n} rows from {migrate_from_csv} into {backend}")
+
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import/export spot history")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("csv_path")
+    parser.add_argument("--backend", default="sqlite", choices=sorted(BACKENDS))
+    parser.add_argument("--path", default=None)
+    args = parser.parse_args()
+
+    store = open_history_store(args.backend, args.path, flush_interval_s=0)
+    if args.command == "import":
+        n = store.import_csv(args.csv_path)
+        print(f"Imported {n} rows from {args.csv_path}")
+    else:
+        n = store.export_csv(args.csv_path)
+        print(f"Exported {n} rows to {args.csv_path}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
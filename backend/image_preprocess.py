@@ -0,0 +1,91 @@
+# image_preprocess.py
+#
+# Per-camera image preprocessing before a frame is sent to the LLM:
+# crop to the parking region, downscale, and re-encode as JPEG.
+#
+# The ESP32 sends full VGA frames whose lower half is road, which the
+# prompt tells the model to ignore anyway. Cropping and shrinking the
+# frame cuts the upload size and the vision tokens billed per call.
+
+from __future__ import annotations
+
+import io
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+
+@dataclass
+class PreprocessConfig:
+    """
+    - crop: (left, top, right, bottom) as fractions of the frame, or None.
+      The default keeps the upper 60%: the parking row, then about 5/6 of
+      the image, plus a thin strip of road. llm_processor's prompts
+      describe the cropped frame whenever a crop is set.
+    - max_size: (width, height) bound for the downscaled frame, or None
+    - jpeg_quality: re-encode quality (1..95)
+    """
+    crop: Optional[Tuple[float, float, float, float]] = (0.0, 0.0, 1.0, 0.6)
+    max_size: Optional[Tuple[int, int]] = (512, 512)
+    jpeg_quality: int = 75
+
+
+def preprocess_jpeg(raw: bytes, config: PreprocessConfig) -> Tuple[bytes, Tuple[int, int]]:
+    """
+    Apply config to raw JPEG bytes. Returns (jpeg_bytes, (width, height)).
+    """
+    with Image.open(io.BytesIO(raw)) as img:
+        if config.max_size is not None:
+            # Let the JPEG decoder drop resolution while decoding when it can
+            img.draft("RGB", config.max_size)
+        frame = img.convert("RGB")
+
+    if config.crop is not None:
+        left, top, right, bottom = config.crop
+        w, h = frame.size
+        frame = frame.crop((
+            int(round(left * w)),
+            int(round(top * h)),
+            int(round(right * w)),
+            int(round(bottom * h)),
+        ))
+
+    if config.max_size is not None:
+        frame.thumbnail(config.max_size, Image.BILINEAR)
+
+    out = io.BytesIO()
+    frame.save(out, format="JPEG", quality=config.jpeg_quality, optimize=True)
+    return out.getvalue(), frame.size
+
+
+class PayloadStats:
+    """
+    Running before/after byte counts per camera.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_camera: Dict[str, Dict[str, int]] = {}
+
+    def record(self, camera_id: Optional[str], original_bytes: int, sent_bytes: int) -> None:
+        with self._lock:
+            c = self._by_camera.setdefault(
+                camera_id or "unknown",
+                {"frames": 0, "original_bytes": 0, "sent_bytes": 0},
+            )
+            c["frames"] += 1
+            c["original_bytes"] += original_bytes
+            c["sent_bytes"] += sent_bytes
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {}
+            for camera_id, c in self._by_camera.items():
+                out[camera_id] = {
+                    **c,
+                    "avg_original_bytes": c["original_bytes"] / c["frames"],
+                    "avg_sent_bytes": c["sent_bytes"] / c["frames"],
+                }
+            return out
@@ -2,33 +2,238 @@
 
 import base64
 import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
+# .env is still read at import: app.py's env-driven settings come from it too
 from dotenv import load_dotenv
 load_dotenv()
 
-from openai import OpenAI
+from image_preprocess import PayloadStats, PreprocessConfig, preprocess_jpeg
+from metrics import LLM_REQUESTS, STAGE_SECONDS
 
 # Assumes OPENAI_API_KEY is set in your environment
 # e.g. export OPENAI_API_KEY="sk-..."
-client = OpenAI()
+#
+# The client (and the openai package, which is slow to import) is only
+# created on first use; see get_client().
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The shared OpenAI client, created on first call.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                _client = OpenAI()
+    return _client
+
+
+def client_ready() -> bool:
+    return _client is not None
+
+
+def __getattr__(name):
+    # Keep `llm_processor.client` working for older callers
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+MODEL_NAME = "gpt-4.1-mini"  # supports vision + JSON, cheap enough for a class project
 
 NUM_SPOTS = 6
 
-def _encode_image_to_data_url(image_path: Path) -> str:
+# Spot count per camera; cameras not listed here use NUM_SPOTS.
+CAMERA_SPOT_COUNTS: Dict[str, int] = {
+    "cam-001": NUM_SPOTS,
+}
+
+
+# Crop/downscale/re-encode frames before upload (see image_preprocess.py).
+# LLM_PREPROCESS=0 sends the original JPEG bytes instead.
+PREPROCESS_ENABLED = os.environ.get("LLM_PREPROCESS", "1") != "0"
+DEFAULT_PREPROCESS = PreprocessConfig()
+
+# Per-camera overrides; cameras not listed here use DEFAULT_PREPROCESS.
+CAMERA_PREPROCESS: Dict[str, PreprocessConfig] = {}
+
+# Before/after payload bytes per camera
+PAYLOAD_STATS = PayloadStats()
+
+
+def num_spots_for(camera_id: Optional[str]) -> int:
+    return CAMERA_SPOT_COUNTS.get(camera_id, NUM_SPOTS)
+
+
+def _encode_image_to_data_url(
+    image_path: Path,
+    camera_id: Optional[str] = None,
+    operation: str = "analyze_parking_image",
+) -> tuple:
     """
-    Read image bytes and return a data URL string suitable for the OpenAI image_url field.
+    Read image bytes, apply the camera's preprocessing, and return
+    (data_url, original_bytes, sent_bytes). The data URL is suitable for
+    the OpenAI image_url field. Each step is timed under operation.
     """
-    with image_path.open("rb") as f:
-        img_bytes = f.read()
+    with STAGE_SECONDS.time(operation, "read_image", camera_id):
+        with image_path.open("rb") as f:
+            img_bytes = f.read()
+
+    original_bytes = len(img_bytes)
+    if PREPROCESS_ENABLED:
+        config = CAMERA_PREPROCESS.get(camera_id, DEFAULT_PREPROCESS)
+        try:
+            with STAGE_SECONDS.time(operation, "preprocess", camera_id):
+                img_bytes, _ = preprocess_jpeg(img_bytes, config)
+        except Exception as e:
+            # Never lose a frame over preprocessing; send it as-is
+            print(f"[llm_processor] preprocessing failed for {image_path}: {e}")
 
-    b64 = base64.b64encode(img_bytes).decode("utf-8")
+    PAYLOAD_STATS.record(camera_id, original_bytes, len(img_bytes))
+
+    with STAGE_SECONDS.time(operation, "base64", camera_id):
+        b64 = base64.b64encode(img_bytes).decode("utf-8")
     # assuming JPEG from ESP32-CAM
-    return f"data:image/jpeg;base64,{b64}"
+    return f"data:image/jpeg;base64,{b64}", original_bytes, len(img_bytes)
 
 
-def analyze_parking_image(image_path: str) -> Dict[str, Any]:
+def _is_cropped(camera_id: Optional[str]) -> bool:
+    """
+    Whether frames from camera_id reach the model cropped (see
+    image_preprocess.py), so the prompt must describe the cropped frame.
+    """
+    return PREPROCESS_ENABLED and CAMERA_PREPROCESS.get(camera_id, DEFAULT_PREPROCESS).crop is not None
+
+
+def _system_prompt(num_spots: int, cropped: bool = False) -> str:
+    if cropped:
+        # The default crop keeps the parking row (~5/6 of the image) and a
+        # thin strip of road along the bottom edge
+        scene = (
+            "The image has been cropped to the parking area, which fills most of the frame:\n"
+            f"- It shows the parking area on white paper, with {num_spots} rectangular parking spaces in one row, "
+            "separated by vertical black lines, against a wall.\n"
+            "- At most a thin strip of the drawn road may remain along the BOTTOM edge; ignore it for parking.\n\n"
+        )
+        area = "the parking area (above any road strip)"
+    else:
+        scene = (
+            "The scene always looks like this:\n"
+            f"- The UPPER part of the image is the parking area on white paper, with {num_spots} rectangular parking spaces in one row, "
+            "separated by vertical black lines, against a wall.\n"
+            "- The LOWER part of the image is a drawn road with dashed lane markings that you must ignore for parking.\n\n"
+        )
+        area = "JUST the upper parking area"
+    return (
+        "You analyze images from a single fixed ESP32 demo camera showing a tiny parking lot drawn on white paper.\n"
+        + scene
+        + f"For this camera, there are ALWAYS exactly {num_spots} parking spaces in a single row, left to right.\n"
+        f"Conceptually divide {area} into {num_spots} equal-width vertical regions from left to right:\n"
+        f"- Region 0 = leftmost space, region {num_spots - 1} = rightmost space.\n\n"
+        + _REGION_RULES
+        + "Respond as a STRICT JSON object only, with no extra text."
+    )
+
+
+_REGION_RULES = (
+    "For each region:\n"
+    "- If any toy car or a significant part of a car is clearly inside that region, the space is OCCUPIED.\n"
+    "- If the region shows only the drawn space lines and empty floor (no car), the space is EMPTY.\n"
+    "- If a car overlaps two regions, treat the region where MOST of the car appears as OCCUPIED "
+    "and the neighbor as EMPTY.\n\n"
+)
+
+
+def _user_prompt(num_spots: int, cropped: bool = False) -> str:
+    if cropped:
+        look = (
+            "Look at the parking spaces, which fill most of this cropped image, "
+            "and ignore any strip of road along the bottom edge.\n"
+        )
+    else:
+        look = (
+            "Look ONLY at the parking spaces in the UPPER half of this image (above the front horizontal line) "
+            "and ignore the road below.\n"
+        )
+    return (
+        look
+        + f"Using the fixed layout described above, determine whether each of the {num_spots} spaces is \"empty\" or \"occupied\".\n\n"
+        "Return JSON in exactly this format:\n"
+        "{\n"
+        "  \"total_spots\": <integer total number of visible parking spots>,\n"
+        "  \"empty_spots\": <integer number of empty spots>,\n"
+        "}\n\n"
+        "Rules:\n"
+        f"- Always set \"total_spots\" to {num_spots}.\n"
+        f"- Always return exactly {num_spots} entries in \"spots\", one for each spot_index from 0 to {num_spots - 1}, "
+        "ordered from left to right.\n"
+        "- Compute \"empty_spots\" as the count of entries whose status is \"empty\".\n"
+        "- Do NOT include any other fields or explanation text.\n"
+        f"If the image is completely unusable (blurry, black, or not a parking lot), still use \"total_spots\" = {num_spots}, "
+        "and set all spots to status \"occupied\" (so empty_spots = 0).\n"
+    )
+
+
+def _valid_statuses(raw_spots, num_spots: int) -> Dict[int, str]:
+    """
+    Collect valid statuses by index from model output.
+    """
+    status_by_idx = {}
+    for item in raw_spots or []:
+        if not isinstance(item, dict):
+            continue
+        idx = item.get("spot_index")
+        status = item.get("status")
+        if isinstance(idx, int) and 0 <= idx < num_spots and status in ("empty", "occupied"):
+            status_by_idx[idx] = status
+    return status_by_idx
+
+
+def _canonicalize(data: Dict[str, Any], num_spots: int, text: str) -> Dict[str, Any]:
+    """
+    Normalize a per-camera model answer to the canonical spots shape.
+    """
+    status_by_idx = _valid_statuses(data.get("spots"), num_spots)
+
+    # Build canonical list: always 0..num_spots-1
+    canonical_spots = []
+    for idx in range(num_spots):
+        # Default to "occupied" if model didn't give anything usable
+        status = status_by_idx.get(idx, "occupied")
+        canonical_spots.append(
+            {
+                "spot_index": idx,
+                "status": status,
+            }
+        )
+
+    data["spots"] = canonical_spots
+    data["total_spots"] = num_spots
+    data["empty_spots"] = sum(1 for s in canonical_spots if s["status"] == "empty")
+
+    # Keep raw text for debugging
+    if "raw_model_text" not in data:
+        data["raw_model_text"] = text
+
+    return data
+
+
+def analyze_parking_image(
+    image_path: str,
+    num_spots: int = NUM_SPOTS,
+    llm_client=None,
+    camera_id: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     Takes a local JPEG path, sends it to an LLM for analysis,
     and returns structured information about parking spots.
@@ -42,119 +247,344 @@ def analyze_parking_image(image_path: str) -> Dict[str, Any]:
 
     Coordinates (lat/lng) will be attached later by mapping
     camera_id + spot_index -> GPS in our backend.
+
+    llm_client defaults to the shared OpenAI client (get_client()); tests can pass
+    a stub with the same chat.completions.create interface. camera_id
+    selects the preprocessing config (crop/downscale) for the frame.
     """
 
+    started = time.perf_counter()
     image_path_obj = Path(image_path)
 
     if not image_path_obj.exists():
         raise FileNotFoundError(f"Image not found: {image_path_obj}")
 
-    image_data_url = _encode_image_to_data_url(image_path_obj)
+    image_data_url, original_bytes, sent_bytes = _encode_image_to_data_url(image_path_obj, camera_id)
 
     # System + user prompt: keep it VERY clear we want strict JSON.
-    system_prompt = (
-        "You analyze images from a single fixed ESP32 demo camera showing a tiny parking lot drawn on white paper.\n"
-        "The scene always looks like this:\n"
-        "- The UPPER part of the image is the parking area on white paper, with six rectangular parking spaces in one row, "
-        "separated by vertical black lines, against a wall.\n"
-        "- The LOWER part of the image is a drawn road with dashed lane markings that you must ignore for parking.\n\n"
-        f"For this camera, there are ALWAYS exactly {NUM_SPOTS} parking spaces in a single row, left to right.\n"
-        f"Conceptually divide JUST the upper parking area into {NUM_SPOTS} equal-width vertical regions from left to right:\n"
-        f"- Region 0 = leftmost space, region {NUM_SPOTS - 1} = rightmost space.\n\n"
-        "For each region:\n"
-        "- If any toy car or a significant part of a car is clearly inside that region, the space is OCCUPIED.\n"
-        "- If the region shows only the drawn space lines and empty floor (no car), the space is EMPTY.\n"
-        "- If a car overlaps two regions, treat the region where MOST of the car appears as OCCUPIED "
-        "and the neighbor as EMPTY.\n\n"
-        "Respond as a STRICT JSON object only, with no extra text."
-    )
+    cropped = _is_cropped(camera_id)
+    system_prompt = _system_prompt(num_spots, cropped)
+    user_text_prompt = _user_prompt(num_spots, cropped)
+
+    # Call the OpenAI Chat Completions API with image input
+    with STAGE_SECONDS.time("analyze_parking_image", "openai_call", camera_id):
+        try:
+            response = (llm_client or get_client()).chat.completions.create(
+                model=MODEL_NAME,
+                response_format={"type": "json_object"},
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": user_text_prompt},
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": image_data_url
+                                },
+                            },
+                        ],
+                    },
+                ],
+                max_tokens=500,
+            )
+        except Exception:
+            LLM_REQUESTS.inc(camera_id, "api_error")
+            raise
+
+    with STAGE_SECONDS.time("analyze_parking_image", "parse_json", camera_id):
+        # The model was told to return a JSON object as a string
+        raw_content = response.choices[0].message.content
+        text = (raw_content or "").strip()
+
+        try:
+            data = json.loads(raw_content)
+            LLM_REQUESTS.inc(camera_id, "ok")
+        except (json.JSONDecodeError, TypeError):
+            # Fallback: wrap raw text if model somehow returns non-JSON
+            LLM_REQUESTS.inc(camera_id, "bad_json")
+            data = {
+                "spots": [],
+                "notes": "Failed to parse model JSON.",
+            }
+
+        if isinstance(data, dict):
+            data = _canonicalize(data, num_spots, text)
+            data["payload_bytes"] = {"original": original_bytes, "sent": sent_bytes}
+
+    STAGE_SECONDS.observe(time.perf_counter() - started, "analyze_parking_image", "total", camera_id)
+    return data
+
+
+# -----------------------------
+# Multi-camera batched analysis
+# -----------------------------
+_BATCH_SYSTEM_PROMPT = (
+    "You analyze several images at once, each from a different fixed ESP32 camera showing a parking lot.\n"
+    "Every image is preceded by a label of the form: IMAGE <image_index> (camera_id=<id>, spots=<N>).\n"
+    "In every image:\n"
+    "- The UPPER part of the image is the parking area, with N rectangular parking spaces in one row, "
+    "separated by vertical lines.\n"
+    "- The LOWER part of the image is a road that you must ignore for parking.\n"
+    "Images whose label ends in \"cropped\" were cut down to the parking area, which then fills most of the "
+    "image, with at most a thin strip of road along the bottom edge to ignore.\n\n"
+    "For each image, conceptually divide JUST the parking area into N equal-width vertical regions "
+    "from left to right (region 0 = leftmost, region N-1 = rightmost).\n\n"
+    + _REGION_RULES
+    + "Judge every image independently. Respond as a STRICT JSON object only, with no extra text."
+)
+
 
-    user_text_prompt = (
-        "Look ONLY at the parking spaces in the UPPER half of this image (above the front horizontal line) "
-        "and ignore the road below.\n"
-        "Using the fixed layout described above, determine whether each of the six spaces is \"empty\" or \"occupied\".\n\n"
+def _batch_user_prompt(frames: List[Dict[str, Any]]) -> str:
+    return (
+        f"There are {len(frames)} images below. For each one, determine whether each space is "
+        "\"empty\" or \"occupied\".\n\n"
         "Return JSON in exactly this format:\n"
         "{\n"
-        "  \"total_spots\": <integer total number of visible parking spots>,\n"
-        "  \"empty_spots\": <integer number of empty spots>,\n"
+        "  \"cameras\": [\n"
+        "    {\n"
+        "      \"image_index\": <integer from the image label>,\n"
+        "      \"camera_id\": <string from the image label>,\n"
+        "      \"spots\": [{\"spot_index\": <int>, \"status\": \"empty\" | \"occupied\"}, ...]\n"
+        "    },\n"
+        "    ...\n"
+        "  ]\n"
         "}\n\n"
         "Rules:\n"
-        f"- Always set \"total_spots\" to {NUM_SPOTS}.\n"
-        f"- Always return exactly {NUM_SPOTS} entries in \"spots\", one for each spot_index from 0 to {NUM_SPOTS - 1}, "
-        "ordered from left to right.\n"
-        "- Compute \"empty_spots\" as the count of entries whose status is \"empty\".\n"
+        "- Return exactly one entry in \"cameras\" per image, in image order.\n"
+        "- Each entry has exactly N spots, spot_index 0..N-1 from left to right, N taken from that image's label.\n"
+        "- If an image is unusable (blurry, black, or not a parking lot), set all its spots to \"occupied\".\n"
         "- Do NOT include any other fields or explanation text.\n"
-        f"If the image is completely unusable (blurry, black, or not a parking lot), still use \"total_spots\" = {NUM_SPOTS}, "
-        "and set all spots to status \"occupied\" (so empty_spots = 0).\n"
     )
 
-    # Call the OpenAI Chat Completions API with image input
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",  # supports vision + JSON, cheap enough for a class project
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": user_text_prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": image_data_url
-                        },
-                    },
-                ],
-            },
-        ],
-        max_tokens=500,
-    )
 
-    # The model was told to return a JSON object as a string
-    raw_content = response.choices[0].message.content
-    text = (raw_content or "").strip()
+def _failed(camera_id: Optional[str], error: Exception) -> Dict[str, Any]:
+    """
+    Result for one frame that could not be analyzed; the analysis
+    pipeline fails that frame's job on the "error" key.
+    """
+    return {"camera_id": camera_id, "error": f"{type(error).__name__}: {error}"}
 
-    try:
-        data = json.loads(raw_content)
-    except json.JSONDecodeError:
-        # Fallback: wrap raw text if model somehow returns non-JSON
-        data = {
-            "spots": [],
-            "notes": "Failed to parse model JSON.",
-        }
-
-    if isinstance(data, dict):
-        raw_spots = data.get("spots") or []
-
-        # Collect valid statuses by index from model output
-        status_by_idx = {}
-        for item in raw_spots:
-            if not isinstance(item, dict):
-                continue
-            idx = item.get("spot_index")
-            status = item.get("status")
-            if isinstance(idx, int) and 0 <= idx < NUM_SPOTS and status in ("empty", "occupied"):
-                status_by_idx[idx] = status
-
-        # Build canonical list: always 0..NUM_SPOTS-1
-        canonical_spots = []
-        for idx in range(NUM_SPOTS):
-            # Default to "occupied" if model didn't give anything usable
-            status = status_by_idx.get(idx, "occupied")
-            canonical_spots.append(
-                {
-                    "spot_index": idx,
-                    "status": status,
-                }
+
+def analyze_parking_images_batch(
+    frames: List[Dict[str, Any]],
+    llm_client=None,
+) -> List[Dict[str, Any]]:
+    """
+    Analyze frames from several cameras in ONE Chat Completions request.
+
+    frames: [{"camera_id": str, "image_path": str, "num_spots": int (optional)}, ...]
+
+    Returns one result per frame, in order, in the same canonical shape as
+    analyze_parking_image(). Frames whose part of the batch answer is
+    missing or malformed are re-analyzed with individual calls
+    (marked "batch_fallback": True). A frame that can't be analyzed at
+    all (missing file, failed fallback call) gets {"camera_id", "error"}
+    instead; the other frames' results are still returned.
+    """
+    if not frames:
+        return []
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(frames)
+    specs = []
+    for position, frame in enumerate(frames):
+        camera_id = frame.get("camera_id")
+        image_path_obj = Path(frame["image_path"])
+        if not image_path_obj.exists():
+            results[position] = _failed(camera_id, FileNotFoundError(f"Image not found: {image_path_obj}"))
+            continue
+        specs.append({
+            "position": position,
+            "camera_id": camera_id,
+            "image_path": str(image_path_obj),
+            "num_spots": frame.get("num_spots") or num_spots_for(camera_id),
+        })
+
+    def single(spec):
+        try:
+            return analyze_parking_image(spec["image_path"], spec["num_spots"], llm_client, spec["camera_id"])
+        except Exception as e:
+            print(f"[llm_processor] analysis of {spec['image_path']} failed: {e}")
+            return _failed(spec["camera_id"], e)
+
+    if len(specs) <= 1:
+        for spec in specs:
+            results[spec["position"]] = single(spec)
+        return results
+
+    started = time.perf_counter()
+    sent = []
+    for spec in specs:
+        try:
+            data_url, original_bytes, sent_bytes = _encode_image_to_data_url(
+                Path(spec["image_path"]), spec["camera_id"], "analyze_parking_images_batch"
             )
+        except OSError as e:
+            # Removed or unreadable since the existence check
+            results[spec["position"]] = _failed(spec["camera_id"], e)
+            continue
+        spec["payload_bytes"] = {"original": original_bytes, "sent": sent_bytes}
+        spec["data_url"] = data_url
+        sent.append(spec)
+
+    content: List[Dict[str, Any]] = [{"type": "text", "text": _batch_user_prompt(sent)}]
+    for i, spec in enumerate(sent):
+        content.append({
+            "type": "text",
+            "text": f"IMAGE {i} (camera_id={spec['camera_id']}, spots={spec['num_spots']})"
+                    + (", cropped" if _is_cropped(spec["camera_id"]) else ""),
+        })
+        content.append({
+            "type": "image_url",
+            "image_url": {"url": spec.pop("data_url")},
+        })
 
-        data["spots"] = canonical_spots
-        data["total_spots"] = NUM_SPOTS
-        data["empty_spots"] = sum(1 for s in canonical_spots if s["status"] == "empty")
+    text = ""
+    entries = None
+    # The batch request is not one camera's: its call and parse are timed
+    # (and counted) with camera_id ""
+    outcome = "api_error"
+    try:
+        if sent:
+            with STAGE_SECONDS.time("analyze_parking_images_batch", "openai_call", ""):
+                response = (llm_client or get_client()).chat.completions.create(
+                    model=MODEL_NAME,
+                    response_format={"type": "json_object"},
+                    messages=[
+                        {"role": "system", "content": _BATCH_SYSTEM_PROMPT},
+                        {"role": "user", "content": content},
+                    ],
+                    max_tokens=200 + sum(60 + 20 * spec["num_spots"] for spec in sent),
+                )
+            outcome = "bad_json"
+            with STAGE_SECONDS.time("analyze_parking_images_batch", "parse_json", ""):
+                raw_content = response.choices[0].message.content
+                text = (raw_content or "").strip()
+                data = json.loads(raw_content)
+                entries = data.get("cameras") if isinstance(data, dict) else None
+            LLM_REQUESTS.inc("", "ok")
+    except Exception as e:
+        LLM_REQUESTS.inc("", outcome)
+        print(f"[llm_processor] batch request failed, falling back to single calls: {e}")
+        entries = None
 
-        # Keep raw text for debugging
-        if "raw_model_text" not in data:
-            data["raw_model_text"] = text
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        i = entry.get("image_index")
+        if not isinstance(i, int) or not 0 <= i < len(sent) or results[sent[i]["position"]] is not None:
+            continue
+        spec = sent[i]
+        if entry.get("camera_id") not in (None, spec["camera_id"]):
+            continue
+        # Only trust entries that cover every spot of that camera
+        if len(_valid_statuses(entry.get("spots"), spec["num_spots"])) != spec["num_spots"]:
+            continue
+        result = {"spots": entry["spots"], "payload_bytes": spec["payload_bytes"]}
+        results[spec["position"]] = _canonicalize(result, spec["num_spots"], text)
 
-    return data
+    for spec in sent:
+        if results[spec["position"]] is None:
+            result = single(spec)
+            if isinstance(result, dict) and "error" not in result:
+                result["batch_fallback"] = True
+            results[spec["position"]] = result
+
+    STAGE_SECONDS.observe(time.perf_counter() - started, "analyze_parking_images_batch", "total", "")
+    return results
+
+
+class BatchingAnalyzer:
+    """
+    Collects frames from many threads (e.g. the analysis workers) and
+    sends them as analyze_parking_images_batch() requests.
+
+    A batch is sent when batch_size frames are waiting or when the oldest
+    waiting frame has waited flush_interval_s, whichever comes first.
+    Up to max_inflight batches can be in flight at once.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 4,
+        flush_interval_s: float = 0.5,
+        max_inflight: int = 4,
+        llm_client=None,
+    ):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval_s = float(flush_interval_s)
+        self.llm_client = llm_client
+
+        self._cond = threading.Condition()
+        self._waiting: List[tuple] = []  # (enqueued_at, frame, future)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_inflight,
+            thread_name_prefix="llm-batch",
+        )
+        self._counters = {"frames": 0, "batches": 0, "fallbacks": 0, "failed": 0}
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="llm-batch-flusher", daemon=True)
+        self._flusher.start()
+
+    def submit(self, camera_id: str, image_path: str, num_spots: Optional[int] = None) -> Future:
+        future: Future = Future()
+        frame = {"camera_id": camera_id, "image_path": image_path, "num_spots": num_spots}
+        with self._cond:
+            self._waiting.append((time.monotonic(), frame, future))
+            self._counters["frames"] += 1
+            self._cond.notify_all()
+        return future
+
+    def analyze(self, camera_id: str, image_path: str, num_spots: Optional[int] = None) -> Dict[str, Any]:
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(camera_id, image_path, num_spots).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self._counters,
+                "waiting": len(self._waiting),
+                "batch_size": self.batch_size,
+                "flush_interval_s": self.flush_interval_s,
+            }
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._waiting:
+                    self._cond.wait()
+                deadline = self._waiting[0][0] + self.flush_interval_s
+                while len(self._waiting) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._waiting[:self.batch_size]
+                del self._waiting[:self.batch_size]
+                self._counters["batches"] += 1
+
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[tuple]) -> None:
+        # Frames that fail on their own come back as {"error": ...} results
+        # (see analyze_parking_images_batch); only an unexpected exception
+        # fails the whole batch
+        frames = [frame for _, frame, _ in batch]
+        try:
+            results = analyze_parking_images_batch(frames, self.llm_client)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        fallbacks = sum(1 for r in results if isinstance(r, dict) and r.get("batch_fallback"))
+        failed = sum(1 for r in results if isinstance(r, dict) and "error" in r)
+        if fallbacks or failed:
+            with self._cond:
+                self._counters["fallbacks"] += fallbacks
+                self._counters["failed"] += failed
 
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
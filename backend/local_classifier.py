@@ -0,0 +1,265 @@
+# local_classifier.py
+#
+# Local CPU occupancy classifier used as a fast path ahead of the LLM.
+#
+# Each frame is split into the same equal-width spot regions that
+# llm_processor's prompt describes (upper parking area, left to right).
+# A few cheap image features per region go into a small sklearn
+# RandomForest (trained by train_occupancy_model.py, labelled with past
+# LLM answers from the spot history). If every spot is classified with enough
+# confidence we return that; otherwise the caller escalates to
+# analyze_parking_image.
+
+from __future__ import annotations
+
+import csv
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from PIL import Image
+
+from scene_change import DEFAULT_NUM_SPOTS, DEFAULT_PARKING_FRACTION
+
+MODEL_PATH = Path(__file__).with_name("occupancy_model.joblib")
+
+THUMB_SIZE = (160, 120)
+HIST_BINS = 8
+
+FEATURE_NAMES = (
+    ["position", "rel_brightness", "gray_std", "edge_x", "edge_y", "sat_mean", "sat_std", "dark_frac"]
+    + [f"hist_{i}" for i in range(HIST_BINS)]
+)
+
+
+def load_rgb(image_path: str) -> np.ndarray:
+    """
+    Small RGB thumbnail of a JPEG as float32 in [0, 1].
+    """
+    with Image.open(image_path) as img:
+        img.draft("RGB", (THUMB_SIZE[0] * 2, THUMB_SIZE[1] * 2))
+        rgb = img.convert("RGB").resize(THUMB_SIZE, Image.BILINEAR)
+        return np.asarray(rgb, dtype=np.float32) / 255.0
+
+
+def region_features(
+    rgb: np.ndarray,
+    num_spots: int = DEFAULT_NUM_SPOTS,
+    parking_fraction: float = DEFAULT_PARKING_FRACTION,
+) -> np.ndarray:
+    """
+    One feature row per spot region, shape (num_spots, len(FEATURE_NAMES)).
+    """
+    rows = max(2, int(round(rgb.shape[0] * parking_fraction)))
+    top = rgb[:rows]
+
+    gray = top.mean(axis=2)
+    sat = top.max(axis=2) - top.min(axis=2)
+    edge_x = np.abs(np.diff(gray, axis=1))
+    edge_y = np.abs(np.diff(gray, axis=0))
+    frame_mean = gray.mean()
+
+    feats = []
+    parts = zip(
+        np.array_split(gray, num_spots, axis=1),
+        np.array_split(sat, num_spots, axis=1),
+        np.array_split(edge_x, num_spots, axis=1),
+        np.array_split(edge_y, num_spots, axis=1),
+    )
+    for idx, (g, s, ex, ey) in enumerate(parts):
+        hist, _ = np.histogram(g - frame_mean, bins=HIST_BINS, range=(-0.5, 0.5))
+        feats.append([
+            idx / max(1, num_spots - 1),
+            g.mean() - frame_mean,
+            g.std(),
+            ex.mean(),
+            ey.mean(),
+            s.mean(),
+            s.std(),
+            (g < frame_mean - 0.2).mean(),
+            *(hist / g.size),
+        ])
+
+    return np.asarray(feats, dtype=np.float32)
+
+
+class LocalOccupancyClassifier:
+    """
+    Wraps the fitted sklearn model. classify() returns the canonical
+    llm_processor result shape plus per-spot confidences.
+    """
+
+    def __init__(self, model, min_confidence: float = 0.9, model_path: Path | str | None = None):
+        self.min_confidence = float(min_confidence)
+        self._model = None
+        self._model_path = model_path
+        self._lock = threading.Lock()
+        if model is not None:
+            self._set_model(model)
+
+    def _set_model(self, model) -> None:
+        # Column of predict_proba that means "occupied"; None for a model
+        # that only ever saw empty spots (it always answers p = 0)
+        classes = list(model.classes_)
+        self._occupied_col = classes.index(1) if 1 in classes else None
+        self._model = model
+
+    @property
+    def model(self):
+        """The fitted model, unpickled on first use when built by lazy()."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._set_model(joblib.load(self._model_path))
+        return self._model
+
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @classmethod
+    def load(cls, model_path: Path | str = MODEL_PATH, min_confidence: float = 0.9):
+        return cls(joblib.load(model_path), min_confidence)
+
+    @classmethod
+    def lazy(cls, model_path: Path | str = MODEL_PATH, min_confidence: float = 0.9):
+        """
+        Like load(), but defer unpickling (and importing sklearn) until the
+        first classify().
+        """
+        return cls(None, min_confidence, model_path)
+
+    def classify(
+        self,
+        image_path: str,
+        num_spots: int = DEFAULT_NUM_SPOTS,
+        parking_fraction: float = DEFAULT_PARKING_FRACTION,
+    ) -> Dict[str, Any]:
+        X = region_features(load_rgb(image_path), num_spots, parking_fraction)
+        model = self.model
+        if self._occupied_col is None:
+            p_occupied = np.zeros(len(X))
+        else:
+            p_occupied = model.predict_proba(X)[:, self._occupied_col]
+
+        spots = []
+        confidence = []
+        for idx, p in enumerate(p_occupied.tolist()):
+            occupied = p >= 0.5
+            spots.append({"spot_index": idx, "status": "occupied" if occupied else "empty"})
+            confidence.append(p if occupied else 1.0 - p)
+
+        return {
+            "spots": spots,
+            "total_spots": num_spots,
+            "empty_spots": sum(1 for s in spots if s["status"] == "empty"),
+            "spot_confidence": confidence,
+            "confident": min(confidence) >= self.min_confidence,
+            "source": "local",
+        }
+
+
+# -----------------------------
+# Training data from captures + LLM history
+# -----------------------------
+def _capture_time(path: Path) -> Tuple[str, float]:
+    """
+    captures/<camera_id>_<YYYYmmdd_HHMMSS>.jpg, as written by camera_upload.
+    """
+    camera_id, date_part, time_part = path.stem.rsplit("_", 2)
+    ts = datetime.strptime(f"{date_part}_{time_part}", "%Y%m%d_%H%M%S")
+    return camera_id, ts.timestamp()
+
+
+def _history_rows(history):
+    """
+    Rows from a history.csv path or anything with a query() method
+    (a history_store.HistoryStore).
+    """
+    if hasattr(history, "query"):
+        yield from history.query()
+        return
+    with open(history, newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def labelled_frames(
+    captures_dir: Path | str,
+    history,
+    max_skew_s: float = 2.0,
+) -> List[Tuple[Path, str, Dict[int, int]]]:
+    """
+    Pair saved captures with the history rows written for them.
+    history is a history.csv path or a HistoryStore.
+
+    Returns [(image_path, camera_id, {spot_index: 1 if occupied else 0})].
+    Rows are matched per camera by nearest timestamp within max_skew_s.
+
+    Note: history rows come from whatever analyzed the frame, so once the
+    local fast path is enabled, retrain only on frames the LLM labelled
+    (e.g. captures from before it was turned on).
+    """
+    by_camera: Dict[str, Dict[float, Dict[int, int]]] = defaultdict(dict)
+    for row in _history_rows(history):
+        try:
+            ts = datetime.fromisoformat(row["timestamp"].replace("Z", "")).timestamp()
+            idx = int(row["spot_index"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if row.get("status") not in ("empty", "occupied"):
+            continue
+        by_camera[row["camera_id"]].setdefault(ts, {})[idx] = int(row["status"] == "occupied")
+
+    times = {cam: sorted(snaps) for cam, snaps in by_camera.items()}
+
+    frames = []
+    for path in sorted(Path(captures_dir).glob("*.jpg")):
+        try:
+            camera_id, ts = _capture_time(path)
+        except ValueError:
+            continue
+        cam_times = times.get(camera_id)
+        if not cam_times:
+            continue
+
+        i = bisect_left(cam_times, ts)
+        nearest = min(
+            (t for t in cam_times[max(0, i - 1):i + 1]),
+            key=lambda t: abs(t - ts),
+        )
+        if abs(nearest - ts) <= max_skew_s:
+            frames.append((path, camera_id, by_camera[camera_id][nearest]))
+
+    return frames
+
+
+def build_dataset(frames, num_spots_for=lambda camera_id: DEFAULT_NUM_SPOTS):
+    """
+    Feature matrix, labels and per-row frame ids for labelled_frames() output.
+    """
+    X, y, groups = [], [], []
+    for frame_id, (path, camera_id, labels) in enumerate(frames):
+        num_spots = num_spots_for(camera_id)
+        feats = region_features(load_rgb(str(path)), num_spots)
+        for idx in range(num_spots):
+            if idx in labels:
+                X.append(feats[idx])
+                y.append(labels[idx])
+                groups.append(frame_id)
+    return np.asarray(X, dtype=np.float32), np.asarray(y), np.asarray(groups)
+
+
+def load_default(min_confidence: float = 0.9, lazy: bool = False) -> Optional[LocalOccupancyClassifier]:
+    """
+    The trained classifier if occupancy_model.joblib exists, else None.
+    With lazy the model file is only read on first use.
+    """
+    if not MODEL_PATH.exists():
+        return None
+    if lazy:
+        return LocalOccupancyClassifier.lazy(MODEL_PATH, min_confidence)
+    return LocalOccupancyClassifier.load(MODEL_PATH, min_confidence)
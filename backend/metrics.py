@@ -0,0 +1,346 @@
+# metrics.py
+#
+# Per-stage timings and counters, exposed in the Prometheus text format
+# at /metrics, so a slow upload or forecast can be traced to the stage
+# that took the time (reading the body, saving the JPEG, preprocessing,
+# the OpenAI call, the history append, ...) instead of to print lines.
+#
+# No prometheus_client dependency: a histogram observation is a bisect
+# over fixed buckets and three additions under the metric's lock (about
+# a microsecond), and label series can be resolved once with .labels()
+# for hot paths. METRICS_ENABLED=0 turns every observation into a no-op.
+#
+# Label values such as camera_id come from clients, so each metric keeps
+# at most max_series label sets; observations beyond that are counted
+# under "other" label values (and reported in
+# metrics_series_overflow_total).
+#
+# Under serve.py the numbers are per worker process (labelled worker=N),
+# like the /api/camera/pipeline counters.
+
+from __future__ import annotations
+
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Seconds: sub-millisecond table lookups up to multi-second OpenAI calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+DEFAULT_MAX_SERIES = 10000
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+OTHER = "other"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("_series", "_start")
+
+    def __init__(self, series):
+        self._series = series
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._series.observe(perf_counter() - self._start)
+        return False
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labels: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self.overflowed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.registry.enabled
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        The series for these label values (in label order), created on
+        first use. Keep the result to skip the lookup on hot paths.
+        """
+        # Label values are usually strings already: try them as the key first
+        series = self._series.get(values)
+        if series is not None:
+            return series
+        key = tuple(str(v) if v is not None else "" for v in values)
+        if len(key) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {values!r}")
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                if len(self._series) >= self.registry.max_series:
+                    self.overflowed += 1
+                    key = (OTHER,) * len(self.label_names)
+                    series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = self._new_series()
+            return series
+
+    def _snapshot(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return [(key, series.snapshot()) for key, series in self._series.items()]
+
+
+class _CounterSeries:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self.value = 0
+
+    def inc(self, amount=1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries(self._lock)
+
+    def inc(self, *label_values, amount=1) -> None:
+        if not self.registry.enabled:
+            return
+        self.labels(*label_values).inc(amount)
+
+    def render(self, lines: List[str], const: Tuple[Tuple[str, str], ...]) -> None:
+        names = tuple(n for n, _ in const) + self.label_names
+        for key, value in self._snapshot():
+            labels = _label_text(names, tuple(v for _, v in const) + key)
+            lines.append(f"{self.name}{labels} {_number(value)}")
+
+
+class _HistogramSeries:
+    __slots__ = ("_lock", "_buckets", "counts", "sum", "count", "_registry")
+
+    def __init__(self, lock: threading.Lock, buckets: Tuple[float, ...], registry: "MetricsRegistry"):
+        self._lock = lock
+        self._buckets = buckets
+        self._registry = registry
+        # Per bucket (not cumulative); the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._registry.enabled
+
+    def observe(self, value: float) -> None:
+        if not self._registry.enabled:
+            return
+        i = bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the seconds spent in its block."""
+        if not self._registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self)
+
+    def snapshot(self):
+        return list(self.counts), self.sum, self.count
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labels, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self._lock, self.buckets, self.registry)
+
+    def observe(self, value: float, *label_values) -> None:
+        if not self.registry.enabled:
+            return
+        self.labels(*label_values).observe(value)
+
+    def time(self, *label_values):
+        """
+        with STAGE_SECONDS.time("camera_upload", "save_jpeg", camera_id): ...
+        """
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self.labels(*label_values))
+
+    def render(self, lines: List[str], const: Tuple[Tuple[str, str], ...]) -> None:
+        names = tuple(n for n, _ in const) + self.label_names
+        les = [f'le="{_number(b)}"}} ' for b in self.buckets] + ['le="+Inf"} ']
+        for key, (counts, total, count) in self._snapshot():
+            labels = _label_text(names, tuple(v for _, v in const) + key)
+            # The series' labels, escaped once, then le per bucket
+            head = f"{self.name}_bucket{{" + (labels[1:-1] + "," if labels else "")
+            cumulative = 0
+            for le, n in zip(les, counts):
+                cumulative += n
+                lines.append(f"{head}{le}{cumulative}")
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+
+
+class MetricsRegistry:
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_series: int = DEFAULT_MAX_SERIES,
+        const_labels: Optional[Dict[str, str]] = None,
+    ):
+        """
+        - enabled: False makes every inc/observe/time a no-op
+        - max_series: label sets kept per metric (see OTHER)
+        - const_labels: added to every sample (e.g. the serve.py worker)
+        """
+        self.enabled = bool(enabled)
+        self.max_series = max(1, int(max_series))
+        self.const_labels = tuple((const_labels or {}).items())
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            metric.render(lines, self.const_labels)
+
+        overflowed = [(m.name, m.overflowed) for m in metrics if m.overflowed]
+        if overflowed:
+            names = tuple(n for n, _ in self.const_labels) + ("metric",)
+            lines.append("# HELP metrics_series_overflow_total Observations recorded under 'other' labels")
+            lines.append("# TYPE metrics_series_overflow_total counter")
+            for name, n in overflowed:
+                labels = _label_text(names, tuple(v for _, v in self.const_labels) + (name,))
+                lines.append(f"metrics_series_overflow_total{labels} {n}")
+        return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# The backend's metrics
+# -----------------------------
+REGISTRY = MetricsRegistry(
+    enabled=METRICS_ENABLED,
+    max_series=int(os.environ.get("METRICS_MAX_SERIES", str(DEFAULT_MAX_SERIES))),
+    const_labels={"worker": os.environ["SERVE_WORKER_ID"]} if os.environ.get("SERVE_WORKER_ID") else None,
+)
+
+# operation: camera_upload, analyze_frame, analyze_parking_image,
+# analyze_parking_images_batch, update_spot_storage, forecast,
+# forecast_batch, forecast_horizon; stage "total" is the whole operation
+STAGE_SECONDS = REGISTRY.histogram(
+    "parking_stage_seconds",
+    "Seconds spent in each stage of an upload, analysis, storage update or forecast",
+    ("operation", "stage", "camera_id"),
+)
+
+UPLOADS = REGISTRY.counter(
+    "parking_uploads_total",
+    "Camera uploads by outcome (accepted, rejected, empty)",
+    ("camera_id", "outcome"),
+)
+
+UPLOAD_BYTES = REGISTRY.counter(
+    "parking_upload_bytes_total",
+    "JPEG bytes received from cameras",
+    ("camera_id",),
+)
+
+ANALYSES = REGISTRY.counter(
+    "parking_analyses_total",
+    "Analyzed frames by where the result came from (scene_reuse, local, llm, llm_batch, error)",
+    ("camera_id", "source"),
+)
+
+LLM_REQUESTS = REGISTRY.counter(
+    "parking_llm_requests_total",
+    "OpenAI requests by outcome (ok, api_error, bad_json)",
+    ("camera_id", "outcome"),
+)
+
+HISTORY_ROWS = REGISTRY.counter(
+    "parking_history_rows_total",
+    "Spot rows appended to the history store",
+    ("camera_id",),
+)
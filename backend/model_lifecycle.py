@@ -0,0 +1,407 @@
+# model_lifecycle.py
+#
+# Online retraining of the forecast model.
+#
+# ModelLifecycle runs in the backend as a background thread:
+#   1. feature_pipeline materializes new history rows (incremental),
+#   2. once enough new rows arrived (or the schedule is due), a separate
+#      Python process (this file's "train" command) fits a candidate with
+#      train_model.build_classifier(), scores it and the active model on
+#      the most recent holdout, and commits it to the model store with
+#      the verdict in its meta.json,
+#   3. an accepted candidate is loaded (table built) off the request path
+#      and swapped into predictor in one assignment.
+#
+# Training in a child process keeps the forest fit (n_jobs=-1) from
+# competing with request threads for the GIL; a crash there leaves the
+# active model untouched.
+#
+#   python model_lifecycle.py status
+#   python model_lifecycle.py retrain        # one cycle, outside the server
+#   python model_lifecycle.py rollback
+#   python model_lifecycle.py activate v0003
+#   python model_lifecycle.py train-camera lot-a --cameras cam-001,cam-002
+#   python model_lifecycle.py status --camera lot-a
+#
+# A running server (every serve.py worker, including those that do not
+# retrain) follows CLI activations/rollbacks on its next poll
+# (per-camera ones within predictor.MODEL_REGISTRY's refresh interval);
+# the /api/model endpoints in app.py apply them immediately.
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from feature_pipeline import FEATURES_DIR, FeaturePipeline
+from forecast_engine import ProbabilityTable
+from model_store import MODELS_DIR, ModelStore
+
+DEFAULT_INTERVAL_S = 6 * 3600.0
+DEFAULT_MIN_NEW_ROWS = 2000
+DEFAULT_POLL_S = 300.0
+DEFAULT_MAX_BRIER_REGRESSION = 0.005
+DEFAULT_MIN_HOLDOUT_ROWS = 200
+
+
+def _score(model, X: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    classes = list(model.classes_)
+    if 1 in classes:
+        p = model.predict_proba(X)[:, classes.index(1)]
+    else:
+        p = np.zeros(len(y))
+    return {
+        "brier": float(np.mean((p - y) ** 2)),
+        "accuracy": float(np.mean((p >= 0.5) == (y == 1))),
+    }
+
+
+def train_candidate(
+    model_store: ModelStore,
+    features_dir: Path | str = FEATURES_DIR,
+    baseline_version: Optional[str] = None,
+    max_brier_regression: float = DEFAULT_MAX_BRIER_REGRESSION,
+    min_holdout_rows: int = DEFAULT_MIN_HOLDOUT_ROWS,
+    camera_ids=None,
+    baseline_store: Optional[ModelStore] = None,
+) -> Dict[str, Any]:
+    """
+    Fit, validate and commit one candidate version. Runs in the training
+    process. The candidate is accepted if its holdout Brier score is no
+    worse than the baseline's by more than max_brier_regression.
+
+    camera_ids restricts training and holdout rows to those cameras.
+    baseline_version is read from baseline_store (default model_store),
+    e.g. the global model when a camera gets its first own model.
+    """
+    import joblib
+
+    from train_model import build_classifier, load_feature_split
+
+    X_train, y_train, X_test, y_test = load_feature_split(Path(features_dir), camera_ids=camera_ids)
+    if len(y_test) < min_holdout_rows:
+        return {"status": "skipped", "reason": f"only {len(y_test)} holdout rows"}
+    if len(np.unique(y_train)) < 2:
+        return {"status": "skipped", "reason": "training rows have a single label"}
+
+    clf = build_classifier()
+    clf.fit(X_train, y_train)
+    candidate = _score(clf, X_test, y_test)
+
+    baseline = None
+    if baseline_version is not None:
+        baseline_path = (baseline_store or model_store).model_path(baseline_version)
+        baseline = _score(joblib.load(baseline_path), X_test, y_test)
+
+    accepted = baseline is None or candidate["brier"] <= baseline["brier"] + max_brier_regression
+
+    version = model_store.new_version()
+    joblib.dump(clf, model_store.model_path(version))
+    # Serving processes memory-map this instead of unpickling the forest
+    ProbabilityTable.from_model(clf).save(model_store.table_path(version))
+    model_store.commit(version, {
+        "origin": "retrain",
+        "cameras": sorted(camera_ids) if camera_ids is not None else None,
+        "feature_rows": int(len(y_train) + len(y_test)),
+        "train_rows": int(len(y_train)),
+        "holdout_rows": int(len(y_test)),
+        "holdout": candidate,
+        "baseline": {"version": baseline_version, "holdout": baseline},
+        "accepted": accepted,
+    })
+    return {"status": "trained", "version": version, "accepted": accepted, "holdout": candidate, "baseline": baseline}
+
+
+class ModelLifecycle:
+    """
+    Background retrain-validate-swap loop for predictor's model.
+    """
+
+    def __init__(
+        self,
+        history_store,
+        model_store: Optional[ModelStore] = None,
+        features_dir: Path | str = FEATURES_DIR,
+        interval_s: float = DEFAULT_INTERVAL_S,
+        min_new_rows: int = DEFAULT_MIN_NEW_ROWS,
+        poll_s: float = DEFAULT_POLL_S,
+        max_brier_regression: float = DEFAULT_MAX_BRIER_REGRESSION,
+        train_timeout_s: float = 1800.0,
+    ):
+        import predictor
+
+        self._predictor = predictor
+        self.model_store = model_store or predictor.MODEL_STORE
+        self.features_dir = Path(features_dir)
+        self.pipeline = FeaturePipeline(history_store, self.features_dir)
+        self.interval_s = float(interval_s)
+        self.min_new_rows = int(min_new_rows)
+        self.poll_s = float(poll_s)
+        self.max_brier_regression = float(max_brier_regression)
+        self.train_timeout_s = float(train_timeout_s)
+
+        self._train_lock = threading.RLock()
+        self._stop = threading.Event()
+        # Set to run the loop before poll_s is up (stop, request_retrain)
+        self._wake = threading.Event()
+        self._request_lock = threading.Lock()
+        self._retrain_requested = False
+        self._thread: Optional[threading.Thread] = None
+        self._train = True
+        self._last_train = time.time()
+        # Feature rows seen by the last training attempt, so a rejected
+        # candidate (or a rollback) does not retrigger training every poll
+        self._attempted_rows = 0
+        self._counters = {"cycles": 0, "trained": 0, "accepted": 0, "rejected": 0, "failed": 0, "rollbacks": 0}
+        self._last_result: Optional[Dict[str, Any]] = None
+
+    def start(self, train: bool = True) -> None:
+        """
+        train=False only follows activations made elsewhere (the CLI, or
+        the serve.py worker that does the training).
+        """
+        if self._thread is None:
+            self._train = train
+            self._thread = threading.Thread(target=self._loop, name="model-lifecycle", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def request_retrain(self) -> bool:
+        """
+        Queue a forced cycle (run_once(force=True)) on the background
+        thread, for callers that must not wait for training. False if one
+        is already queued.
+        """
+        with self._request_lock:
+            if self._retrain_requested:
+                return False
+            self._retrain_requested = True
+        self._wake.set()
+        return True
+
+    def _bootstrap(self) -> None:
+        """
+        Give an empty global store its first version (the model predictor
+        has been serving from parking_forecast_model.joblib) and switch
+        to it.
+        """
+        with self._train_lock:
+            if self.model_store is self._predictor.MODEL_STORE and self._predictor.bootstrap_store() is not None:
+                self._sync_active()
+
+    def _loop(self) -> None:
+        if self._train:
+            try:
+                self._bootstrap()
+            except Exception as e:
+                print(f"[model_lifecycle] Could not import the first model version: {e}")
+        while True:
+            self._wake.wait(self.poll_s)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            with self._request_lock:
+                forced, self._retrain_requested = self._retrain_requested, False
+            try:
+                if self._train or forced:
+                    self.run_once(force=forced)
+                else:
+                    with self._train_lock:
+                        self._sync_active()
+            except Exception as e:
+                self._counters["failed"] += 1
+                print(f"[model_lifecycle] Cycle failed: {e}")
+
+    def _rows_since_train(self) -> int:
+        trained_on = 0
+        version = self.model_store.active_version()
+        if version is not None:
+            trained_on = int(self.model_store.meta(version).get("feature_rows", 0))
+        trained_on = max(trained_on, self._attempted_rows)
+        return self.pipeline.load_checkpoint()["rows"] - trained_on
+
+    def run_once(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Materialize new features and, if due (or forced), train, validate
+        and maybe swap in a new model. Returns what happened.
+        """
+        with self._train_lock:
+            self._counters["cycles"] += 1
+            self._bootstrap()
+            self._sync_active()
+            features = self.pipeline.run_once()
+
+            new_rows = self._rows_since_train()
+            due = new_rows >= self.min_new_rows or (
+                new_rows > 0 and time.time() - self._last_train >= self.interval_s
+            )
+            if not (force or due):
+                return {"status": "idle", "new_rows": new_rows, "features": features}
+
+            self._last_train = time.time()
+            self._attempted_rows = features["total_rows"]
+            result = self._train_in_subprocess()
+            if result.get("status") == "trained":
+                self._counters["trained"] += 1
+                if result["accepted"]:
+                    self.activate(result["version"])
+                    self._counters["accepted"] += 1
+                else:
+                    self._counters["rejected"] += 1
+            self._last_result = result
+            print(f"[model_lifecycle] {result}")
+            return result
+
+    def _sync_active(self) -> None:
+        """
+        Follow activations made outside this process (the CLI below).
+        """
+        version = self.model_store.active_version()
+        if version is not None and version != self._predictor.model_version():
+            self._predictor.set_active(self._predictor.load_version(version))
+            print(f"[model_lifecycle] Switched to {version} (activated externally)")
+
+    def _train_in_subprocess(self) -> Dict[str, Any]:
+        cmd = [
+            sys.executable, str(Path(__file__).resolve()), "train",
+            "--models", str(self.model_store.root),
+            "--features", str(self.features_dir),
+            "--max-brier-regression", str(self.max_brier_regression),
+        ]
+        baseline = self.model_store.active_version()
+        if baseline is not None:
+            cmd += ["--baseline", baseline]
+
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=self.train_timeout_s)
+        if proc.returncode != 0:
+            self._counters["failed"] += 1
+            return {"status": "failed", "stderr": proc.stderr[-2000:]}
+        # Last stdout line is the JSON result
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    def activate(self, version: str) -> None:
+        """
+        Load `version` (and build its table) first, then record it as
+        active and swap it in, so requests never see a partly loaded model.
+        """
+        with self._train_lock:
+            active = self._predictor.load_version(version)
+            self.model_store.activate(version)
+            self._predictor.set_active(active)
+
+    def rollback(self) -> str:
+        with self._train_lock:
+            previous = self.model_store.previous_version()
+            if previous is None:
+                raise ValueError("no earlier model version to roll back to")
+            active = self._predictor.load_version(previous)
+            self.model_store.rollback()
+            self._predictor.set_active(active)
+            self._counters["rollbacks"] += 1
+            return previous
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "active_version": self._predictor.model_version(),
+            "rows_since_train": self._rows_since_train(),
+            "min_new_rows": self.min_new_rows,
+            "interval_s": self.interval_s,
+            "counters": dict(self._counters),
+            "retrain_queued": self._retrain_requested,
+            "last_result": self._last_result,
+        }
+
+
+def main():
+    import argparse
+
+    from model_registry import CAMERA_MODELS_DIR
+
+    parser = argparse.ArgumentParser(description="Forecast model lifecycle")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="fit and commit one candidate (used by the server)")
+    train.add_argument("--models", default=str(MODELS_DIR))
+    train.add_argument("--features", default=str(FEATURES_DIR))
+    train.add_argument("--baseline", default=None)
+    train.add_argument("--max-brier-regression", type=float, default=DEFAULT_MAX_BRIER_REGRESSION)
+
+    sub.add_parser("retrain", help="materialize features and run one forced cycle")
+
+    train_camera = sub.add_parser(
+        "train-camera",
+        help="train a model for one camera or lot from the materialized features",
+    )
+    train_camera.add_argument("key", help="camera id, or lot id (see model_registry aliases)")
+    train_camera.add_argument("--cameras", default=None, help="comma-separated cameras of the lot (default: key)")
+    train_camera.add_argument("--max-brier-regression", type=float, default=DEFAULT_MAX_BRIER_REGRESSION)
+
+    # --camera selects a per-camera store instead of the global one
+    for name in ("status", "rollback", "activate"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--camera", default=None)
+        if name == "activate":
+            cmd.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        result = train_candidate(
+            ModelStore(args.models), args.features, args.baseline, args.max_brier_regression,
+        )
+        print(json.dumps(result))
+        return
+
+    if args.command == "train-camera":
+        store = ModelStore(CAMERA_MODELS_DIR / args.key)
+        cameras = args.cameras.split(",") if args.cameras else [args.key]
+        # Until the camera has its own model it has to beat the global one
+        baseline_store = store if store.active_version() is not None else ModelStore()
+        result = train_candidate(
+            store, FEATURES_DIR, baseline_store.active_version(), args.max_brier_regression,
+            camera_ids=cameras, baseline_store=baseline_store,
+        )
+        if result.get("accepted"):
+            store.activate(result["version"])
+        print(json.dumps(result))
+        return
+
+    camera = getattr(args, "camera", None)
+    store = ModelStore(CAMERA_MODELS_DIR / camera) if camera else ModelStore()
+    if args.command == "status":
+        print(json.dumps(store.describe(), indent=2))
+    elif args.command == "rollback":
+        print(f"Active model: {store.rollback()}")
+    elif args.command == "activate":
+        store.activate(args.version)
+        print(f"Active model: {args.version}")
+    elif args.command == "retrain":
+        import os
+
+        from history_store import open_history_store
+
+        history = open_history_store(
+            os.environ.get("HISTORY_BACKEND", "sqlite"),
+            os.environ.get("HISTORY_PATH"),
+            migrate_from_csv=str(Path(__file__).with_name("history.csv")),
+            flush_interval_s=0,
+        )
+        try:
+            print(ModelLifecycle(history, store).run_once(force=True))
+        finally:
+            history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# model_registry.py
+#
+# Per-camera (or per-lot) forecast models with the global model as the
+# fallback.
+#
+# Each key with its own model has a versioned store next to the global
+# one (same layout, see model_store.py):
+#   models/forecast/            global model (predictor.MODEL_STORE)
+#   models/cameras/<key>/       model for one camera or lot
+# Cameras are mapped to keys with `aliases` (e.g. every camera of a lot
+# -> the lot id); unmapped cameras use their own id.
+#
+# ModelRegistry keeps at most `capacity` loaded ActiveModels in an LRU.
+# A loaded model is only its memory-mapped table.npy (~80 KB, shared
+# between processes), so even a full cache stays small; keys without
+# a model are cached too, as "use the global model", so the directory
+# is not stat'ed on every request. Entries older than refresh_s re-check
+# their store's active version, which picks up new activations and
+# newly added per-camera models.
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from model_store import ModelStore
+
+CAMERA_MODELS_DIR = Path(__file__).with_name("models") / "cameras"
+
+DEFAULT_CAPACITY = 64
+DEFAULT_REFRESH_S = 30.0
+
+# Keys become directory names; anything else (e.g. "../x") gets the global model
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        load_version: Callable[[ModelStore, str], Any],
+        global_model: Callable[[], Any],
+        root: Path | str = CAMERA_MODELS_DIR,
+        capacity: int = DEFAULT_CAPACITY,
+        refresh_s: float = DEFAULT_REFRESH_S,
+        aliases: Optional[Dict[str, str]] = None,
+    ):
+        """
+        - load_version(store, version): load one version as an ActiveModel
+        - global_model(): the current fallback (predictor.active_model)
+        """
+        self._load_version = load_version
+        self._global_model = global_model
+        self.root = Path(root)
+        self.capacity = max(1, int(capacity))
+        self.refresh_s = float(refresh_s)
+        self.aliases = dict(aliases or {})
+
+        self._lock = threading.Lock()
+        # key -> (ActiveModel or None for "no own model", checked_at)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "fallbacks": 0}
+
+    def key_for(self, camera_id: Optional[str]) -> Optional[str]:
+        if camera_id is None:
+            return None
+        return self.aliases.get(camera_id, camera_id)
+
+    def store_for(self, key: str) -> ModelStore:
+        return ModelStore(self.root / key)
+
+    def get(self, camera_id: Optional[str]):
+        """
+        The ActiveModel serving camera_id: its own (or its lot's) model if
+        one is active, else the global model.
+        """
+        key = self.key_for(camera_id)
+        if key is None or not _SAFE_KEY.match(key):
+            return self._global_model()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            fresh = entry is not None and now - entry[1] < self.refresh_s
+            if fresh:
+                self._cache.move_to_end(key)
+                self._counters["hits"] += 1
+            else:
+                self._counters["misses"] += 1
+
+        # Loading happens outside the lock so one slow load (e.g. a version
+        # without table.npy yet) does not stall lookups for other cameras
+        model = entry[0] if fresh else self._refresh(key, entry, now)
+
+        if model is None:
+            with self._lock:
+                self._counters["fallbacks"] += 1
+            return self._global_model()
+        return model
+
+    def _refresh(self, key: str, entry, now: float):
+        """Load or re-validate `key`. Returns its model or None."""
+        store = self.store_for(key)
+        version = store.active_version() if store.root.exists() else None
+
+        current = entry[0] if entry is not None else None
+        loaded = False
+        if version is None:
+            model = None
+        elif current is not None and current.version == version:
+            model = current
+        else:
+            model = self._load_version(store, version)
+            loaded = True
+
+        with self._lock:
+            if loaded:
+                self._counters["loads"] += 1
+            self._cache[key] = (model, now)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+                self._counters["evictions"] += 1
+        return model
+
+    def invalidate(self, camera_id: Optional[str] = None) -> None:
+        """Forget one key (or everything) so the next get() reloads it."""
+        with self._lock:
+            if camera_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(self.key_for(camera_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "resident": len(self._cache),
+                "resident_models": sum(1 for model, _ in self._cache.values() if model is not None),
+                "capacity": self.capacity,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,166 @@
+# model_store.py
+#
+# Versioned directory of forecast models:
+#
+#   models/forecast/
+#     v0001/model.joblib   v0001/table.npy   v0001/meta.json
+#     v0002/...
+#     manifest.json        {"active": "v0002", "history": ["v0001", "v0002"]}
+#
+# A version directory is only listed once its meta.json exists (written
+# last), so a half-written training run is never picked up. manifest.json
+# is replaced atomically; "history" is the activation order, which
+# rollback() walks back through.
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MODELS_DIR = Path(__file__).with_name("models") / "forecast"
+MODEL_FILE = "model.joblib"
+# Cached ProbabilityTable for the version (see predictor.load_version)
+TABLE_FILE = "table.npy"
+META_FILE = "meta.json"
+
+
+class ModelStore:
+    def __init__(self, root: Path | str = MODELS_DIR, keep_versions: int = 10):
+        self.root = Path(root)
+        self.keep_versions = int(keep_versions)
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Versions
+    # -----------------------------
+    def versions(self) -> List[str]:
+        """Committed versions, oldest first."""
+        if not self.root.exists():
+            return []
+        return sorted(
+            p.name for p in self.root.iterdir()
+            if p.is_dir() and p.name.startswith("v") and (p / META_FILE).exists()
+        )
+
+    def model_path(self, version: str) -> Path:
+        return self.root / version / MODEL_FILE
+
+    def table_path(self, version: str) -> Path:
+        return self.root / version / TABLE_FILE
+
+    def meta(self, version: str) -> Dict[str, Any]:
+        with open(self.root / version / META_FILE) as f:
+            return json.load(f)
+
+    def new_version(self) -> str:
+        """
+        Reserve the next version id and create its (uncommitted) directory.
+        """
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            taken = [int(p.name[1:]) for p in self.root.iterdir() if p.is_dir() and p.name[1:].isdigit()]
+            version = f"v{max(taken, default=0) + 1:04d}"
+            (self.root / version).mkdir()
+            return version
+
+    def commit(self, version: str, meta: Dict[str, Any]) -> None:
+        """
+        Mark a version complete (its model.joblib must already be written).
+        """
+        meta = {"version": version, "created_at": datetime.utcnow().isoformat() + "Z", **meta}
+        path = self.root / version / META_FILE
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, path)
+
+    def discard(self, version: str) -> None:
+        shutil.rmtree(self.root / version, ignore_errors=True)
+
+    def import_file(self, model_file: Path | str, meta: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Copy an existing joblib (e.g. parking_forecast_model.joblib from
+        train_model.py) in as a new committed version.
+        """
+        version = self.new_version()
+        shutil.copyfile(model_file, self.model_path(version))
+        self.commit(version, {"source": str(model_file), **(meta or {})})
+        return version
+
+    # -----------------------------
+    # Activation
+    # -----------------------------
+    def _manifest(self) -> Dict[str, Any]:
+        path = self.root / "manifest.json"
+        if not path.exists():
+            return {"active": None, "history": []}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / "manifest.json"
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    def active_version(self) -> Optional[str]:
+        with self._lock:
+            return self._manifest()["active"]
+
+    def activate(self, version: str) -> None:
+        with self._lock:
+            if not (self.root / version / META_FILE).exists():
+                raise KeyError(f"unknown model version {version!r}")
+            manifest = self._manifest()
+            if manifest["active"] != version:
+                manifest["active"] = version
+                manifest["history"] = (manifest["history"] + [version])[-self.keep_versions:]
+                self._write_manifest(manifest)
+        self.prune()
+
+    def previous_version(self) -> Optional[str]:
+        """The version rollback() would activate, or None."""
+        with self._lock:
+            history = self._manifest()["history"]
+            return history[-2] if len(history) >= 2 else None
+
+    def rollback(self) -> str:
+        """
+        Re-activate the version that was active before the current one.
+        """
+        with self._lock:
+            manifest = self._manifest()
+            if len(manifest["history"]) < 2:
+                raise ValueError("no earlier model version to roll back to")
+            manifest["history"].pop()
+            manifest["active"] = manifest["history"][-1]
+            self._write_manifest(manifest)
+            return manifest["active"]
+
+    def prune(self) -> None:
+        """
+        Delete the oldest versions beyond keep_versions, except any still
+        reachable by rollback.
+        """
+        with self._lock:
+            keep = set(self._manifest()["history"])
+            versions = self.versions()
+            for version in versions[:max(0, len(versions) - self.keep_versions)]:
+                if version not in keep:
+                    shutil.rmtree(self.root / version, ignore_errors=True)
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            manifest = self._manifest()
+        return {
+            "active": manifest["active"],
+            "history": manifest["history"],
+            "versions": [self.meta(v) for v in self.versions()],
+        }
@@ -5,20 +5,189 @@
 # empty at the driver's arrival time.
 #
 # IMPORTANT:
-# - Requires parking_forecast_model.joblib (trained by train_model_24h.py)
+# - Serves the active version from models/forecast (see model_store.py).
+#   Until that store has one, parking_forecast_model.joblib (trained by
+#   train_model.py) is served straight from the file; model_lifecycle.py
+#   imports it as the first version when it starts retraining, then
+#   retrains and swaps it live.
 # - Function signatures are unchanged so the rest of the backend
 #   (Flask routes, iOS app, etc.) do not need to be modified.
 
 from __future__ import annotations
 
+import os
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Any, Optional
 
-import joblib
+import numpy as np
 
-# Load the trained model at import time
+from forecast_engine import MINUTES_PER_WEEK, ProbabilityTable, crossing_waits, first_crossing, week_slot
+from model_registry import DEFAULT_CAPACITY, ModelRegistry
+from model_store import ModelStore
+
+# Output of train_model.py; served as FILE_VERSION while the versioned
+# model store (see model_store.py) is still empty
 _MODEL_PATH = Path(__file__).with_name("parking_forecast_model.joblib")
-_model = joblib.load(_MODEL_PATH)
+FILE_VERSION = "file"
+
+MODEL_STORE = ModelStore()
+
+
+class ActiveModel:
+    """
+    One model version as served: its version id and probability table.
+
+    Requests only need the table, which is memory-mapped from the
+    version's table.npy (shared by all worker processes). The forest
+    itself is only unpickled if something asks for .model.
+    """
+
+    __slots__ = ("version", "table", "_model", "_model_path")
+
+    def __init__(self, version: str, model: Any, table: ProbabilityTable, model_path: Path | None = None):
+        self.version = version
+        # Whole time-of-week grid scored once, so requests never touch the forest
+        self.table = table
+        self._model = model
+        self._model_path = model_path
+
+    @property
+    def model(self):
+        if self._model is None and self._model_path is not None:
+            import joblib
+
+            self._model = joblib.load(self._model_path)
+        return self._model
+
+
+def load_version(version: Optional[str] = None, store: Optional[ModelStore] = None) -> ActiveModel:
+    """
+    Load a version from `store` (default MODEL_STORE; default version: the
+    active one). Does not make it active; see set_active().
+
+    Uses the version's cached table.npy when present; otherwise unpickles
+    the forest once, scores the grid and writes the cache for next time.
+    """
+    if store is None:
+        store = MODEL_STORE
+    if version is None:
+        version = store.active_version()
+        if version is None and store is MODEL_STORE:
+            # Nothing imported yet: serve the file without touching models/
+            import joblib
+
+            model = joblib.load(_MODEL_PATH)
+            return ActiveModel(FILE_VERSION, model, ProbabilityTable.from_model(model), _MODEL_PATH)
+        if version is None:
+            raise FileNotFoundError(f"no active model version in {store.root}")
+
+    model_path = store.model_path(version)
+    table_path = store.table_path(version)
+    if table_path.exists():
+        return ActiveModel(version, None, ProbabilityTable.load(table_path), model_path)
+
+    import joblib
+
+    model = joblib.load(model_path)
+    table = ProbabilityTable.from_model(model)
+    try:
+        table.save(table_path)
+    except OSError as e:
+        print(f"[predictor] Could not cache table for {version}: {e}")
+    return ActiveModel(version, model, table, model_path)
+
+
+# Loaded on first use (see active_model()), so importing this module is
+# cheap; app.py warms it up in the background and reports it on /ready.
+_active: Optional[ActiveModel] = None
+_load_lock = threading.Lock()
+
+
+def bootstrap_store() -> Optional[str]:
+    """
+    Import parking_forecast_model.joblib into MODEL_STORE as its first
+    version and activate it, if the store has no active version yet.
+    Returns the new version, else None. Only ModelLifecycle calls this,
+    so a server that does not retrain never writes to models/.
+    """
+    if MODEL_STORE.active_version() is not None or not _MODEL_PATH.exists():
+        return None
+    version = MODEL_STORE.import_file(_MODEL_PATH, {"origin": "bootstrap"})
+    MODEL_STORE.activate(version)
+    return version
+
+
+def set_active(active: ActiveModel) -> None:
+    """
+    Swap in a fully loaded model. A single reference assignment, so a
+    request sees either the old (version, table) or the new one, never a mix.
+    """
+    global _active
+    _active = active
+
+
+def active_model() -> ActiveModel:
+    """
+    The current model (loading the active version on first call). Grab it
+    once per request and pass it as `active=` to keep every answer in
+    that request on the same version.
+    """
+    active = _active
+    if active is not None:
+        return active
+    with _load_lock:
+        if _active is None:
+            set_active(load_version())
+        return _active
+
+
+def is_loaded() -> bool:
+    return _active is not None
+
+
+def model_version() -> str:
+    return active_model().version
+
+
+# Per-camera / per-lot models (models/cameras/<key>/), falling back to
+# the global model above; see model_registry.py
+MODEL_REGISTRY = ModelRegistry(
+    load_version=lambda store, version: load_version(version, store),
+    global_model=active_model,
+    capacity=int(os.environ.get("MODEL_REGISTRY_CAPACITY", str(DEFAULT_CAPACITY))),
+)
+
+
+def model_for(camera_id: Optional[str]) -> ActiveModel:
+    """
+    The model serving camera_id (the global one if it has none, or for None).
+    """
+    return MODEL_REGISTRY.get(camera_id)
+
+
+def _resolve(active: Optional[ActiveModel], camera_id: Optional[str]) -> ActiveModel:
+    if active is not None:
+        return active
+    if camera_id is not None:
+        return MODEL_REGISTRY.get(camera_id)
+    return active_model()
+
+
+def reload_model(model_path: Path | str | None = None) -> None:
+    """
+    Re-load the model from disk and rebuild the probability table for it.
+    With model_path (e.g. after running train_model.py) the file is
+    imported into the model store as a new version and activated.
+    """
+    if model_path is not None:
+        version = MODEL_STORE.import_file(model_path, {"origin": "reload_model"})
+        active = load_version(version)
+        MODEL_STORE.activate(version)
+    else:
+        active = load_version()
+    set_active(active)
 
 
 def _arrival_features(eta_minutes: float, now: datetime | None = None):
@@ -42,10 +211,35 @@ def _arrival_features(eta_minutes: float, now: datetime | None = None):
     return [[day_of_week, minute_of_day]]
 
 
+def _arrival_slot(eta_minutes: float, now: datetime | None = None) -> int:
+    """
+    Same arrival time as _arrival_features(), as a minute-of-week slot.
+    """
+    if now is None:
+        now = datetime.now()
+
+    return week_slot(now + timedelta(minutes=float(eta_minutes)))
+
+
+def _arrival_slots(eta_minutes, now: datetime | None = None) -> np.ndarray:
+    """
+    _arrival_slot() for an array of ETAs at once, in whole microseconds
+    like timedelta does.
+    """
+    if now is None:
+        now = datetime.now()
+
+    now_us = (week_slot(now) * 60 + now.second) * 1_000_000 + now.microsecond
+    eta_us = np.round(np.asarray(eta_minutes, dtype=np.float64) * 60e6).astype(np.int64)
+    return ((now_us + eta_us) // 60_000_000) % MINUTES_PER_WEEK
+
+
 def predict_empty_probability(
     num_empty: int,
     num_total: int,
     eta_minutes: float,
+    active: ActiveModel | None = None,
+    camera_id: str | None = None,
 ) -> float:
     """
     Predict P(at least one spot is empty at arrival time).
@@ -55,18 +249,34 @@ def predict_empty_probability(
       - num_total: total number of spots (6 in your demo)
       - eta_minutes: user's ETA in minutes
 
+    Optional:
+      - active: a pinned model (see active_model() / model_for())
+      - camera_id: use that camera's (or lot's) model, if it has one
+
     Implementation:
       - Compute arrival time = now + eta_minutes
-      - Convert to (day_of_week, minute_of_day)
-      - Query the trained model for P(any empty at that time)
+      - Convert to a (day_of_week, minute_of_day) slot
+      - Look up P(any empty at that time) in the precomputed table
+        (same value the model's predict_proba would return)
     """
     # If there is already an empty spot and ETA is ~0, you could shortcut,
     # but we let the model handle it for simplicity/consistency.
-    X = _arrival_features(eta_minutes)
-    proba_any_empty = _model.predict_proba(X)[0][1]  # class 1 = "any empty"
+    table = _resolve(active, camera_id).table
+    return float(table.probs[_arrival_slot(eta_minutes)])
 
-    # Clamp to [0,1] just in case of numeric quirks
-    return float(max(0.0, min(1.0, proba_any_empty)))
+
+def predict_empty_probabilities(
+    eta_minutes,
+    active: ActiveModel | None = None,
+    camera_id: str | None = None,
+    now: datetime | None = None,
+) -> np.ndarray:
+    """
+    predict_empty_probability() for many ETAs (e.g. every query of a
+    batch forecast) in one table gather.
+    """
+    table = _resolve(active, camera_id).table
+    return table.probs.take(_arrival_slots(eta_minutes, now))
 
 
 def expected_wait_minutes(
@@ -74,6 +284,8 @@ def expected_wait_minutes(
     num_total: int,
     target_confidence: float = 0.8,
     max_wait: int = 60,
+    active: ActiveModel | None = None,
+    camera_id: str | None = None,
 ) -> float:
     """
     Estimate how long the driver should expect to wait until we reach
@@ -84,6 +296,8 @@ def expected_wait_minutes(
       - num_total: total spots (not heavily used here)
       - target_confidence: e.g. 0.8 for 80% chance of availability
       - max_wait: upper bound on wait time we search over (minutes)
+      - active / camera_id: which model to use, as in
+        predict_empty_probability()
 
     Strategy:
       - If there are already empty spots now, return 0.
@@ -95,11 +309,68 @@ def expected_wait_minutes(
     if num_empty > 0:
         return 0.0
 
-    for w in range(0, max_wait + 1):
-        p = predict_empty_probability(num_empty, num_total, w)
-        if p >= target_confidence:
-            return float(w)
+    # Score w = 0..max_wait in one go; if we never hit the threshold,
+    # just return the cap.
+    curve = availability_curve(max_wait, active=active, camera_id=camera_id)
+    return first_crossing(curve, target_confidence, default=float(max_wait))
+
+
+def expected_wait_minutes_multi(
+    num_empty: int,
+    num_total: int,
+    target_confidences,
+    max_wait: int = 60,
+    active: ActiveModel | None = None,
+    camera_id: str | None = None,
+) -> list[float]:
+    """
+    expected_wait_minutes() for several confidence levels at once,
+    all answered from a single availability curve.
+    """
+    targets = list(target_confidences)
+    if num_empty > 0:
+        return [0.0 for _ in targets]
+
+    curve = availability_curve(max_wait, active=active, camera_id=camera_id)
+    return first_crossing(curve, targets, default=float(max_wait))
 
-    # If we never hit the threshold, just return the cap.
-    return float(max_wait)
 
+def availability_curve(
+    horizon_minutes: int,
+    step: int = 1,
+    now: datetime | None = None,
+    active: ActiveModel | None = None,
+    camera_id: str | None = None,
+):
+    """
+    P(any empty) at now, now + step, ..., now + horizon_minutes.
+
+    Returns a NumPy array of length horizon_minutes // step + 1,
+    gathered from the precomputed table in one vectorized call.
+    """
+    return _resolve(active, camera_id).table.curve(_arrival_slot(0, now), horizon_minutes, step)
+
+
+def availability_horizon(
+    horizon_minutes: int,
+    step: int = 1,
+    target_confidence: float = 0.8,
+    max_wait: int = 60,
+    now: datetime | None = None,
+    active: ActiveModel | None = None,
+    camera_id: str | None = None,
+):
+    """
+    availability_curve(horizon_minutes, step), plus for each of those
+    arrival times the expected wait (as expected_wait_minutes() with no
+    spot empty yet) until P(any empty) >= target_confidence.
+
+    Returns two NumPy arrays of length horizon_minutes // step + 1, both
+    from a single gather of horizon_minutes + max_wait minutes.
+    """
+    if step <= 0:
+        raise ValueError("step must be positive")
+    horizon_minutes, max_wait = int(horizon_minutes), int(max_wait)
+    minutes = _resolve(active, camera_id).table.curve(_arrival_slot(0, now), horizon_minutes + max_wait)
+    waits = crossing_waits(minutes, target_confidence, max_wait, default=float(max_wait))
+    return minutes[:horizon_minutes + 1:step], waits[::step]
@@ -0,0 +1,245 @@
+# request_profiler.py
+#
+# Opt-in cProfile runs of individual requests, to see where the CPU goes
+# inside one slow request (say a forecast calling expected_wait_minutes
+# for every camera) rather than in the /metrics aggregates.
+#
+# A request is profiled when it is sampled (sample_rate) or when it
+# carries the operator's token in the X-Profile-Token header. Each run is
+# written to the profile directory as <id>.prof (pstats, for `python -m
+# pstats` or snakeviz), <id>.txt (the top functions by cumulative time)
+# and <id>.json (what was profiled); only the newest `keep` runs are
+# kept. app.py only installs its request hooks when sampling or the
+# token is configured, so with profiling off requests pay nothing.
+#
+# One request per process is profiled at a time: cProfile can't run two
+# profilers at once on newer Pythons, and a second run would only skew
+# the first. Requests that arrive meanwhile, sampled or requested, are
+# simply not profiled (counted as skipped_busy).
+
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+TOKEN_HEADER = "X-Profile-Token"
+ID_HEADER = "X-Profile-Id"
+
+DEFAULT_KEEP = 200
+SUMMARY_LINES = 60
+
+_ID = re.compile(r"^\d{8}T\d{6}-\d+-\d+$")
+SUFFIXES = (".prof", ".txt", ".json")
+
+
+class ProfileRun:
+    """One request being profiled: started by start(), ended by finish()."""
+
+    __slots__ = ("profile", "trigger", "started", "method", "path")
+
+    def __init__(self, profile: cProfile.Profile, trigger: str, method: str, path: str):
+        self.profile = profile
+        self.trigger = trigger
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        directory: Path | str,
+        sample_rate: float = 0.0,
+        token: str = "",
+        keep: int = DEFAULT_KEEP,
+        min_duration_s: float = 0.0,
+    ):
+        """
+        - directory: where runs are written (created on first write)
+        - sample_rate: fraction of requests profiled at random
+        - token: X-Profile-Token value that forces a profile and opens
+          the admin listing; "" disables both
+        - keep: newest runs kept in directory
+        - min_duration_s: sampled runs faster than this are discarded
+          (token-triggered runs are always kept)
+        """
+        self.directory = Path(directory)
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        self.token = token or ""
+        self.keep = max(1, int(keep))
+        self.min_duration_s = max(0.0, float(min_duration_s))
+
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._rng = random.Random()
+        self._counters = {
+            "sampled": 0,
+            "requested": 0,
+            "written": 0,
+            "discarded_fast": 0,
+            "skipped_busy": 0,
+            "failed": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0.0 or bool(self.token)
+
+    def authorized(self, header_value: Optional[str]) -> bool:
+        """True if header_value is the operator token (never without one)."""
+        if not self.token or not header_value:
+            return False
+        return hmac.compare_digest(header_value.encode("utf-8"), self.token.encode("utf-8"))
+
+    # -----------------------------
+    # Per request
+    # -----------------------------
+    def start(self, method: str, path: str, token_header: Optional[str]) -> Optional[ProfileRun]:
+        """
+        Begin profiling this request if it is requested or sampled;
+        None otherwise. The caller must pass the run to finish().
+        """
+        if self.authorized(token_header):
+            trigger = "requested"
+        elif self.sample_rate > 0.0 and self._rng.random() < self.sample_rate:
+            trigger = "sampled"
+        else:
+            return None
+
+        if not self._busy.acquire(blocking=False):
+            self._count("skipped_busy")
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger's) is already active
+            self._busy.release()
+            self._count("skipped_busy")
+            return None
+        self._count(trigger)
+        return ProfileRun(profile, trigger, method, path)
+
+    def finish(self, run: ProfileRun, status: Any) -> Optional[str]:
+        """
+        Stop run and write it out; returns its id, or None if it was
+        discarded (a fast sampled request) or could not be written.
+        """
+        try:
+            run.profile.disable()
+            duration_s = time.perf_counter() - run.started
+        finally:
+            self._busy.release()
+
+        if run.trigger == "sampled" and duration_s < self.min_duration_s:
+            self._count("discarded_fast")
+            return None
+        try:
+            return self._write(run, status, duration_s)
+        except Exception as e:
+            self._count("failed")
+            print(f"[request_profiler] Could not write profile of {run.method} {run.path}: {e}")
+            return None
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _write(self, run: ProfileRun, status: Any, duration_s: float) -> str:
+        now = datetime.utcnow()
+        with self._lock:
+            self._seq += 1
+            profile_id = f"{now:%Y%m%dT%H%M%S}-{os.getpid()}-{self._seq}"
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "id": profile_id,
+            "timestamp": now.isoformat() + "Z",
+            "method": run.method,
+            "path": run.path,
+            "status": status,
+            "trigger": run.trigger,
+            "duration_ms": round(duration_s * 1000.0, 3),
+            "pid": os.getpid(),
+        }
+
+        text = io.StringIO()
+        text.write(f"{run.method} {run.path} -> {status} in {meta['duration_ms']} ms ({run.trigger})\n\n")
+        stats = pstats.Stats(run.profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+
+        run.profile.dump_stats(str(self.directory / f"{profile_id}.prof"))
+        (self.directory / f"{profile_id}.txt").write_text(text.getvalue(), encoding="utf-8")
+        # Written last: list() only shows runs whose .json exists
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(meta), encoding="utf-8")
+
+        self._count("written")
+        self._rotate()
+        return profile_id
+
+    def _rotate(self) -> None:
+        ids = self._ids()
+        for stale in ids[:max(0, len(ids) - self.keep)]:
+            for suffix in SUFFIXES:
+                try:
+                    (self.directory / f"{stale}{suffix}").unlink()
+                except FileNotFoundError:
+                    pass
+
+    # -----------------------------
+    # Listing and download (admin)
+    # -----------------------------
+    def _ids(self) -> List[str]:
+        """Ids of the complete runs in directory (any worker's), oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        ids = [name[:-5] for name in names if name.endswith(".json") and _ID.match(name[:-5])]
+        # Timestamp first, then pid and sequence as numbers
+        return sorted(ids, key=lambda i: (i.split("-")[0], int(i.split("-")[1]), int(i.split("-")[2])))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of the kept runs, newest first."""
+        out = []
+        for profile_id in reversed(self._ids()):
+            try:
+                meta = json.loads((self.directory / f"{profile_id}.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                # Rotated away by another worker meanwhile
+                continue
+            meta["files"] = [f"{profile_id}{suffix}" for suffix in SUFFIXES]
+            out.append(meta)
+        return out
+
+    def path_for(self, filename: str) -> Optional[Path]:
+        """The file of a kept run by name (e.g. <id>.prof); None if unknown."""
+        stem, dot, suffix = filename.rpartition(".")
+        if not dot or f".{suffix}" not in SUFFIXES or not _ID.match(stem):
+            return None
+        path = self.directory / filename
+        return path if path.is_file() else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "token_configured": bool(self.token),
+                "keep": self.keep,
+                "min_duration_ms": self.min_duration_s * 1000.0,
+                "directory": str(self.directory),
+            }
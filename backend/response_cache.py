@@ -0,0 +1,147 @@
+# response_cache.py
+#
+# Serialized (and lazily gzip-compressed) JSON response bodies for the
+# polling endpoints, so repeated polls with the same state and the same
+# (quantized) query do not rebuild and re-serialize the response.
+#
+# Keys are chosen by the caller and must include everything the body
+# depends on, e.g. (endpoint, SPOT_STATE.version, time bucket, params);
+# entries for old versions simply age out of the LRU, so max_entries must
+# exceed the keys live within one version or they evict each other.
+#
+# ETags are a hash of the body without its volatile fields (the response
+# "timestamp"), so they stay equal across time buckets, rebuilds and
+# serve.py workers as long as the content is the same. A client that
+# sends If-None-Match with it gets a 304 and no body.
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_GZIP_MIN_BYTES = 1024
+
+
+class CachedBody:
+    __slots__ = ("body", "etag", "_gzipped", "_lock")
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+        self._gzipped: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    def gzipped(self, level: int = 6) -> bytes:
+        """The body gzip-compressed, compressed on first use."""
+        if self._gzipped is None:
+            with self._lock:
+                if self._gzipped is None:
+                    self._gzipped = gzip.compress(self.body, compresslevel=level, mtime=0)
+        return self._gzipped
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against etag.
+    """
+    if not if_none_match:
+        return False
+    tag = _opaque(etag)
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or _opaque(candidate) == tag:
+            return True
+    return False
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        dumps: Callable[[Any], str],
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        gzip_min_bytes: int = DEFAULT_GZIP_MIN_BYTES,
+        volatile_keys: Iterable[str] = ("timestamp",),
+    ):
+        """
+        - dumps(payload): the app's JSON serializer (app.json.dumps), so
+          cached bodies match what jsonify() would send
+        - volatile_keys: top-level payload keys left out of the ETag
+        """
+        self._dumps = dumps
+        self.max_entries = max(1, int(max_entries))
+        self.gzip_min_bytes = int(gzip_min_bytes)
+        self.volatile_keys = tuple(volatile_keys)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "not_modified": 0, "gzip": 0, "evictions": 0}
+
+    def get(self, key: Hashable, build: Callable[[], Dict[str, Any]]) -> CachedBody:
+        """
+        The cached body for key, calling build() for the payload on a miss.
+        Concurrent misses for one key may both build; the last one wins.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry
+            self._counters["misses"] += 1
+
+        entry = self._encode(build())
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+        return entry
+
+    def _encode(self, payload: Dict[str, Any]) -> CachedBody:
+        body = (self._dumps(payload) + "\n").encode("utf-8")
+        stable = {k: v for k, v in payload.items() if k not in self.volatile_keys}
+        digest = hashlib.blake2b(self._dumps(stable).encode("utf-8"), digest_size=12).hexdigest()
+        return CachedBody(body, f'W/"{digest}"')
+
+    def encode(self, payload: Dict[str, Any]) -> CachedBody:
+        """Serialize without caching (same body and ETag as get())."""
+        return self._encode(payload)
+
+    def should_gzip(self, entry: CachedBody, accept_encoding: Optional[str]) -> bool:
+        return len(entry.body) >= self.gzip_min_bytes and accepts_gzip(accept_encoding)
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,288 @@
+# rollups.py
+#
+# Incrementally maintained occupancy rollups for /api/occupancy/rollup
+# and /api/history.
+#
+# For every resolution (1 min, 15 min, 1 hour) and camera we keep two
+# small count matrices indexed by [bucket, spot_index]:
+#   samples[b, s]  = how many history rows spot s had in bucket b
+#   occupied[b, s] = how many of those said "occupied"
+# update_spot_storage adds each upload's records as they are written, so
+# a query is a binary search on the bucket ids plus a slice, never a
+# rescan of the history.
+#
+# Counts are uint16 (enough for several days of 5 s samples in one
+# bucket). 1-minute rollups are kept for `retention_s["1m"]` (default
+# 7 days) to bound memory; coarser ones for a year.
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from history_store import TimeLike, to_epoch
+
+RESOLUTIONS = {"1m": 60, "15m": 900, "1h": 3600}
+
+DEFAULT_RETENTION_S = {
+    "1m": 7 * 86400,
+    "15m": 366 * 86400,
+    "1h": 366 * 86400,
+}
+
+
+class _Series:
+    """
+    Bucket ids (sorted) and [bucket, spot] count matrices for one camera
+    at one resolution.
+    """
+
+    def __init__(self, num_spots: int):
+        self.n = 0
+        self.buckets = np.empty(64, dtype=np.int64)
+        self.samples = np.zeros((64, max(1, num_spots)), dtype=np.uint16)
+        self.occupied = np.zeros((64, max(1, num_spots)), dtype=np.uint16)
+
+    def _ensure(self, rows: int, spots: int) -> None:
+        cap, width = self.samples.shape
+        if rows <= cap and spots <= width:
+            return
+        new_cap = max(cap, 1)
+        while new_cap < rows:
+            new_cap *= 2
+        new_width = max(width, spots)
+
+        for name in ("samples", "occupied"):
+            old = getattr(self, name)
+            grown = np.zeros((new_cap, new_width), dtype=old.dtype)
+            grown[:self.n, :width] = old[:self.n]
+            setattr(self, name, grown)
+        if new_cap != cap:
+            self.buckets = np.resize(self.buckets, new_cap)
+
+    def row_for(self, bucket: int, spots: int) -> int:
+        """Index of `bucket`, inserting it (in sorted position) if needed."""
+        self._ensure(self.n + 1, spots)
+
+        # Fast path: uploads arrive in time order
+        if self.n and self.buckets[self.n - 1] == bucket:
+            return self.n - 1
+        if not self.n or self.buckets[self.n - 1] < bucket:
+            self.buckets[self.n] = bucket
+            self.samples[self.n] = 0
+            self.occupied[self.n] = 0
+            self.n += 1
+            return self.n - 1
+
+        i = int(np.searchsorted(self.buckets[:self.n], bucket))
+        if self.buckets[i] == bucket:
+            return i
+        # Late record for an older bucket: shift the tail right by one
+        for arr in (self.buckets, self.samples, self.occupied):
+            arr[i + 1:self.n + 1] = arr[i:self.n].copy()
+        self.buckets[i] = bucket
+        self.samples[i] = 0
+        self.occupied[i] = 0
+        self.n += 1
+        return i
+
+    def merge(self, ids: np.ndarray, add_samples: np.ndarray, add_occupied: np.ndarray) -> None:
+        """Add [bucket, spot] counts for sorted, unique bucket ids."""
+        merged = np.union1d(self.buckets[:self.n], ids)
+        spots = max(self.samples.shape[1], add_samples.shape[1])
+
+        samples = np.zeros((len(merged), spots), dtype=np.int64)
+        occupied = np.zeros((len(merged), spots), dtype=np.int64)
+        old_rows = np.searchsorted(merged, self.buckets[:self.n])
+        samples[old_rows, :self.samples.shape[1]] = self.samples[:self.n]
+        occupied[old_rows, :self.occupied.shape[1]] = self.occupied[:self.n]
+        new_rows = np.searchsorted(merged, ids)
+        samples[new_rows, :add_samples.shape[1]] += add_samples
+        occupied[new_rows, :add_occupied.shape[1]] += add_occupied
+
+        cap = max(64, len(merged))
+        self.buckets = np.empty(cap, dtype=np.int64)
+        self.buckets[:len(merged)] = merged
+        self.samples = np.zeros((cap, spots), dtype=np.uint16)
+        self.occupied = np.zeros((cap, spots), dtype=np.uint16)
+        self.samples[:len(merged)] = np.minimum(samples, np.iinfo(np.uint16).max)
+        self.occupied[:len(merged)] = np.minimum(occupied, np.iinfo(np.uint16).max)
+        self.n = len(merged)
+
+    def trim_before(self, bucket: int) -> None:
+        k = int(np.searchsorted(self.buckets[:self.n], bucket))
+        if k == 0:
+            return
+        for arr in (self.buckets, self.samples, self.occupied):
+            arr[:self.n - k] = arr[k:self.n].copy()
+        self.n -= k
+
+    def window(self, first: int, last: int):
+        """Rows with first <= bucket <= last."""
+        ids = self.buckets[:self.n]
+        lo = int(np.searchsorted(ids, first, side="left"))
+        hi = int(np.searchsorted(ids, last, side="right"))
+        return ids[lo:hi], self.samples[lo:hi], self.occupied[lo:hi]
+
+
+class OccupancyRollups:
+    def __init__(self, retention_s: Optional[Dict[str, float]] = None):
+        self.retention_s = {**DEFAULT_RETENTION_S, **(retention_s or {})}
+        self._lock = threading.Lock()
+        # resolution -> camera_id -> _Series
+        self._series: Dict[str, Dict[str, _Series]] = {res: {} for res in RESOLUTIONS}
+        self._latest = 0.0
+        self._adds_since_trim = 0
+        # add() skips rows stamped before this epoch, which a backfill
+        # from the history store (add_arrays) counts instead
+        self.live_since: Optional[float] = None
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        Fold history records (update_spot_storage's record dicts) into
+        every resolution.
+        """
+        with self._lock:
+            for r in records:
+                spot = r.get("spot_index")
+                status = r.get("status")
+                if spot is None or status not in ("empty", "occupied"):
+                    continue
+                spot = int(spot)
+                ts = to_epoch(r["timestamp"])
+                if self.live_since is not None and ts < self.live_since:
+                    continue
+                self._latest = max(self._latest, ts)
+                occupied = status == "occupied"
+
+                for res, width in RESOLUTIONS.items():
+                    cams = self._series[res]
+                    series = cams.get(r["camera_id"])
+                    if series is None:
+                        series = cams[r["camera_id"]] = _Series(spot + 1)
+                    i = series.row_for(int(ts // width), spot + 1)
+                    series.samples[i, spot] += 1
+                    if occupied:
+                        series.occupied[i, spot] += 1
+
+            self._adds_since_trim += 1
+            if self._adds_since_trim >= 1000:
+                self._trim()
+
+    def _trim(self) -> None:
+        self._adds_since_trim = 0
+        for res, width in RESOLUTIONS.items():
+            cutoff = int((self._latest - self.retention_s[res]) // width)
+            for series in self._series[res].values():
+                series.trim_before(cutoff)
+
+    def cameras(self) -> List[str]:
+        with self._lock:
+            return sorted(self._series["1h"])
+
+    def query(
+        self,
+        start: TimeLike,
+        end: TimeLike,
+        resolution: str = "15m",
+        camera_ids: Optional[Iterable[str]] = None,
+        per_spot: bool = False,
+        spot_index: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        {camera_id: series} for buckets overlapping [start, end).
+
+        Each series is columnar (one list entry per bucket): start (epoch
+        seconds), samples, spots_seen, occupied_fraction, avg_empty_spots.
+        With per_spot (or spot_index) it also has spot_samples and
+        spot_occupied as [bucket][spot] count matrices.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {sorted(RESOLUTIONS)}")
+        width = RESOLUTIONS[resolution]
+        first = int(to_epoch(start) // width)
+        last = int((to_epoch(end) - 1e-6) // width)
+
+        out: Dict[str, Any] = {}
+        with self._lock:
+            cams = self._series[resolution]
+            wanted = sorted(cams) if camera_ids is None else [c for c in camera_ids if c in cams]
+
+            for cam in wanted:
+                ids, samples, occupied = cams[cam].window(first, last)
+                # Copy out under the lock; the JSON building below does not need it
+                ids, samples, occupied = ids.copy(), samples.astype(np.int64), occupied.astype(np.int64)
+                out[cam] = (ids, samples, occupied)
+
+        result: Dict[str, Any] = {}
+        for cam, (ids, samples, occupied) in out.items():
+            if spot_index is not None:
+                if spot_index >= samples.shape[1]:
+                    continue
+                samples = samples[:, spot_index:spot_index + 1]
+                occupied = occupied[:, spot_index:spot_index + 1]
+                spot_ids = [spot_index]
+            else:
+                spot_ids = list(range(samples.shape[1]))
+
+            total = samples.sum(axis=1)
+            occ = occupied.sum(axis=1)
+            seen = samples > 0
+            spot_frac = occupied / np.maximum(samples, 1)
+            # Expected number of empty spots at a random instant in the bucket
+            avg_empty = ((1.0 - spot_frac) * seen).sum(axis=1)
+
+            series = {
+                "resolution": resolution,
+                "bucket_seconds": width,
+                # Columnar: one entry per bucket, bucket start as epoch seconds
+                "start": (ids * width).tolist(),
+                "samples": total.tolist(),
+                "spots_seen": seen.sum(axis=1).tolist(),
+                "occupied_fraction": (occ / np.maximum(total, 1)).tolist(),
+                "avg_empty_spots": avg_empty.tolist(),
+            }
+            if per_spot or spot_index is not None:
+                series["spot_index"] = spot_ids
+                # [bucket][spot] counts; fraction = occupied / samples where samples > 0
+                series["spot_samples"] = samples.tolist()
+                series["spot_occupied"] = occupied.tolist()
+
+            result[cam] = series
+        return result
+
+    def add_arrays(
+        self,
+        camera_id: str,
+        ts: np.ndarray,
+        spot_index: np.ndarray,
+        occupied: np.ndarray,
+    ) -> None:
+        """
+        Vectorized add() for many records of one camera (e.g. backfill):
+        epoch seconds, spot indexes and occupied booleans as arrays.
+        """
+        ts = np.asarray(ts, dtype=np.float64)
+        spot_index = np.asarray(spot_index, dtype=np.int64)
+        occupied = np.asarray(occupied, dtype=bool)
+        if ts.size == 0:
+            return
+        spots = int(spot_index.max()) + 1
+
+        with self._lock:
+            self._latest = max(self._latest, float(ts.max()))
+            for res, width in RESOLUTIONS.items():
+                ids_new, inv = np.unique((ts // width).astype(np.int64), return_inverse=True)
+                add_s = np.zeros((len(ids_new), spots), dtype=np.int64)
+                add_o = np.zeros((len(ids_new), spots), dtype=np.int64)
+                np.add.at(add_s, (inv, spot_index), 1)
+                np.add.at(add_o, (inv[occupied], spot_index[occupied]), 1)
+
+                cams = self._series[res]
+                series = cams.get(camera_id)
+                if series is None:
+                    series = cams[camera_id] = _Series(spots)
+                series.merge(ids_new, add_s, add_o)
+            self._trim()
@@ -0,0 +1,180 @@
+# scene_change.py
+#
+# Per-camera scene-change detection, used to skip redundant LLM calls.
+#
+# Each frame is decoded to a small grayscale thumbnail. Only the parking
+# area (the upper part of the image, split into equal-width regions the
+# same way llm_processor's prompt describes) is compared against the last
+# frame that was actually sent to the LLM. If no spot region moved more
+# than a threshold, the previous analysis result is reused.
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+# Defaults match the single demo camera in llm_processor.py
+DEFAULT_NUM_SPOTS = 6
+DEFAULT_PARKING_FRACTION = 0.5  # upper half is the lot, lower half is road
+
+
+@dataclass
+class CameraLayout:
+    num_spots: int = DEFAULT_NUM_SPOTS
+    parking_fraction: float = DEFAULT_PARKING_FRACTION
+
+
+class SceneChangeDetector:
+    """
+    Decides per frame whether the spot regions changed since the last
+    analyzed frame of the same camera.
+
+    - thumb_size: (width, height) of the grayscale thumbnail
+    - region_threshold: mean absolute difference (0..255 gray levels,
+      after removing global brightness shifts) above which a region
+      counts as changed
+    - max_reuse_s: re-analyze at least this often even if nothing
+      changed (None = never force)
+    - spot_count: camera_id -> number of spots, for cameras without a
+      configure_camera() layout (e.g. llm_processor.num_spots_for, so
+      the regions match the prompt's); DEFAULT_NUM_SPOTS if None
+    """
+
+    def __init__(
+        self,
+        thumb_size: tuple[int, int] = (96, 72),
+        region_threshold: float = 8.0,
+        max_reuse_s: Optional[float] = 300.0,
+        spot_count: Optional[Callable[[str], int]] = None,
+    ):
+        self.thumb_size = thumb_size
+        self.region_threshold = float(region_threshold)
+        self.max_reuse_s = max_reuse_s
+        self.spot_count = spot_count
+
+        self._lock = threading.Lock()
+        self._layouts: Dict[str, CameraLayout] = {}
+        # camera_id -> (thumbnail, result, analyzed_at) of last analyzed frame
+        self._reference: Dict[str, tuple[np.ndarray, Dict[str, Any], float]] = {}
+        # camera_id -> thumbnail of the frame currently being analyzed
+        self._candidate: Dict[str, np.ndarray] = {}
+
+        self._counters = {
+            "frames": 0,
+            "skipped": 0,
+            "analyzed": 0,
+            "forced_refresh": 0,
+        }
+
+    def configure_camera(
+        self,
+        camera_id: str,
+        num_spots: int = DEFAULT_NUM_SPOTS,
+        parking_fraction: float = DEFAULT_PARKING_FRACTION,
+    ) -> None:
+        with self._lock:
+            self._layouts[camera_id] = CameraLayout(num_spots, parking_fraction)
+            self._reference.pop(camera_id, None)
+
+    def layout(self, camera_id: str) -> CameraLayout:
+        layout = self._layouts.get(camera_id)
+        if layout is not None:
+            return layout
+        if self.spot_count is None:
+            return CameraLayout()
+        return CameraLayout(num_spots=max(1, int(self.spot_count(camera_id))))
+
+    def thumbnail(self, image_path: str) -> np.ndarray:
+        """
+        Small grayscale float32 thumbnail of a JPEG.
+        """
+        with Image.open(image_path) as img:
+            # Let the JPEG decoder downscale while decoding (much cheaper)
+            img.draft("L", (self.thumb_size[0] * 2, self.thumb_size[1] * 2))
+            gray = img.convert("L").resize(self.thumb_size, Image.BILINEAR)
+            return np.asarray(gray, dtype=np.float32)
+
+    def region_scores(self, camera_id: str, before: np.ndarray, after: np.ndarray) -> list[float]:
+        """
+        Mean absolute difference per spot region of the parking area.
+        """
+        layout = self.layout(camera_id)
+        rows = max(1, int(round(before.shape[0] * layout.parking_fraction)))
+
+        a = before[:rows]
+        b = after[:rows]
+        # Ignore global exposure changes: compare relative to each frame's mean
+        diff = np.abs((b - b.mean()) - (a - a.mean()))
+
+        return [float(part.mean()) for part in np.array_split(diff, layout.num_spots, axis=1)]
+
+    def reuse_result(
+        self,
+        camera_id: str,
+        image_path: str,
+        now: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Previous analysis result for this camera if none of its spot
+        regions changed, else None (the caller should analyze the frame
+        and then call record()).
+        """
+        if now is None:
+            now = time.time()
+
+        thumb = self.thumbnail(image_path)
+
+        with self._lock:
+            self._counters["frames"] += 1
+            ref = self._reference.get(camera_id)
+
+            if ref is not None:
+                ref_thumb, ref_result, analyzed_at = ref
+                scores = self.region_scores(camera_id, ref_thumb, thumb)
+                stale = self.max_reuse_s is not None and now - analyzed_at >= self.max_reuse_s
+
+                if max(scores) <= self.region_threshold and not stale:
+                    self._counters["skipped"] += 1
+                    return {**ref_result, "reused": True, "region_change": scores}
+                if stale:
+                    self._counters["forced_refresh"] += 1
+
+            self._candidate[camera_id] = thumb
+            return None
+
+    def record(
+        self,
+        camera_id: str,
+        image_path: str,
+        result: Dict[str, Any],
+        now: Optional[float] = None,
+    ) -> None:
+        """
+        Remember an analyzed frame and its result as the new reference.
+        """
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            thumb = self._candidate.pop(camera_id, None)
+        if thumb is None:
+            thumb = self.thumbnail(image_path)
+
+        with self._lock:
+            self._counters["analyzed"] += 1
+            self._reference[camera_id] = (thumb, result, now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            frames = self._counters["frames"]
+            return {
+                **self._counters,
+                "skip_rate": self._counters["skipped"] / frames if frames else 0.0,
+                "region_threshold": self.region_threshold,
+                "max_reuse_s": self.max_reuse_s,
+            }
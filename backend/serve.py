@@ -0,0 +1,167 @@
+# serve.py
+#
+# Production entry point: a pre-fork server running app.py in N worker
+# processes (each a threaded werkzeug server) on one listening socket.
+# `python app.py` stays the single-process development server.
+#
+# The master binds the socket, opens (and, the first time, migrates) the
+# history store and resets the shared state, then forks the workers
+# and restarts any that die. Workers import app.py only after the fork,
+# so each one has its own analysis pipeline, rollups and model cache;
+# SPOT_STATE and LAST_IMAGE_PATH are shared through SHARED_STATE_PATH
+# (see shared_state.py), history rows go to the one SQLite file (WAL),
+# and only worker 0 retrains the model (unless MODEL_RETRAIN_ENABLED=0);
+# the others follow its activations.
+#
+# On SIGTERM/SIGINT the master stops every worker; a worker stops
+# accepting requests, lets its queued analyses finish and flushes its
+# buffered history rows (app.shutdown()) before it exits.
+#
+# Still per worker: analysis job status (/api/camera/jobs/<id> answers
+# only on the worker that took the upload), pipeline/cache counters
+# and /metrics (labelled worker=N).
+#
+#   cd backend && python serve.py --workers 4 [--port 8080] [--threads]
+
+import argparse
+import os
+import shutil
+import signal
+import socket
+import sys
+import threading
+import time
+
+from history_store import open_history_store
+from shared_state import DEFAULT_CAPACITY, DEFAULT_PATH, SharedCameraState, entries_dir
+
+
+def _bind(host, port, backlog=1024):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _prepare_history():
+    """
+    Open the history store once in the master, so a first-run CSV import
+    happens before (not in) every worker.
+    """
+    backend = os.environ.get("HISTORY_BACKEND", "sqlite")
+    if backend != "sqlite":
+        # The columnar and CSV stores assume a single writer process
+        raise SystemExit(f"serve.py needs HISTORY_BACKEND=sqlite (got {backend!r})")
+    store = open_history_store(backend, os.environ.get("HISTORY_PATH"), migrate_from_csv="history.csv")
+    store.close()
+
+
+def _reset_snapshot(path, capacity):
+    # State left by an earlier run would resurrect stale spots
+    for stale in (path, path + ".lock"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    shutil.rmtree(entries_dir(path), ignore_errors=True)
+    SharedCameraState(path, capacity).close()
+
+
+def _run_worker(worker_id, sock, args):
+    os.environ["SERVE_WORKER_ID"] = str(worker_id)
+    if worker_id == 0:
+        # Unless the operator turned retraining off for the deployment
+        os.environ.setdefault("MODEL_RETRAIN_ENABLED", "1")
+    else:
+        os.environ["MODEL_RETRAIN_ENABLED"] = "0"
+
+    # Imported here so every worker builds its own threads and stores
+    from werkzeug.serving import make_server
+
+    import app as backend
+
+    server = make_server(
+        args.host, args.port, backend.app, threaded=args.threads, fd=sock.fileno(),
+    )
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so not from here
+        threading.Thread(target=server.shutdown, name="serve-shutdown", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"[serve] Worker {worker_id} (pid {os.getpid()}) ready")
+    status = 1
+    try:
+        server.serve_forever()
+        print(f"[serve] Worker {worker_id} (pid {os.getpid()}) draining")
+        backend.shutdown()
+        status = 0
+    finally:
+        os._exit(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork multi-process server for app.py")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--threads", action=argparse.BooleanOptionalAction, default=True,
+                        help="serve requests on threads within each worker")
+    parser.add_argument("--state-path", default=os.environ.get("SHARED_STATE_PATH") or DEFAULT_PATH)
+    parser.add_argument("--state-capacity", type=int, default=DEFAULT_CAPACITY)
+    args = parser.parse_args()
+
+    os.environ["SHARED_STATE_PATH"] = args.state_path
+    _reset_snapshot(args.state_path, args.state_capacity)
+    _prepare_history()
+    sock = _bind(args.host, args.port)
+    print(f"[serve] Listening on {args.host}:{args.port} with {args.workers} workers")
+
+    workers = {}  # pid -> worker_id
+    stopping = False
+
+    def spawn(worker_id):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            _run_worker(worker_id, sock, args)
+        workers[pid] = worker_id
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker_id in range(args.workers):
+        spawn(worker_id)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker_id = workers.pop(pid, None)
+        if worker_id is None or stopping:
+            continue
+        print(f"[serve] Worker {worker_id} (pid {pid}) exited with status {status}, restarting")
+        time.sleep(1.0)  # don't spin if it crashes on import
+        spawn(worker_id)
+
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
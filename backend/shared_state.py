@@ -0,0 +1,289 @@
+# shared_state.py
+#
+# The backend's current state (SPOT_STATE and LAST_IMAGE_PATH) shared by
+# every worker process of serve.py, by default under /dev/shm:
+#
+#   <path>.cameras/<hash>.json   each camera's latest entry (timestamp,
+#                                version, prev_version, spots), replaced
+#                                atomically, so its size is one camera's
+#   <path>                       a small SharedSnapshot: the latest image
+#                                and a ring of the last `ring` (generation,
+#                                camera_id) writes
+#
+# A worker that last synced at generation G reads only the entries of the
+# cameras named in the ring after G; one that fell behind the ring lists
+# the whole directory. Either way a write costs one camera's entry plus
+# the ring, however many spots the other cameras have.
+#
+# SharedSnapshot file layout:
+#   header (64 bytes): magic, seq, generation, active slot, slot lengths
+#   slot 0, slot 1:    JSON payloads, `capacity` bytes each
+#
+# Writers take an flock on a side lock file, write the new JSON into the
+# inactive slot and then flip the header, bumping `seq` to odd before and
+# back to even after (a seqlock). Readers never lock: they read the
+# header, copy the active slot and re-read `seq`, retrying if a write
+# overlapped. Each process caches the decoded snapshot by generation, so
+# the common "nothing changed" read is a single 8-byte header read.
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+MAGIC = b"PKSNAP01"
+# magic, seq, generation, active, len0, len1
+_HEADER = struct.Struct("<8sQQIII")
+HEADER_SIZE = 64
+
+DEFAULT_CAPACITY = 8 * 1024 * 1024
+DEFAULT_RING = 1024
+DEFAULT_PATH = "/dev/shm/parking-snapshot" if os.path.isdir("/dev/shm") else "parking-snapshot"
+
+
+class SnapshotTooLarge(ValueError):
+    pass
+
+
+class SharedSnapshot:
+    def __init__(self, path: Path | str = DEFAULT_PATH, capacity: int = DEFAULT_CAPACITY):
+        """
+        Open (creating if needed) the snapshot file at `path`. Every process
+        must use the same capacity; an existing file's size wins.
+        """
+        self.path = Path(path)
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+
+        with self._file_lock():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                size = os.fstat(fd).st_size
+                if size < HEADER_SIZE:
+                    size = HEADER_SIZE + 2 * int(capacity)
+                    os.ftruncate(fd, size)
+                    self._mm = mmap.mmap(fd, size)
+                    _HEADER.pack_into(self._mm, 0, MAGIC, 0, 0, 0, 0, 0)
+                else:
+                    self._mm = mmap.mmap(fd, size)
+                    if self._mm[:8] != MAGIC:
+                        raise ValueError(f"{self.path} is not a snapshot file")
+            finally:
+                os.close(fd)
+
+        self.capacity = (len(self._mm) - HEADER_SIZE) // 2
+        self._local = threading.Lock()
+        self._owner: Optional[int] = None
+        self._cached: Tuple[int, Any] = (-1, None)
+
+    @contextmanager
+    def _file_lock(self):
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive across processes (and threads), for read-modify-write:
+        read() the latest state, change it, write() it back.
+        """
+        with self._local:
+            with self._file_lock():
+                self._owner = threading.get_ident()
+                try:
+                    yield
+                finally:
+                    self._owner = None
+
+    def _slot_offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * self.capacity
+
+    def generation(self) -> int:
+        """Bumped by every write; cheap enough to poll."""
+        return _HEADER.unpack_from(self._mm, 0)[2]
+
+    def read(self) -> Tuple[int, Any]:
+        """
+        (generation, snapshot). Lock-free; returns the cached object when
+        nothing was written since the last read in this process.
+        """
+        while True:
+            _, seq1, gen, active, len0, len1 = _HEADER.unpack_from(self._mm, 0)
+            if seq1 & 1:
+                continue  # header being flipped
+            cached_gen, cached = self._cached
+            if gen == cached_gen:
+                return gen, cached
+            if gen == 0:
+                return 0, None
+
+            length = len1 if active else len0
+            off = self._slot_offset(active)
+            payload = self._mm[off:off + length]
+            if _HEADER.unpack_from(self._mm, 0)[1] != seq1:
+                continue  # a writer reused the slot while we copied it
+
+            value = json.loads(payload)
+            self._cached = (gen, value)
+            return gen, value
+
+    def encode(self, value: Any) -> bytes:
+        """value's payload; raises SnapshotTooLarge if it does not fit a slot."""
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        if len(payload) > self.capacity:
+            raise SnapshotTooLarge(f"snapshot is {len(payload)} bytes, capacity {self.capacity}")
+        return payload
+
+    def write(self, value: Any, payload: Optional[bytes] = None) -> int:
+        """
+        Publish a new snapshot atomically. Call inside locked() when the
+        new value depends on the current one. Returns the new generation.
+        payload, if given, is encode(value) already checked by the caller.
+        """
+        if payload is None:
+            payload = self.encode(value)
+
+        if self._owner == threading.get_ident():
+            gen = self._publish(payload)  # already inside locked()
+        else:
+            with self._local, self._file_lock():
+                gen = self._publish(payload)
+
+        # Callers must not mutate `value` after publishing it
+        self._cached = (gen, value)
+        return gen
+
+    def _publish(self, payload: bytes) -> int:
+        """Write payload to the inactive slot and flip to it (file lock held)."""
+        _, seq, gen, active, len0, len1 = _HEADER.unpack_from(self._mm, 0)
+        slot = 1 - active
+        off = self._slot_offset(slot)
+        self._mm[off:off + len(payload)] = payload
+
+        lens = [len0, len1]
+        lens[slot] = len(payload)
+        gen += 1
+        # seq odd while the header changes, even once it is consistent
+        struct.pack_into("<Q", self._mm, 8, seq + 1)
+        _HEADER.pack_into(self._mm, 0, MAGIC, seq + 1, gen, slot, lens[0], lens[1])
+        struct.pack_into("<Q", self._mm, 8, seq + 2)
+        return gen
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class SharedCameraState:
+    def __init__(self, path: Path | str = DEFAULT_PATH, capacity: int = DEFAULT_CAPACITY, ring: int = DEFAULT_RING):
+        """
+        Open (creating if needed) the shared state at `path`: the
+        SharedSnapshot there and the <path>.cameras directory.
+        """
+        self.snapshot = SharedSnapshot(path, capacity)
+        self.directory = entries_dir(path)
+        self.directory.mkdir(exist_ok=True)
+        self.ring = max(1, int(ring))
+
+    def locked(self):
+        """Exclusive across processes; publish() must be called inside it."""
+        return self.snapshot.locked()
+
+    def generation(self) -> int:
+        return self.snapshot.generation()
+
+    def _entry_path(self, camera_id: str) -> Path:
+        # Camera ids come from clients: never use them as file names
+        digest = hashlib.sha1(camera_id.encode("utf-8")).hexdigest()
+        return self.directory / f"{digest}.json"
+
+    def publish(
+        self,
+        last_image_path: Optional[str],
+        camera_id: Optional[str] = None,
+        entry: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        Publish camera_id's new entry (if any) and the latest image as the
+        next generation, which is returned and stored as the entry's
+        "version". Raises (SnapshotTooLarge, OSError) before anything is
+        visible to other workers if it cannot be published.
+        """
+        gen = self.snapshot.generation() + 1
+        _, current = self.snapshot.read()
+        changes = list(current["changes"]) if current else []
+        complete_after = current["complete_after"] if current else 0
+        if camera_id is not None:
+            changes.append([gen, camera_id])
+            if len(changes) > self.ring:
+                # Readers that synced before this generation must list the directory
+                complete_after = changes[-self.ring - 1][0]
+                changes = changes[-self.ring:]
+        index = {"changes": changes, "complete_after": complete_after, "last_image_path": last_image_path}
+        payload = self.snapshot.encode(index)
+
+        if camera_id is not None:
+            path = self._entry_path(camera_id)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({**entry, "camera_id": camera_id, "version": gen}), encoding="utf-8")
+            os.replace(tmp, path)
+        # The payload fits, so from here the write cannot fail
+        return self.snapshot.write(index, payload)
+
+    def _read_entry(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def changes_since(self, seen: int) -> Tuple[int, Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        (generation, entries of the cameras written after generation
+        `seen`, oldest first, latest image). Entries is None when nothing
+        changed. Lock-free.
+        """
+        gen, index = self.snapshot.read()
+        if gen == seen or index is None:
+            return gen, None, None
+
+        if seen < index["complete_after"]:
+            paths = self.directory.glob("*.json")
+        else:
+            paths = {self._entry_path(c) for g, c in index["changes"] if g > seen}
+        entries = []
+        for path in paths:
+            entry = self._read_entry(path)
+            # An entry newer than gen is still being published: the next
+            # call will find it in the ring
+            if entry is not None and entry["version"] <= gen:
+                entries.append(entry)
+        entries.sort(key=lambda e: e["version"])
+        return gen, entries, index["last_image_path"]
+
+    def close(self) -> None:
+        self.snapshot.close()
+
+
+def entries_dir(path: Path | str) -> Path:
+    """Directory holding the per-camera entries of the shared state at path."""
+    return Path(f"{path}.cameras")
+
+
+def open_shared_state(path: Optional[str], capacity: int = DEFAULT_CAPACITY) -> Optional[SharedCameraState]:
+    """
+    SharedCameraState at path, or None when path is empty (single process).
+    """
+    if not path:
+        return None
+    return SharedCameraState(path, capacity)
@@ -0,0 +1,252 @@
+# spatial_index.py
+#
+# Grid-bucket spatial index over parking spot coordinates.
+#
+# Spots are bucketed into fixed lat/lng cells (~110 m by default).
+# Radius queries only look at the cells overlapping the search circle,
+# then compute exact distances for those candidates with a NumPy-batched
+# haversine. k-nearest queries grow the search radius until k spots are
+# inside it and use argpartition instead of sorting every spot.
+#
+# Good for campus/city-scale areas; the cell math assumes we are not
+# near the poles.
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Hashable
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0  # same radius as app.haversine_distance_m
+METERS_PER_DEG_LAT = EARTH_RADIUS_M * math.pi / 180.0
+
+
+def haversine_m(lat1: float, lng1: float, lat2, lng2) -> np.ndarray:
+    """
+    Distance in meters from one point to arrays of points.
+    """
+    lat2 = np.asarray(lat2, dtype=np.float64)
+    lng2 = np.asarray(lng2, dtype=np.float64)
+
+    phi1 = math.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lng2 - lng1)
+
+    a = np.sin(dphi / 2.0) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1.0 - a))
+
+
+def haversine_pairs_m(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    haversine_m() between broadcastable arrays of points, e.g. every
+    query against every spot with lat1[:, None] and lat2[None, :].
+    """
+    phi1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    phi2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lng2, dtype=np.float64) - np.asarray(lng1, dtype=np.float64))
+
+    a = np.sin(dphi / 2.0) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1.0 - a))
+
+
+class SpotIndex:
+    """
+    Maps spot keys (e.g. (camera_id, spot_index)) to coordinates and an
+    arbitrary item (the spot record), bucketed by grid cell.
+
+    Spots without coordinates are kept aside in `unlocated()` so callers
+    can still list them.
+    """
+
+    def __init__(self, cell_deg: float = 0.001):
+        self._cell = float(cell_deg)
+        self._lock = threading.RLock()
+
+        self._slot_of: dict[Hashable, int] = {}
+        self._keys: list[Hashable] = []
+        self._items: list[Any] = []
+        self._lat = np.empty(64, dtype=np.float64)
+        self._lng = np.empty(64, dtype=np.float64)
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._cell_of: list[tuple[int, int]] = []
+
+        self._unlocated: dict[Hashable, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys) + len(self._unlocated)
+
+    def _cell_key(self, lat: float, lng: float) -> tuple[int, int]:
+        return (math.floor(lat / self._cell), math.floor(lng / self._cell))
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    def upsert(self, key: Hashable, lat: float | None, lng: float | None, item: Any = None) -> None:
+        """
+        Insert or move a spot. lat/lng of None means "no coordinates yet".
+        """
+        with self._lock:
+            if lat is None or lng is None:
+                self._remove_located(key)
+                self._unlocated[key] = item
+                return
+
+            self._unlocated.pop(key, None)
+            cell = self._cell_key(lat, lng)
+
+            slot = self._slot_of.get(key)
+            if slot is None:
+                slot = len(self._keys)
+                if slot == self._lat.shape[0]:
+                    self._lat = np.resize(self._lat, slot * 2)
+                    self._lng = np.resize(self._lng, slot * 2)
+                self._slot_of[key] = slot
+                self._keys.append(key)
+                self._items.append(item)
+                self._cell_of.append(cell)
+            else:
+                self._items[slot] = item
+                old_cell = self._cell_of[slot]
+                if old_cell != cell:
+                    self._discard_from_cell(old_cell, slot)
+                    self._cell_of[slot] = cell
+
+            self._lat[slot] = lat
+            self._lng[slot] = lng
+            self._cells.setdefault(cell, set()).add(slot)
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._unlocated.pop(key, None)
+            self._remove_located(key)
+
+    def _discard_from_cell(self, cell: tuple[int, int], slot: int) -> None:
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(slot)
+            if not members:
+                del self._cells[cell]
+
+    def _remove_located(self, key: Hashable) -> None:
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return
+
+        self._discard_from_cell(self._cell_of[slot], slot)
+
+        # Move the last slot into the hole so the arrays stay dense
+        last = len(self._keys) - 1
+        if slot != last:
+            moved_key = self._keys[last]
+            moved_cell = self._cell_of[last]
+            self._keys[slot] = moved_key
+            self._items[slot] = self._items[last]
+            self._cell_of[slot] = moved_cell
+            self._lat[slot] = self._lat[last]
+            self._lng[slot] = self._lng[last]
+            self._slot_of[moved_key] = slot
+            members = self._cells[moved_cell]
+            members.discard(last)
+            members.add(slot)
+
+        self._keys.pop()
+        self._items.pop()
+        self._cell_of.pop()
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def unlocated(self) -> list[Any]:
+        with self._lock:
+            return list(self._unlocated.values())
+
+    def _candidate_slots(self, lat: float, lng: float, radius_m: float | None) -> np.ndarray:
+        n = len(self._keys)
+        if radius_m is None or n == 0:
+            return np.arange(n)
+
+        # Bounding box of the search circle, with a small safety margin
+        dlat = radius_m / METERS_PER_DEG_LAT * 1.01
+        cos_lat = math.cos(math.radians(min(89.0, abs(lat) + dlat)))
+        dlng = radius_m / (METERS_PER_DEG_LAT * cos_lat) * 1.01
+
+        i0, j0 = self._cell_key(lat - dlat, lng - dlng)
+        i1, j1 = self._cell_key(lat + dlat, lng + dlng)
+
+        slots: list[int] = []
+        if (i1 - i0 + 1) * (j1 - j0 + 1) <= len(self._cells):
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    members = self._cells.get((i, j))
+                    if members:
+                        slots.extend(members)
+        else:
+            # Search box is bigger than the occupied area: walk occupied cells
+            for (i, j), members in self._cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    slots.extend(members)
+
+        return np.fromiter(slots, dtype=np.intp, count=len(slots))
+
+    def _distances(self, lat: float, lng: float, slots: np.ndarray, radius_m: float | None):
+        dist = haversine_m(lat, lng, self._lat[slots], self._lng[slots])
+        if radius_m is not None:
+            keep = dist <= radius_m
+            slots, dist = slots[keep], dist[keep]
+        return slots, dist
+
+    def within(self, lat: float, lng: float, radius_m: float | None = None) -> list[tuple[Any, float]]:
+        """
+        (item, distance_m) for every located spot within radius_m,
+        nearest first. radius_m=None returns every located spot.
+        """
+        with self._lock:
+            slots = self._candidate_slots(lat, lng, radius_m)
+            slots, dist = self._distances(lat, lng, slots, radius_m)
+            order = np.argsort(dist, kind="stable")
+            return [(self._items[s], d) for s, d in zip(slots[order].tolist(), dist[order].tolist())]
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        max_radius_m: float | None = None,
+    ) -> list[tuple[Any, float]]:
+        """
+        Up to k (item, distance_m) pairs closest to (lat, lng), nearest
+        first, optionally limited to max_radius_m.
+        """
+        with self._lock:
+            n = len(self._keys)
+            if k <= 0 or n == 0:
+                return []
+
+            search_m = self._cell * METERS_PER_DEG_LAT
+            while True:
+                capped = max_radius_m is not None and search_m >= max_radius_m
+                limit = max_radius_m if capped else search_m
+
+                slots = self._candidate_slots(lat, lng, limit)
+                covers_all = slots.shape[0] == n
+                if covers_all:
+                    # Circle already reaches every spot: just rank them all
+                    limit = max_radius_m
+                slots, dist = self._distances(lat, lng, slots, limit)
+
+                # Done once k spots are inside the circle (nothing outside it
+                # can be closer), or when the circle cannot usefully grow.
+                if dist.shape[0] >= k or capped or covers_all:
+                    break
+                search_m *= 2.0
+
+            if dist.shape[0] > k:
+                part = np.argpartition(dist, k - 1)[:k]
+                slots, dist = slots[part], dist[part]
+
+            order = np.argsort(dist, kind="stable")
+            return [(self._items[s], d) for s, d in zip(slots[order].tolist(), dist[order].tolist())]
@@ -0,0 +1,364 @@
+# spot_stream.py
+#
+# Server-sent-events fan-out of spot changes (/api/spots/stream), so
+# phones subscribe once instead of polling /api/spots/current.
+#
+# Subscribers are grouped by region: every spot, a set of cameras, or a
+# circle (lat/lng/radius; app.py rounds the center so nearby phones share
+# a region). publish() only queues the change event; a dispatcher thread
+# matches it against the regions (one NumPy distance computation per
+# changed spot over all circle centers), serializes one SSE frame per
+# distinct set of matching spots, and appends the same bytes to every
+# subscriber of those regions.
+#
+# Each subscriber has a bounded queue (frames and bytes). A subscriber
+# that falls behind (a stuck or very slow client) gets a final "resync"
+# frame and is dropped, so it can never hold more than its limit; the
+# client reconnects with Last-Event-ID or uses /api/spots/changes.
+#
+# Frames carry the same body as /api/spots/changes, with the change
+# version as the SSE event id.
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from change_journal import Change, api_changes
+from spatial_index import haversine_m
+
+DEFAULT_MAX_SUBSCRIBERS = 5000
+DEFAULT_MAX_QUEUED = 64
+DEFAULT_MAX_QUEUED_BYTES = 256 * 1024
+DEFAULT_MAX_PENDING_EVENTS = 1024
+
+HEARTBEAT_FRAME = b": ping\n\n"
+
+
+class Region:
+    """
+    What a subscriber wants: cameras (a set of camera ids), a circle
+    (lat, lng, radius_m), or everything. Spots without coordinates are
+    in every circle, like unlocated spots in /api/spots/current.
+    """
+
+    __slots__ = ("cameras", "lat", "lng", "radius_m", "key")
+
+    def __init__(
+        self,
+        cameras: Optional[Iterable[str]] = None,
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+        radius_m: Optional[float] = None,
+    ):
+        self.cameras = frozenset(cameras) if cameras else None
+        self.lat, self.lng, self.radius_m = lat, lng, radius_m
+        if self.cameras is not None:
+            self.key: Hashable = ("cameras", tuple(sorted(self.cameras)))
+        elif lat is not None and lng is not None and radius_m is not None:
+            self.key = ("circle", lat, lng, radius_m)
+        else:
+            self.key = ("all",)
+
+    @property
+    def is_circle(self) -> bool:
+        return self.key[0] == "circle"
+
+    def matches(self, camera_id: str, lat: Any, lng: Any) -> bool:
+        if self.cameras is not None:
+            return camera_id in self.cameras
+        if not self.is_circle or lat is None or lng is None:
+            return True
+        return float(haversine_m(self.lat, self.lng, lat, lng)) <= self.radius_m
+
+
+class Subscriber:
+    """
+    One stream's bounded queue of (version, frame). Filled by the
+    dispatcher, drained by the response generator with take(). The final
+    resync frame is queued with version None.
+    """
+
+    def __init__(self, region: Region, max_queued: int, max_queued_bytes: int):
+        self.region = region
+        self.max_queued = max_queued
+        self.max_queued_bytes = max_queued_bytes
+        self._lock = threading.Lock()
+        self._frames: "deque[Tuple[Optional[int], bytes]]" = deque()
+        self._bytes = 0
+        self._wake = threading.Event()
+        self.closed = False
+
+    def offer(self, version: int, frame: bytes) -> bool:
+        """Queue a frame; False (and the subscriber is closed) on overflow."""
+        with self._lock:
+            if self.closed:
+                return False
+            if len(self._frames) >= self.max_queued or self._bytes + len(frame) > self.max_queued_bytes:
+                self._frames.clear()
+                self._frames.append((None, resync_frame(version, "slow_consumer")))
+                self._bytes = 0
+                self.closed = True
+                self._wake.set()
+                return False
+            self._frames.append((version, frame))
+            self._bytes += len(frame)
+        self._wake.set()
+        return True
+
+    def close(self, version: int, reason: str) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self._frames.clear()
+            self._frames.append((None, resync_frame(version, reason)))
+            self._bytes = 0
+            self.closed = True
+        self._wake.set()
+
+    def take(self, timeout: float) -> Optional[List[Tuple[Optional[int], bytes]]]:
+        """
+        Queued (version, frame)s, waiting up to timeout; [] on timeout,
+        None once the subscriber is closed and drained.
+        """
+        self._wake.wait(timeout)
+        with self._lock:
+            self._wake.clear()
+            frames = list(self._frames)
+            self._frames.clear()
+            self._bytes = 0
+            if not frames and self.closed:
+                return None
+        return frames
+
+    def queued(self) -> Tuple[int, int]:
+        with self._lock:
+            return len(self._frames), self._bytes
+
+
+def resync_frame(version: int, reason: str) -> bytes:
+    return f'event: resync\ndata: {{"version": {int(version)}, "reason": "{reason}"}}\n\n'.encode("utf-8")
+
+
+class SpotStream:
+    def __init__(
+        self,
+        dumps: Callable[[Any], str],
+        max_subscribers: int = DEFAULT_MAX_SUBSCRIBERS,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        max_queued_bytes: int = DEFAULT_MAX_QUEUED_BYTES,
+        max_pending_events: int = DEFAULT_MAX_PENDING_EVENTS,
+    ):
+        """
+        - dumps(payload): the app's JSON serializer (app.json.dumps)
+        - max_subscribers: subscribe() returns None beyond this
+        - max_queued / max_queued_bytes: per-subscriber queue limits
+        - max_pending_events: events waiting for the dispatcher; beyond
+          it every subscriber is told to resync
+        """
+        self._dumps = dumps
+        self.max_subscribers = max(1, int(max_subscribers))
+        self.max_queued = max(1, int(max_queued))
+        self.max_queued_bytes = max(1, int(max_queued_bytes))
+        self.max_pending_events = max(1, int(max_pending_events))
+
+        self._lock = threading.Lock()
+        # region key -> (Region, subscribers)
+        self._regions: Dict[Hashable, Tuple[Region, set]] = {}
+        self._subscribers = 0
+        # Circle regions as arrays for the dispatcher, rebuilt on change
+        self._circles: Optional[Tuple[List[Hashable], np.ndarray, np.ndarray, np.ndarray]] = None
+
+        self._cond = threading.Condition()
+        self._events: "deque[Tuple[int, List[Change]]]" = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self._counters = {
+            "events": 0,
+            "frames_encoded": 0,
+            "delivered": 0,
+            "subscribed": 0,
+            "rejected_full": 0,
+            "dropped_slow": 0,
+            "backlog_resyncs": 0,
+        }
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._dispatch_loop, name="spot-stream", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    # -----------------------------
+    # Subscribers
+    # -----------------------------
+    def subscribe(self, region: Region) -> Optional[Subscriber]:
+        with self._lock:
+            if self._subscribers >= self.max_subscribers:
+                self._counters["rejected_full"] += 1
+                return None
+            sub = Subscriber(region, self.max_queued, self.max_queued_bytes)
+            entry = self._regions.get(region.key)
+            if entry is None:
+                entry = self._regions[region.key] = (region, set())
+                if region.is_circle:
+                    self._circles = None
+            entry[1].add(sub)
+            self._subscribers += 1
+            self._counters["subscribed"] += 1
+            return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            entry = self._regions.get(sub.region.key)
+            if entry is None or sub not in entry[1]:
+                return
+            entry[1].discard(sub)
+            self._subscribers -= 1
+            if not entry[1]:
+                del self._regions[sub.region.key]
+                if sub.region.is_circle:
+                    self._circles = None
+
+    def encode(self, version: int, entries: List[Change]) -> bytes:
+        """One SSE frame: the /api/spots/changes body for entries, id = version."""
+        changes, removed = api_changes(entries)
+        data = self._dumps({"version": version, "changes": changes, "removed": removed})
+        return f"id: {int(version)}\nevent: spots\ndata: {data}\n\n".encode("utf-8")
+
+    # -----------------------------
+    # Producer side
+    # -----------------------------
+    def publish(self, version: int, camera_id: str, changes: Iterable[Tuple[Any, Any, Any, Any, Optional[str]]]) -> None:
+        """
+        Queue camera_id's changed spots, as (spot_index, status, lat, lng,
+        timestamp) with status None for a removed spot, for delivery.
+        Never blocks on subscribers.
+        """
+        if not self._regions:
+            return
+        entries = [(version, camera_id, *change) for change in changes]
+        if not entries:
+            return
+        with self._cond:
+            if len(self._events) >= self.max_pending_events:
+                # The dispatcher is hopelessly behind: drop the backlog and
+                # have everyone catch up through /api/spots/changes
+                self._events.clear()
+                self._counters["backlog_resyncs"] += 1
+                self._close_all(version, "backlog")
+                return
+            self._events.append((version, entries))
+            self._cond.notify()
+
+    def _close_all(self, version: int, reason: str) -> None:
+        with self._lock:
+            subs = [sub for _, members in self._regions.values() for sub in members]
+        for sub in subs:
+            sub.close(version, reason)
+            self.unsubscribe(sub)
+
+    # -----------------------------
+    # Dispatcher
+    # -----------------------------
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._events and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                version, entries = self._events.popleft()
+            try:
+                self._dispatch(version, entries)
+            except Exception as e:
+                print(f"[spot_stream] Dispatch of version {version} failed: {e}")
+
+    def _circle_table(self):
+        # Called with self._lock held
+        if self._circles is None:
+            keys = [key for key, (region, _) in self._regions.items() if region.is_circle]
+            regions = [self._regions[key][0] for key in keys]
+            self._circles = (
+                keys,
+                np.array([r.lat for r in regions], dtype=np.float64),
+                np.array([r.lng for r in regions], dtype=np.float64),
+                np.array([r.radius_m for r in regions], dtype=np.float64),
+            )
+        return self._circles
+
+    def _dispatch(self, version: int, entries: List[Change]) -> None:
+        camera_id = entries[0][1]
+        with self._lock:
+            keys, lat, lng, radius = self._circle_table()
+            targets = [(region, list(members)) for region, members in self._regions.values()]
+
+        # matches[r, j]: changed spot j is inside circle r
+        matches = np.ones((len(keys), len(entries)), dtype=bool)
+        if keys:
+            for j, entry in enumerate(entries):
+                if entry[4] is not None and entry[5] is not None:
+                    matches[:, j] = haversine_m(entry[4], entry[5], lat, lng) <= radius
+        row_of = {key: r for r, key in enumerate(keys)}
+        everything = tuple(range(len(entries)))
+
+        frames: Dict[Tuple[int, ...], bytes] = {}
+        delivered = dropped = 0
+        for region, members in targets:
+            if region.is_circle:
+                picked = tuple(np.flatnonzero(matches[row_of[region.key]]).tolist())
+            elif region.cameras is None or camera_id in region.cameras:
+                picked = everything
+            else:
+                continue
+            if not picked:
+                continue
+
+            frame = frames.get(picked)
+            if frame is None:
+                frame = frames[picked] = self.encode(version, [entries[j] for j in picked])
+            for sub in members:
+                if sub.closed:
+                    continue
+                if sub.offer(version, frame):
+                    delivered += 1
+                else:
+                    dropped += 1
+                    self.unsubscribe(sub)
+
+        with self._lock:
+            self._counters["events"] += 1
+            self._counters["frames_encoded"] += len(frames)
+            self._counters["delivered"] += delivered
+            self._counters["dropped_slow"] += dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._events)
+        with self._lock:
+            return {
+                **self._counters,
+                "subscribers": self._subscribers,
+                "regions": len(self._regions),
+                "pending_events": pending,
+                "max_subscribers": self.max_subscribers,
+                "max_queued": self.max_queued,
+                "max_queued_bytes": self.max_queued_bytes,
+            }
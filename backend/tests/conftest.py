@@ -0,0 +1,33 @@
+# tests/conftest.py
+#
+# Correctness checks for the backend, split out of the benchmarks (which
+# only time things now). The backend modules are flat imports, so put
+# backend/ on sys.path whichever directory pytest runs from; tests that
+# need the Flask app take the `backend` fixture instead of importing it:
+#
+#   cd backend && python -m pytest -q tests
+
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def backend(tmp_path_factory):
+    """
+    app.py imported once for the session, with its history in a temp dir
+    and no background model work or LLM calls.
+    """
+    os.environ.setdefault("MODEL_RETRAIN_ENABLED", "0")
+    os.environ.setdefault("STARTUP_WARMUP", "off")
+    os.environ.setdefault("LOCAL_CLASSIFIER_ENABLED", "0")
+    os.environ.setdefault("HISTORY_MODE", "transitions")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-test-not-used")
+    os.environ.setdefault("HISTORY_PATH", str(tmp_path_factory.mktemp("history") / "history.db"))
+    app = importlib.import_module("app")
+    yield app
+    app.shutdown()
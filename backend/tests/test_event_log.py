@@ -0,0 +1,114 @@
+# tests/test_event_log.py
+#
+# EventLogReader rebuilds, from the transition-only log, exactly the
+# per-spot state a full log holds: after every upload and between
+# uploads, including cameras silent for longer than the reader's first
+# lookback window and cameras whose spot set changes.
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from event_log import EventLogReader, TransitionFilter
+from history_store import CsvHistoryStore, to_epoch
+
+KEYFRAME_S = 900.0
+START = datetime(2025, 12, 1, 8, 0, 0)
+
+
+def _uploads():
+    """
+    Two hours of uploads, oldest first, each a list of history records:
+    cam-a every 60 s, cam-b only for its first 10 minutes, cam-c losing
+    its last spot after an hour.
+    """
+    rng = random.Random(0)
+    status = {}
+    uploads = []
+    for minute in range(120):
+        ts = (START + timedelta(minutes=minute)).isoformat() + "Z"
+        for camera_id, spots in (("cam-a", 4), ("cam-b", 3), ("cam-c", 3)):
+            if camera_id == "cam-b" and minute >= 10:
+                continue
+            if camera_id == "cam-c" and minute >= 60:
+                spots = 2
+            records = []
+            for i in range(spots):
+                key = (camera_id, i)
+                if key not in status or rng.random() < 0.15:
+                    status[key] = rng.choice(["empty", "occupied"])
+                records.append({
+                    "timestamp": ts, "camera_id": camera_id, "spot_index": i,
+                    "status": status[key], "lat": 40.8 + i * 1e-4, "lng": -73.96,
+                })
+            uploads.append(records)
+    return uploads
+
+
+@pytest.fixture
+def event_log(tmp_path):
+    uploads = _uploads()
+    events = CsvHistoryStore(tmp_path / "history_events.csv", flush_interval_s=0)
+    transition_filter = TransitionFilter(KEYFRAME_S)
+    for records in uploads:
+        events.append(transition_filter.filter(records[0]["camera_id"], records))
+    events.flush()
+    return uploads, events, transition_filter
+
+
+def test_log_keeps_only_transitions(event_log):
+    uploads, _, transition_filter = event_log
+    stats = transition_filter.stats()
+    assert stats["rows_in"] == sum(len(records) for records in uploads)
+    assert stats["reduction"] > 0.5
+    # Each camera's first upload, then every 15 minutes for cam-a and cam-c
+    # (cam-c's at minute 60 coming from its lost spot)
+    assert stats["keyframes"] == 3 + 7 + 7
+
+
+def _full_states(uploads):
+    """
+    {epoch: state after every upload at that time}, as the full log has it.
+    """
+    states = {}
+    state = {}
+    for records in uploads:
+        # An upload replaces its camera's spots, removed ones included
+        state[records[0]["camera_id"]] = {r["spot_index"]: (r["status"], r["lat"], r["lng"]) for r in records}
+        states[to_epoch(records[0]["timestamp"])] = {cam: dict(spots) for cam, spots in state.items()}
+    return states
+
+
+def _rebuilt(state):
+    return {
+        cam: {idx: (rec["status"], rec["lat"], rec["lng"]) for idx, rec in spots.items()}
+        for cam, spots in state.items()
+    }
+
+
+@pytest.mark.parametrize("lookback_s", [60.0, None])
+def test_state_at_matches_full_log(event_log, lookback_s):
+    uploads, events, _ = event_log
+    reader = EventLogReader(events, KEYFRAME_S, lookback_s)
+
+    states = _full_states(uploads)
+    times = sorted(states)
+    for i, ts in enumerate(times):
+        # At the upload and halfway to the next one
+        probes = [ts] if i + 1 == len(times) else [ts, (ts + times[i + 1]) / 2]
+        for t in probes:
+            assert _rebuilt(reader.state_at(t)) == states[ts], f"mismatch at {t}"
+
+
+def test_transitions_match_full_log(event_log):
+    uploads, events, _ = event_log
+    reader = EventLogReader(events, KEYFRAME_S)
+
+    states = _full_states(uploads)
+    times = sorted(states)
+    seen = 0
+    for ts, state in reader.transitions(times[5], times[-1] + 1):
+        assert _rebuilt(state) == states[ts], f"mismatch at {ts}"
+        seen += 1
+    assert seen > 1
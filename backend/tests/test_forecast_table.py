@@ -0,0 +1,50 @@
+# tests/test_forecast_table.py
+#
+# The precomputed time-of-week table answers exactly like the per-call
+# RandomForest path it replaced.
+
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import predictor
+from forecast_engine import MINUTES_PER_DAY, MINUTES_PER_WEEK, ProbabilityTable
+
+
+@pytest.fixture(scope="module")
+def model():
+    # Small forest on synthetic (day_of_week, minute_of_day) rows
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.integers(0, 7, 2000), rng.integers(0, MINUTES_PER_DAY, 2000)])
+    y = ((X[:, 1] < 8 * 60) | (X[:, 1] > 18 * 60) | (X[:, 0] >= 5)).astype(int)
+    y ^= rng.random(2000) < 0.1
+    return RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+
+
+def test_table_matches_predict_proba(model):
+    table = ProbabilityTable.from_model(model)
+    rng = random.Random(0)
+    now = datetime(2025, 12, 1, 8, 30, 15)
+    for _ in range(200):
+        eta = rng.uniform(0, MINUTES_PER_WEEK)
+        expected = model.predict_proba(predictor._arrival_features(eta, now))[0][1]
+        assert table.probs[predictor._arrival_slot(eta, now)] == pytest.approx(expected, abs=1e-12)
+
+
+def test_arrival_slots_match_scalar_path():
+    rng = random.Random(1)
+    now = datetime(2025, 12, 7, 23, 59, 59, 999_000)
+    etas = [rng.uniform(0, 2 * MINUTES_PER_WEEK) for _ in range(500)] + [0.0, 0.01, 1 / 60]
+    slots = predictor._arrival_slots(etas, now)
+    assert slots.tolist() == [predictor._arrival_slot(eta, now) for eta in etas]
+
+
+def test_table_save_load_roundtrip(model, tmp_path):
+    table = ProbabilityTable.from_model(model)
+    table.save(tmp_path / "table.npy")
+    loaded = ProbabilityTable.load(tmp_path / "table.npy")
+    assert np.array_equal(loaded.probs, table.probs)
+    assert not loaded.probs.flags.writeable
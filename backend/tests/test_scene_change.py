@@ -0,0 +1,90 @@
+# tests/test_scene_change.py
+#
+# Offline replay of a few synthetic captures (named like camera_upload
+# writes them) through SceneChangeDetector, as
+# benchmarks/replay_scene_change.py replays real ones.
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.replay_scene_change import load_captures, replay
+from scene_change import SceneChangeDetector
+
+WIDTH, HEIGHT = 320, 240
+START = datetime(2025, 12, 1, 8, 0, 0)
+
+
+def _frame(cars=(), brightness=0, strip=None):
+    """
+    A smooth gray lot with a dark car in each spot of cars (out of 6
+    across the upper half); strip=(x0, x1, delta) lightens a column band.
+    """
+    x = np.linspace(60, 180, WIDTH)
+    img = np.tile(x, (HEIGHT, 1)) + brightness
+    spot_w = WIDTH // 6
+    for spot in cars:
+        img[20:100, spot * spot_w + 8:(spot + 1) * spot_w - 8] = 30 + brightness
+    if strip is not None:
+        x0, x1, delta = strip
+        img[:HEIGHT // 2, x0:x1] += delta
+    return Image.fromarray(np.clip(img, 0, 255).astype(np.uint8), "L")
+
+
+@pytest.fixture
+def captures(tmp_path):
+    def write(camera_id, seconds, image):
+        ts = START + timedelta(seconds=seconds)
+        image.save(tmp_path / f"{camera_id}_{ts:%Y%m%d_%H%M%S}.jpg", quality=95)
+    return write, tmp_path
+
+
+def test_replay_skips_unchanged_frames(captures):
+    write, root = captures
+    write("cam-001", 0, _frame())                      # first frame: analyzed
+    write("cam-001", 10, _frame())                     # unchanged: reused
+    write("cam-001", 20, _frame(brightness=30))        # exposure shift only: reused
+    write("cam-001", 30, _frame(cars=[2], brightness=30))  # a car parks: analyzed
+    write("cam-001", 40, _frame(cars=[2], brightness=30))  # reused
+    write("cam-001", 400, _frame(cars=[2], brightness=30))  # past max_reuse_s: analyzed
+
+    detector = SceneChangeDetector(region_threshold=8.0, max_reuse_s=300.0)
+    per_camera = replay(load_captures(root), detector)
+
+    assert per_camera == {"cam-001": {"frames": 6, "llm_calls": 3}}
+    stats = detector.stats()
+    assert (stats["skipped"], stats["analyzed"], stats["forced_refresh"]) == (3, 3, 1)
+
+
+def test_replay_orders_frames_across_cameras(captures):
+    write, root = captures
+    write("cam-b", 5, _frame())
+    write("cam-a", 0, _frame())
+    write("cam-a", 10, _frame(cars=[0]))
+    write("cam-b", 15, _frame())
+    (root / "notes.jpg").write_bytes(b"not a capture name")
+
+    frames = load_captures(root)
+    assert [(cam, ts - frames[0][0]) for ts, cam, _ in frames] == [
+        ("cam-a", 0), ("cam-b", 5), ("cam-a", 10), ("cam-b", 15),
+    ]
+    per_camera = replay(frames, SceneChangeDetector(max_reuse_s=None))
+    assert per_camera == {"cam-a": {"frames": 2, "llm_calls": 2}, "cam-b": {"frames": 2, "llm_calls": 1}}
+
+
+def test_regions_follow_the_camera_spot_count(captures):
+    # A change over one sixth of the width moves one of 6 regions a lot,
+    # but barely moves a single region covering the whole lot
+    write, root = captures
+    for camera_id in ("cam-six", "cam-one"):
+        write(camera_id, 0, _frame())
+        write(camera_id, 10, _frame(strip=(0, WIDTH // 6, 24)))
+
+    counts = {"cam-six": 6, "cam-one": 1}
+    detector = SceneChangeDetector(max_reuse_s=None, spot_count=counts.__getitem__)
+    per_camera = replay(load_captures(root), detector)
+
+    assert per_camera["cam-six"]["llm_calls"] == 2
+    assert per_camera["cam-one"]["llm_calls"] == 1
@@ -0,0 +1,115 @@
+# tests/test_spot_changes.py
+#
+# Delta sync (/api/spots/changes) through Flask's test client and the
+# real update_spot_storage path: a phone that starts from
+# /api/spots/current and then applies the deltas always holds the same
+# state as a freshly built full snapshot, and one that is behind the
+# journal's floor (or ahead of it) is told to resync.
+
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from change_journal import ChangeJournal
+
+SPOTS_PER_CAMERA = 8
+
+
+class Uploader:
+    """Analysis results for a few cameras: statuses flip, spots come and go."""
+
+    def __init__(self, backend, cameras, rng):
+        self.backend = backend
+        self.cameras = cameras
+        self.rng = rng
+        self.t = datetime(2025, 1, 6, 8, 0)
+        self.statuses = {}
+
+    def upload(self, camera_id=None):
+        rng = self.rng
+        if camera_id is None:
+            camera_id = f"cam-{rng.randrange(self.cameras):04d}"
+        spots = self.statuses.setdefault(camera_id, {i: "empty" for i in range(SPOTS_PER_CAMERA)})
+        for i in list(spots):
+            if rng.random() < 0.15:
+                spots[i] = "occupied" if spots[i] == "empty" else "empty"
+        if rng.random() < 0.05 and len(spots) > 1:
+            del spots[rng.choice(list(spots))]
+        elif rng.random() < 0.05:
+            spots[max(spots) + 1] = "empty"
+        self.t += timedelta(seconds=1)
+        result = {"spots": [{"spot_index": i, "status": st} for i, st in sorted(spots.items())]}
+        self.backend.update_spot_storage(camera_id, result, self.t.isoformat() + "Z")
+
+
+class Phone:
+    def __init__(self, client):
+        self.client = client
+        self.resyncs = 0
+        self.version, self.state = _full(client)
+
+    def poll(self):
+        body = json.loads(self.client.get(f"/api/spots/changes?since={self.version}").data)
+        if body["resync"]:
+            self.resyncs += 1
+            self.version, self.state = _full(self.client)
+            return
+        for spot in body["changes"]:
+            self.state[spot["spotID"]] = spot["status"]
+        for spot_id in body["removed"]:
+            self.state.pop(spot_id, None)
+        self.version = body["version"]
+
+
+def _full(client):
+    body = json.loads(client.get("/api/spots/current").data)
+    return body["version"], {s["spotID"]: s["status"] for s in body["spots"]}
+
+
+@pytest.fixture(scope="module")
+def uploader(backend):
+    # One clock for the module: an upload older than a camera's state is skipped
+    uploader = Uploader(backend, cameras=30, rng=random.Random(0))
+    for c in range(uploader.cameras):
+        uploader.upload(f"cam-{c:04d}")
+    return uploader
+
+
+def _truth(backend):
+    body = backend._current_payload(None, None, None, None)
+    return {s["spotID"]: s["status"] for s in body["spots"]}
+
+
+def test_delta_sync_matches_full_snapshot(backend, uploader):
+    client = backend.app.test_client()
+    rng = random.Random(1)
+    phones = [Phone(client) for _ in range(5)]
+    for step in range(300):
+        for _ in range(rng.randint(0, 3)):
+            uploader.upload()
+        phone = rng.choice(phones)
+        phone.poll()
+        assert phone.state == _truth(backend), f"step {step}"
+    assert not any(phone.resyncs for phone in phones)
+
+
+def test_resync_outside_the_journal(backend, uploader, monkeypatch):
+    journal = ChangeJournal(max_changes=50)
+    journal.observe(backend.CHANGE_JOURNAL.version)
+    monkeypatch.setattr(backend, "CHANGE_JOURNAL", journal)
+
+    phone = Phone(backend.app.test_client())
+    # ~1 change per upload: enough to push the phone below the floor
+    for _ in range(150):
+        uploader.upload()
+    phone.poll()
+    assert phone.resyncs == 1
+    assert phone.state == _truth(backend)
+
+    # Ahead of the server (e.g. it restarted): resync too
+    phone.version = journal.version + 10
+    phone.poll()
+    assert phone.resyncs == 2
+    assert phone.state == _truth(backend)
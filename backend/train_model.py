@@ -1,17 +1,30 @@
-# This reads training.csv / testing.csv, trains a
-# model to predict whether at least one spot is empty, and saves
-# the model as parking_forecast_model.joblib
+# This reads training data, trains a model to predict whether at
+# least one spot is empty, and saves the model as
+# parking_forecast_model.joblib
+#
+# Training data comes from the rows feature_pipeline.py materialized from
+# the live spot history (features/*.npz, last 20% by time held out), or
+# from the static training.csv / testing.csv:
+#
+#   python train_model.py [--source auto|features|csv]
 
+import argparse
 from pathlib import Path
 
 import joblib
-import pandas as pd
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
 
+from feature_pipeline import FEATURES_DIR, LABEL_COLUMN, load_features
+
+# Features: time-of-week only
+FEATURE_COLS = ["day_of_week", "minute_of_day"]
+
+
+def load_csv_split(base_dir: Path):
+    import pandas as pd
 
-def main():
-    base_dir = Path(__file__).resolve().parent
     train_path = base_dir / "training.csv"
     test_path = base_dir / "testing.csv"
 
@@ -21,17 +34,36 @@ def main():
     print(f"Loading test data from: {test_path}")
     df_test = pd.read_csv(test_path)
 
-    # Features: time-of-week only
-    feature_cols = ["day_of_week", "minute_of_day"]
+    return (
+        df_train[FEATURE_COLS].values, df_train[LABEL_COLUMN].values,
+        df_test[FEATURE_COLS].values, df_test[LABEL_COLUMN].values,
+    )
 
-    X_train = df_train[feature_cols].values
-    y_train = df_train["label_any_empty"].values
 
-    X_test = df_test[feature_cols].values
-    y_test = df_test["label_any_empty"].values
+def load_feature_split(features_dir: Path = FEATURES_DIR, test_fraction: float = 0.2, camera_ids=None):
+    """
+    Materialized history rows, split by time so the test set is the most
+    recent test_fraction of uploads. camera_ids limits the rows to those
+    cameras (for a per-camera / per-lot model).
+    """
+    print(f"Loading materialized features from: {features_dir}")
+    data = load_features(features_dir)
+    if camera_ids is not None:
+        keep = np.isin(data["camera_id"], list(camera_ids))
+        data = {name: col[keep] for name, col in data.items()}
+    order = np.argsort(data["timestamp"], kind="stable")
+    X = np.column_stack([data[c] for c in FEATURE_COLS])[order]
+    y = data[LABEL_COLUMN][order]
 
-    print("Training RandomForestClassifier...")
-    clf = RandomForestClassifier(
+    cutoff = int(len(y) * (1.0 - test_fraction))
+    return X[:cutoff], y[:cutoff], X[cutoff:], y[cutoff:]
+
+
+def build_classifier() -> RandomForestClassifier:
+    """
+    The forecast model's estimator (shared with model_lifecycle.py retraining).
+    """
+    return RandomForestClassifier(
         n_estimators=200,
         max_depth=10,
         min_samples_leaf=5,
@@ -39,6 +71,31 @@ def main():
         random_state=42,
         n_jobs=-1,
     )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the parking forecast model")
+    parser.add_argument(
+        "--source", choices=["auto", "features", "csv"], default="auto",
+        help="auto uses materialized features when there are any, else the CSVs",
+    )
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).resolve().parent
+
+    source = args.source
+    if source == "auto":
+        source = "features" if len(load_features(FEATURES_DIR)[LABEL_COLUMN]) else "csv"
+
+    if source == "features":
+        X_train, y_train, X_test, y_test = load_feature_split()
+        if not len(X_train) or not len(X_test):
+            raise SystemExit("Not enough materialized rows; run feature_pipeline.py first.")
+    else:
+        X_train, y_train, X_test, y_test = load_csv_split(base_dir)
+
+    print("Training RandomForestClassifier...")
+    clf = build_classifier()
     clf.fit(X_train, y_train)
 
     print("Evaluating on test set...")
@@ -0,0 +1,75 @@
+# This pairs saved captures/ frames with the LLM answers recorded for
+# them in the history store, trains a per-spot empty/occupied classifier on
+# simple image features, and saves it as occupancy_model.joblib
+# (used by local_classifier.py as a fast path ahead of the LLM).
+
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import classification_report
+
+from history_store import open_history_store
+from llm_processor import num_spots_for
+from local_classifier import MODEL_PATH, build_dataset, labelled_frames
+
+
+def main():
+    base_dir = Path(__file__).resolve().parent
+    captures_dir = base_dir / "captures"
+
+    # Same history store the backend writes to (see app.py)
+    backend = os.environ.get("HISTORY_BACKEND", "sqlite")
+    history = open_history_store(
+        backend,
+        os.environ.get("HISTORY_PATH"),
+        migrate_from_csv=str(base_dir / "history.csv"),
+        flush_interval_s=0,
+    )
+
+    print(f"Matching captures in {captures_dir} with labels from the {backend} history store")
+    frames = labelled_frames(captures_dir, history)
+    history.close()
+    if not frames:
+        raise SystemExit("No labelled frames found (need captures/*.jpg with matching history rows).")
+    print(f"Found {len(frames)} labelled frames")
+
+    # Same spot regions per camera as app.py classifies with
+    X, y, groups = build_dataset(frames, num_spots_for=num_spots_for)
+
+    # Hold out the last 20% of frames (by time) so spots from one frame
+    # never land on both sides of the split
+    cutoff = int(len(frames) * 0.8)
+    train_mask = groups < cutoff
+
+    X_train, y_train = X[train_mask], y[train_mask]
+    X_test, y_test = X[~train_mask], y[~train_mask]
+    if len(np.unique(y_train)) < 2:
+        # A one-class forest would answer that class for every spot
+        raise SystemExit("Training frames only show one class (all empty or all occupied); not saving a model.")
+
+    print("Training RandomForestClassifier...")
+    clf = RandomForestClassifier(
+        n_estimators=100,
+        max_depth=8,
+        min_samples_leaf=3,
+        class_weight="balanced",
+        random_state=42,
+        n_jobs=-1,
+    )
+    clf.fit(X_train, y_train)
+
+    if len(X_test):
+        print("Evaluating on held-out frames...")
+        y_pred = clf.predict(X_test)
+        print(classification_report(y_test, y_pred, target_names=["empty", "occupied"]))
+        print(f"Held-out spots: {len(y_test)} ({np.mean(y_test):.0%} occupied)")
+
+    joblib.dump(clf, MODEL_PATH)
+    print(f"Saved model to: {MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()